@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import copy
 import json
 import os
 from contextlib import asynccontextmanager
@@ -7,15 +8,35 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 from html import escape
 from pathlib import Path
-from typing import Any, Callable
+from typing import Annotated, Any, Callable
 
 try:  # pragma: no cover - imported lazily for endpoint typing when FastAPI is available
-    from fastapi import Request
+    from fastapi import Query, Request
 except Exception:  # pragma: no cover - diagnostic fallback path
     Request = Any  # type: ignore[misc,assignment]
 
+    def Query(*_: Any, **__: Any) -> Any:  # type: ignore[no-redef]
+        return None
+
+from proof_of_heat.services.series_encoding import (
+    BINARY_MEDIA_TYPE,
+    COLUMNAR_MEDIA_TYPE,
+    CSV_MEDIA_TYPE,
+    GZIP_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    encode_binary,
+    encode_columnar,
+    iter_csv,
+    iter_gzip,
+    iter_ndjson,
+    negotiate_series_format,
+)
+from proof_of_heat.settings_store import SettingsStore
+
 TEMPLATES_DIR = Path(__file__).with_name("templates")
 STATIC_DIR = Path(__file__).with_name("static")
+METRIC_QUERY_MAX_SERIES = 32
 
 HEATING_CURVE_DEFAULTS: dict[str, Any] = {
     "slope": 6.0,
@@ -60,6 +81,8 @@ class AppBuilderDependencies:
     http_exception_cls: Any
     html_response_cls: Any
     json_response_cls: Any
+    response_cls: Any
+    streaming_response_cls: Any
     static_files_cls: Any
     background_scheduler_cls: Any
     interval_trigger_cls: Any
@@ -71,8 +94,9 @@ class AppBuilderDependencies:
     parse_settings_yaml: Callable[[str], dict[str, Any]]
     render_settings_yaml: Callable[[dict[str, Any]], str]
     save_settings_yaml: Callable[[str], dict[str, Any]]
-    run_heating_mode_control: Callable[[Any | None], None]
+    run_heating_mode_control: Callable[..., None]
     resolve_control_interval_seconds: Callable[[dict[str, Any]], int]
+    settings_file_signature: Callable[[], Any] | None = None
 
 
 def _parse_iso_datetime(value: str | None) -> int | None:
@@ -88,6 +112,12 @@ def _parse_iso_datetime(value: str | None) -> int | None:
     return int(dt.timestamp() * 1000)
 
 
+def _split_filter(value: str | None) -> list[str]:
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
 def _coerce_float(value: Any, default: float) -> float:
     try:
         return float(value)
@@ -217,11 +247,33 @@ def create_app(
     app = deps.fastapi_cls(title="proof-of-heat MVP", version=app_version, root_path=root_path)
     app.mount("/static", deps.static_files_cls(directory=STATIC_DIR), name="static")
 
-    settings_data = deps.parse_settings_yaml(deps.load_settings_yaml())
+    settings_store = SettingsStore(
+        load_yaml=deps.load_settings_yaml,
+        parse_yaml=deps.parse_settings_yaml,
+        save_yaml=deps.save_settings_yaml,
+        signature=deps.settings_file_signature,
+        logger=logger,
+    )
+    settings_data = settings_store.data
     device_poller = deps.device_poller_cls(settings_data, data_dir=config.data_dir)
     app.state.device_poller = device_poller
+    app.state.settings_store = settings_store
     control_scheduler: Any | None = None
 
+    def apply_settings(parsed: dict[str, Any]) -> None:
+        nonlocal settings_data
+        settings_data = parsed
+        device_poller.update_settings(parsed)
+        if control_scheduler:
+            control_scheduler.reschedule_job(
+                "heating-mode-control",
+                trigger=deps.interval_trigger_cls(
+                    seconds=deps.resolve_control_interval_seconds(parsed)
+                ),
+            )
+
+    settings_store.subscribe(apply_settings)
+
     @asynccontextmanager
     async def lifespan(app_instance: Any):
         nonlocal control_scheduler
@@ -235,12 +287,14 @@ def create_app(
                 trigger=deps.interval_trigger_cls(
                     seconds=deps.resolve_control_interval_seconds(settings_data)
                 ),
-                args=[device_poller],
+                args=[device_poller, settings_store],
                 id="heating-mode-control",
                 replace_existing=True,
+                # First tick right away, on the scheduler thread, so a slow
+                # miner does not hold up the server.
+                next_run_time=datetime.now(timezone.utc),
             )
             control_scheduler.start()
-            deps.run_heating_mode_control(device_poller)
             yield
         finally:
             device_poller.shutdown()
@@ -268,6 +322,11 @@ def create_app(
     def health() -> dict[str, str]:
         return {"status": "ok"}
 
+    @app.get("/health/ready")
+    def health_ready() -> Any:
+        readiness = device_poller.get_readiness()
+        return deps.json_response_cls(readiness, status_code=200 if readiness["ready"] else 503)
+
     @app.get("/debug/routes")
     def debug_routes() -> dict[str, Any]:
         return {"routes": sorted({route.path for route in app.router.routes})}
@@ -300,49 +359,35 @@ def create_app(
     @app.get("/api/config")
     @app.get("/api/config/")
     def get_config() -> dict[str, Any]:
-        raw_yaml = deps.load_settings_yaml()
-        parsed = deps.parse_settings_yaml(raw_yaml)
-        return {"raw_yaml": raw_yaml, "parsed": parsed}
+        snapshot = settings_store.snapshot()
+        return {"raw_yaml": snapshot.raw_yaml, "parsed": snapshot.data}
 
     @app.post("/api/config")
     @app.post("/api/config/")
     def update_config(payload: dict[str, Any]) -> dict[str, Any]:
-        nonlocal settings_data
         raw_yaml = payload.get("raw_yaml")
         if not isinstance(raw_yaml, str):
             raise deps.http_exception_cls(status_code=400, detail="raw_yaml must be a string")
         try:
-            parsed = deps.save_settings_yaml(raw_yaml)
+            parsed = settings_store.save(raw_yaml)
         except ValueError as exc:
             raise deps.http_exception_cls(status_code=400, detail=str(exc)) from exc
-        settings_data = parsed
-        device_poller.update_settings(parsed)
-        if control_scheduler:
-            control_scheduler.reschedule_job(
-                "heating-mode-control",
-                trigger=deps.interval_trigger_cls(
-                    seconds=deps.resolve_control_interval_seconds(parsed)
-                ),
-            )
         return {"parsed": parsed}
 
     @app.get("/api/heating-curve")
     @app.get("/api/heating-curve/")
     def get_heating_curve() -> dict[str, Any]:
-        raw_yaml = deps.load_settings_yaml()
-        parsed = deps.parse_settings_yaml(raw_yaml)
+        parsed = settings_store.data
         return {"data": _normalize_heating_curve(parsed.get("heating_curve"))}
 
     @app.post("/api/heating-curve")
     @app.post("/api/heating-curve/")
     def update_heating_curve(payload: dict[str, Any]) -> dict[str, Any]:
         heating_curve = _normalize_heating_curve(payload)
-        raw_yaml = deps.load_settings_yaml()
-        parsed = deps.parse_settings_yaml(raw_yaml)
+        parsed = copy.deepcopy(settings_store.data)
         parsed["heating_curve"] = heating_curve
         rendered_yaml = deps.render_settings_yaml(parsed)
-        saved = deps.save_settings_yaml(rendered_yaml)
-        device_poller.update_settings(saved)
+        saved = settings_store.save(rendered_yaml)
         return {"data": _normalize_heating_curve(saved.get("heating_curve"))}
 
     @app.get("/api/metrics/device-types")
@@ -361,6 +406,16 @@ def create_app(
         catalog.pop("economics", None)
         return {"catalog": catalog}
 
+    @app.get("/api/metrics/catalog/series")
+    def get_metrics_catalog_series() -> dict[str, list[dict[str, Any]]]:
+        return {
+            "series": [
+                item
+                for item in device_poller.get_metric_catalog_series()
+                if item["device_type"] != "economics"
+            ]
+        }
+
     @app.get("/api/metrics/device-ids")
     def list_metric_device_ids(device_type: str) -> dict[str, list[str]]:
         if not device_type:
@@ -373,6 +428,19 @@ def create_app(
             raise deps.http_exception_cls(status_code=400, detail="device_type and device_id required")
         return {"metrics": device_poller.list_metric_names(device_type, device_id)}
 
+    def metric_series_response(request: Request | None, **query: Any) -> Any:
+        accept = request.headers.get("accept") if request is not None else None
+        media_type = negotiate_series_format(accept)
+        try:
+            if media_type == JSON_MEDIA_TYPE:
+                return {"points": device_poller.get_metric_series(**query)}
+            ts, values = device_poller.get_metric_columns(**query)
+        except ValueError as exc:
+            raise deps.http_exception_cls(status_code=400, detail=str(exc)) from exc
+        if media_type == BINARY_MEDIA_TYPE:
+            return deps.response_cls(content=encode_binary(ts, values), media_type=BINARY_MEDIA_TYPE)
+        return deps.json_response_cls(encode_columnar(ts, values), media_type=COLUMNAR_MEDIA_TYPE)
+
     @app.get("/api/metrics/data")
     def get_metric_data(
         device_type: str,
@@ -380,28 +448,137 @@ def create_app(
         metric: str,
         start: str | None = None,
         end: str | None = None,
-    ) -> dict[str, Any]:
+        aggregate: str = "sample",
+        max_points: int | None = None,
+        gap_ms: int | None = None,
+        request: Request = None,
+    ) -> Any:
         if not device_type or not device_id or not metric:
             raise deps.http_exception_cls(
                 status_code=400,
                 detail="device_type, device_id, metric required",
             )
-        start_ms = _parse_iso_datetime(start)
-        end_ms = _parse_iso_datetime(end)
-        points = device_poller.get_metric_series(
+        return metric_series_response(
+            request,
             device_type=device_type,
             device_id=device_id,
             metric=metric,
-            start_ms=start_ms,
-            end_ms=end_ms,
+            start_ms=_parse_iso_datetime(start),
+            end_ms=_parse_iso_datetime(end),
+            aggregate=aggregate,
+            max_points=max_points,
+            gap_ms=gap_ms,
+        )
+
+    @app.post("/api/metrics/query")
+    @app.post("/api/metrics/query/")
+    def query_metric_data(payload: dict[str, Any]) -> Any:
+        if not isinstance(payload, dict):
+            raise deps.http_exception_cls(status_code=400, detail="payload must be a JSON object")
+        series = payload.get("series")
+        if not isinstance(series, list) or not series:
+            raise deps.http_exception_cls(status_code=400, detail="series must be a non-empty list")
+        if len(series) > METRIC_QUERY_MAX_SERIES:
+            raise deps.http_exception_cls(
+                status_code=400,
+                detail=f"at most {METRIC_QUERY_MAX_SERIES} series per query",
+            )
+        for item in series:
+            if not isinstance(item, dict) or not all(
+                isinstance(item.get(key), str) and item.get(key)
+                for key in ("device_type", "device_id", "metric")
+            ):
+                raise deps.http_exception_cls(
+                    status_code=400,
+                    detail="each series requires device_type, device_id, metric",
+                )
+        bounds: dict[str, int | None] = {}
+        for name in ("start", "end"):
+            value = payload.get(name)
+            bounds[name] = _parse_iso_datetime(value) if isinstance(value, str) and value else None
+            if value is not None and bounds[name] is None:
+                raise deps.http_exception_cls(status_code=400, detail=f"{name} must be an ISO 8601 datetime")
+        try:
+            results = device_poller.iter_metric_series(
+                series,
+                start_ms=bounds["start"],
+                end_ms=bounds["end"],
+                aggregate=payload.get("aggregate", "sample"),
+                max_points=payload.get("max_points"),
+                gap_ms=payload.get("gap_ms"),
+            )
+        except ValueError as exc:
+            raise deps.http_exception_cls(status_code=400, detail=str(exc)) from exc
+
+        def stream() -> Any:
+            # Each series is serialized as soon as it has been read.
+            yield b'{"series": ['
+            for index, (item, points) in enumerate(results):
+                if index:
+                    yield b","
+                yield json.dumps(
+                    {
+                        "device_type": item["device_type"],
+                        "device_id": item["device_id"],
+                        "metric": item["metric"],
+                        "points": points,
+                    }
+                ).encode("utf-8")
+            yield b"]}"
+
+        return deps.streaming_response_cls(stream(), media_type="application/json")
+
+    @app.get("/api/metrics/export")
+    @app.get("/api/metrics/export/")
+    def export_metric_data(
+        export_format: Annotated[str, Query(alias="format")] = "csv",
+        source: str = "raw",
+        device_type: str | None = None,
+        device_id: str | None = None,
+        metric: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        resolution_seconds: int | None = None,
+        compress: Annotated[bool, Query(alias="gzip")] = False,
+    ) -> Any:
+        encoders = {"csv": (iter_csv, CSV_MEDIA_TYPE), "ndjson": (iter_ndjson, NDJSON_MEDIA_TYPE)}
+        if export_format not in encoders:
+            raise deps.http_exception_cls(status_code=400, detail="format must be csv or ndjson")
+        try:
+            columns, chunks = device_poller.iter_metric_export(
+                source,
+                device_types=_split_filter(device_type),
+                device_ids=_split_filter(device_id),
+                metrics=_split_filter(metric),
+                start_ms=_parse_iso_datetime(start),
+                end_ms=_parse_iso_datetime(end),
+                resolution_seconds=resolution_seconds,
+            )
+        except ValueError as exc:
+            raise deps.http_exception_cls(status_code=400, detail=str(exc)) from exc
+        encode, media_type = encoders[export_format]
+        body = encode(columns, chunks)
+        filename = f"metrics-{source}.{export_format}"
+        if compress:
+            body = iter_gzip(body)
+            media_type = GZIP_MEDIA_TYPE
+            filename += ".gz"
+        return deps.streaming_response_cls(
+            body,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
-        return {"points": points}
 
     @app.get("/api/control-inputs/latest")
     @app.get("/api/control-inputs/latest/")
     def get_latest_control_inputs() -> dict[str, Any]:
         return {"data": device_poller.get_latest_control_inputs()}
 
+    @app.get("/api/control-inputs/refresh-stats")
+    @app.get("/api/control-inputs/refresh-stats/")
+    def get_control_input_refresh_stats() -> dict[str, Any]:
+        return {"data": device_poller.get_control_input_refresh_stats()}
+
     @app.get("/api/control-decisions/latest")
     @app.get("/api/control-decisions/latest/")
     def get_latest_control_decision() -> dict[str, Any]:
@@ -435,25 +612,45 @@ def create_app(
         metric: str,
         start: str | None = None,
         end: str | None = None,
-    ) -> dict[str, Any]:
+        aggregate: str = "sample",
+        max_points: int | None = None,
+        gap_ms: int | None = None,
+        request: Request = None,
+    ) -> Any:
         if not metric:
             raise deps.http_exception_cls(status_code=400, detail="metric required")
-        start_ms = _parse_iso_datetime(start)
-        end_ms = _parse_iso_datetime(end)
-        points = device_poller.get_metric_series(
+        return metric_series_response(
+            request,
             device_type="economics",
             device_id="market",
             metric=metric,
-            start_ms=start_ms,
-            end_ms=end_ms,
+            start_ms=_parse_iso_datetime(start),
+            end_ms=_parse_iso_datetime(end),
+            aggregate=aggregate,
+            max_points=max_points,
+            gap_ms=gap_ms,
         )
-        return {"points": points}
 
     @app.get("/api/database/vacuum")
     @app.get("/api/database/vacuum/")
     def get_database_vacuum_status() -> dict[str, Any]:
         return device_poller.get_database_vacuum_status()
 
+    @app.get("/api/database/write-queue")
+    @app.get("/api/database/write-queue/")
+    def get_database_write_queue_status() -> dict[str, Any]:
+        return device_poller.get_write_queue_status()
+
+    @app.get("/api/database/series-cache")
+    @app.get("/api/database/series-cache/")
+    def get_database_series_cache_status() -> dict[str, Any]:
+        return device_poller.get_series_cache_status()
+
+    @app.get("/api/database/retention")
+    @app.get("/api/database/retention/")
+    def get_database_retention_status() -> dict[str, Any]:
+        return device_poller.get_retention_status()
+
     @app.post("/api/database/vacuum")
     @app.post("/api/database/vacuum/")
     def run_database_vacuum(payload: dict[str, Any] | None = None) -> dict[str, Any]:
@@ -467,8 +664,7 @@ def create_app(
     def status() -> dict[str, Any]:
         miner_status = miner.fetch_status()
         snapshot = controller.record_snapshot(indoor_temp_c=21.0, miner_status=miner_status)
-        raw_yaml = deps.load_settings_yaml()
-        parsed = deps.parse_settings_yaml(raw_yaml)
+        parsed = settings_store.data
         latest_payloads = device_poller.get_latest_payloads()
         weather_payload: dict[str, Any] | None = None
         for source in _load_weather_devices(parsed):
@@ -524,8 +720,7 @@ def create_app(
     @app.get("/devices", response_class=deps.html_response_cls, include_in_schema=False)
     @app.get("/devices/", response_class=deps.html_response_cls, include_in_schema=False)
     def devices_view() -> Any:
-        raw_yaml = deps.load_settings_yaml()
-        parsed = deps.parse_settings_yaml(raw_yaml)
+        parsed = settings_store.data
         latest_payloads = device_poller.get_latest_payloads()
 
         cards = []
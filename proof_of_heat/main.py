@@ -21,6 +21,7 @@ from proof_of_heat.logging_utils import (
     configure_logging,
     ensure_trace_level,
 )
+from proof_of_heat.settings_store import SettingsStore
 from proof_of_heat.version import get_display_version
 
 _startup_error: Exception | None = None
@@ -57,7 +58,7 @@ try:  # Lazy import to allow a diagnostic ASGI fallback if dependencies are miss
     from apscheduler.schedulers.background import BackgroundScheduler
     from apscheduler.triggers.interval import IntervalTrigger
     from fastapi import FastAPI, HTTPException
-    from fastapi.responses import HTMLResponse, JSONResponse
+    from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
     from fastapi.staticfiles import StaticFiles
     from proof_of_heat.config import DEFAULT_CONFIG, AppConfig
     from proof_of_heat.plugins.base import human_readable_mode
@@ -67,6 +68,7 @@ try:  # Lazy import to allow a diagnostic ASGI fallback if dependencies are miss
         parse_settings_yaml,
         render_settings_yaml,
         save_settings_yaml,
+        settings_file_signature,
     )
     from proof_of_heat.services.device_polling import DevicePoller
     from proof_of_heat.services.temperature_control import TemperatureController
@@ -75,10 +77,11 @@ except Exception as exc:  # pragma: no cover - defensive import guard
     IntervalTrigger = None  # type: ignore[assignment]
     FastAPI = None  # type: ignore[assignment]
     HTTPException = Exception  # type: ignore[assignment]
-    HTMLResponse = JSONResponse = None  # type: ignore[assignment]
+    HTMLResponse = JSONResponse = Response = StreamingResponse = None  # type: ignore[assignment]
     StaticFiles = None  # type: ignore[assignment]
     DEFAULT_CONFIG = AppConfig = human_readable_mode = Whatsminer = TemperatureController = None  # type: ignore[assignment]
     load_settings_yaml = parse_settings_yaml = render_settings_yaml = save_settings_yaml = None  # type: ignore[assignment]
+    settings_file_signature = None  # type: ignore[assignment]
     DevicePoller = None  # type: ignore[assignment]
     _startup_error = exc
 
@@ -164,10 +167,16 @@ def _clear_fixed_supply_temp_runtime_state() -> None:
     clear_fixed_supply_temp_runtime_state()
 
 
-def _run_heating_mode_control(device_poller: Any | None = None) -> None:
+def _run_heating_mode_control(
+    device_poller: Any | None = None,
+    settings_store: SettingsStore | None = None,
+) -> None:
     try:
         logger.debug("Heating mode control tick started")
-        settings_data = parse_settings_yaml(load_settings_yaml())
+        if settings_store is not None:
+            settings_data = settings_store.data
+        else:
+            settings_data = parse_settings_yaml(load_settings_yaml())
         heating_mode = settings_data.get("heating_mode") if isinstance(settings_data, dict) else None
         mode_enabled = not isinstance(heating_mode, dict) or heating_mode.get("enabled", True) is not False
         mode_type = heating_mode.get("type") if isinstance(heating_mode, dict) else None
@@ -223,6 +232,8 @@ def create_app(config: AppConfig = DEFAULT_CONFIG) -> FastAPI:
         http_exception_cls=HTTPException,
         html_response_cls=HTMLResponse,
         json_response_cls=JSONResponse,
+        response_cls=Response,
+        streaming_response_cls=StreamingResponse,
         static_files_cls=StaticFiles,
         background_scheduler_cls=BackgroundScheduler,
         interval_trigger_cls=IntervalTrigger,
@@ -236,6 +247,7 @@ def create_app(config: AppConfig = DEFAULT_CONFIG) -> FastAPI:
         save_settings_yaml=save_settings_yaml,
         run_heating_mode_control=_run_heating_mode_control,
         resolve_control_interval_seconds=resolve_control_interval_seconds,
+        settings_file_signature=settings_file_signature,
     )
     return build_app(
         config,
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+@dataclass(frozen=True)
+class ChangeOnlyOptions:
+    enabled: bool = False
+    keyframe_interval_seconds: int = 3_600
+    heartbeat_seconds: int = 900
+    deadband: float = 0.0
+    deadbands: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def heartbeat_ms(self) -> int:
+        return self.heartbeat_seconds * 1000 if self.enabled else 0
+
+    def deadband_for(self, metric: str) -> float:
+        return self.deadbands.get(metric, self.deadband)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "keyframe_interval_seconds": self.keyframe_interval_seconds,
+            "heartbeat_seconds": self.heartbeat_seconds,
+            "deadband": self.deadband,
+            "deadbands": dict(self.deadbands),
+        }
+
+
+def parse_change_only_options(
+    settings: Any,
+    *,
+    logger: logging.Logger,
+) -> ChangeOnlyOptions:
+    defaults = ChangeOnlyOptions()
+    if not isinstance(settings, dict):
+        return defaults
+    database = settings.get("database")
+    if not isinstance(database, dict):
+        return defaults
+    change_only = database.get("change_only")
+    if not isinstance(change_only, dict):
+        return defaults
+
+    def _int_option(name: str, default: int) -> int:
+        value = change_only.get(name)
+        if value is None:
+            return default
+        try:
+            parsed = int(value)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring invalid change-only %s: %r", name, value)
+            return default
+        if parsed < 1:
+            logger.warning("Ignoring out-of-range change-only %s: %r", name, value)
+            return default
+        return parsed
+
+    def _deadband(name: str, value: Any, default: float) -> float:
+        try:
+            parsed = float(value)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring invalid change-only deadband for %s: %r", name, value)
+            return default
+        if parsed < 0:
+            logger.warning("Ignoring negative change-only deadband for %s: %r", name, value)
+            return default
+        return parsed
+
+    deadband = defaults.deadband
+    if change_only.get("deadband") is not None:
+        deadband = _deadband("all metrics", change_only["deadband"], defaults.deadband)
+    deadbands: dict[str, float] = {}
+    raw_deadbands = change_only.get("deadbands")
+    if isinstance(raw_deadbands, dict):
+        for metric, value in raw_deadbands.items():
+            deadbands[str(metric)] = _deadband(str(metric), value, deadband)
+
+    return ChangeOnlyOptions(
+        enabled=bool(change_only.get("enabled", defaults.enabled)),
+        keyframe_interval_seconds=_int_option("keyframe_interval_seconds", defaults.keyframe_interval_seconds),
+        heartbeat_seconds=_int_option("heartbeat_seconds", defaults.heartbeat_seconds),
+        deadband=deadband,
+        deadbands=deadbands,
+    )
+
+
+def diff_payload(base: Any, current: Any) -> Any:
+    """Describe how to turn ``base`` into ``current``; ``None`` if they are equal.
+
+    The patch follows the shape of the document: an object maps each changed
+    key (or list index, as a string) to the patch of that member. A one-item
+    list ``[value]`` replaces a member, an empty list removes it. Objects are
+    compared key by key and lists of the same length item by item; anything
+    else that differs is replaced whole.
+    """
+    if isinstance(base, dict) and isinstance(current, dict):
+        patch: dict[str, Any] = {}
+        for key, value in current.items():
+            if key not in base:
+                patch[key] = [value]
+                continue
+            member = diff_payload(base[key], value)
+            if member is not None:
+                patch[key] = member
+        for key in base:
+            if key not in current:
+                patch[key] = []
+        return patch or None
+    if isinstance(base, list) and isinstance(current, list) and len(base) == len(current):
+        patch = {}
+        for index, (old, new) in enumerate(zip(base, current)):
+            member = diff_payload(old, new)
+            if member is not None:
+                patch[str(index)] = member
+        return patch or None
+    if base == current and type(base) is type(current):
+        return None
+    return [current]
+
+
+def apply_payload_diff(base: Any, patch: Any) -> Any:
+    """Inverse of ``diff_payload``; ``base`` is left untouched."""
+    if patch is None:
+        return base
+    if isinstance(patch, list):
+        return patch[0]
+    if isinstance(base, list):
+        result_list = list(base)
+        for key, member in patch.items():
+            index = int(key)
+            result_list[index] = apply_payload_diff(result_list[index], member)
+        return result_list
+    result = dict(base)
+    for key, member in patch.items():
+        if member == []:
+            result.pop(key, None)
+        elif isinstance(member, list):
+            result[key] = member[0]
+        else:
+            result[key] = apply_payload_diff(result[key], member)
+    return result
+
+
+class MetricChangeFilter:
+    """Decide which metric samples are worth storing in change-only mode.
+
+    A sample is stored when its series has nothing stored yet, when it moved
+    further than the metric's deadband from the last stored value, or when
+    the heartbeat interval passed since that value. When a change follows
+    skipped samples, the last skipped one is stored as well, so a reader
+    that joins consecutive points draws a step instead of a slow ramp.
+
+    Not thread-safe; the poller only uses it under the writer lock.
+    """
+
+    def __init__(self) -> None:
+        # key -> (last stored ts, last stored value, last skipped row or None)
+        self._state: dict[tuple[str, str, str], tuple[int, float, dict[str, Any] | None]] = {}
+
+    def reset(self) -> None:
+        self._state = {}
+
+    def filter(self, rows: list[dict[str, Any]], options: ChangeOnlyOptions) -> list[dict[str, Any]]:
+        if not options.enabled:
+            return rows
+        heartbeat_ms = options.heartbeat_ms
+        kept: list[dict[str, Any]] = []
+        for row in rows:
+            key = (str(row["device_type"]), str(row["device_id"]), str(row["metric"]))
+            ts = int(row["ts"])
+            value = float(row["value"])
+            state = self._state.get(key)
+            if state is not None:
+                stored_ts, stored_value, skipped = state
+                changed = abs(value - stored_value) > options.deadband_for(key[2])
+                if not changed and ts - stored_ts < heartbeat_ms:
+                    self._state[key] = (stored_ts, stored_value, row)
+                    continue
+                if changed and skipped is not None:
+                    kept.append(skipped)
+            kept.append(row)
+            self._state[key] = (ts, value, None)
+        return kept
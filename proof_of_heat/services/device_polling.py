@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import heapq
+import itertools
 import json
 import logging
 import re
@@ -7,32 +9,145 @@ import shutil
 import socket
 import sqlite3
 import subprocess
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from threading import Lock
-from typing import Any, Callable
+from threading import Event, Lock, RLock, Thread
+from typing import Any, Callable, Iterator
 
 import httpx
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED, JobExecutionEvent
 from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.base import JobLookupError
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from whatsminer_cli import DEFAULT_PORT, DEFAULT_TIMEOUT, call_whatsminer
 
 from proof_of_heat.logging_utils import TRACE_LEVEL, ensure_trace_level
+from proof_of_heat.services.change_only import (
+    MetricChangeFilter,
+    apply_payload_diff,
+    diff_payload,
+    parse_change_only_options,
+)
 from proof_of_heat.services.economic_polling import (
     ECONOMICS_DEVICE_ID,
     ECONOMICS_DEVICE_TYPE,
     EconomicsPoller,
 )
+from proof_of_heat.services.latest_values import LatestValueIndex
+from proof_of_heat.services.metric_archive import ARCHIVE_FORMATS, MetricArchive
 from proof_of_heat.services.metrics import MetricSample
-from proof_of_heat.services.sqlite_logging import connect_logged_sqlite
+from proof_of_heat.services.payload_compression import (
+    build_dictionary,
+    compress_payload,
+    decompress_payload,
+    parse_payload_compression_options,
+)
+from proof_of_heat.services.series_cache import SeriesCache, SeriesKey, parse_series_cache_options
+from proof_of_heat.services.sqlite_pool import SQLiteConnectionManager, parse_connection_options
 from proof_of_heat.services.weather import fetch_met_no_weather, fetch_open_meteo_weather
+from proof_of_heat.services.write_queue import WriteBehindQueue, parse_write_queue_options
 
 ensure_trace_level()
 logger = logging.getLogger("proof_of_heat.device_polling")
 
 CONTROL_INPUTS_DEVICE_TYPE = "control_inputs"
+CONTROL_INPUT_NAMES = ("indoor_temp", "outdoor_temp", "supply_temp", "power")
+SERIES_ID_CLAUSE = """series_id = (
+    SELECT id FROM series
+    WHERE device_type = :device_type AND device_id = :device_id AND metric = :metric
+)"""
+WRITE_QUEUE_SHUTDOWN_TIMEOUT_S = 10.0
+METRICS_ROLLUP_CHECKPOINT = "metrics_rollup"
+METRICS_ROLLUP_BATCH_SIZE = 50_000
+METRICS_ROLLUP_PROGRESS_INTERVAL_S = 10.0
+RAW_EVENTS_RETENTION_BATCH_SIZE = 10_000
+RETENTION_MAX_RUN_S = 600
+# Pause between retention chunks so that waiting poll writes get the
+# writer before the next chunk does.
+RETENTION_CHUNK_PAUSE_S = 0.005
+# Window ordering that puts the representative sample of a bucket first.
+ROLLUP_SAMPLE_ORDER = {"last": "DESC", "first": "ASC", "any": "ASC"}
+# Rollup expression per aggregate that get_metric_series can return. Rollups
+# written before aggregates were recorded only have ``value``.
+METRIC_AGGREGATES = {
+    "sample": "value",
+    "min": "COALESCE(min_value, value)",
+    "max": "COALESCE(max_value, value)",
+    "avg": "COALESCE(sum_value / sample_count, value)",
+    "sum": "COALESCE(sum_value, value)",
+    "count": "COALESCE(sample_count, 1)",
+    "twa": "COALESCE(time_weighted_value, sum_value / sample_count, value)",
+}
+# Aggregates that stay exact when change-only storage skips unchanged
+# samples. Counts, sums and means of the stored samples weight each change
+# once however long it held, and rollup buckets do not see the value held
+# over from the bucket before.
+CHANGE_ONLY_AGGREGATES = ("sample", "min", "max")
+# How points of one aggregate are folded together when a series is
+# downsampled to a point budget.
+DOWNSAMPLE_FOLDS = {
+    "sample": "AVG",
+    "min": "MIN",
+    "max": "MAX",
+    "avg": "AVG",
+    "sum": "SUM",
+    "count": "SUM",
+    "twa": "AVG",
+}
+# Columns written by iter_metric_export for each source table.
+METRICS_EXPORT_COLUMNS = {
+    "raw": ("ts", "device_type", "device_id", "metric", "value", "unit"),
+    "rollups": (
+        "ts",
+        "resolution_seconds",
+        "device_type",
+        "device_id",
+        "metric",
+        "value",
+        "min_value",
+        "max_value",
+        "sum_value",
+        "sample_count",
+        "time_weighted_value",
+        "covered_ms",
+        "unit",
+    ),
+}
+METRICS_EXPORT_CHUNK_SIZE = 5_000
+# raw_events columns _decode_raw_event needs, with the change-only keyframe
+# joined in as ``keyframes``.
+RAW_EVENT_PAYLOAD_COLUMNS = """raw_events.codec, raw_events.dictionary_id, raw_events.payload, raw_events.keyframe_id,
+    keyframes.codec, keyframes.dictionary_id, keyframes.payload"""
+# Adds the samples one batch writes for a series to metric_catalog, before
+# they are written. Only timestamps up to last_seen can already exist, so the
+# lookup that keeps overwrites from being counted runs only for backdated
+# batches. The fifth parameter lists the timestamps as a JSON array, or is
+# NULL when the batch holds a single one.
+METRIC_CATALOG_ADD_SAMPLES = """
+    INSERT INTO metric_catalog (series_id, first_seen, last_seen, sample_count)
+    VALUES (?1, ?2, ?3, ?4)
+    ON CONFLICT (series_id) DO UPDATE SET
+        first_seen = min(first_seen, excluded.first_seen),
+        last_seen = max(last_seen, excluded.last_seen),
+        sample_count = sample_count + excluded.sample_count - CASE
+            WHEN excluded.first_seen > last_seen THEN 0
+            ELSE (
+                SELECT COUNT(*)
+                FROM samples
+                WHERE samples.series_id = excluded.series_id
+                  AND samples.ts BETWEEN excluded.first_seen AND excluded.last_seen
+                  AND (?5 IS NULL OR samples.ts IN (SELECT value FROM json_each(?5)))
+            )
+        END
+"""
+DATABASE_VACUUM_MODES = ("full", "incremental", "into")
+DATABASE_AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+DATABASE_VACUUM_INCREMENTAL_PAGES = 1_024
+DATABASE_VACUUM_SLICE_PAUSE_MS = 100
+DATABASE_VACUUM_MAX_DURATION_S = 300
 CONTROL_DECISIONS_DEVICE_TYPE = "control_decisions"
 CONTROL_DEVICE_ID = "main"
 
@@ -46,12 +161,33 @@ class ResolvedControlInput:
     value: float | None
     source: str | None = None
     sources: list[str] | None = None
+    valid_until_ms: int | None = None
+
+
+@dataclass(frozen=True)
+class ControlInputPlan:
+    control_inputs: dict[str, Any]
+    max_age_ms: int
+    dependencies: dict[tuple[str, str, str], frozenset[str]]
+
+
+@dataclass
+class PollWriteBatch:
+    """Everything one poll persists; committed in a single transaction."""
+
+    ts_ms: int
+    device_type: str
+    device_id: str
+    payload: dict[str, Any] | None = None
+    metrics: list[MetricSample] = field(default_factory=list)
 
 
 @dataclass(frozen=True)
 class RawEventsRetentionPolicy:
     retention_seconds: int
     interval_seconds: int
+    batch_size: int = RAW_EVENTS_RETENTION_BATCH_SIZE
+    max_run_seconds: int = RETENTION_MAX_RUN_S
 
 
 @dataclass(frozen=True)
@@ -65,7 +201,63 @@ class MetricRollupPolicy:
 class MetricsRetentionPolicy:
     interval_seconds: int
     raw_retention_seconds: int
+    # Ordered from the finest to the coarsest resolution; every tier's
+    # resolution is a multiple of the previous one.
+    rollups: tuple[MetricRollupPolicy, ...]
+    batch_size: int = METRICS_ROLLUP_BATCH_SIZE
+    max_run_seconds: int = RETENTION_MAX_RUN_S
+
+    @property
+    def rollup(self) -> MetricRollupPolicy:
+        """The finest tier, which is rolled up directly from raw samples."""
+        return self.rollups[0]
+
+
+@dataclass
+class RetentionRun:
+    """Progress of one retention run; every chunk is one writer transaction."""
+
+    max_run_seconds: int
+    started_at: float = field(default_factory=time.monotonic)
+    batches: int = 0
+    deleted_rows: int = 0
+    max_batch_ms: float = 0.0
+    completed: bool = False
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.deleted_rows / elapsed if elapsed > 0 else 0.0
+
+    def record(self, deleted_rows: int, batch_started_at: float) -> None:
+        self.batches += 1
+        self.deleted_rows += deleted_rows
+        self.max_batch_ms = max(self.max_batch_ms, (time.monotonic() - batch_started_at) * 1000)
+
+    def out_of_time(self) -> bool:
+        return time.monotonic() - self.started_at >= self.max_run_seconds
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "completed": self.completed,
+            "duration_ms": (time.monotonic() - self.started_at) * 1000,
+            "batches": self.batches,
+            "deleted_rows": self.deleted_rows,
+            "rows_per_second": self.rows_per_second,
+            "max_batch_ms": self.max_batch_ms,
+        }
+
+
+@dataclass(frozen=True)
+class ArchivedRollups:
+    """Archived rollup rows of the requested series, loaded into one in-memory database."""
+
+    conn: sqlite3.Connection
     rollup: MetricRollupPolicy
+    start_ms: int | None
+    end_ms: int
+    series: frozenset[SeriesKey]
 
 
 @dataclass(frozen=True)
@@ -74,42 +266,177 @@ class DatabaseVacuumPolicy:
     interval_seconds: int
     min_free_ratio: float
     min_reclaimable_mb: float
+    mode: str = "full"
+    incremental_pages: int = DATABASE_VACUUM_INCREMENTAL_PAGES
+    slice_pause_ms: int = DATABASE_VACUUM_SLICE_PAUSE_MS
+    max_duration_seconds: int = DATABASE_VACUUM_MAX_DURATION_S
+
+
+class RawEventKeyframeMissingError(ValueError):
+    """A change-only diff whose keyframe is no longer stored."""
+
+    def __init__(self, keyframe_id: int, diff: Any) -> None:
+        super().__init__(f"raw event keyframe {keyframe_id} is missing")
+        self.keyframe_id = keyframe_id
+        self.diff = diff
 
 
 @dataclass(frozen=True)
-class MaintenanceJob:
+class ScheduledJob:
+    """A poll or maintenance job as derived from the settings.
+
+    Two specs with the same ``job_id`` are compared field by field to decide
+    whether a settings change has to touch the scheduled job.
+    """
+
     job_id: str
+    kind: str
     interval_seconds: int
-    handler: Callable[[], Any]
+    handler: Callable[..., Any]
+    args: tuple[Any, ...] = ()
     run_on_start: bool = False
 
+    @property
+    def poll_config(self) -> Any:
+        """The polled device's config, minus the interval the trigger already covers."""
+        if self.kind != "poll" or len(self.args) < 2 or not isinstance(self.args[1], dict):
+            return None
+        return {key: value for key, value in self.args[1].items() if key != "refresh_interval"}
+
 
 class DevicePoller:
     def __init__(self, settings: dict[str, Any], data_dir: Path | None = None) -> None:
         self._settings = settings
         self._lock = Lock()
-        self._db_lock = Lock()
+        self._catalog_lock = Lock()
         self._latest_payloads: dict[DeviceKey, dict[str, Any]] = {}
         self._metric_catalog_cache: dict[str, dict[str, set[str]]] | None = None
+        self._latest_values = LatestValueIndex()
+        # (device_type, device_id, metric) -> (series id, unit); writer lock only.
+        self._series_cache: dict[tuple[str, str, str], tuple[int, str | None]] = {}
+        # Control-input refresh state is only touched under the writer lock.
+        self._control_input_plan: ControlInputPlan | None = None
+        self._control_input_state: dict[str, ResolvedControlInput] = {}
+        self._control_input_last_row: dict[str, Any] | None = None
+        self._control_input_stats = {
+            "refreshes": 0,
+            "skipped_unrelated": 0,
+            "skipped_unchanged": 0,
+            "recomputed_inputs": 0,
+        }
+        self._payload_compression = parse_payload_compression_options(settings, logger=logger)
+        # (device_type, codec) -> (dictionary id, dictionary) or None when the
+        # device type has none yet; samples collected to train one. Both are
+        # writer lock only. Decoding dictionaries are cached by id.
+        self._payload_dictionaries: dict[tuple[str, str], tuple[int, bytes] | None] = {}
+        self._payload_dictionary_samples: dict[str, list[bytes]] = {}
+        self._payload_dictionary_cache: dict[int, bytes] = {}
+        self._change_only = parse_change_only_options(settings, logger=logger)
+        self._series_points_cache = SeriesCache(parse_series_cache_options(settings, logger=logger))
+        self._vacuum_lock = Lock()
+        # Last run of each retention job, as reported by get_retention_status.
+        self._retention_runs: dict[str, dict[str, Any]] = {}
+        self._last_database_vacuum: dict[str, Any] | None = None
+        # Change-only state, writer lock only: the last raw keyframe per
+        # device as (row id, ts, payload), and the last stored metric values.
+        self._raw_event_keyframes: dict[DeviceKey, tuple[int, int, dict[str, Any]]] = {}
+        self._metric_change_filter = MetricChangeFilter()
         self._scheduler: BackgroundScheduler | None = None
+        self._scheduler_workers = 0
+        # Specs of the jobs on the scheduler, by job id; see update_settings.
+        self._scheduled_jobs: dict[str, ScheduledJob] = {}
+        self._started = False
+        self._started_at: datetime | None = None
+        # Guards the scheduler's lifecycle against the startup thread.
+        self._scheduler_lock = RLock()
+        self._storage_ready = Event()
+        # Jobs asked to run right away whose run has not finished; _lock.
+        self._pending_first_runs: set[str] = set()
         self._db_path = (data_dir / "telemetry.sqlite3") if data_dir else None
         self._schema_ready = False
+        self._db = (
+            SQLiteConnectionManager(
+                self._db_path,
+                logger=logger,
+                options=parse_connection_options(settings, logger=logger),
+                on_writer_connect=self._ensure_schema,
+                on_writer_rollback=self._discard_uncommitted_state,
+            )
+            if self._db_path
+            else None
+        )
+        self._write_queue: WriteBehindQueue[PollWriteBatch] | None = (
+            WriteBehindQueue(
+                self._commit_poll_batches,
+                logger=logger,
+                options=parse_write_queue_options(settings, logger=logger),
+            )
+            if self._db_path
+            else None
+        )
         self._economics_poller = EconomicsPoller(
             settings=settings,
-            db_path=self._db_path,
-            db_lock=self._db_lock,
-            ensure_schema=self._ensure_schema,
+            db=self._db,
+            latest_values=self._latest_values,
         )
 
     def start(self) -> None:
+        """Schedule polling and maintenance without waiting for any of it.
+
+        Opening the database, which runs any pending schema migration, and
+        loading the latest values happen on a background thread; the
+        scheduler starts once that is done. Every device is then polled,
+        and every ``run_on_start`` maintenance job runs, once right away on
+        the scheduler's threads. ``get_readiness`` reports the progress.
+        """
+        with self._scheduler_lock:
+            if self._started:
+                return
+            self._started = True
+            self._started_at = datetime.now(timezone.utc)
+            self._storage_ready.clear()
+            jobs = self._build_scheduled_jobs()
+            self._scheduled_jobs = {job.job_id: job for job in jobs}
+            if not jobs:
+                logger.info("No devices, economics polling, or database maintenance configured")
+            else:
+                self._ensure_scheduler(len(jobs))
+                for job in jobs:
+                    self._add_scheduled_job(job, run_now=job.kind == "poll" or job.run_on_start)
+        Thread(target=self._prepare_storage, name="device-poller-startup", daemon=True).start()
+
+    def _prepare_storage(self) -> None:
+        started_at = time.monotonic()
+        try:
+            if self._db is not None:
+                with self._db.writer():
+                    pass
+            self._warm_latest_values()
+        except Exception:  # pragma: no cover - defensive logging
+            logger.exception("Failed to prepare telemetry storage")
+        finally:
+            logger.info("Telemetry storage ready after %.1f s", time.monotonic() - started_at)
+            with self._scheduler_lock:
+                self._storage_ready.set()
+                if self._started and self._scheduler is not None and not self._scheduler.running:
+                    self._start_scheduler()
+
+    def _start_scheduler(self) -> None:
+        # Callers hold _scheduler_lock.
+        assert self._scheduler is not None
+        if self._write_queue is not None and self._write_queue.options.enabled:
+            self._write_queue.start()
+        self._scheduler.start()
+
+    def _build_scheduled_jobs(self) -> list[ScheduledJob]:
         devices = self._settings.get("devices", {}) if isinstance(self._settings, dict) else {}
         if not isinstance(devices, dict):
             logger.warning("Devices settings are not a mapping; polling disabled")
-            return
+            devices = {}
 
         default_interval = int(devices.get("refresh_interval", 30) or 30)
         poll_jobs: list[tuple[DeviceKey, dict[str, Any], Callable[..., dict[str, Any]]]] = []
-        maintenance_jobs: list[MaintenanceJob] = []
+        jobs: list[ScheduledJob] = []
         seen_weather_device_ids: set[int] = set()
 
         for device in devices.get("zont", []) or []:
@@ -150,11 +477,28 @@ class DevicePoller:
                 )
             )
 
+        for key, device, handler in poll_jobs:
+            if key.device_type == ECONOMICS_DEVICE_TYPE:
+                interval = self._economics_poller.resolve_interval_seconds(device)
+            else:
+                interval_default = 180 if key.device_type == "zont" else default_interval
+                interval = int(device.get("refresh_interval", interval_default) or interval_default)
+            jobs.append(
+                ScheduledJob(
+                    job_id=f"{key.device_type}-{key.device_id}",
+                    kind="poll",
+                    interval_seconds=max(1, interval),
+                    handler=self._poll_device,
+                    args=(key, device, handler),
+                )
+            )
+
         raw_events_retention = self._load_raw_events_retention_policy()
         if raw_events_retention is not None:
-            maintenance_jobs.append(
-                MaintenanceJob(
+            jobs.append(
+                ScheduledJob(
                     job_id="retention-raw-events",
+                    kind="maintenance",
                     interval_seconds=raw_events_retention.interval_seconds,
                     handler=self._apply_raw_events_retention,
                     run_on_start=True,
@@ -163,9 +507,10 @@ class DevicePoller:
 
         metrics_retention = self._load_metrics_retention_policy()
         if metrics_retention is not None:
-            maintenance_jobs.append(
-                MaintenanceJob(
+            jobs.append(
+                ScheduledJob(
                     job_id="retention-metrics",
+                    kind="maintenance",
                     interval_seconds=metrics_retention.interval_seconds,
                     handler=self._apply_metrics_retention,
                     run_on_start=True,
@@ -174,81 +519,150 @@ class DevicePoller:
 
         database_vacuum = self._load_database_vacuum_policy()
         if database_vacuum is not None and database_vacuum.enabled:
-            maintenance_jobs.append(
-                MaintenanceJob(
+            jobs.append(
+                ScheduledJob(
                     job_id="maintenance-vacuum",
+                    kind="maintenance",
                     interval_seconds=database_vacuum.interval_seconds,
                     handler=self._vacuum_database_if_needed,
                 )
             )
-
-        if not poll_jobs and not maintenance_jobs:
-            logger.info("No devices, economics polling, or database maintenance configured")
-            return
-
-        executor = ThreadPoolExecutor(max_workers=max(1, len(poll_jobs) + len(maintenance_jobs)))
-        self._scheduler = BackgroundScheduler(executors={"default": executor})
-
-        for key, device, handler in poll_jobs:
-            if key.device_type == ECONOMICS_DEVICE_TYPE:
-                interval = self._economics_poller.resolve_interval_seconds(device)
-            else:
-                interval_default = 180 if key.device_type == "zont" else default_interval
-                interval = int(device.get("refresh_interval", interval_default) or interval_default)
-            interval = max(1, interval)
-            trigger = IntervalTrigger(seconds=interval)
-            job_id = f"{key.device_type}-{key.device_id}"
-            self._scheduler.add_job(
-                self._poll_device,
-                trigger=trigger,
-                id=job_id,
-                name=f"Poll {job_id}",
-                args=[key, device, handler],
-                replace_existing=True,
-            )
-            logger.info(
-                "Scheduled polling for %s (%s seconds)",
-                job_id,
-                interval,
+        return jobs
+
+    def _ensure_scheduler(self, job_count: int) -> BackgroundScheduler:
+        if self._scheduler is None:
+            self._scheduler_workers = max(1, job_count)
+            executor = ThreadPoolExecutor(max_workers=self._scheduler_workers)
+            self._scheduler = BackgroundScheduler(executors={"default": executor})
+            self._scheduler.add_listener(
+                self._on_scheduled_job_finished,
+                EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED,
             )
+        return self._scheduler
 
-        for job in maintenance_jobs:
-            trigger = IntervalTrigger(seconds=job.interval_seconds)
-            self._scheduler.add_job(
-                job.handler,
-                trigger=trigger,
-                id=job.job_id,
-                name=f"Maintenance {job.job_id}",
-                replace_existing=True,
-            )
+    def _on_scheduled_job_finished(self, event: JobExecutionEvent) -> None:
+        with self._lock:
+            self._pending_first_runs.discard(event.job_id)
+
+    def _add_scheduled_job(self, job: ScheduledJob, *, run_now: bool = False) -> None:
+        assert self._scheduler is not None
+        options: dict[str, Any] = {}
+        if run_now:
+            options["next_run_time"] = datetime.now(timezone.utc)
+            with self._lock:
+                self._pending_first_runs.add(job.job_id)
+        self._scheduler.add_job(
+            job.handler,
+            trigger=IntervalTrigger(seconds=job.interval_seconds),
+            id=job.job_id,
+            name=f"{'Poll' if job.kind == 'poll' else 'Maintenance'} {job.job_id}",
+            args=list(job.args),
+            replace_existing=True,
+            **options,
+        )
+        if job.kind == "poll":
+            logger.info("Scheduled polling for %s (%s seconds)", job.job_id, job.interval_seconds)
+        else:
+            logger.info("Scheduled maintenance job %s (%s seconds)", job.job_id, job.interval_seconds)
+
+    def _reconcile_scheduled_jobs(self) -> dict[str, list[str]]:
+        with self._scheduler_lock:
+            return self._reconcile_scheduled_jobs_locked()
+
+    def _reconcile_scheduled_jobs_locked(self) -> dict[str, list[str]]:
+        """Bring the running scheduler in line with the current settings.
+
+        Only jobs whose spec changed are touched; the others keep their
+        schedule and any run in progress. New jobs, and poll jobs whose
+        device config changed beyond its interval, run once right away on
+        the scheduler's own threads instead of in the caller.
+        """
+        jobs = {job.job_id: job for job in self._build_scheduled_jobs()}
+        previous = self._scheduled_jobs
+        changes: dict[str, list[str]] = {"added": [], "removed": [], "rescheduled": [], "updated": []}
+        if jobs and self._scheduler is None:
+            self._ensure_scheduler(len(jobs))
+            if self._storage_ready.is_set():
+                self._start_scheduler()
+        scheduler = self._scheduler
+        if scheduler is None:
+            self._scheduled_jobs = jobs
+            return changes
+
+        for job_id in previous.keys() - jobs.keys():
+            try:
+                scheduler.remove_job(job_id)
+            except JobLookupError:  # pragma: no cover - already gone
+                pass
+            with self._lock:
+                self._pending_first_runs.discard(job_id)
+            changes["removed"].append(job_id)
+        for job_id, job in jobs.items():
+            old = previous.get(job_id)
+            if old is None:
+                self._add_scheduled_job(job, run_now=job.kind == "poll" or job.run_on_start)
+                changes["added"].append(job_id)
+                continue
+            if old.interval_seconds != job.interval_seconds:
+                scheduler.reschedule_job(job_id, trigger=IntervalTrigger(seconds=job.interval_seconds))
+                with self._lock:
+                    first_run_pending = job_id in self._pending_first_runs
+                if first_run_pending:
+                    # Rescheduling moved the first run to a whole interval away.
+                    scheduler.modify_job(job_id, next_run_time=datetime.now(timezone.utc))
+                changes["rescheduled"].append(job_id)
+            if old.args != job.args:
+                updates: dict[str, Any] = {"args": list(job.args)}
+                if job.kind == "poll" and old.poll_config != job.poll_config:
+                    updates["next_run_time"] = datetime.now(timezone.utc)
+                scheduler.modify_job(job_id, **updates)
+                changes["updated"].append(job_id)
+        self._scheduled_jobs = jobs
+
+        if len(jobs) > self._scheduler_workers:
             logger.info(
-                "Scheduled maintenance job %s (%s seconds)",
-                job.job_id,
-                job.interval_seconds,
+                "%s scheduled jobs share %s worker threads until the next restart",
+                len(jobs),
+                self._scheduler_workers,
             )
-
-        self._scheduler.start()
-        for key, device, handler in poll_jobs:
-            self._poll_device(key, device, handler)
-        for job in maintenance_jobs:
-            if not job.run_on_start:
-                continue
-            try:
-                job.handler()
-            except Exception:  # pragma: no cover - defensive logging
-                logger.exception("Maintenance job failed during initial run: %s", job.job_id)
+        if any(changes.values()):
+            logger.info("Reconciled scheduled jobs: %s", {key: value for key, value in changes.items() if value})
+        return changes
 
     def shutdown(self) -> None:
-        if self._scheduler:
-            self._scheduler.shutdown(wait=False)
-            self._scheduler = None
+        with self._scheduler_lock:
+            self._started = False
+            self._scheduled_jobs = {}
+            with self._lock:
+                self._pending_first_runs = set()
+            if self._scheduler:
+                if self._scheduler.running:
+                    self._scheduler.shutdown(wait=False)
+                self._scheduler = None
+        if self._write_queue is not None:
+            self._write_queue.stop(timeout=WRITE_QUEUE_SHUTDOWN_TIMEOUT_S)
+        if self._db is not None:
+            self._db.close()
 
     def update_settings(self, settings: dict[str, Any]) -> None:
         self._settings = settings
         self._economics_poller.update_settings(settings)
-        if self._scheduler:
-            self.shutdown()
-            self.start()
+        if self._db is not None:
+            self._db.configure(parse_connection_options(settings, logger=logger))
+        if self._write_queue is not None:
+            self._write_queue.configure(parse_write_queue_options(settings, logger=logger))
+        self._payload_compression = parse_payload_compression_options(settings, logger=logger)
+        self._change_only = parse_change_only_options(settings, logger=logger)
+        # Cached reads were stitched with the old retention tiers.
+        self._series_points_cache.configure(parse_series_cache_options(settings, logger=logger))
+        if not self._started:
+            return
+        self._reconcile_scheduled_jobs()
+        if self._write_queue is not None and self._scheduler is not None and self._scheduler.running:
+            if self._write_queue.options.enabled:
+                self._write_queue.start()
+            else:
+                self._write_queue.stop(timeout=WRITE_QUEUE_SHUTDOWN_TIMEOUT_S)
 
     def _upsert_metric_catalog_entry(
         self,
@@ -280,50 +694,63 @@ class DevicePoller:
             self._upsert_metric_catalog_entry(catalog, row[0], row[1], row[2])
 
     def _load_metric_catalog_from_db(self, conn: sqlite3.Connection) -> dict[str, dict[str, set[str]]]:
+        # Series rows outlive their samples, so only list series that still
+        # have raw or rolled-up data.
         rows = conn.execute(
             """
-            SELECT device_type, device_id, metric
-            FROM metrics
-            UNION
-            SELECT device_type, device_id, metric
-            FROM metric_rollups
-            ORDER BY device_type, device_id, metric
+            SELECT series.device_type, series.device_id, series.metric
+            FROM metric_catalog
+            JOIN series ON series.id = metric_catalog.series_id
+            WHERE metric_catalog.sample_count > 0 OR metric_catalog.rollup_count > 0
+            ORDER BY series.device_type, series.device_id, series.metric
             """
         ).fetchall()
         catalog: dict[str, dict[str, set[str]]] = {}
         self._populate_metric_catalog(catalog, rows)
         return catalog
 
-    def _ensure_metric_catalog_cache(
-        self,
-        conn: sqlite3.Connection | None = None,
-    ) -> dict[str, dict[str, set[str]]]:
-        if self._metric_catalog_cache is not None:
-            return self._metric_catalog_cache
-        if not self._db_path:
-            return {}
-        if conn is None:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
+    def _ensure_metric_catalog_cache(self) -> dict[str, dict[str, set[str]]]:
+        # Callers must hold _catalog_lock while reading the returned mapping.
+        # The reader is checked out before taking the lock so that the catalog
+        # lock is never held while waiting for the writer.
+        if self._metric_catalog_cache is None and self._db is not None:
+            with self._db.reader() as conn:
+                with self._catalog_lock:
+                    if self._metric_catalog_cache is None:
+                        self._metric_catalog_cache = self._load_metric_catalog_from_db(conn)
+        return self._metric_catalog_cache if self._metric_catalog_cache is not None else {}
+
+    def _refresh_metric_catalog_cache(self) -> None:
+        if self._db is None:
+            return
+        with self._db.reader() as conn:
+            with self._catalog_lock:
                 self._metric_catalog_cache = self._load_metric_catalog_from_db(conn)
-        else:
-            self._ensure_schema(conn)
-            self._metric_catalog_cache = self._load_metric_catalog_from_db(conn)
-        return self._metric_catalog_cache
-
-    def _refresh_metric_catalog_cache(self, conn: sqlite3.Connection) -> None:
-        self._metric_catalog_cache = self._load_metric_catalog_from_db(conn)
 
     def _update_metric_catalog_cache(self, rows: list[dict[str, Any]] | list[tuple[Any, Any, Any]]) -> None:
-        if self._metric_catalog_cache is None:
+        # Called after the rows are committed so a concurrent cache load
+        # either sees them in its snapshot or gets them from this update.
+        with self._catalog_lock:
+            if self._metric_catalog_cache is None:
+                return
+            self._populate_metric_catalog(self._metric_catalog_cache, rows)
+
+    def _warm_latest_values(self) -> None:
+        if self._db is None or self._latest_values.loaded:
             return
-        self._populate_metric_catalog(self._metric_catalog_cache, rows)
+        try:
+            with self._db.reader() as conn:
+                self._latest_values.load(conn)
+        except sqlite3.Error:  # pragma: no cover - defensive logging
+            logger.exception("Failed to warm latest metric values from SQLite")
+            return
+        logger.info("Loaded %s latest metric values from SQLite", len(self._latest_values))
 
     def _snapshot_metric_catalog(self) -> dict[str, dict[str, list[str]]]:
         if not self._db_path:
             return {}
-        with self._db_lock:
-            catalog = self._ensure_metric_catalog_cache()
+        catalog = self._ensure_metric_catalog_cache()
+        with self._catalog_lock:
             return {
                 device_type: {
                     device_id: sorted(metrics)
@@ -332,6 +759,43 @@ class DevicePoller:
                 for device_type, device_ids in sorted(catalog.items())
             }
 
+    def get_readiness(self) -> dict[str, Any]:
+        """Report which devices have finished their first poll since start.
+
+        The poller is ready once the database is open and migrated and every
+        scheduled device was polled at least once, whether or not the device
+        answered; ``reported`` tells the two apart. Maintenance jobs still on
+        their first run are listed but do not hold readiness back.
+        """
+        with self._lock:
+            pending = set(self._pending_first_runs)
+            latest = {key: payload.get("timestamp") for key, payload in self._latest_payloads.items()}
+        devices = []
+        pending_maintenance = []
+        for job_id, job in sorted(self._scheduled_jobs.items()):
+            if job.kind != "poll":
+                if job_id in pending:
+                    pending_maintenance.append(job_id)
+                continue
+            key = job.args[0]
+            devices.append(
+                {
+                    "device_type": key.device_type,
+                    "device_id": key.device_id,
+                    "polled": job_id not in pending,
+                    "reported": key in latest,
+                    "last_reported_at": latest.get(key),
+                }
+            )
+        storage_ready = self._storage_ready.is_set()
+        return {
+            "ready": self._started and storage_ready and all(device["polled"] for device in devices),
+            "storage_ready": storage_ready,
+            "started_at": self._started_at.isoformat() if self._started_at is not None else None,
+            "devices": devices,
+            "pending_maintenance": pending_maintenance,
+        }
+
     def get_latest_payloads(self) -> dict[str, dict[str, Any]]:
         with self._lock:
             return {
@@ -345,27 +809,63 @@ class DevicePoller:
     def list_metric_device_types(self) -> list[str]:
         if not self._db_path:
             return []
-        with self._db_lock:
-            catalog = self._ensure_metric_catalog_cache()
+        catalog = self._ensure_metric_catalog_cache()
+        with self._catalog_lock:
             return sorted(catalog)
 
     def list_metric_device_ids(self, device_type: str) -> list[str]:
         if not self._db_path:
             return []
-        with self._db_lock:
-            catalog = self._ensure_metric_catalog_cache()
+        catalog = self._ensure_metric_catalog_cache()
+        with self._catalog_lock:
             return sorted(catalog.get(device_type, {}))
 
     def list_metric_names(self, device_type: str, device_id: str) -> list[str]:
         if not self._db_path:
             return []
-        with self._db_lock:
-            catalog = self._ensure_metric_catalog_cache()
+        catalog = self._ensure_metric_catalog_cache()
+        with self._catalog_lock:
             return sorted(catalog.get(device_type, {}).get(device_id, set()))
 
     def get_metric_catalog(self) -> dict[str, dict[str, list[str]]]:
         return self._snapshot_metric_catalog()
 
+    def get_metric_catalog_series(self) -> list[dict[str, Any]]:
+        """Every series that still has data, with its time span and row counts."""
+        if self._db is None:
+            return []
+        with self._db.reader() as conn:
+            rows = conn.execute(
+                """
+                SELECT
+                    series.device_type,
+                    series.device_id,
+                    series.metric,
+                    series.unit,
+                    metric_catalog.first_seen,
+                    metric_catalog.last_seen,
+                    metric_catalog.sample_count,
+                    metric_catalog.rollup_count
+                FROM metric_catalog
+                JOIN series ON series.id = metric_catalog.series_id
+                WHERE metric_catalog.sample_count > 0 OR metric_catalog.rollup_count > 0
+                ORDER BY series.device_type, series.device_id, series.metric
+                """
+            ).fetchall()
+        return [
+            {
+                "device_type": row[0],
+                "device_id": row[1],
+                "metric": row[2],
+                "unit": row[3],
+                "first_seen": int(row[4]),
+                "last_seen": int(row[5]),
+                "sample_count": int(row[6]),
+                "rollup_count": int(row[7]),
+            }
+            for row in rows
+        ]
+
     def get_metric_series(
         self,
         device_type: str,
@@ -373,154 +873,680 @@ class DevicePoller:
         metric: str,
         start_ms: int | None,
         end_ms: int | None,
+        aggregate: str = "sample",
+        max_points: int | None = None,
+        gap_ms: int | None = None,
     ) -> list[dict[str, Any]]:
+        """Return raw points stitched with rollups older than the raw window.
+
+        Every period older than the raw window is read from the finest rollup
+        tier that still retains it. With ``max_points`` the rollup part uses
+        the finest tier whose bucket count over the requested range fits the
+        budget, falling back to the coarsest tier, and the result is then
+        folded in SQL into at most about ``max_points`` evenly sized steps.
+
+        ``aggregate`` picks which rollup column is returned for compacted
+        buckets (see ``METRIC_AGGREGATES``). A raw sample is its own
+        aggregate, so raw points always return the sample value, or ``1``
+        for ``count``.
+
+        With ``gap_ms`` a ``{"ts": ..., "value": None}`` marker is inserted
+        wherever consecutive points are further apart than ``gap_ms`` or
+        twice the resolution they were read at, whichever is larger.
+        """
+        timestamps, values = self.get_metric_columns(
+            device_type,
+            device_id,
+            metric,
+            start_ms,
+            end_ms,
+            aggregate=aggregate,
+            max_points=max_points,
+            gap_ms=gap_ms,
+        )
+        return [{"ts": ts, "value": value} for ts, value in zip(timestamps, values)]
+
+    def get_metric_columns(
+        self,
+        device_type: str,
+        device_id: str,
+        metric: str,
+        start_ms: int | None,
+        end_ms: int | None,
+        aggregate: str = "sample",
+        max_points: int | None = None,
+        gap_ms: int | None = None,
+    ) -> tuple[list[int], list[float | None]]:
+        """Same as ``get_metric_series`` but as parallel timestamp and value lists."""
+        series = [{"device_type": device_type, "device_id": device_id, "metric": metric}]
+        for _item, columns in self.iter_metric_series(
+            series,
+            start_ms,
+            end_ms,
+            aggregate=aggregate,
+            max_points=max_points,
+            gap_ms=gap_ms,
+            columnar=True,
+        ):
+            return columns
+        return [], []
+
+    def iter_metric_export(
+        self,
+        source: str = "raw",
+        *,
+        device_types: list[str] | None = None,
+        device_ids: list[str] | None = None,
+        metrics: list[str] | None = None,
+        start_ms: int | None = None,
+        end_ms: int | None = None,
+        resolution_seconds: int | None = None,
+        chunk_size: int = METRICS_EXPORT_CHUNK_SIZE,
+    ) -> tuple[tuple[str, ...], Iterator[list[tuple[Any, ...]]]]:
+        """Return export column names and an iterator of row chunks.
+
+        ``source`` is ``raw`` for samples or ``rollups`` for rollup buckets.
+        Chunks hold at most ``chunk_size`` rows ordered by series and time.
+        Empty filter lists match everything. The rows are read through one
+        cursor on a pooled reader inside a single read transaction, so memory
+        stays bounded by the chunk size and the writer is never blocked.
+        Options are validated before the iterator is returned.
+        """
+        if source not in METRICS_EXPORT_COLUMNS:
+            raise ValueError(f"unsupported export source: {source!r}")
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+        if resolution_seconds is not None and source != "rollups":
+            raise ValueError("resolution_seconds only applies to rollups")
+        columns = METRICS_EXPORT_COLUMNS[source]
         if not self._db_path:
-            return []
-        if start_ms is not None and end_ms is not None and start_ms > end_ms:
-            return []
+            return columns, iter(())
+
+        conditions: list[str] = []
+        params: list[Any] = []
+        for column, values in (
+            ("series.device_type", device_types),
+            ("series.device_id", device_ids),
+            ("series.metric", metrics),
+        ):
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+        table = "samples" if source == "raw" else "sample_rollups"
+        if start_ms is not None:
+            conditions.append(f"{table}.ts >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            conditions.append(f"{table}.ts <= ?")
+            params.append(end_ms)
+        if resolution_seconds is not None:
+            conditions.append("sample_rollups.resolution_seconds = ?")
+            params.append(resolution_seconds)
+        select = self._export_select(source)
+        order = "samples.ts" if source == "raw" else "sample_rollups.resolution_seconds, sample_rollups.ts"
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # CROSS JOIN keeps series as the outer loop, walked in its unique
+        # index order, so rows come out of the primary keys already sorted and
+        # no temporary B-tree holding the whole result is built.
+        query = f"""
+            SELECT {select}
+            FROM series
+            CROSS JOIN {table} ON {table}.series_id = series.id
+            {where}
+            ORDER BY series.device_type, series.device_id, series.metric, {order}
+        """
+        return columns, self._iter_metric_export(query, params, chunk_size)
+
+    def _export_select(self, source: str) -> str:
+        table = "samples" if source == "raw" else "sample_rollups"
+        return ", ".join(
+            f"series.{column}" if column in {"device_type", "device_id", "metric", "unit"} else f"{table}.{column}"
+            for column in METRICS_EXPORT_COLUMNS[source]
+        )
+
+    def _iter_metric_export(
+        self,
+        query: str,
+        params: list[Any],
+        chunk_size: int,
+    ) -> Iterator[list[tuple[Any, ...]]]:
+        with self._db.reader() as conn:
+            conn.execute("BEGIN")
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def iter_metric_series(
+        self,
+        series: list[dict[str, Any]],
+        start_ms: int | None,
+        end_ms: int | None,
+        aggregate: str = "sample",
+        max_points: int | None = None,
+        gap_ms: int | None = None,
+        columnar: bool = False,
+    ) -> Iterator[tuple[dict[str, Any], Any]]:
+        """Yield ``(series item, points)`` for several series over one range.
+
+        All series are read on one reader connection inside one read
+        transaction, so they come from the same snapshot, and the retention
+        policy is resolved once. Items need ``device_type``, ``device_id``
+        and ``metric`` and may override ``aggregate`` and ``gap_ms``. Options
+        are validated before the iterator is returned, so a bad request
+        raises ``ValueError`` before anything is read. With ``columnar``
+        points come as a ``(timestamps, values)`` pair of lists instead of
+        one dict per point.
+        """
+        self._validate_metric_read_options(aggregate, max_points, gap_ms)
+        for item in series:
+            self._validate_metric_read_options(
+                item.get("aggregate", aggregate),
+                max_points,
+                item.get("gap_ms", gap_ms),
+            )
+        if not self._db_path or (start_ms is not None and end_ms is not None and start_ms > end_ms):
+            return iter([(item, ([], []) if columnar else []) for item in series])
+        return self._iter_metric_series(series, start_ms, end_ms, aggregate, max_points, gap_ms, columnar)
+
+    def _validate_metric_read_options(self, aggregate: Any, max_points: Any, gap_ms: Any) -> None:
+        if not isinstance(aggregate, str) or aggregate not in METRIC_AGGREGATES:
+            raise ValueError(f"unsupported aggregate: {aggregate!r}")
+        if self._change_only.enabled and aggregate not in CHANGE_ONLY_AGGREGATES:
+            raise ValueError(
+                f"aggregate {aggregate!r} is not supported with change-only storage; "
+                f"use one of {', '.join(CHANGE_ONLY_AGGREGATES)}"
+            )
+        for name, value in (("max_points", max_points), ("gap_ms", gap_ms)):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value <= 0):
+                raise ValueError(f"{name} must be a positive integer")
 
+    def _iter_metric_series(
+        self,
+        series: list[dict[str, Any]],
+        start_ms: int | None,
+        end_ms: int | None,
+        aggregate: str,
+        max_points: int | None,
+        gap_ms: int | None,
+        columnar: bool,
+    ) -> Iterator[tuple[dict[str, Any], Any]]:
         policy = self._load_metrics_retention_policy()
-        params: dict[str, Any] = {
-            "device_type": device_type,
-            "device_id": device_id,
-            "metric": metric,
-        }
-        clauses = [
-            "device_type = :device_type",
-            "device_id = :device_id",
-            "metric = :metric",
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        series_params = [
+            {
+                "device_type": str(item.get("device_type")),
+                "device_id": str(item.get("device_id")),
+                "metric": str(item.get("metric")),
+            }
+            for item in series
         ]
-        if start_ms is not None:
-            clauses.append("ts >= :start_ms")
-            params["start_ms"] = start_ms
-        if end_ms is not None:
-            clauses.append("ts <= :end_ms")
-            params["end_ms"] = end_ms
-        metric_queries: list[tuple[str, dict[str, Any]]] = []
+        archived: ArchivedRollups | None = None
         if policy is None:
-            where_clause = " AND ".join(clauses)
-            metric_queries.append(
+            segments: list[tuple[MetricRollupPolicy | None, int | None, int | None]] = [
+                (None, start_ms, end_ms)
+            ]
+        else:
+            segments = self._metric_series_segments(policy, now_ms, start_ms, end_ms, max_points)
+            # Anything older than the coarsest tier's retention may only be
+            # left in the archive. Only a range that explicitly starts there
+            # reads it, before the read snapshot is taken, so the file I/O
+            # never holds a WAL snapshot open.
+            archive_end_ms = now_ms - policy.rollups[-1].retention_seconds * 1000 - 1
+            if end_ms is not None:
+                archive_end_ms = min(archive_end_ms, end_ms)
+            if start_ms is not None and start_ms <= archive_end_ms:
+                archive = self._load_metric_archive()
+                if archive is not None:
+                    archived = self._load_archived_rollups(
+                        archive, series_params, policy.rollups[-1], start_ms, archive_end_ms
+                    )
+
+        # Taken before the read snapshot starts; see SeriesCache.
+        versions = [
+            self._series_points_cache.version((params["device_type"], params["device_id"], params["metric"]))
+            for params in series_params
+        ]
+        try:
+            with self._db.reader() as conn:
+                conn.execute("BEGIN")
+                for item, params, version in zip(series, series_params, versions):
+                    series_archived = archived
+                    if archived is not None and (
+                        (params["device_type"], params["device_id"], params["metric"]) not in archived.series
+                    ):
+                        series_archived = None
+                    timestamps, values = self._read_metric_series(
+                        conn,
+                        params,
+                        segments,
+                        start_ms,
+                        end_ms if end_ms is not None else now_ms,
+                        aggregate=item.get("aggregate", aggregate),
+                        max_points=max_points,
+                        gap_ms=item.get("gap_ms", gap_ms),
+                        archived=series_archived,
+                        now_ms=now_ms,
+                        cache_version=version,
+                    )
+                    if columnar:
+                        yield item, (timestamps, values)
+                    else:
+                        yield item, [{"ts": ts, "value": value} for ts, value in zip(timestamps, values)]
+        finally:
+            if archived is not None:
+                archived.conn.close()
+
+    def _read_metric_series(
+        self,
+        conn: sqlite3.Connection,
+        params: dict[str, Any],
+        segments: list[tuple[MetricRollupPolicy | None, int | None, int | None]],
+        start_ms: int | None,
+        range_end_ms: int,
+        *,
+        aggregate: str,
+        max_points: int | None,
+        gap_ms: int | None,
+        archived: ArchivedRollups | None = None,
+        now_ms: int | None = None,
+        cache_version: tuple[int, int] | None = None,
+    ) -> tuple[list[int], list[float | None]]:
+        step_ms: int | None = None
+        if max_points is not None:
+            range_start_ms = start_ms
+            if range_start_ms is None:
+                first_ts = [self._first_metric_ts(conn, params)]
+                if archived is not None:
+                    first_ts.append(self._first_metric_ts(archived.conn, params))
+                range_start_ms = min((ts for ts in first_ts if ts is not None), default=None)
+            if range_start_ms is not None:
+                step_ms = max(1, -(-(range_end_ms - range_start_ms) // max_points))
+                # Rounded up to two significant digits, so a window ending
+                # "now" keeps the same buckets (and cache entry) for a while.
+                unit = 10 ** max(0, len(str(step_ms)) - 2)
+                step_ms = -(-step_ms // unit) * unit
+
+        # Everything before the bucket that holds "now" (or the range end)
+        # is closed: it only changes through retention or a backfilled write.
+        series: SeriesKey = (params["device_type"], params["device_id"], params["metric"])
+        cache_key = None
+        cached = None
+        closed_end_ms = min(now_ms if now_ms is not None else range_end_ms, range_end_ms + 1)
+        if step_ms is not None:
+            closed_end_ms = closed_end_ms // step_ms * step_ms
+        closed_end_ms -= 1
+        if archived is None and cache_version is not None and self._series_points_cache.enabled:
+            cache_key = (
+                series,
+                aggregate,
+                start_ms,
+                step_ms,
+                tuple(rollup.resolution_seconds if rollup is not None else None for rollup, _start, _end in segments),
+            )
+            cached = self._series_points_cache.get(cache_key)
+            if cached is not None and cached.closed_end_ms > range_end_ms:
+                cached = None
+        tail_segments = segments
+        if cached is not None:
+            tail_start_ms = cached.closed_end_ms + 1
+            tail_segments = [
                 (
-                    f"""
-                    SELECT ts, value
-                    FROM metrics
-                    WHERE {where_clause}
-                    ORDER BY ts
-                    """,
+                    rollup,
+                    tail_start_ms if segment_start_ms is None else max(segment_start_ms, tail_start_ms),
+                    segment_end_ms,
+                )
+                for rollup, segment_start_ms, segment_end_ms in segments
+                if segment_end_ms is None or segment_end_ms >= tail_start_ms
+            ]
+
+        points = self._iter_stitched_points(
+            conn,
+            params,
+            tail_segments,
+            aggregate=aggregate,
+            step_ms=step_ms,
+        )
+        if cached is not None:
+            points = itertools.chain(cached.points(), points)
+        if archived is not None:
+            # Archived buckets are older than the hot ones except while
+            # retention is catching up, so merge rather than concatenate.
+            spacing_ms = max(step_ms or 0, archived.rollup.resolution_seconds * 1000)
+            archived_points = (
+                (ts, value, spacing_ms)
+                for ts, value in self._read_metric_segment(
+                    archived.conn,
                     params,
+                    archived.rollup,
+                    archived.start_ms,
+                    archived.end_ms,
+                    METRIC_AGGREGATES[aggregate],
+                    step_ms=step_ms,
+                    fold=self._downsample_fold(aggregate),
                 )
             )
-        else:
-            now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
-            raw_cutoff_ms = now_ms - (policy.raw_retention_seconds * 1000)
-
-            rollup_params = {
-                **params,
-                "resolution_seconds": policy.rollup.resolution_seconds,
-            }
-            rollup_clauses = [
-                "resolution_seconds = :resolution_seconds",
-                "device_type = :device_type",
-                "device_id = :device_id",
-                "metric = :metric",
-            ]
+            points = heapq.merge(archived_points, points, key=lambda point: point[0])
+
+        timestamps: list[int] = []
+        values: list[float | None] = []
+        closed_points: list[tuple[int, float, int]] = []
+        previous_ts: int | None = None
+        for ts, value, spacing_ms in points:
+            if value is None:
+                continue
+            ts = int(ts)
+            if cache_key is not None and ts <= closed_end_ms and (cached is None or ts > cached.closed_end_ms):
+                closed_points.append((ts, float(value), spacing_ms))
+            if gap_ms is not None and previous_ts is not None:
+                # Change-only series are only stored once per heartbeat
+                # while they hold still.
+                threshold_ms = max(gap_ms, 2 * spacing_ms) + self._change_only.heartbeat_ms
+                if ts - previous_ts > threshold_ms:
+                    timestamps.append(previous_ts + threshold_ms)
+                    values.append(None)
+            timestamps.append(ts)
+            values.append(float(value))
+            previous_ts = ts
+        if cache_key is not None and (cached is None or cached.closed_end_ms < closed_end_ms):
+            self._series_points_cache.put(cache_key, series, cache_version, closed_end_ms, closed_points, base=cached)
+        return timestamps, values
+
+    def _iter_stitched_points(
+        self,
+        conn: sqlite3.Connection,
+        params: dict[str, Any],
+        segments: list[tuple[MetricRollupPolicy | None, int | None, int | None]],
+        *,
+        aggregate: str,
+        step_ms: int | None,
+    ) -> Iterator[tuple[int, float | None, int]]:
+        """Yield ``(ts, value, spacing_ms)`` for all segments in time order.
+
+        The segments are read by one ``UNION ALL`` query. Each arm walks the
+        ``(series_id, ...)`` primary key in ``ts`` order, so SQLite merges
+        the arms instead of sorting the result. A rollup segment without
+        rollups falls back to raw samples, because those stay in place until
+        retention first runs. ``spacing_ms`` is the resolution a point was
+        read at, for gap markers.
+        """
+        if not segments:
+            return
+        row = conn.execute(
+            "SELECT id FROM series WHERE device_type = :device_type AND device_id = :device_id AND metric = :metric",
+            params,
+        ).fetchone()
+        if row is None:
+            return
+        query_params: dict[str, Any] = {"series_id": int(row[0])}
+        raw_value = "1" if aggregate == "count" else "value"
+        arms: list[str] = []
+        for index, (rollup, start_ms, end_ms) in enumerate(segments):
+            clauses = ["series_id = :series_id"]
             if start_ms is not None:
-                rollup_clauses.append("ts >= :start_ms")
-            rollup_end_ms = raw_cutoff_ms - 1
+                clauses.append(f"ts >= :start_{index}")
+                query_params[f"start_{index}"] = start_ms
             if end_ms is not None:
-                rollup_end_ms = min(rollup_end_ms, end_ms)
-            if start_ms is None or start_ms <= rollup_end_ms:
-                rollup_params["rollup_end_ms"] = rollup_end_ms
-                rollup_clauses.append("ts <= :rollup_end_ms")
-                metric_queries.append(
-                    (
-                        f"""
-                        SELECT ts, value
-                        FROM metric_rollups
-                        WHERE {" AND ".join(rollup_clauses)}
-                        ORDER BY ts
-                        """,
-                        rollup_params,
+                clauses.append(f"ts <= :end_{index}")
+                query_params[f"end_{index}"] = end_ms
+            raw_clauses = list(clauses)
+            if rollup is not None:
+                query_params[f"resolution_{index}"] = rollup.resolution_seconds
+                rollup_clauses = [*clauses, f"resolution_seconds = :resolution_{index}"]
+                arms.append(
+                    self._stitched_arm(
+                        "sample_rollups",
+                        METRIC_AGGREGATES[aggregate],
+                        rollup_clauses,
+                        max(step_ms or 0, rollup.resolution_seconds * 1000),
+                        step_ms,
+                        aggregate,
                     )
                 )
+                raw_clauses.append(
+                    f"NOT EXISTS (SELECT 1 FROM sample_rollups WHERE {' AND '.join(rollup_clauses)})"
+                )
+            arms.append(self._stitched_arm("samples", raw_value, raw_clauses, step_ms or 0, step_ms, aggregate))
+        if step_ms is not None:
+            query_params["step_ms"] = step_ms
+        cursor = conn.execute(f"{' UNION ALL '.join(arms)} ORDER BY 1", query_params)
+        yield from cursor
 
-            raw_params = dict(params)
-            raw_clauses = list(clauses)
-            raw_start_ms = raw_cutoff_ms
-            if start_ms is not None:
-                raw_start_ms = max(raw_start_ms, start_ms)
-            if end_ms is None or raw_start_ms <= end_ms:
-                raw_params["raw_start_ms"] = raw_start_ms
-                raw_clauses.append("ts >= :raw_start_ms")
-                metric_queries.append(
-                    (
-                        f"""
-                        SELECT ts, value
-                        FROM metrics
-                        WHERE {" AND ".join(raw_clauses)}
-                        ORDER BY ts
-                        """,
-                        raw_params,
-                    )
+    def _stitched_arm(
+        self,
+        table_name: str,
+        value_expression: str,
+        clauses: list[str],
+        spacing_ms: int,
+        step_ms: int | None,
+        aggregate: str,
+    ) -> str:
+        query = f"SELECT ts, {value_expression} AS value FROM {table_name} WHERE {' AND '.join(clauses)}"
+        if step_ms is None:
+            return f"SELECT ts, value, {spacing_ms} FROM ({query})"
+        return f"""
+            SELECT MIN(ts), {self._downsample_fold(aggregate)}, {spacing_ms}
+            FROM ({query})
+            GROUP BY ts / :step_ms
+        """
+
+    def _downsample_fold(self, aggregate: str) -> str:
+        if self._change_only.enabled and aggregate == "sample":
+            # A change-only series is a step function whose points are not
+            # evenly spaced, so averaging them is biased towards changes.
+            # Each step takes the value stored first in it instead: next to
+            # MIN(ts), the bare column comes from the same row.
+            return "value"
+        return f"{DOWNSAMPLE_FOLDS[aggregate]}(value)"
+
+    def _load_archived_rollups(
+        self,
+        archive: MetricArchive,
+        series_params: list[dict[str, Any]],
+        rollup: MetricRollupPolicy,
+        start_ms: int,
+        end_ms: int,
+    ) -> ArchivedRollups | None:
+        """Load the archived ``rollup`` rows of several series for a range.
+
+        The day files are read in one pass for all series. Each series only
+        takes rows older than anything the hot tables still hold for it, so
+        rows that retention has not deleted yet are not read twice. The rows
+        go into one in-memory database with the same tables, so they are
+        aggregated and downsampled by exactly the queries used for the hot
+        database. Rows archived twice collapse on the primary key.
+        """
+        series_end_ms: dict[SeriesKey, int] = {}
+        with self._db.reader() as conn:
+            for params in series_params:
+                first_hot_ts = self._first_metric_ts(conn, params)
+                series_end_ms[(params["device_type"], params["device_id"], params["metric"])] = (
+                    end_ms if first_hot_ts is None else min(end_ms, first_hot_ts - 1)
+                )
+        rows_by_series: dict[SeriesKey, list[tuple[Any, ...]]] = {}
+        for row in archive.read("rollups", start_ms, max(series_end_ms.values(), default=end_ms)):
+            key = (row[2], row[3], row[4])
+            if row[1] == rollup.resolution_seconds and row[0] <= series_end_ms.get(key, -1):
+                rows_by_series.setdefault(key, []).append((row[0], *row[5:12]))
+        if not rows_by_series:
+            return None
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE series (id INTEGER PRIMARY KEY, device_type TEXT, device_id TEXT, metric TEXT)")
+        conn.execute(
+            """
+            CREATE TABLE samples (
+                series_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (series_id, ts)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE sample_rollups (
+                series_id INTEGER NOT NULL,
+                resolution_seconds INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                value REAL NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                sum_value REAL,
+                sample_count INTEGER,
+                time_weighted_value REAL,
+                covered_ms INTEGER,
+                PRIMARY KEY (series_id, resolution_seconds, ts)
+            )
+            """
+        )
+        for series_id, (key, rows) in enumerate(rows_by_series.items(), start=1):
+            conn.execute(
+                "INSERT INTO series (id, device_type, device_id, metric) VALUES (?, ?, ?, ?)",
+                (series_id, *key),
+            )
+            conn.executemany(
+                f"""
+                INSERT OR REPLACE INTO sample_rollups (
+                    series_id, resolution_seconds, ts, value, min_value, max_value,
+                    sum_value, sample_count, time_weighted_value, covered_ms
                 )
+                VALUES ({series_id}, {rollup.resolution_seconds}, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+        return ArchivedRollups(
+            conn=conn,
+            rollup=rollup,
+            start_ms=start_ms,
+            end_ms=end_ms,
+            series=frozenset(rows_by_series),
+        )
 
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                rows: list[tuple[int, float]] = []
-                for query, query_params in metric_queries:
-                    query_rows = conn.execute(query, query_params).fetchall()
-                    if query_rows or "metric_rollups" not in query:
-                        rows.extend(query_rows)
-                        continue
-
-                    fallback_params = dict(params)
-                    fallback_clauses = list(clauses)
-                    if start_ms is not None:
-                        fallback_clauses.append("ts >= :start_ms")
-                    fallback_end_ms = raw_cutoff_ms - 1
-                    if end_ms is not None:
-                        fallback_end_ms = min(fallback_end_ms, end_ms)
-                    if start_ms is None or start_ms <= fallback_end_ms:
-                        fallback_params["fallback_end_ms"] = fallback_end_ms
-                        fallback_clauses.append("ts <= :fallback_end_ms")
-                        fallback_rows = conn.execute(
-                            f"""
-                            SELECT ts, value
-                            FROM metrics
-                            WHERE {" AND ".join(fallback_clauses)}
-                            ORDER BY ts
-                            """,
-                            fallback_params,
-                        ).fetchall()
-                        rows.extend(fallback_rows)
+    def _first_metric_ts(self, conn: sqlite3.Connection, params: dict[str, Any]) -> int | None:
+        row = conn.execute(
+            f"""
+            SELECT MIN(ts)
+            FROM (
+                SELECT MIN(ts) AS ts FROM samples WHERE {SERIES_ID_CLAUSE}
+                UNION ALL
+                SELECT MIN(ts) AS ts FROM sample_rollups WHERE {SERIES_ID_CLAUSE}
+            )
+            """,
+            params,
+        ).fetchone()
+        return int(row[0]) if row and row[0] is not None else None
 
-        rows.sort(key=lambda row: int(row[0]))
-        return [{"ts": int(ts), "value": float(value)} for ts, value in rows]
+    def _metric_series_segments(
+        self,
+        policy: MetricsRetentionPolicy,
+        now_ms: int,
+        start_ms: int | None,
+        end_ms: int | None,
+        max_points: int | None,
+    ) -> list[tuple[MetricRollupPolicy | None, int | None, int | None]]:
+        """Split a requested range into ``(tier, start, end)`` reads.
+
+        ``tier`` is ``None`` for raw samples; both bounds are inclusive and
+        ``None`` means unbounded.
+        """
+        raw_cutoff_ms = self._metrics_raw_cutoff_ms(policy, now_ms)
+        rollup_end_ms = raw_cutoff_ms - 1
+        if end_ms is not None:
+            rollup_end_ms = min(rollup_end_ms, end_ms)
+
+        tiers = list(policy.rollups)
+        if max_points is not None and max_points > 0:
+            oldest_ms = now_ms - max(rollup.retention_seconds for rollup in tiers) * 1000
+            span_ms = rollup_end_ms - (oldest_ms if start_ms is None else max(start_ms, oldest_ms))
+            for index, rollup in enumerate(tiers):
+                if span_ms <= max_points * rollup.resolution_seconds * 1000:
+                    break
+            tiers = tiers[index:]
+
+        segments: list[tuple[MetricRollupPolicy | None, int | None, int | None]] = []
+        newer_edge_ms = rollup_end_ms
+        for position, rollup in enumerate(tiers):
+            # The coarsest tier also returns rows that are past retention but
+            # have not been deleted yet.
+            older_edge_ms = None
+            if position < len(tiers) - 1:
+                older_edge_ms = now_ms - rollup.retention_seconds * 1000
+            segment_start_ms = older_edge_ms
+            if start_ms is not None:
+                segment_start_ms = start_ms if segment_start_ms is None else max(segment_start_ms, start_ms)
+            if segment_start_ms is None or segment_start_ms <= newer_edge_ms:
+                segments.append((rollup, segment_start_ms, newer_edge_ms))
+            if older_edge_ms is None or segment_start_ms == start_ms:
+                break
+            newer_edge_ms = min(newer_edge_ms, older_edge_ms - 1)
+
+        raw_start_ms = raw_cutoff_ms if start_ms is None else max(raw_cutoff_ms, start_ms)
+        if end_ms is None or raw_start_ms <= end_ms:
+            segments.append((None, raw_start_ms, end_ms))
+        return segments
+
+    def _read_metric_segment(
+        self,
+        conn: sqlite3.Connection,
+        params: dict[str, Any],
+        rollup: MetricRollupPolicy | None,
+        start_ms: int | None,
+        end_ms: int | None,
+        value_expression: str,
+        step_ms: int | None = None,
+        fold: str = "AVG(value)",
+    ) -> list[tuple[int, float]]:
+        clauses = [SERIES_ID_CLAUSE]
+        query_params = dict(params)
+        if rollup is not None:
+            clauses.append("resolution_seconds = :resolution_seconds")
+            query_params["resolution_seconds"] = rollup.resolution_seconds
+        if start_ms is not None:
+            clauses.append("ts >= :start_ms")
+            query_params["start_ms"] = start_ms
+        if end_ms is not None:
+            clauses.append("ts <= :end_ms")
+            query_params["end_ms"] = end_ms
+        table_name = "samples" if rollup is None else "sample_rollups"
+        query = f"""
+            SELECT ts, {value_expression} AS value
+            FROM {table_name}
+            WHERE {" AND ".join(clauses)}
+            ORDER BY ts
+        """
+        if step_ms is not None:
+            query_params["step_ms"] = step_ms
+            query = f"""
+                SELECT MIN(ts), {fold}
+                FROM ({query})
+                GROUP BY ts / :step_ms
+                ORDER BY 1
+            """
+        return conn.execute(query, query_params).fetchall()
 
     def get_latest_control_inputs(self) -> dict[str, Any] | None:
         if not self._db_path:
             return None
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                row = conn.execute(
-                    """
-                    SELECT
-                        ts,
-                        indoor_temp,
-                        indoor_temp_source,
-                        outdoor_temp,
-                        outdoor_temp_source,
-                        supply_temp,
-                        supply_temp_source,
-                        power,
-                        power_sources
-                    FROM control_inputs
-                    ORDER BY ts DESC, id DESC
-                    LIMIT 1
-                    """
-                ).fetchone()
+        with self._db.reader() as conn:
+            row = conn.execute(
+                """
+                SELECT
+                    ts,
+                    indoor_temp,
+                    indoor_temp_source,
+                    outdoor_temp,
+                    outdoor_temp_source,
+                    supply_temp,
+                    supply_temp_source,
+                    power,
+                    power_sources
+                FROM control_inputs
+                ORDER BY ts DESC, id DESC
+                LIMIT 1
+                """
+            ).fetchone()
         if row is None:
             return None
         power_sources: list[str] = []
@@ -546,24 +1572,22 @@ class DevicePoller:
     def get_latest_control_decision(self) -> dict[str, Any] | None:
         if not self._db_path:
             return None
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                row = conn.execute(
-                    """
-                    SELECT
-                        ts,
-                        mode,
-                        resolved_target_room_temp_c,
-                        resolved_target_supply_temp_c,
-                        requested_power_percent,
-                        requested_power_w,
-                        override_reason
-                    FROM control_decisions
-                    ORDER BY ts DESC, id DESC
-                    LIMIT 1
-                    """
-                ).fetchone()
+        with self._db.reader() as conn:
+            row = conn.execute(
+                """
+                SELECT
+                    ts,
+                    mode,
+                    resolved_target_room_temp_c,
+                    resolved_target_supply_temp_c,
+                    requested_power_percent,
+                    requested_power_w,
+                    override_reason
+                FROM control_decisions
+                ORDER BY ts DESC, id DESC
+                LIMIT 1
+                """
+            ).fetchone()
         if row is None:
             return None
         return {
@@ -643,53 +1667,35 @@ class DevicePoller:
                 }
             )
 
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                conn.execute(
-                    """
-                    INSERT INTO control_decisions (
-                        ts,
-                        mode,
-                        resolved_target_room_temp_c,
-                        resolved_target_supply_temp_c,
-                        requested_power_percent,
-                        requested_power_w,
-                        override_reason
-                    ) VALUES (
-                        :ts,
-                        :mode,
-                        :resolved_target_room_temp_c,
-                        :resolved_target_supply_temp_c,
-                        :requested_power_percent,
-                        :requested_power_w,
-                        :override_reason
-                    )
-                    """,
-                    row,
+        with self._db.writer() as conn:
+            conn.execute(
+                """
+                INSERT INTO control_decisions (
+                    ts,
+                    mode,
+                    resolved_target_room_temp_c,
+                    resolved_target_supply_temp_c,
+                    requested_power_percent,
+                    requested_power_w,
+                    override_reason
+                ) VALUES (
+                    :ts,
+                    :mode,
+                    :resolved_target_room_temp_c,
+                    :resolved_target_supply_temp_c,
+                    :requested_power_percent,
+                    :requested_power_w,
+                    :override_reason
                 )
-                if metric_rows:
-                    conn.executemany(
-                        """
-                        INSERT INTO metrics (
-                            ts,
-                            device_type,
-                            device_id,
-                            metric,
-                            value,
-                            unit
-                        ) VALUES (
-                            :ts,
-                            :device_type,
-                            :device_id,
-                            :metric,
-                            :value,
-                            :unit
-                        )
-                        """,
-                        metric_rows,
-                    )
-                    self._update_metric_catalog_cache(metric_rows)
+                """,
+                row,
+            )
+            if metric_rows:
+                self._insert_metric_rows(conn, metric_rows)
+        if metric_rows:
+            self._latest_values.update(metric_rows)
+            self._update_metric_catalog_cache(metric_rows)
+            self._series_points_cache.invalidate_writes(metric_rows)
 
     def _poll_device(
         self,
@@ -792,20 +1798,15 @@ class DevicePoller:
         }
         ts_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
         if self._db_path:
-            self._write_raw_event(
-                ts_ms=ts_ms,
-                device_type="zont",
-                device_id=device_id,
-                payload=result,
-            )
-            metrics = self._extract_zont_metrics(matched)
-            if metrics:
-                self._write_metrics(
+            self._commit_poll_batch(
+                PollWriteBatch(
                     ts_ms=ts_ms,
                     device_type="zont",
                     device_id=device_id,
-                    metrics=metrics,
+                    payload=result,
+                    metrics=self._extract_zont_metrics(matched),
                 )
+            )
         return result
 
     def poll_whatsminer_device(
@@ -876,26 +1877,18 @@ class DevicePoller:
 
         if self._db_path:
             device_id = str(device.get("device_id", "unknown"))
-            ts_ms = self._to_epoch_ms(summary_response.get("when"))
-            self._write_raw_event(
-                ts_ms=ts_ms,
+            batch = PollWriteBatch(
+                ts_ms=self._to_epoch_ms(summary_response.get("when")),
                 device_type="whatsminer",
                 device_id=device_id,
                 payload=response,
             )
             summary = self._extract_whatsminer_summary(summary_response)
-            metrics: list[MetricSample] = []
             if summary:
-                metrics.extend(self._extract_whatsminer_metrics(summary))
-            metrics.extend(self._extract_whatsminer_pool_metrics(pools_response))
-            metrics.extend(self._extract_whatsminer_device_info_metrics(device_info_response))
-            if metrics:
-                self._write_metrics(
-                    ts_ms=ts_ms,
-                    device_type="whatsminer",
-                    device_id=device_id,
-                    metrics=metrics,
-                )
+                batch.metrics.extend(self._extract_whatsminer_metrics(summary))
+            batch.metrics.extend(self._extract_whatsminer_pool_metrics(pools_response))
+            batch.metrics.extend(self._extract_whatsminer_device_info_metrics(device_info_response))
+            self._commit_poll_batch(batch)
         return response
 
     def _call_whatsminer(
@@ -995,19 +1988,15 @@ class DevicePoller:
         economics = device if isinstance(device, dict) else self._economics_poller.load_settings()
         result = self._economics_poller.poll(economics)
         if self._db_path:
-            self._write_raw_event(
-                ts_ms=result.ts_ms,
-                device_type=ECONOMICS_DEVICE_TYPE,
-                device_id=ECONOMICS_DEVICE_ID,
-                payload=result.payload,
-            )
-            if result.metrics:
-                self._write_metrics(
+            self._commit_poll_batch(
+                PollWriteBatch(
                     ts_ms=result.ts_ms,
                     device_type=ECONOMICS_DEVICE_TYPE,
                     device_id=ECONOMICS_DEVICE_ID,
+                    payload=result.payload,
                     metrics=result.metrics,
                 )
+            )
         return result.payload
 
     def _ping_host(self, host: str, port: int, timeout_s: int = 1) -> bool:
@@ -1048,33 +2037,9 @@ class DevicePoller:
         device_id: str,
         payload: dict[str, Any],
     ) -> None:
-        if not self._db_path:
-            return
-        payload_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                conn.execute(
-                    """
-                    INSERT INTO raw_events (
-                        ts,
-                        device_type,
-                        device_id,
-                        payload
-                    ) VALUES (
-                        :ts,
-                        :device_type,
-                        :device_id,
-                        :payload
-                    )
-                    """,
-                    {
-                        "ts": ts_ms,
-                        "device_type": device_type,
-                        "device_id": device_id,
-                        "payload": payload_json,
-                    },
-                )
+        self._commit_poll_batch(
+            PollWriteBatch(ts_ms=ts_ms, device_type=device_type, device_id=device_id, payload=payload)
+        )
 
     def _write_metrics(
         self,
@@ -1083,44 +2048,372 @@ class DevicePoller:
         device_id: str,
         metrics: list[MetricSample],
     ) -> None:
-        if not self._db_path or not metrics:
+        self._commit_poll_batch(
+            PollWriteBatch(ts_ms=ts_ms, device_type=device_type, device_id=device_id, metrics=metrics)
+        )
+
+    def _commit_poll_batch(self, batch: PollWriteBatch) -> None:
+        if not self._db_path or (batch.payload is None and not batch.metrics):
             return
-        rows = [
-            {
-                "ts": ts_ms,
-                "device_type": device_type,
-                "device_id": device_id,
-                "metric": sample.name,
-                "value": sample.value,
-                "unit": sample.unit,
-            }
-            for sample in metrics
-        ]
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                conn.executemany(
-                    """
-                    INSERT INTO metrics (
-                        ts,
-                        device_type,
-                        device_id,
-                        metric,
-                        value,
-                        unit
-                    ) VALUES (
-                        :ts,
-                        :device_type,
-                        :device_id,
-                        :metric,
-                        :value,
-                        :unit
+        if self._write_queue is not None and self._write_queue.running:
+            # Poll threads only enqueue; the writer thread group-commits.
+            self._write_queue.submit(batch)
+            return
+        self._commit_poll_batches([batch])
+
+    def _commit_poll_batches(self, batches: list[PollWriteBatch]) -> None:
+        catalog_rows: list[dict[str, Any]] = []
+        stored_metric_rows: list[dict[str, Any]] = []
+        # Raw event, metrics and the derived control inputs become visible
+        # together: readers never see a raw event without its metrics.
+        with self._db.writer() as conn:
+            for batch in batches:
+                rows = [
+                    {
+                        "ts": batch.ts_ms,
+                        "device_type": batch.device_type,
+                        "device_id": batch.device_id,
+                        "metric": sample.name,
+                        "value": sample.value,
+                        "unit": sample.unit,
+                    }
+                    for sample in batch.metrics
+                ]
+                if batch.payload is not None:
+                    self._insert_raw_event(conn, batch)
+                if rows:
+                    # In change-only mode unchanged samples are not stored,
+                    # but the latest values and control inputs still see them.
+                    stored_rows = self._metric_change_filter.filter(rows, self._change_only)
+                    if stored_rows:
+                        self._insert_metric_rows(conn, stored_rows)
+                        stored_metric_rows.extend(stored_rows)
+                    # Control inputs resolve against the index, so it has
+                    # to include this batch before the transaction ends.
+                    self._latest_values.update(rows)
+                    catalog_rows.extend(rows)
+                    catalog_rows.extend(
+                        self._refresh_control_inputs(
+                            conn=conn,
+                            ts_ms=batch.ts_ms,
+                            touched={(row["device_type"], row["device_id"], row["metric"]) for row in rows},
+                        )
                     )
-                    """,
-                    rows,
+        if catalog_rows:
+            self._update_metric_catalog_cache(catalog_rows)
+        # catalog_rows also holds the control input rows; stored rows add
+        # the held-back samples change-only mode writes with an older ts.
+        self._series_points_cache.invalidate_writes([*catalog_rows, *stored_metric_rows])
+
+    def _insert_raw_event(self, conn: sqlite3.Connection, batch: PollWriteBatch) -> None:
+        options = self._payload_compression
+        data = json.dumps(batch.payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        keyframe_id = None
+        if self._change_only.enabled:
+            key = DeviceKey(batch.device_type, batch.device_id)
+            keyframe = self._raw_event_keyframes.get(key)
+            if keyframe is not None and batch.ts_ms - keyframe[1] < self._change_only.keyframe_interval_seconds * 1000:
+                diff = json.dumps(
+                    diff_payload(keyframe[2], batch.payload),
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                ).encode("utf-8")
+                # A diff that is not much smaller than the payload is
+                # better spent on a new keyframe.
+                if len(diff) * 2 < len(data):
+                    keyframe_id, data = keyframe[0], diff
+        dictionary = self._payload_dictionary_for(conn, batch.device_type, data) if options.dictionary else None
+        row = conn.execute(
+            """
+            INSERT INTO raw_events (
+                ts,
+                device_type,
+                device_id,
+                codec,
+                dictionary_id,
+                keyframe_id,
+                payload
+            ) VALUES (
+                :ts,
+                :device_type,
+                :device_id,
+                :codec,
+                :dictionary_id,
+                :keyframe_id,
+                :payload
+            )
+            RETURNING id
+            """,
+            {
+                "ts": batch.ts_ms,
+                "device_type": batch.device_type,
+                "device_id": batch.device_id,
+                "codec": options.codec,
+                "dictionary_id": dictionary[0] if dictionary else None,
+                "keyframe_id": keyframe_id,
+                "payload": compress_payload(
+                    options.codec,
+                    data,
+                    level=options.level,
+                    dictionary=dictionary[1] if dictionary else None,
+                ),
+            },
+        ).fetchone()
+        if self._change_only.enabled and keyframe_id is None:
+            self._raw_event_keyframes[DeviceKey(batch.device_type, batch.device_id)] = (
+                int(row[0]),
+                batch.ts_ms,
+                batch.payload,
+            )
+
+    def _payload_dictionary_for(
+        self,
+        conn: sqlite3.Connection,
+        device_type: str,
+        data: bytes,
+    ) -> tuple[int, bytes] | None:
+        """Return the dictionary to compress ``device_type`` payloads with.
+
+        Until a device type has one, its payloads are collected and the
+        dictionary is built once ``dictionary_samples`` of them are in.
+        """
+        options = self._payload_compression
+        key = (device_type, options.codec)
+        if key not in self._payload_dictionaries:
+            row = conn.execute(
+                """
+                SELECT id, dictionary
+                FROM raw_event_dictionaries
+                WHERE device_type = ? AND codec = ?
+                ORDER BY id DESC
+                LIMIT 1
+                """,
+                key,
+            ).fetchone()
+            self._payload_dictionaries[key] = (int(row[0]), bytes(row[1])) if row else None
+        dictionary = self._payload_dictionaries[key]
+        if dictionary is not None:
+            return dictionary
+
+        samples = self._payload_dictionary_samples.setdefault(device_type, [])
+        samples.append(data)
+        if len(samples) < options.dictionary_samples:
+            return None
+        self._payload_dictionary_samples.pop(device_type, None)
+        try:
+            content = build_dictionary(options.codec, samples, options.dictionary_size)
+        except Exception as exc:  # zstd refuses to train on too little or too uniform data
+            logger.warning("Could not build a %s payload dictionary for %s: %s", options.codec, device_type, exc)
+            return None
+        row = conn.execute(
+            """
+            INSERT INTO raw_event_dictionaries (device_type, codec, dictionary, created_at)
+            VALUES (?, ?, ?, ?)
+            RETURNING id
+            """,
+            (device_type, options.codec, content, int(datetime.now(timezone.utc).timestamp() * 1000)),
+        ).fetchone()
+        dictionary = (int(row[0]), content)
+        self._payload_dictionaries[key] = dictionary
+        logger.info(
+            "Built a %s byte %s payload dictionary for %s from %s samples",
+            len(content),
+            options.codec,
+            device_type,
+            len(samples),
+        )
+        return dictionary
+
+    def _decode_raw_payload(
+        self,
+        conn: sqlite3.Connection,
+        codec: str,
+        dictionary_id: int | None,
+        blob: bytes,
+    ) -> str:
+        dictionary = None
+        if dictionary_id is not None:
+            dictionary = self._payload_dictionary_cache.get(dictionary_id)
+            if dictionary is None:
+                row = conn.execute(
+                    "SELECT dictionary FROM raw_event_dictionaries WHERE id = ?",
+                    (dictionary_id,),
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"raw event dictionary {dictionary_id} is missing")
+                dictionary = self._payload_dictionary_cache[dictionary_id] = bytes(row[0])
+        return decompress_payload(codec, bytes(blob), dictionary=dictionary).decode("utf-8")
+
+    def _decode_raw_event(
+        self,
+        conn: sqlite3.Connection,
+        row: tuple[Any, ...],
+        keyframes: dict[int, Any],
+    ) -> Any:
+        """Decode a ``RAW_EVENT_PAYLOAD_COLUMNS`` row to the polled document.
+
+        Change-only diffs are applied to their keyframe; decoded keyframes
+        are kept in ``keyframes`` for the other rows of the same read. A diff
+        whose keyframe is gone raises ``RawEventKeyframeMissingError``.
+        """
+        codec, dictionary_id, blob, keyframe_id, *keyframe_row = row
+        document = json.loads(self._decode_raw_payload(conn, codec, dictionary_id, blob))
+        if keyframe_id is None:
+            return document
+        keyframe = keyframes.get(keyframe_id)
+        if keyframe is None:
+            if keyframe_row[2] is None:
+                raise RawEventKeyframeMissingError(int(keyframe_id), document)
+            keyframe = keyframes[keyframe_id] = json.loads(self._decode_raw_payload(conn, *keyframe_row))
+        return apply_payload_diff(keyframe, document)
+
+    def get_raw_events(
+        self,
+        device_type: str,
+        device_id: str,
+        start_ms: int | None = None,
+        end_ms: int | None = None,
+        limit: int = 100,
+    ) -> list[dict[str, Any]]:
+        """Return stored poll payloads of one device, newest first.
+
+        Payloads are decompressed and change-only diffs are applied to their
+        keyframes, so every entry holds the full polled document. A diff
+        whose keyframe is gone has a ``None`` payload and an ``error``
+        instead, so it does not hide the other events.
+        """
+        if not self._db_path:
+            return []
+        clauses = ["raw_events.device_type = :device_type", "raw_events.device_id = :device_id"]
+        params: dict[str, Any] = {"device_type": device_type, "device_id": device_id, "limit": limit}
+        if start_ms is not None:
+            clauses.append("raw_events.ts >= :start_ms")
+            params["start_ms"] = start_ms
+        if end_ms is not None:
+            clauses.append("raw_events.ts <= :end_ms")
+            params["end_ms"] = end_ms
+        with self._db.reader() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT raw_events.ts, {RAW_EVENT_PAYLOAD_COLUMNS}
+                FROM raw_events
+                LEFT JOIN raw_events AS keyframes ON keyframes.id = raw_events.keyframe_id
+                WHERE {" AND ".join(clauses)}
+                ORDER BY raw_events.ts DESC, raw_events.id DESC
+                LIMIT :limit
+                """,
+                params,
+            ).fetchall()
+            keyframes: dict[int, Any] = {}
+            events = []
+            for row in rows:
+                event: dict[str, Any] = {"ts": int(row[0]), "device_type": device_type, "device_id": device_id}
+                try:
+                    event["payload"] = self._decode_raw_event(conn, row[1:], keyframes)
+                except RawEventKeyframeMissingError as exc:
+                    event["payload"] = None
+                    event["error"] = str(exc)
+                events.append(event)
+            return events
+
+    def _archived_raw_event_json(
+        self, conn: sqlite3.Connection, row: tuple[Any, ...], keyframes: dict[int, Any]
+    ) -> str:
+        try:
+            document = self._decode_raw_event(conn, row, keyframes)
+        except RawEventKeyframeMissingError as exc:
+            # Left behind by older retention runs; archive what is there
+            # rather than fail every run on the same rows.
+            logger.warning("Archiving raw event diff without its keyframe: %s", exc)
+            document = {"error": str(exc), "diff": exc.diff}
+        return json.dumps(document, ensure_ascii=False)
+
+    def _insert_metric_rows(self, conn: sqlite3.Connection, rows: list[dict[str, Any]]) -> None:
+        sample_rows = [
+            (
+                self._resolve_series_id(
+                    conn,
+                    device_type=str(row["device_type"]),
+                    device_id=str(row["device_id"]),
+                    metric=str(row["metric"]),
+                    unit=row.get("unit"),
+                ),
+                row["ts"],
+                row["value"],
+            )
+            for row in rows
+        ]
+        if not sample_rows:
+            return
+        self._add_samples_to_metric_catalog(conn, sample_rows)
+        conn.executemany(
+            """
+            INSERT INTO samples (series_id, ts, value)
+            VALUES (?, ?, ?)
+            ON CONFLICT (series_id, ts) DO UPDATE SET value = excluded.value
+            """,
+            sample_rows,
+        )
+
+    def _add_samples_to_metric_catalog(
+        self,
+        conn: sqlite3.Connection,
+        sample_rows: list[tuple[int, Any, Any]],
+    ) -> None:
+        timestamps: dict[int, set[Any]] = {}
+        for series_id, ts, _ in sample_rows:
+            timestamps.setdefault(series_id, set()).add(ts)
+        conn.executemany(
+            METRIC_CATALOG_ADD_SAMPLES,
+            [
+                (
+                    series_id,
+                    min(series_timestamps),
+                    max(series_timestamps),
+                    len(series_timestamps),
+                    json.dumps(list(series_timestamps)) if len(series_timestamps) > 1 else None,
                 )
-                self._update_metric_catalog_cache(rows)
-                self._refresh_control_inputs(conn=conn, ts_ms=ts_ms)
+                for series_id, series_timestamps in timestamps.items()
+            ],
+        )
+
+    def _resolve_series_id(
+        self,
+        conn: sqlite3.Connection,
+        device_type: str,
+        device_id: str,
+        metric: str,
+        unit: str | None,
+    ) -> int:
+        key = (device_type, device_id, metric)
+        cached = self._series_cache.get(key)
+        if cached is not None and cached[1] == unit:
+            return cached[0]
+        row = conn.execute(
+            """
+            INSERT INTO series (device_type, device_id, metric, unit)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (device_type, device_id, metric) DO UPDATE SET unit = excluded.unit
+            RETURNING id
+            """,
+            (device_type, device_id, metric, unit),
+        ).fetchone()
+        series_id = int(row[0])
+        self._series_cache[key] = (series_id, unit)
+        return series_id
+
+    def _discard_uncommitted_state(self) -> None:
+        # Called by the connection manager after a writer rollback: series
+        # ids, latest values and the last control-input row may all refer to
+        # rows that no longer exist.
+        self._series_cache = {}
+        self._latest_values.invalidate()
+        self._control_input_state = {}
+        self._control_input_last_row = None
+        self._payload_dictionaries = {}
+        self._payload_dictionary_samples = {}
+        self._raw_event_keyframes = {}
+        self._metric_change_filter.reset()
 
     def _load_raw_events_retention_policy(self) -> RawEventsRetentionPolicy | None:
         if not self._db_path or not isinstance(self._settings, dict):
@@ -1149,8 +2442,45 @@ class DevicePoller:
         return RawEventsRetentionPolicy(
             retention_seconds=retention_seconds,
             interval_seconds=interval_seconds,
+            batch_size=self._retention_int_option(
+                raw_events, "raw_events", "batch_size", RAW_EVENTS_RETENTION_BATCH_SIZE
+            ),
+            max_run_seconds=self._retention_int_option(
+                raw_events, "raw_events", "max_run_seconds", RETENTION_MAX_RUN_S
+            ),
         )
 
+    def _retention_int_option(self, block: dict[str, Any], target: str, name: str, default: int) -> int:
+        value = self._safe_int(block.get(name))
+        if value is None:
+            return default
+        if value <= 0:
+            logger.warning("Ignoring invalid %s retention %s: %r", target, name, block)
+            return default
+        return value
+
+    def _load_metric_archive(self) -> MetricArchive | None:
+        if not self._db_path or not isinstance(self._settings, dict):
+            return None
+
+        database = self._settings.get("database")
+        if not isinstance(database, dict):
+            return None
+        retention = database.get("retention")
+        if not isinstance(retention, dict):
+            return None
+        archive = retention.get("archive")
+        if not isinstance(archive, dict):
+            return None
+        if archive.get("enabled") is False:
+            return None
+
+        file_format = str(archive.get("format") or "auto").strip().lower()
+        if file_format not in ARCHIVE_FORMATS:
+            logger.warning("Skipping archive due to unsupported format: %r", archive)
+            return None
+        return MetricArchive(self._db_path.parent / "archive", file_format)
+
     def _load_metrics_retention_policy(self) -> MetricsRetentionPolicy | None:
         if not self._db_path or not isinstance(self._settings, dict):
             return None
@@ -1177,30 +2507,43 @@ class DevicePoller:
             logger.warning("Skipping metrics retention due to invalid raw_retention_seconds: %r", metrics)
             return None
 
+        batch_size = self._retention_int_option(metrics, "metrics", "batch_size", METRICS_ROLLUP_BATCH_SIZE)
+        max_run_seconds = self._retention_int_option(metrics, "metrics", "max_run_seconds", RETENTION_MAX_RUN_S)
+
         rollups = metrics.get("rollups")
         if not isinstance(rollups, list) or not rollups:
             logger.warning("Skipping metrics retention due to missing rollups: %r", metrics)
             return None
 
-        valid_rollups: list[MetricRollupPolicy] = []
+        parsed_rollups: list[MetricRollupPolicy] = []
         for rollup in rollups:
             parsed = self._parse_metric_rollup_policy(rollup)
             if parsed is not None:
-                valid_rollups.append(parsed)
+                parsed_rollups.append(parsed)
+
+        # Each tier is computed from the previous one, so its buckets must
+        # be made of whole buckets of the finer tier.
+        valid_rollups: list[MetricRollupPolicy] = []
+        for rollup in sorted(parsed_rollups, key=lambda item: item.resolution_seconds):
+            if valid_rollups and rollup.resolution_seconds % valid_rollups[-1].resolution_seconds:
+                logger.warning(
+                    "Skipping metrics rollup whose resolution_seconds is not a multiple of %s: %r",
+                    valid_rollups[-1].resolution_seconds,
+                    rollup,
+                )
+                continue
+            valid_rollups.append(rollup)
 
         if not valid_rollups:
             logger.warning("Skipping metrics retention due to invalid rollups: %r", metrics)
             return None
-        if len(valid_rollups) > 1:
-            logger.warning(
-                "Only the first metrics rollup level is currently supported; ignoring %s extra rollups",
-                len(valid_rollups) - 1,
-            )
 
         return MetricsRetentionPolicy(
             interval_seconds=interval_seconds,
             raw_retention_seconds=raw_retention_seconds,
-            rollup=valid_rollups[0],
+            rollups=tuple(valid_rollups),
+            batch_size=batch_size,
+            max_run_seconds=max_run_seconds,
         )
 
     def _parse_metric_rollup_policy(self, rollup: Any) -> MetricRollupPolicy | None:
@@ -1259,11 +2602,32 @@ class DevicePoller:
             logger.warning("Skipping database vacuum due to invalid min_reclaimable_mb: %r", vacuum)
             return None
 
+        mode = str(vacuum.get("mode") or "full").strip().lower()
+        if mode not in DATABASE_VACUUM_MODES:
+            logger.warning("Skipping database vacuum due to invalid mode: %r", vacuum)
+            return None
+
+        slice_options: dict[str, int] = {}
+        for name, default in (
+            ("incremental_pages", DATABASE_VACUUM_INCREMENTAL_PAGES),
+            ("slice_pause_ms", DATABASE_VACUUM_SLICE_PAUSE_MS),
+            ("max_duration_seconds", DATABASE_VACUUM_MAX_DURATION_S),
+        ):
+            value = self._safe_int(vacuum.get(name))
+            if value is None:
+                value = default
+            if value < 0 or (value == 0 and name != "slice_pause_ms"):
+                logger.warning("Skipping database vacuum due to invalid %s: %r", name, vacuum)
+                return None
+            slice_options[name] = value
+
         return DatabaseVacuumPolicy(
             enabled=enabled,
             interval_seconds=interval_seconds,
             min_free_ratio=min_free_ratio,
             min_reclaimable_mb=min_reclaimable_mb,
+            mode=mode,
+            **slice_options,
         )
 
     def _apply_raw_events_retention(self, reference_ts_ms: int | None = None) -> int:
@@ -1275,27 +2639,91 @@ class DevicePoller:
         if now_ms is None:
             now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
         cutoff_ms = now_ms - (policy.retention_seconds * 1000)
-
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                cursor = conn.execute(
+        archive = self._load_metric_archive()
+
+        # A change-only keyframe goes in the same chunk as its last diff;
+        # until then a diff newer than the chunk still needs it, so no stored
+        # diff ever loses its keyframe. Held-back keyframes are the only rows
+        # left below the chunk start, so the window has no lower bound.
+        expired_clause = """
+            raw_events.ts < :chunk_end_ms
+            AND NOT EXISTS (
+                SELECT 1 FROM raw_events AS diffs
+                WHERE diffs.keyframe_id = raw_events.id AND diffs.ts >= :chunk_end_ms
+            )
+        """
+        # Rows are deleted in chunks of about ``batch_size`` rows, oldest
+        # first, each in its own transaction, so polls can write between
+        # chunks. A run that runs out of time leaves the rest to the next.
+        run = RetentionRun(max_run_seconds=policy.max_run_seconds)
+        chunk_start_ms = 0
+        while chunk_start_ms < cutoff_ms:
+            chunk_started_at = time.monotonic()
+            with self._db.writer() as conn:
+                boundary = conn.execute(
                     """
+                    SELECT ts
+                    FROM raw_events
+                    WHERE ts >= :chunk_start_ms AND ts < :cutoff_ms
+                    ORDER BY ts
+                    LIMIT 1 OFFSET :batch_size
+                    """,
+                    {"chunk_start_ms": chunk_start_ms, "cutoff_ms": cutoff_ms, "batch_size": policy.batch_size},
+                ).fetchone()
+                chunk_end_ms = cutoff_ms if boundary is None else max(int(boundary[0]), chunk_start_ms + 1)
+                params = {"chunk_end_ms": chunk_end_ms}
+                if archive is not None:
+                    keyframes: dict[int, Any] = {}
+                    self._archive_rows(
+                        archive,
+                        "raw_events",
+                        conn.execute(
+                            f"""
+                            SELECT raw_events.ts, raw_events.device_type, raw_events.device_id,
+                                {RAW_EVENT_PAYLOAD_COLUMNS}
+                            FROM raw_events
+                            LEFT JOIN raw_events AS keyframes ON keyframes.id = raw_events.keyframe_id
+                            WHERE {expired_clause}
+                            """,
+                            params,
+                        ),
+                        # Archives hold the full plain JSON so they stay
+                        # readable without the dictionaries and keyframes.
+                        transform=lambda row: (*row[:3], self._archived_raw_event_json(conn, row[3:], keyframes)),
+                    )
+                cursor = conn.execute(
+                    f"""
                     DELETE FROM raw_events
-                    WHERE ts < :cutoff_ms
+                    WHERE {expired_clause}
                     """,
-                    {"cutoff_ms": cutoff_ms},
+                    params,
                 )
-                deleted_rows = cursor.rowcount if cursor.rowcount is not None else 0
-
-        log_level = logging.INFO if deleted_rows else logging.DEBUG
+                # A keyframe nothing referred to yet may just have been deleted.
+                self._raw_event_keyframes = {
+                    key: keyframe
+                    for key, keyframe in self._raw_event_keyframes.items()
+                    if keyframe[1] >= chunk_end_ms
+                    or conn.execute("SELECT 1 FROM raw_events WHERE id = ?", (keyframe[0],)).fetchone() is not None
+                }
+            run.record(cursor.rowcount or 0, chunk_started_at)
+            chunk_start_ms = chunk_end_ms
+            if chunk_start_ms >= cutoff_ms or run.out_of_time():
+                break
+            time.sleep(RETENTION_CHUNK_PAUSE_S)
+        run.completed = chunk_start_ms >= cutoff_ms
+        self._retention_runs["raw_events"] = run.as_dict()
+
+        log_level = logging.INFO if run.deleted_rows else logging.DEBUG
         logger.log(
             log_level,
-            "Raw events retention removed %s rows older than %s seconds",
-            deleted_rows,
+            "Raw events retention removed %s rows older than %s seconds in %s chunks (%.0f rows/s)%s",
+            run.deleted_rows,
             policy.retention_seconds,
+            run.batches,
+            run.rows_per_second,
+            "" if run.completed else "; the rest is left for the next run",
         )
-        return deleted_rows
+        return run.deleted_rows
 
     def _apply_metrics_retention(self, reference_ts_ms: int | None = None) -> dict[str, int]:
         policy = self._load_metrics_retention_policy()
@@ -1309,90 +2737,144 @@ class DevicePoller:
         now_ms = reference_ts_ms
         if now_ms is None:
             now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
-        raw_cutoff_ms = now_ms - (policy.raw_retention_seconds * 1000)
-        rollup_cutoff_ms = now_ms - (policy.rollup.retention_seconds * 1000)
-
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                raw_rows = conn.execute(
-                    """
-                    SELECT
-                        id,
-                        ts,
-                        device_type,
-                        device_id,
-                        metric,
-                        value,
-                        unit
-                    FROM metrics
-                    WHERE ts < :raw_cutoff_ms
-                    ORDER BY device_type, device_id, metric, ts, id
-                    """,
-                    {"raw_cutoff_ms": raw_cutoff_ms},
-                ).fetchall()
-
-                rollup_rows = self._build_metric_rollup_rows(raw_rows=raw_rows, rollup=policy.rollup)
-                if rollup_rows:
-                    conn.executemany(
-                        """
-                        INSERT OR REPLACE INTO metric_rollups (
-                            ts,
-                            resolution_seconds,
-                            device_type,
-                            device_id,
-                            metric,
-                            value,
-                            unit
-                        ) VALUES (
-                            :ts,
-                            :resolution_seconds,
-                            :device_type,
-                            :device_id,
-                            :metric,
-                            :value,
-                            :unit
+        raw_cutoff_ms = self._metrics_raw_cutoff_ms(policy, now_ms)
+        archive = self._load_metric_archive()
+
+        # Raw samples are rolled up one series at a time in chunks of at most
+        # ``batch_size`` rows. Every chunk commits its rollups, the deletion
+        # of the covered raw rows and the checkpoint together, so memory stays
+        # bounded, polls can write between chunks and an interrupted run
+        # resumes from the series it was working on.
+        # The checkpoint only applies to the raw rollup: the coarser tiers
+        # and the expiry below keep their own progress per series and always
+        # go over every series.
+        with self._db.reader() as conn:
+            start_series_id = self._load_metrics_rollup_checkpoint(conn, policy.rollup)
+            all_series_ids = [int(row[0]) for row in conn.execute("SELECT id FROM series ORDER BY id")]
+        series_ids = [series_id for series_id in all_series_ids if series_id >= start_series_id]
+        if start_series_id:
+            logger.info("Resuming metrics rollup from series %s", start_series_id)
+
+        rolled_up_rows = 0
+        deleted_raw_rows = 0
+        deleted_rollup_rows = 0
+        # Series without raw samples left: their latest values are gone
+        # from samples and are evicted from the index.
+        drained_series: list[tuple[str, str, str]] = []
+        # Every chunk below is its own writer transaction. When the run is
+        # out of time it stops after the current chunk; the checkpoint and
+        # the watermarks let the next run pick up from there.
+        run = RetentionRun(max_run_seconds=policy.max_run_seconds)
+        try:
+            last_progress_at = time.monotonic()
+            for position, series_id in enumerate(series_ids, start=1):
+                while not run.out_of_time():
+                    chunk_started_at = time.monotonic()
+                    with self._db.writer() as conn:
+                        chunk = self._rollup_sample_chunk(
+                            conn,
+                            series_id=series_id,
+                            raw_cutoff_ms=raw_cutoff_ms,
+                            rollup=policy.rollup,
+                            batch_size=policy.batch_size,
+                            archive=archive,
                         )
-                        """,
-                        rollup_rows,
+                        if chunk is None:
+                            if not conn.execute(
+                                "SELECT 1 FROM samples WHERE series_id = ?", (series_id,)
+                            ).fetchone():
+                                drained_series.append(
+                                    conn.execute(
+                                        "SELECT device_type, device_id, metric FROM series WHERE id = ?",
+                                        (series_id,),
+                                    ).fetchone()
+                                )
+                            break
+                        self._save_metrics_rollup_checkpoint(conn, series_id, policy.rollup, now_ms)
+                    run.record(chunk[1], chunk_started_at)
+                    rolled_up_rows += chunk[0]
+                    deleted_raw_rows += chunk[1]
+                    if time.monotonic() - last_progress_at >= METRICS_ROLLUP_PROGRESS_INTERVAL_S:
+                        last_progress_at = time.monotonic()
+                        logger.info(
+                            "Metrics rollup progress: %s/%s series, %s buckets written, %s raw rows deleted",
+                            position,
+                            len(series_ids),
+                            rolled_up_rows,
+                            deleted_raw_rows,
+                        )
+                    time.sleep(RETENTION_CHUNK_PAUSE_S)
+
+            # Coarser tiers are built from the tier below them, only for
+            # buckets that the finer tier fully covers by now.
+            for source, target in zip(policy.rollups, policy.rollups[1:]):
+                target_bucket_ms = target.resolution_seconds * 1000
+                target_end_ms = (raw_cutoff_ms // target_bucket_ms) * target_bucket_ms
+                for series_id in all_series_ids:
+                    while not run.out_of_time():
+                        chunk_started_at = time.monotonic()
+                        with self._db.writer() as conn:
+                            chunk = self._cascade_rollup_chunk(
+                                conn,
+                                series_id=series_id,
+                                source=source,
+                                target=target,
+                                end_ms=target_end_ms,
+                                batch_size=policy.batch_size,
+                            )
+                        if chunk is None:
+                            break
+                        run.record(0, chunk_started_at)
+                        rolled_up_rows += chunk
+
+            for rollup in policy.rollups:
+                rollup_cutoff_ms = now_ms - rollup.retention_seconds * 1000
+                for series_id in all_series_ids:
+                    more_left = True
+                    while more_left and not run.out_of_time():
+                        chunk_started_at = time.monotonic()
+                        with self._db.writer() as conn:
+                            deleted, more_left = self._expire_rollup_chunk(
+                                conn,
+                                series_id=series_id,
+                                rollup=rollup,
+                                rollup_cutoff_ms=rollup_cutoff_ms,
+                                batch_size=policy.batch_size,
+                                archive=archive,
+                            )
+                        if deleted:
+                            run.record(deleted, chunk_started_at)
+                            deleted_rollup_rows += deleted
+                            time.sleep(RETENTION_CHUNK_PAUSE_S)
+
+            run.completed = not run.out_of_time()
+            if run.completed:
+                with self._db.writer() as conn:
+                    conn.execute(
+                        "DELETE FROM maintenance_checkpoints WHERE name = ?",
+                        (METRICS_ROLLUP_CHECKPOINT,),
                     )
-                    self._update_metric_catalog_cache(rollup_rows)
+        finally:
+            if drained_series:
+                self._latest_values.discard_older(drained_series, raw_cutoff_ms)
+            if rolled_up_rows or deleted_raw_rows or deleted_rollup_rows:
+                self._series_points_cache.clear()
+            self._retention_runs["metrics"] = run.as_dict()
 
-                deleted_raw_cursor = conn.execute(
-                    """
-                    DELETE FROM metrics
-                    WHERE ts < :raw_cutoff_ms
-                    """,
-                    {"raw_cutoff_ms": raw_cutoff_ms},
-                )
-                deleted_raw_rows = (
-                    deleted_raw_cursor.rowcount if deleted_raw_cursor.rowcount is not None else 0
-                )
-                deleted_rollup_cursor = conn.execute(
-                    """
-                    DELETE FROM metric_rollups
-                    WHERE resolution_seconds = :resolution_seconds
-                      AND ts < :rollup_cutoff_ms
-                    """,
-                    {
-                        "resolution_seconds": policy.rollup.resolution_seconds,
-                        "rollup_cutoff_ms": rollup_cutoff_ms,
-                    },
-                )
-                deleted_rollup_rows = (
-                    deleted_rollup_cursor.rowcount if deleted_rollup_cursor.rowcount is not None else 0
-                )
-                if self._metric_catalog_cache is not None and (deleted_raw_rows or deleted_rollup_rows):
-                    self._refresh_metric_catalog_cache(conn)
+        if self._metric_catalog_cache is not None and (deleted_raw_rows or deleted_rollup_rows):
+            self._refresh_metric_catalog_cache()
 
-        rolled_up_rows = len(rollup_rows)
         log_level = logging.INFO if (rolled_up_rows or deleted_raw_rows or deleted_rollup_rows) else logging.DEBUG
         logger.log(
             log_level,
-            "Metrics retention rolled up %s buckets, deleted %s raw rows, deleted %s expired rollups",
+            "Metrics retention rolled up %s buckets, deleted %s raw rows, deleted %s expired rollups "
+            "in %s chunks (%.0f rows/s)%s",
             rolled_up_rows,
             deleted_raw_rows,
             deleted_rollup_rows,
+            run.batches,
+            run.rows_per_second,
+            "" if run.completed else "; the rest is left for the next run",
         )
         return {
             "rolled_up_rows": rolled_up_rows,
@@ -1400,58 +2882,480 @@ class DevicePoller:
             "deleted_rollup_rows": deleted_rollup_rows,
         }
 
-    def _build_metric_rollup_rows(
+    def _expire_rollup_chunk(
         self,
-        raw_rows: list[tuple[Any, ...]],
+        conn: sqlite3.Connection,
+        *,
+        series_id: int,
         rollup: MetricRollupPolicy,
-    ) -> list[dict[str, Any]]:
-        if not raw_rows:
-            return []
+        rollup_cutoff_ms: int,
+        batch_size: int,
+        archive: MetricArchive | None = None,
+    ) -> tuple[int, bool]:
+        """Delete up to ``batch_size`` of the oldest expired rollups of one series and tier.
+
+        The rows are archived first when ``archive`` is given. Returns the
+        number of deleted rows and whether expired rows are left.
+        """
+        params = {
+            "series_id": series_id,
+            "resolution_seconds": rollup.resolution_seconds,
+            "rollup_cutoff_ms": rollup_cutoff_ms,
+            "batch_size": batch_size,
+        }
+        boundary = conn.execute(
+            """
+            SELECT ts
+            FROM sample_rollups
+            WHERE series_id = :series_id
+              AND resolution_seconds = :resolution_seconds
+              AND ts < :rollup_cutoff_ms
+            ORDER BY ts
+            LIMIT 1 OFFSET :batch_size
+            """,
+            params,
+        ).fetchone()
+        params["end_ms"] = rollup_cutoff_ms if boundary is None else int(boundary[0])
+        if archive is not None:
+            self._archive_rows(
+                archive,
+                "rollups",
+                conn.execute(
+                    f"""
+                    SELECT {self._export_select("rollups")}
+                    FROM series
+                    CROSS JOIN sample_rollups ON sample_rollups.series_id = series.id
+                    WHERE series.id = :series_id
+                      AND sample_rollups.resolution_seconds = :resolution_seconds
+                      AND sample_rollups.ts < :end_ms
+                    """,
+                    params,
+                ),
+            )
+        cursor = conn.execute(
+            """
+            DELETE FROM sample_rollups
+            WHERE series_id = :series_id
+              AND resolution_seconds = :resolution_seconds
+              AND ts < :end_ms
+            """,
+            params,
+        )
+        deleted_rows = cursor.rowcount or 0
+        self._remove_from_metric_catalog(conn, series_id=series_id, rollup_rows=deleted_rows)
+        return deleted_rows, boundary is not None
+
+    def _metrics_raw_cutoff_ms(self, policy: MetricsRetentionPolicy, now_ms: int) -> int:
+        # Aligned down to a bucket boundary so that a bucket is always rolled
+        # up from all of its raw samples at once.
+        bucket_ms = policy.rollup.resolution_seconds * 1000
+        return ((now_ms - policy.raw_retention_seconds * 1000) // bucket_ms) * bucket_ms
+
+    def _rollup_sample_chunk(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        series_id: int,
+        raw_cutoff_ms: int,
+        rollup: MetricRollupPolicy,
+        batch_size: int,
+        archive: MetricArchive | None = None,
+    ) -> tuple[int, int] | None:
+        """Roll up the oldest chunk of raw samples of one series.
+
+        The covered samples are archived first when ``archive`` is given.
+        Returns ``(rollup_rows, deleted_raw_rows)`` or ``None`` when the
+        series has no raw samples older than the cutoff left.
+        """
+        params = {"series_id": series_id, "raw_cutoff_ms": raw_cutoff_ms}
+        start_ms = conn.execute(
+            "SELECT MIN(ts) FROM samples WHERE series_id = :series_id AND ts < :raw_cutoff_ms",
+            params,
+        ).fetchone()[0]
+        if start_ms is None:
+            return None
 
+        # Chunks end on a bucket boundary so that a bucket is never split
+        # across transactions.
         bucket_ms = rollup.resolution_seconds * 1000
-        selected_rows: dict[tuple[int, str, str, str], tuple[int, int, str | None, float]] = {}
-        for row in raw_rows:
-            row_id = self._safe_int(row[0])
-            ts = self._safe_int(row[1])
-            device_type = str(row[2])
-            device_id = str(row[3])
-            metric = str(row[4])
-            value = self._safe_float(row[5])
-            unit = str(row[6]) if row[6] is not None else None
-            if row_id is None or ts is None or value is None:
-                continue
+        end_ms = raw_cutoff_ms
+        boundary = conn.execute(
+            """
+            SELECT ts
+            FROM samples
+            WHERE series_id = :series_id
+              AND ts >= :start_ms
+              AND ts < :raw_cutoff_ms
+            ORDER BY ts
+            LIMIT 1 OFFSET :batch_size
+            """,
+            {**params, "start_ms": start_ms, "batch_size": batch_size},
+        ).fetchone()
+        if boundary is not None:
+            end_ms = min(
+                raw_cutoff_ms,
+                max(
+                    (int(boundary[0]) // bucket_ms) * bucket_ms,
+                    (int(start_ms) // bucket_ms + 1) * bucket_ms,
+                ),
+            )
 
-            bucket_start_ts = (ts // bucket_ms) * bucket_ms
-            key = (bucket_start_ts, device_type, device_id, metric)
-            current = selected_rows.get(key)
-            if current is None:
-                selected_rows[key] = (ts, row_id, unit, value)
-                continue
+        chunk_params = {
+            **params,
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "bucket_ms": bucket_ms,
+            "resolution_seconds": rollup.resolution_seconds,
+        }
+        catalog_range = {
+            "series_id": series_id,
+            "resolution_seconds": rollup.resolution_seconds,
+            "start_ms": (int(start_ms) // bucket_ms) * bucket_ms,
+            "end_ms": end_ms,
+        }
+        existing_rollups = self._count_rollup_range(conn, catalog_range)
+        # Each sample is held until the next one (or the end of its bucket)
+        # for the time-weighted mean.
+        rollup_cursor = conn.execute(
+            f"""
+            INSERT INTO sample_rollups (
+                series_id,
+                resolution_seconds,
+                ts,
+                value,
+                min_value,
+                max_value,
+                sum_value,
+                sample_count,
+                time_weighted_value,
+                covered_ms
+            )
+            SELECT
+                series_id,
+                :resolution_seconds,
+                bucket_ts,
+                MAX(CASE WHEN bucket_rank = 1 THEN value END),
+                MIN(value),
+                MAX(value),
+                SUM(value),
+                COUNT(*),
+                SUM(value * hold_ms) / SUM(hold_ms),
+                SUM(hold_ms)
+            FROM (
+                SELECT
+                    series_id,
+                    (ts / :bucket_ms) * :bucket_ms AS bucket_ts,
+                    value,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY ts / :bucket_ms
+                        ORDER BY ts {ROLLUP_SAMPLE_ORDER[rollup.sample]}
+                    ) AS bucket_rank,
+                    COALESCE(
+                        LEAD(ts) OVER (PARTITION BY ts / :bucket_ms ORDER BY ts),
+                        (ts / :bucket_ms + 1) * :bucket_ms
+                    ) - ts AS hold_ms
+                FROM samples
+                WHERE series_id = :series_id
+                  AND ts >= :start_ms
+                  AND ts < :end_ms
+            )
+            GROUP BY bucket_ts
+            {self._rollup_merge_clause(rollup)}
+            """,
+            chunk_params,
+        )
+        self._add_rollups_to_metric_catalog(conn, catalog_range, existing_rollups)
+        if archive is not None:
+            self._archive_rows(
+                archive,
+                "samples",
+                conn.execute(
+                    f"""
+                    SELECT {self._export_select("raw")}
+                    FROM series
+                    CROSS JOIN samples ON samples.series_id = series.id
+                    WHERE series.id = :series_id
+                      AND samples.ts >= :start_ms
+                      AND samples.ts < :end_ms
+                    """,
+                    chunk_params,
+                ),
+            )
+        delete_cursor = conn.execute(
+            """
+            DELETE FROM samples
+            WHERE series_id = :series_id
+              AND ts >= :start_ms
+              AND ts < :end_ms
+            """,
+            chunk_params,
+        )
+        self._remove_from_metric_catalog(conn, series_id=series_id, sample_rows=delete_cursor.rowcount or 0)
+        return (
+            rollup_cursor.rowcount if rollup_cursor.rowcount is not None else 0,
+            delete_cursor.rowcount if delete_cursor.rowcount is not None else 0,
+        )
 
-            current_ts, current_row_id, _current_unit, _current_value = current
-            if rollup.sample == "last":
-                if (ts, row_id) >= (current_ts, current_row_id):
-                    selected_rows[key] = (ts, row_id, unit, value)
-            elif rollup.sample == "first":
-                if (ts, row_id) <= (current_ts, current_row_id):
-                    selected_rows[key] = (ts, row_id, unit, value)
-
-        rollup_rows: list[dict[str, Any]] = []
-        for key in sorted(selected_rows):
-            bucket_start_ts, device_type, device_id, metric = key
-            _ts, _row_id, unit, value = selected_rows[key]
-            rollup_rows.append(
-                {
-                    "ts": bucket_start_ts,
-                    "resolution_seconds": rollup.resolution_seconds,
-                    "device_type": device_type,
-                    "device_id": device_id,
-                    "metric": metric,
-                    "value": value,
-                    "unit": unit,
-                }
+    def _cascade_rollup_chunk(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        series_id: int,
+        source: MetricRollupPolicy,
+        target: MetricRollupPolicy,
+        end_ms: int,
+        batch_size: int,
+    ) -> int | None:
+        """Build the next chunk of ``target`` buckets from ``source`` rollups.
+
+        The newest ``target`` bucket of the series is the watermark, so every
+        run continues where the previous one stopped. Returns the number of
+        rollup rows written or ``None`` when the series is up to date.
+        """
+        bucket_ms = target.resolution_seconds * 1000
+        params: dict[str, Any] = {
+            "series_id": series_id,
+            "source_resolution_seconds": source.resolution_seconds,
+            "target_resolution_seconds": target.resolution_seconds,
+            "end_ms": end_ms,
+        }
+        watermark_ms = conn.execute(
+            """
+            SELECT MAX(ts)
+            FROM sample_rollups
+            WHERE series_id = :series_id
+              AND resolution_seconds = :target_resolution_seconds
+            """,
+            params,
+        ).fetchone()[0]
+        start_ms = conn.execute(
+            """
+            SELECT MIN(ts)
+            FROM sample_rollups
+            WHERE series_id = :series_id
+              AND resolution_seconds = :source_resolution_seconds
+              AND ts >= :watermark_ms
+              AND ts < :end_ms
+            """,
+            {**params, "watermark_ms": -1 if watermark_ms is None else int(watermark_ms) + bucket_ms},
+        ).fetchone()[0]
+        if start_ms is None:
+            return None
+        start_ms = (int(start_ms) // bucket_ms) * bucket_ms
+
+        chunk_end_ms = end_ms
+        boundary = conn.execute(
+            """
+            SELECT ts
+            FROM sample_rollups
+            WHERE series_id = :series_id
+              AND resolution_seconds = :source_resolution_seconds
+              AND ts >= :start_ms
+              AND ts < :end_ms
+            ORDER BY ts
+            LIMIT 1 OFFSET :batch_size
+            """,
+            {**params, "start_ms": start_ms, "batch_size": batch_size},
+        ).fetchone()
+        if boundary is not None:
+            chunk_end_ms = min(end_ms, max((int(boundary[0]) // bucket_ms) * bucket_ms, start_ms + bucket_ms))
+
+        catalog_range = {
+            "series_id": series_id,
+            "resolution_seconds": target.resolution_seconds,
+            "start_ms": start_ms,
+            "end_ms": chunk_end_ms,
+        }
+        existing_rollups = self._count_rollup_range(conn, catalog_range)
+        cursor = conn.execute(
+            f"""
+            INSERT INTO sample_rollups (
+                series_id,
+                resolution_seconds,
+                ts,
+                value,
+                min_value,
+                max_value,
+                sum_value,
+                sample_count,
+                time_weighted_value,
+                covered_ms
+            )
+            SELECT
+                series_id,
+                :target_resolution_seconds,
+                bucket_ts,
+                MAX(CASE WHEN bucket_rank = 1 THEN value END),
+                MIN(COALESCE(min_value, value)),
+                MAX(COALESCE(max_value, value)),
+                SUM(COALESCE(sum_value, value)),
+                SUM(COALESCE(sample_count, 1)),
+                SUM(COALESCE(time_weighted_value, value) * covered)
+                    / SUM(covered),
+                SUM(covered)
+            FROM (
+                SELECT
+                    series_id,
+                    (ts / :bucket_ms) * :bucket_ms AS bucket_ts,
+                    value,
+                    min_value,
+                    max_value,
+                    sum_value,
+                    sample_count,
+                    time_weighted_value,
+                    COALESCE(covered_ms, :source_bucket_ms) AS covered,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY ts / :bucket_ms
+                        ORDER BY ts {ROLLUP_SAMPLE_ORDER[target.sample]}
+                    ) AS bucket_rank
+                FROM sample_rollups
+                WHERE series_id = :series_id
+                  AND resolution_seconds = :source_resolution_seconds
+                  AND ts >= :start_ms
+                  AND ts < :chunk_end_ms
             )
-        return rollup_rows
+            GROUP BY bucket_ts
+            {self._rollup_merge_clause(target)}
+            """,
+            {
+                **params,
+                "start_ms": start_ms,
+                "chunk_end_ms": chunk_end_ms,
+                "bucket_ms": bucket_ms,
+                "source_bucket_ms": source.resolution_seconds * 1000,
+            },
+        )
+        self._add_rollups_to_metric_catalog(conn, catalog_range, existing_rollups)
+        return cursor.rowcount if cursor.rowcount is not None else 0
+
+    def _count_rollup_range(self, conn: sqlite3.Connection, catalog_range: dict[str, Any]) -> int:
+        return int(
+            conn.execute(
+                """
+                SELECT COUNT(*)
+                FROM sample_rollups
+                WHERE series_id = :series_id
+                  AND resolution_seconds = :resolution_seconds
+                  AND ts >= :start_ms
+                  AND ts < :end_ms
+                """,
+                catalog_range,
+            ).fetchone()[0]
+        )
+
+    def _add_rollups_to_metric_catalog(
+        self,
+        conn: sqlite3.Connection,
+        catalog_range: dict[str, Any],
+        existing_rollups: int,
+    ) -> None:
+        # A chunk either adds buckets or merges into existing ones, so the
+        # rows it added are the growth of its bucket range.
+        conn.execute(
+            """
+            INSERT INTO metric_catalog (series_id, first_seen, last_seen, rollup_count)
+            SELECT series_id, MIN(ts), MAX(ts), COUNT(*) - :existing_rollups
+            FROM sample_rollups
+            WHERE series_id = :series_id
+              AND resolution_seconds = :resolution_seconds
+              AND ts >= :start_ms
+              AND ts < :end_ms
+            GROUP BY series_id
+            ON CONFLICT (series_id) DO UPDATE SET
+                first_seen = min(first_seen, excluded.first_seen),
+                last_seen = max(last_seen, excluded.last_seen),
+                rollup_count = rollup_count + excluded.rollup_count
+            """,
+            {**catalog_range, "existing_rollups": existing_rollups},
+        )
+
+    def _remove_from_metric_catalog(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        series_id: int,
+        sample_rows: int = 0,
+        rollup_rows: int = 0,
+    ) -> None:
+        if not sample_rows and not rollup_rows:
+            return
+        conn.execute(
+            """
+            UPDATE metric_catalog
+            SET sample_count = sample_count - ?, rollup_count = rollup_count - ?
+            WHERE series_id = ?
+            """,
+            (sample_rows, rollup_rows, series_id),
+        )
+
+    def _archive_rows(
+        self,
+        archive: MetricArchive,
+        kind: str,
+        cursor: sqlite3.Cursor,
+        transform: Callable[[tuple[Any, ...]], tuple[Any, ...]] | None = None,
+    ) -> None:
+        # Runs inside the transaction that deletes the rows, before the
+        # DELETE: a failed write aborts the deletion, and a crash before the
+        # commit at worst archives the rows twice, which reads tolerate.
+        while True:
+            rows = cursor.fetchmany(METRICS_EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            archive.write(kind, [transform(row) for row in rows] if transform else rows)
+
+    def _rollup_merge_clause(self, rollup: MetricRollupPolicy) -> str:
+        # Rows that already exist for a bucket, for example from samples that
+        # arrived late, are merged with the new aggregates instead of being
+        # replaced.
+        keep_value = "excluded.value" if ROLLUP_SAMPLE_ORDER[rollup.sample] == "DESC" else "value"
+        return f"""
+            ON CONFLICT (series_id, resolution_seconds, ts) DO UPDATE SET
+                value = {keep_value},
+                min_value = MIN(COALESCE(min_value, value), excluded.min_value),
+                max_value = MAX(COALESCE(max_value, value), excluded.max_value),
+                sum_value = COALESCE(sum_value, value) + excluded.sum_value,
+                sample_count = COALESCE(sample_count, 1) + excluded.sample_count,
+                time_weighted_value = (
+                    COALESCE(time_weighted_value, value) * COALESCE(covered_ms, 0)
+                    + excluded.time_weighted_value * excluded.covered_ms
+                ) / (COALESCE(covered_ms, 0) + excluded.covered_ms),
+                covered_ms = COALESCE(covered_ms, 0) + excluded.covered_ms
+        """
+
+    def _load_metrics_rollup_checkpoint(self, conn: sqlite3.Connection, rollup: MetricRollupPolicy) -> int:
+        row = conn.execute(
+            "SELECT state FROM maintenance_checkpoints WHERE name = ?",
+            (METRICS_ROLLUP_CHECKPOINT,),
+        ).fetchone()
+        if row is None:
+            return 0
+        try:
+            state = json.loads(row[0])
+        except (TypeError, ValueError):
+            return 0
+        if not isinstance(state, dict) or state.get("resolution_seconds") != rollup.resolution_seconds:
+            return 0
+        return self._safe_int(state.get("series_id")) or 0
+
+    def _save_metrics_rollup_checkpoint(
+        self,
+        conn: sqlite3.Connection,
+        series_id: int,
+        rollup: MetricRollupPolicy,
+        now_ms: int,
+    ) -> None:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO maintenance_checkpoints (name, state, updated_at)
+            VALUES (?, ?, ?)
+            """,
+            (
+                METRICS_ROLLUP_CHECKPOINT,
+                json.dumps({"series_id": series_id, "resolution_seconds": rollup.resolution_seconds}),
+                now_ms,
+            ),
+        )
 
     def _vacuum_database_if_needed(self) -> bool:
         result = self.run_database_vacuum(force=False)
@@ -1461,6 +3365,7 @@ class DevicePoller:
         page_count_row = conn.execute("PRAGMA page_count").fetchone()
         freelist_count_row = conn.execute("PRAGMA freelist_count").fetchone()
         page_size_row = conn.execute("PRAGMA page_size").fetchone()
+        auto_vacuum_row = conn.execute("PRAGMA auto_vacuum").fetchone()
 
         page_count = self._safe_int(page_count_row[0] if page_count_row else None) or 0
         freelist_count = self._safe_int(freelist_count_row[0] if freelist_count_row else None) or 0
@@ -1477,6 +3382,7 @@ class DevicePoller:
             "reclaimable_bytes": reclaimable_bytes,
             "reclaimable_mb": reclaimable_mb,
             "free_ratio": free_ratio,
+            "auto_vacuum": DATABASE_AUTO_VACUUM_MODES.get(auto_vacuum_row[0] if auto_vacuum_row else 0, "none"),
         }
 
     def _evaluate_database_vacuum(
@@ -1509,6 +3415,36 @@ class DevicePoller:
             "interval_seconds": policy.interval_seconds,
             "min_free_ratio": policy.min_free_ratio,
             "min_reclaimable_mb": policy.min_reclaimable_mb,
+            "mode": policy.mode,
+            "incremental_pages": policy.incremental_pages,
+            "slice_pause_ms": policy.slice_pause_ms,
+            "max_duration_seconds": policy.max_duration_seconds,
+        }
+
+    def get_series_cache_status(self) -> dict[str, Any]:
+        return self._series_points_cache.stats()
+
+    def get_write_queue_status(self) -> dict[str, Any]:
+        if self._write_queue is None:
+            return {"running": False, "options": None}
+        return self._write_queue.stats()
+
+    def get_retention_status(self) -> dict[str, Any]:
+        raw_events = self._load_raw_events_retention_policy()
+        metrics = self._load_metrics_retention_policy()
+        return {
+            "raw_events": {
+                "configured": raw_events is not None,
+                "batch_size": raw_events.batch_size if raw_events is not None else None,
+                "max_run_seconds": raw_events.max_run_seconds if raw_events is not None else None,
+                "last_run": self._retention_runs.get("raw_events"),
+            },
+            "metrics": {
+                "configured": metrics is not None,
+                "batch_size": metrics.batch_size if metrics is not None else None,
+                "max_run_seconds": metrics.max_run_seconds if metrics is not None else None,
+                "last_run": self._retention_runs.get("metrics"),
+            },
         }
 
     def get_database_vacuum_status(self) -> dict[str, Any]:
@@ -1523,10 +3459,8 @@ class DevicePoller:
             }
 
         policy = self._load_database_vacuum_policy()
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                self._ensure_schema(conn)
-                stats = self._collect_database_vacuum_stats(conn)
+        with self._db.reader() as conn:
+            stats = self._collect_database_vacuum_stats(conn)
 
         should_vacuum, reason = self._evaluate_database_vacuum(
             stats=stats,
@@ -1540,6 +3474,7 @@ class DevicePoller:
             "stats": stats,
             "should_vacuum": should_vacuum,
             "reason": reason,
+            "last_run": self._last_database_vacuum,
         }
 
     def run_database_vacuum(self, force: bool = False) -> dict[str, Any]:
@@ -1556,75 +3491,197 @@ class DevicePoller:
             }
 
         policy = self._load_database_vacuum_policy()
-        with self._db_lock:
-            with connect_logged_sqlite(self._db_path, logger=logger, isolation_level=None) as conn:
-                self._ensure_schema(conn)
+        mode = policy.mode if policy is not None else "full"
+        with self._vacuum_lock:
+            with self._db.writer() as conn:
                 before = self._collect_database_vacuum_stats(conn)
-                should_vacuum, reason = self._evaluate_database_vacuum(
-                    stats=before,
-                    policy=policy,
-                    force=force,
+            should_vacuum, reason = self._evaluate_database_vacuum(
+                stats=before,
+                policy=policy,
+                force=force,
+            )
+            vacuumed = False
+            # How long each step held the writer lock, which is how long
+            # poll writes had to wait.
+            pauses_ms: list[float] = []
+            started = time.monotonic()
+            if should_vacuum:
+                logger.info(
+                    "Running %s database vacuum with free_ratio %.4f and about %.2f reclaimable MiB",
+                    mode,
+                    before["free_ratio"],
+                    before["reclaimable_mb"],
                 )
-                vacuumed = False
-                if should_vacuum:
-                    logger.info(
-                        "Running database vacuum with free_ratio %.4f and about %.2f reclaimable MiB",
-                        before["free_ratio"],
-                        before["reclaimable_mb"],
-                    )
-                    conn.execute("VACUUM")
+                if mode == "incremental" and before["auto_vacuum"] == "incremental":
+                    self._run_incremental_vacuum(policy, pauses_ms)
                     vacuumed = True
+                elif mode in ("incremental", "into"):
+                    if mode == "incremental":
+                        # Only a rewrite switches an existing database to
+                        # incremental auto-vacuum; VACUUM INTO picks up the
+                        # pending setting.
+                        with self._db.writer() as conn:
+                            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                        logger.info("Converting the database to incremental auto-vacuum")
+                    pause_started = time.monotonic()
+                    vacuumed = self._db.compact_into_copy()
+                    pauses_ms.append((time.monotonic() - pause_started) * 1000)
+                    if not vacuumed:
+                        reason = "readers_busy"
                 else:
-                    logger.debug("Skipping database vacuum: %s", reason)
+                    pause_started = time.monotonic()
+                    with self._db.writer() as conn:
+                        conn.execute("VACUUM")
+                    pauses_ms.append((time.monotonic() - pause_started) * 1000)
+                    vacuumed = True
+            else:
+                logger.debug("Skipping database vacuum: %s", reason)
+            with self._db.writer() as conn:
                 after = self._collect_database_vacuum_stats(conn)
 
-        return {
+        result = {
             "configured": policy is not None,
             "enabled": bool(policy.enabled) if policy is not None else False,
             "policy": self._serialize_database_vacuum_policy(policy),
             "force": force,
             "vacuumed": vacuumed,
+            "mode": mode,
             "before": before,
             "after": after,
             "reason": reason,
+            "duration_ms": (time.monotonic() - started) * 1000,
+            "pauses": {
+                "count": len(pauses_ms),
+                "total_ms": sum(pauses_ms),
+                "max_ms": max(pauses_ms, default=0.0),
+                "avg_ms": sum(pauses_ms) / len(pauses_ms) if pauses_ms else 0.0,
+            },
         }
+        if should_vacuum:
+            self._last_database_vacuum = {
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                **{key: result[key] for key in ("vacuumed", "mode", "reason", "duration_ms", "pauses")},
+                "reclaimed_bytes": max(0, before["database_size_bytes"] - after["database_size_bytes"]),
+            }
+        return result
 
-    def _refresh_control_inputs(self, conn: sqlite3.Connection, ts_ms: int) -> None:
+    def _run_incremental_vacuum(self, policy: DatabaseVacuumPolicy, pauses_ms: list[float]) -> None:
+        """Free pages in slices of ``incremental_pages``, releasing the writer between them."""
+        deadline = time.monotonic() + policy.max_duration_seconds
+        while True:
+            pause_started = time.monotonic()
+            with self._db.writer() as conn:
+                # execute() would only step the pragma once, freeing a
+                # single page; executescript runs it to completion.
+                conn.executescript(f"PRAGMA incremental_vacuum({int(policy.incremental_pages)})")
+                freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            pauses_ms.append((time.monotonic() - pause_started) * 1000)
+            if not freelist_count or time.monotonic() >= deadline:
+                break
+            time.sleep(policy.slice_pause_ms / 1000)
+
+    def _load_control_input_plan(self) -> ControlInputPlan | None:
         control_inputs = self._settings.get("control_inputs") if isinstance(self._settings, dict) else None
         if not isinstance(control_inputs, dict):
-            return
+            return None
+        plan = self._control_input_plan
+        if plan is not None and plan.control_inputs is control_inputs:
+            return plan
 
         max_age_seconds = self._safe_int(control_inputs.get("max_age_seconds"))
         if max_age_seconds is None or max_age_seconds < 0:
-            return
-        max_age_ms = max_age_seconds * 1000
+            return None
+        dependencies: dict[tuple[str, str, str], set[str]] = {}
+        for name in CONTROL_INPUT_NAMES:
+            spec = control_inputs.get(name)
+            sources = spec.get("sources") if isinstance(spec, dict) else None
+            for item in sources if isinstance(sources, list) else []:
+                if not isinstance(item, dict):
+                    continue
+                device_type = item.get("device_type")
+                device_id = item.get("device_id")
+                metric = item.get("metric")
+                if not device_type or device_id is None or not metric:
+                    continue
+                dependencies.setdefault((str(device_type), str(device_id), str(metric)), set()).add(name)
 
-        resolved = {
-            "indoor_temp": self._resolve_control_input(
-                conn=conn,
-                spec=control_inputs.get("indoor_temp"),
-                max_age_ms=max_age_ms,
-                reference_ts_ms=ts_ms,
-            ),
-            "outdoor_temp": self._resolve_control_input(
-                conn=conn,
-                spec=control_inputs.get("outdoor_temp"),
-                max_age_ms=max_age_ms,
-                reference_ts_ms=ts_ms,
-            ),
-            "supply_temp": self._resolve_control_input(
-                conn=conn,
-                spec=control_inputs.get("supply_temp"),
-                max_age_ms=max_age_ms,
-                reference_ts_ms=ts_ms,
-            ),
-            "power": self._resolve_control_input(
-                conn=conn,
-                spec=control_inputs.get("power"),
-                max_age_ms=max_age_ms,
+        plan = ControlInputPlan(
+            control_inputs=control_inputs,
+            max_age_ms=max_age_seconds * 1000,
+            dependencies={key: frozenset(names) for key, names in dependencies.items()},
+        )
+        self._control_input_plan = plan
+        self._control_input_state = {}
+        self._control_input_last_row = None
+        return plan
+
+    def get_control_input_refresh_stats(self) -> dict[str, int]:
+        return dict(self._control_input_stats)
+
+    def _refresh_control_inputs(
+        self,
+        conn: sqlite3.Connection,
+        ts_ms: int,
+        touched: set[tuple[str, str, str]] | None = None,
+    ) -> list[dict[str, Any]]:
+        plan = self._load_control_input_plan()
+        if plan is None:
+            return []
+        if not self._latest_values.loaded:
+            self._latest_values.load(conn)
+
+        # Only inputs fed by the written metrics, or whose previous
+        # resolution has aged out, need to be resolved again. touched=None
+        # forces a full refresh.
+        state = self._control_input_state
+        affected: set[str] = set()
+        for name in CONTROL_INPUT_NAMES:
+            previous = state.get(name)
+            if (
+                touched is None
+                or previous is None
+                or (previous.valid_until_ms is not None and ts_ms > previous.valid_until_ms)
+            ):
+                affected.add(name)
+        if touched is not None:
+            for key in touched:
+                affected.update(plan.dependencies.get(key, ()))
+        if not affected:
+            self._control_input_stats["skipped_unrelated"] += 1
+            return []
+
+        for name in affected:
+            state[name] = self._resolve_control_input(
+                spec=plan.control_inputs.get(name),
+                max_age_ms=plan.max_age_ms,
                 reference_ts_ms=ts_ms,
-            ),
+            )
+        self._control_input_stats["recomputed_inputs"] += len(affected)
+        resolved = {name: state[name] for name in CONTROL_INPUT_NAMES}
+
+        row = {
+            "indoor_temp": resolved["indoor_temp"].value,
+            "indoor_temp_source": resolved["indoor_temp"].source,
+            "outdoor_temp": resolved["outdoor_temp"].value,
+            "outdoor_temp_source": resolved["outdoor_temp"].source,
+            "supply_temp": resolved["supply_temp"].value,
+            "supply_temp_source": resolved["supply_temp"].source,
+            "power": resolved["power"].value if resolved["power"].value is not None else 0.0,
+            "power_sources": json.dumps(resolved["power"].sources or [], ensure_ascii=False),
         }
+        last_row = self._control_input_last_row
+        # An unchanged row is still rewritten once it is half of max_age old
+        # so consumers checking the control_inputs ts never see it go stale.
+        if (
+            touched is not None
+            and last_row is not None
+            and {key: value for key, value in last_row.items() if key != "ts"} == row
+            and ts_ms - last_row["ts"] < plan.max_age_ms / 2
+        ):
+            self._control_input_stats["skipped_unchanged"] += 1
+            return []
+        self._control_input_stats["refreshes"] += 1
+        self._control_input_last_row = {"ts": ts_ms, **row}
 
         conn.execute(
             """
@@ -1650,17 +3707,7 @@ class DevicePoller:
                 :power_sources
             )
             """,
-            {
-                "ts": ts_ms,
-                "indoor_temp": resolved["indoor_temp"].value,
-                "indoor_temp_source": resolved["indoor_temp"].source,
-                "outdoor_temp": resolved["outdoor_temp"].value,
-                "outdoor_temp_source": resolved["outdoor_temp"].source,
-                "supply_temp": resolved["supply_temp"].value,
-                "supply_temp_source": resolved["supply_temp"].source,
-                "power": resolved["power"].value if resolved["power"].value is not None else 0.0,
-                "power_sources": json.dumps(resolved["power"].sources or [], ensure_ascii=False),
-            },
+            {"ts": ts_ms, **row},
         )
 
         metric_rows = []
@@ -1703,35 +3750,16 @@ class DevicePoller:
                 "device_type": CONTROL_INPUTS_DEVICE_TYPE,
                 "device_id": CONTROL_DEVICE_ID,
                 "metric": "power",
-                "value": resolved["power"].value if resolved["power"].value is not None else 0.0,
+                "value": row["power"],
                 "unit": "w",
             }
         )
-        conn.executemany(
-            """
-            INSERT INTO metrics (
-                ts,
-                device_type,
-                device_id,
-                metric,
-                value,
-                unit
-            ) VALUES (
-                :ts,
-                :device_type,
-                :device_id,
-                :metric,
-                :value,
-                :unit
-            )
-            """,
-            metric_rows,
-        )
-        self._update_metric_catalog_cache(metric_rows)
+        self._insert_metric_rows(conn, metric_rows)
+        self._latest_values.update(metric_rows)
+        return metric_rows
 
     def _resolve_control_input(
         self,
-        conn: sqlite3.Connection,
         spec: Any,
         max_age_ms: int,
         reference_ts_ms: int,
@@ -1748,7 +3776,6 @@ class DevicePoller:
         if select == "highest_priority_available":
             for item in sources:
                 resolved = self._resolve_source_metric(
-                    conn=conn,
                     spec=item,
                     max_age_ms=max_age_ms,
                     reference_ts_ms=reference_ts_ms,
@@ -1757,15 +3784,16 @@ class DevicePoller:
                     return ResolvedControlInput(
                         value=resolved["value"],
                         source=resolved["source"],
+                        valid_until_ms=resolved["ts"] + max_age_ms,
                     )
             return ResolvedControlInput(value=None)
 
         if select == "sum_all_available":
             total = 0.0
             used_sources: list[str] = []
+            valid_until_ms: int | None = None
             for item in sources:
                 resolved = self._resolve_source_metric(
-                    conn=conn,
                     spec=item,
                     max_age_ms=max_age_ms,
                     reference_ts_ms=reference_ts_ms,
@@ -1774,8 +3802,11 @@ class DevicePoller:
                     continue
                 total += resolved["value"]
                 used_sources.append(resolved["source"])
+                source_valid_until_ms = resolved["ts"] + max_age_ms
+                if valid_until_ms is None or source_valid_until_ms < valid_until_ms:
+                    valid_until_ms = source_valid_until_ms
             if used_sources:
-                return ResolvedControlInput(value=total, sources=used_sources)
+                return ResolvedControlInput(value=total, sources=used_sources, valid_until_ms=valid_until_ms)
             default_value = self._safe_float(spec.get("default"))
             return ResolvedControlInput(value=default_value if default_value is not None else 0.0, sources=[])
 
@@ -1783,7 +3814,6 @@ class DevicePoller:
 
     def _resolve_source_metric(
         self,
-        conn: sqlite3.Connection,
         spec: Any,
         max_age_ms: int,
         reference_ts_ms: int,
@@ -1796,35 +3826,16 @@ class DevicePoller:
         if not device_type or device_id is None or not metric:
             return None
 
-        row = conn.execute(
-            """
-            SELECT ts, value
-            FROM metrics
-            WHERE device_type = :device_type
-              AND device_id = :device_id
-              AND metric = :metric
-            ORDER BY ts DESC
-            LIMIT 1
-            """,
-            {
-                "device_type": str(device_type),
-                "device_id": str(device_id),
-                "metric": str(metric),
-            },
-        ).fetchone()
-        if row is None:
+        sample = self._latest_values.get(str(device_type), str(device_id), str(metric))
+        if sample is None:
             return None
-
-        sample_ts = self._safe_int(row[0])
-        sample_value = self._safe_float(row[1])
-        if sample_ts is None or sample_value is None:
-            return None
-        if reference_ts_ms - sample_ts > max_age_ms:
+        if reference_ts_ms - sample.ts > max_age_ms:
             return None
 
         correction = self._safe_float(spec.get("correction")) or 0.0
         return {
-            "value": sample_value + correction,
+            "ts": sample.ts,
+            "value": sample.value + correction,
             "source": f"{device_type}:{device_id}:{metric}",
         }
 
@@ -1835,6 +3846,7 @@ class DevicePoller:
         self._schema_ready = True
 
     def _ensure_tables(self, conn: sqlite3.Connection) -> None:
+        self._migrate_uncompressed_raw_events(conn)
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS raw_events (
@@ -1842,7 +3854,29 @@ class DevicePoller:
                 ts INTEGER NOT NULL,
                 device_type TEXT NOT NULL,
                 device_id TEXT NOT NULL,
-                payload TEXT NOT NULL
+                codec TEXT NOT NULL,
+                dictionary_id INTEGER,
+                keyframe_id INTEGER,
+                payload BLOB NOT NULL
+            )
+            """
+        )
+        self._ensure_columns(conn, "raw_events", {"keyframe_id": "INTEGER"})
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_raw_events_keyframe
+            ON raw_events (keyframe_id)
+            WHERE keyframe_id IS NOT NULL
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS raw_event_dictionaries (
+                id INTEGER PRIMARY KEY,
+                device_type TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                dictionary BLOB NOT NULL,
+                created_at INTEGER NOT NULL
             )
             """
         )
@@ -1864,112 +3898,176 @@ class DevicePoller:
             ON raw_events (ts)
             """
         )
-        self._ensure_columns(
-            conn,
-            table_name="raw_events",
-            expected_columns={
-                "ts": "INTEGER NOT NULL",
-                "device_type": "TEXT NOT NULL",
-                "device_id": "TEXT NOT NULL",
-                "payload": "TEXT NOT NULL",
-            },
-        )
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts INTEGER NOT NULL,
+            CREATE TABLE IF NOT EXISTS series (
+                id INTEGER PRIMARY KEY,
                 device_type TEXT NOT NULL,
                 device_id TEXT NOT NULL,
                 metric TEXT NOT NULL,
-                value REAL NOT NULL,
                 unit TEXT,
-                labels TEXT,
-                component TEXT
+                UNIQUE (device_type, device_id, metric)
             )
             """
         )
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_metrics_device_metric_ts
-            ON metrics (device_id, metric, ts)
-            """
-        )
-        conn.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_metrics_type_device_id
-            ON metrics (device_type, device_id)
+            CREATE TABLE IF NOT EXISTS samples (
+                series_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (series_id, ts)
+            ) WITHOUT ROWID
             """
         )
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_metrics_type_device_metric_ts
-            ON metrics (device_type, device_id, metric, ts)
+            CREATE TABLE IF NOT EXISTS sample_rollups (
+                series_id INTEGER NOT NULL,
+                resolution_seconds INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                value REAL NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                sum_value REAL,
+                sample_count INTEGER,
+                time_weighted_value REAL,
+                covered_ms INTEGER,
+                PRIMARY KEY (series_id, resolution_seconds, ts)
+            ) WITHOUT ROWID
             """
         )
         self._ensure_columns(
             conn,
-            table_name="metrics",
+            table_name="sample_rollups",
             expected_columns={
-                "ts": "INTEGER NOT NULL",
-                "device_type": "TEXT NOT NULL",
-                "device_id": "TEXT NOT NULL",
-                "metric": "TEXT NOT NULL",
-                "value": "REAL NOT NULL",
-                "unit": "TEXT",
-                "labels": "TEXT",
-                "component": "TEXT",
+                "min_value": "REAL",
+                "max_value": "REAL",
+                "sum_value": "REAL",
+                "sample_count": "INTEGER",
+                "time_weighted_value": "REAL",
+                "covered_ms": "INTEGER",
             },
         )
+        self._migrate_legacy_metric_tables(conn)
         conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS metric_rollups (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts INTEGER NOT NULL,
-                resolution_seconds INTEGER NOT NULL,
-                device_type TEXT NOT NULL,
-                device_id TEXT NOT NULL,
-                metric TEXT NOT NULL,
-                value REAL NOT NULL,
-                unit TEXT
+            CREATE TABLE IF NOT EXISTS maintenance_checkpoints (
+                name TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                updated_at INTEGER NOT NULL
             )
             """
         )
-        self._ensure_columns(
-            conn,
-            table_name="metric_rollups",
-            expected_columns={
-                "ts": "INTEGER NOT NULL",
-                "resolution_seconds": "INTEGER NOT NULL",
-                "device_type": "TEXT NOT NULL",
-                "device_id": "TEXT NOT NULL",
-                "metric": "TEXT NOT NULL",
-                "value": "REAL NOT NULL",
-                "unit": "TEXT",
-            },
-        )
+        self._ensure_metric_catalog_table(conn)
+        # metrics and metric_rollups stay queryable (and insertable) as views
+        # for ad-hoc SQL and older tooling. Older versions of the insert
+        # triggers did not update metric_catalog and are recreated.
+        for trigger_name in ("metrics_insert", "metric_rollups_insert"):
+            row = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                (trigger_name,),
+            ).fetchone()
+            if row is not None and "metric_catalog" not in str(row[0]):
+                conn.execute(f"DROP TRIGGER {trigger_name}")
         conn.execute(
             """
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_metric_rollups_unique_bucket
-            ON metric_rollups (resolution_seconds, device_type, device_id, metric, ts)
+            CREATE VIEW IF NOT EXISTS metrics AS
+            SELECT
+                samples.ts AS ts,
+                series.device_type AS device_type,
+                series.device_id AS device_id,
+                series.metric AS metric,
+                samples.value AS value,
+                series.unit AS unit
+            FROM samples
+            JOIN series ON series.id = samples.series_id
             """
         )
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_metric_rollups_device_metric_ts
-            ON metric_rollups (device_id, metric, ts)
+            CREATE TRIGGER IF NOT EXISTS metrics_insert
+            INSTEAD OF INSERT ON metrics
+            BEGIN
+                INSERT INTO series (device_type, device_id, metric, unit)
+                VALUES (NEW.device_type, NEW.device_id, NEW.metric, NEW.unit)
+                ON CONFLICT (device_type, device_id, metric) DO UPDATE SET unit = excluded.unit;
+                INSERT INTO metric_catalog (series_id, first_seen, last_seen, sample_count)
+                SELECT id, NEW.ts, NEW.ts, NOT EXISTS (
+                    SELECT 1 FROM samples WHERE samples.series_id = series.id AND samples.ts = NEW.ts
+                )
+                FROM series
+                WHERE device_type = NEW.device_type
+                  AND device_id = NEW.device_id
+                  AND metric = NEW.metric
+                ON CONFLICT (series_id) DO UPDATE SET
+                    first_seen = min(first_seen, excluded.first_seen),
+                    last_seen = max(last_seen, excluded.last_seen),
+                    sample_count = sample_count + excluded.sample_count;
+                INSERT INTO samples (series_id, ts, value)
+                SELECT id, NEW.ts, NEW.value
+                FROM series
+                WHERE device_type = NEW.device_type
+                  AND device_id = NEW.device_id
+                  AND metric = NEW.metric
+                ON CONFLICT (series_id, ts) DO UPDATE SET value = excluded.value;
+            END
             """
         )
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_metric_rollups_type_device_metric_ts
-            ON metric_rollups (device_type, device_id, metric, ts)
+            CREATE VIEW IF NOT EXISTS metric_rollups AS
+            SELECT
+                sample_rollups.ts AS ts,
+                sample_rollups.resolution_seconds AS resolution_seconds,
+                series.device_type AS device_type,
+                series.device_id AS device_id,
+                series.metric AS metric,
+                sample_rollups.value AS value,
+                series.unit AS unit
+            FROM sample_rollups
+            JOIN series ON series.id = sample_rollups.series_id
             """
         )
         conn.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_metric_rollups_resolution_ts
-            ON metric_rollups (resolution_seconds, ts)
+            CREATE TRIGGER IF NOT EXISTS metric_rollups_insert
+            INSTEAD OF INSERT ON metric_rollups
+            BEGIN
+                INSERT INTO series (device_type, device_id, metric, unit)
+                VALUES (NEW.device_type, NEW.device_id, NEW.metric, NEW.unit)
+                ON CONFLICT (device_type, device_id, metric) DO UPDATE SET unit = excluded.unit;
+                INSERT INTO metric_catalog (series_id, first_seen, last_seen, rollup_count)
+                SELECT id, NEW.ts, NEW.ts, NOT EXISTS (
+                    SELECT 1
+                    FROM sample_rollups
+                    WHERE sample_rollups.series_id = series.id
+                      AND sample_rollups.resolution_seconds = NEW.resolution_seconds
+                      AND sample_rollups.ts = NEW.ts
+                )
+                FROM series
+                WHERE device_type = NEW.device_type
+                  AND device_id = NEW.device_id
+                  AND metric = NEW.metric
+                ON CONFLICT (series_id) DO UPDATE SET
+                    first_seen = min(first_seen, excluded.first_seen),
+                    last_seen = max(last_seen, excluded.last_seen),
+                    rollup_count = rollup_count + excluded.rollup_count;
+                INSERT INTO sample_rollups (series_id, resolution_seconds, ts, value)
+                SELECT id, NEW.resolution_seconds, NEW.ts, NEW.value
+                FROM series
+                WHERE device_type = NEW.device_type
+                  AND device_id = NEW.device_id
+                  AND metric = NEW.metric
+                ON CONFLICT (series_id, resolution_seconds, ts) DO UPDATE SET
+                    value = excluded.value,
+                    min_value = NULL,
+                    max_value = NULL,
+                    sum_value = NULL,
+                    sample_count = NULL,
+                    time_weighted_value = NULL,
+                    covered_ms = NULL;
+            END
             """
         )
         conn.execute(
@@ -2043,6 +4141,164 @@ class DevicePoller:
             },
         )
 
+    def _migrate_uncompressed_raw_events(self, conn: sqlite3.Connection) -> None:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(raw_events)").fetchall()}
+        if not columns or "codec" in columns:
+            return
+        # Payloads are compressed in one set-based copy; the SQL function
+        # keeps it from round-tripping every row through Python by hand.
+        options = self._payload_compression
+        conn.create_function(
+            "compress_raw_payload",
+            1,
+            lambda payload: compress_payload(options.codec, str(payload).encode("utf-8"), level=options.level),
+            deterministic=True,
+        )
+        conn.execute(
+            """
+            CREATE TABLE raw_events_compressed (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts INTEGER NOT NULL,
+                device_type TEXT NOT NULL,
+                device_id TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                dictionary_id INTEGER,
+                payload BLOB NOT NULL
+            )
+            """
+        )
+        cursor = conn.execute(
+            """
+            INSERT INTO raw_events_compressed (id, ts, device_type, device_id, codec, dictionary_id, payload)
+            SELECT id, ts, device_type, device_id, :codec, NULL, compress_raw_payload(payload)
+            FROM raw_events
+            ORDER BY id
+            """,
+            {"codec": options.codec},
+        )
+        conn.execute("DROP TABLE raw_events")
+        conn.execute("ALTER TABLE raw_events_compressed RENAME TO raw_events")
+        logger.info("Compressed %s raw_events payloads with %s", cursor.rowcount, options.codec)
+
+    def _ensure_metric_catalog_table(self, conn: sqlite3.Connection) -> None:
+        # metric_catalog keeps one row per series with its sample counts, so
+        # listing the catalog never scans samples or sample_rollups. The write
+        # paths update it once per batch or retention chunk, and the insert
+        # triggers of the metrics and metric_rollups views for ad-hoc SQL.
+        # first_seen is the earliest timestamp ever stored (a rollup counts
+        # from the start of its bucket) and is not moved forward by retention.
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'metric_catalog'"
+        ).fetchone()
+        # Earlier versions kept the table with per-row triggers on samples
+        # and sample_rollups; it is rebuilt once when they are dropped.
+        legacy_triggers = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'metric_catalog_%'"
+            ).fetchall()
+        ]
+        if exists and not legacy_triggers:
+            return
+        conn.execute("SAVEPOINT metric_catalog_backfill")
+        for trigger_name in legacy_triggers:
+            conn.execute(f"DROP TRIGGER {trigger_name}")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS metric_catalog (
+                series_id INTEGER PRIMARY KEY,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                sample_count INTEGER NOT NULL DEFAULT 0,
+                rollup_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute("DELETE FROM metric_catalog")
+        conn.execute(
+            """
+            INSERT INTO metric_catalog (series_id, first_seen, last_seen, sample_count, rollup_count)
+            SELECT series_id, MIN(first_seen), MAX(last_seen), SUM(sample_count), SUM(rollup_count)
+            FROM (
+                SELECT series_id, MIN(ts) AS first_seen, MAX(ts) AS last_seen,
+                       COUNT(*) AS sample_count, 0 AS rollup_count
+                FROM samples
+                GROUP BY series_id
+                UNION ALL
+                SELECT series_id, MIN(ts), MAX(ts), 0, COUNT(*)
+                FROM sample_rollups
+                GROUP BY series_id
+            )
+            GROUP BY series_id
+            """
+        )
+        conn.execute("RELEASE metric_catalog_backfill")
+
+    def _migrate_legacy_metric_tables(self, conn: sqlite3.Connection) -> None:
+        legacy_tables = {
+            row[0]
+            for row in conn.execute(
+                """
+                SELECT name
+                FROM sqlite_master
+                WHERE type = 'table' AND name IN ('metrics', 'metric_rollups')
+                """
+            ).fetchall()
+        }
+        for table_name in ("metrics", "metric_rollups"):
+            if table_name not in legacy_tables:
+                continue
+            columns = {
+                row[1]
+                for row in conn.execute(f"PRAGMA table_info({table_name})").fetchall()
+            }
+            unit_column = "unit" if "unit" in columns else "NULL"
+            order_column = "id" if "id" in columns else "rowid"
+            # Rows are replayed in insert order so the newest unit wins and,
+            # for duplicate timestamps, the newest value wins.
+            conn.execute(
+                f"""
+                INSERT INTO series (device_type, device_id, metric, unit)
+                SELECT device_type, device_id, metric, {unit_column}
+                FROM {table_name}
+                WHERE true
+                ORDER BY {order_column}
+                ON CONFLICT (device_type, device_id, metric) DO UPDATE SET unit = excluded.unit
+                """
+            )
+            if table_name == "metrics":
+                cursor = conn.execute(
+                    f"""
+                    INSERT OR REPLACE INTO samples (series_id, ts, value)
+                    SELECT series.id, legacy.ts, legacy.value
+                    FROM {table_name} AS legacy
+                    JOIN series
+                      ON series.device_type = legacy.device_type
+                     AND series.device_id = legacy.device_id
+                     AND series.metric = legacy.metric
+                    ORDER BY legacy.{order_column}
+                    """
+                )
+            else:
+                cursor = conn.execute(
+                    f"""
+                    INSERT OR REPLACE INTO sample_rollups (series_id, resolution_seconds, ts, value)
+                    SELECT series.id, legacy.resolution_seconds, legacy.ts, legacy.value
+                    FROM {table_name} AS legacy
+                    JOIN series
+                      ON series.device_type = legacy.device_type
+                     AND series.device_id = legacy.device_id
+                     AND series.metric = legacy.metric
+                    ORDER BY legacy.{order_column}
+                    """
+                )
+            conn.execute(f"DROP TABLE {table_name}")
+            logger.info(
+                "Migrated %s rows from legacy %s table into the series schema",
+                cursor.rowcount,
+                table_name,
+            )
+
     def _ensure_columns(
         self,
         conn: sqlite3.Connection,
@@ -2161,23 +4417,18 @@ class DevicePoller:
             "provider_ts_ms": provider_ts_ms,
         }
         if self._db_path:
-            self._write_raw_event(
-                ts_ms=polled_ts_ms,
-                device_type=device_type,
-                device_id=device_id,
-                payload=enriched_payload,
-            )
-            metrics = self._extract_weather_metrics(
-                enriched_payload.get("current"),
-                enriched_payload.get("units"),
-            )
-            if metrics:
-                self._write_metrics(
+            self._commit_poll_batch(
+                PollWriteBatch(
                     ts_ms=polled_ts_ms,
                     device_type=device_type,
                     device_id=device_id,
-                    metrics=metrics,
+                    payload=enriched_payload,
+                    metrics=self._extract_weather_metrics(
+                        enriched_payload.get("current"),
+                        enriched_payload.get("units"),
+                    ),
                 )
+            )
         return enriched_payload
 
     def _extract_weather_metrics(
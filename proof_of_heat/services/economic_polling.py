@@ -4,8 +4,7 @@ import logging
 import sqlite3
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from pathlib import Path
-from typing import Any, Callable
+from typing import Any
 from zoneinfo import ZoneInfo
 
 from proof_of_heat.services.market_data import (
@@ -15,8 +14,9 @@ from proof_of_heat.services.market_data import (
     fetch_mempool_prices,
     fetch_mempool_reward_stats,
 )
+from proof_of_heat.services.latest_values import LatestSample, LatestValueIndex
 from proof_of_heat.services.metrics import MetricSample
-from proof_of_heat.services.sqlite_logging import connect_logged_sqlite
+from proof_of_heat.services.sqlite_pool import SQLiteConnectionManager
 
 logger = logging.getLogger("proof_of_heat.economic_polling")
 
@@ -96,14 +96,12 @@ class EconomicsPoller:
     def __init__(
         self,
         settings: dict[str, Any],
-        db_path: Path | None = None,
-        db_lock: Any | None = None,
-        ensure_schema: Callable[[sqlite3.Connection], None] | None = None,
+        db: SQLiteConnectionManager | None = None,
+        latest_values: LatestValueIndex | None = None,
     ) -> None:
         self._settings = settings
-        self._db_path = db_path
-        self._db_lock = db_lock
-        self._ensure_schema = ensure_schema
+        self._db = db
+        self._latest_values = latest_values if latest_values is not None else LatestValueIndex()
 
     def update_settings(self, settings: dict[str, Any]) -> None:
         self._settings = settings
@@ -270,44 +268,44 @@ class EconomicsPoller:
                 except Exception as exc:  # pragma: no cover - network fallback
                     payload["errors"].append(f"Hashrate fetch failed: {exc}")
 
-        if self._db_path and self._db_lock is not None and self._ensure_schema is not None:
-            with self._db_lock:
-                with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                    self._ensure_schema(conn)
-                    if crypto_usd is None:
-                        crypto_usd = _get_latest_metric_value(
-                            conn=conn,
-                            metric=metric_names.exchange_rate_crypto_usd,
-                            max_age_ms=exchange_stale_ms,
-                            reference_ts_ms=ts_ms,
-                        )
-                    if metric_names.exchange_rate_usd_fiat and usd_fiat is None:
-                        usd_fiat = _get_latest_metric_value(
-                            conn=conn,
-                            metric=metric_names.exchange_rate_usd_fiat,
-                            max_age_ms=exchange_stale_ms,
-                            reference_ts_ms=ts_ms,
-                        )
-                    if network_hashrate_th_s is None:
-                        network_hashrate_th_s = _get_latest_metric_value(
-                            conn=conn,
-                            metric=metric_names.network_hashrate_th_s,
-                            max_age_ms=hashprice_stale_ms,
-                            reference_ts_ms=ts_ms,
-                        )
-                    if avg_block_reward_crypto is None:
-                        avg_block_reward_crypto = _get_latest_metric_value(
-                            conn=conn,
-                            metric=metric_names.avg_block_reward_crypto,
-                            max_age_ms=hashprice_stale_ms,
-                            reference_ts_ms=ts_ms,
-                        )
-                    power_rate_sources = _resolve_power_rate_metrics(
-                        conn=conn,
-                        settings=self._settings,
-                        max_age_ms=max(exchange_stale_ms, hashprice_stale_ms),
-                        reference_ts_ms=ts_ms,
-                    )
+        if self._db is not None:
+            if not self._latest_values.loaded:
+                with self._db.reader() as conn:
+                    self._latest_values.load(conn)
+            if crypto_usd is None:
+                crypto_usd = _get_latest_metric_value(
+                    latest_values=self._latest_values,
+                    metric=metric_names.exchange_rate_crypto_usd,
+                    max_age_ms=exchange_stale_ms,
+                    reference_ts_ms=ts_ms,
+                )
+            if metric_names.exchange_rate_usd_fiat and usd_fiat is None:
+                usd_fiat = _get_latest_metric_value(
+                    latest_values=self._latest_values,
+                    metric=metric_names.exchange_rate_usd_fiat,
+                    max_age_ms=exchange_stale_ms,
+                    reference_ts_ms=ts_ms,
+                )
+            if network_hashrate_th_s is None:
+                network_hashrate_th_s = _get_latest_metric_value(
+                    latest_values=self._latest_values,
+                    metric=metric_names.network_hashrate_th_s,
+                    max_age_ms=hashprice_stale_ms,
+                    reference_ts_ms=ts_ms,
+                )
+            if avg_block_reward_crypto is None:
+                avg_block_reward_crypto = _get_latest_metric_value(
+                    latest_values=self._latest_values,
+                    metric=metric_names.avg_block_reward_crypto,
+                    max_age_ms=hashprice_stale_ms,
+                    reference_ts_ms=ts_ms,
+                )
+            power_rate_sources = _resolve_power_rate_metrics(
+                latest_values=self._latest_values,
+                settings=self._settings,
+                max_age_ms=max(exchange_stale_ms, hashprice_stale_ms),
+                reference_ts_ms=ts_ms,
+            )
 
         if crypto_usd is not None:
             metrics.append(
@@ -448,11 +446,9 @@ class EconomicsPoller:
         sources: set[EconomicsMetricSource] = set(
             _configured_hashcost_sources(self._settings)
         )
-        if self._db_path and self._db_lock is not None and self._ensure_schema is not None:
-            with self._db_lock:
-                with connect_logged_sqlite(self._db_path, logger=logger) as conn:
-                    self._ensure_schema(conn)
-                    sources.update(_discover_hashcost_sources(conn, settings=self._settings))
+        if self._db is not None:
+            with self._db.reader() as conn:
+                sources.update(_discover_hashcost_sources(conn, settings=self._settings))
         return _sort_metric_sources(sources)
 
 
@@ -719,74 +715,49 @@ def _resolve_stale_after_ms(section: Any, default_seconds: int) -> int:
 
 
 def _get_latest_metric_value(
-    conn: sqlite3.Connection,
+    latest_values: LatestValueIndex,
     metric: str,
     max_age_ms: int,
     reference_ts_ms: int,
 ) -> float | None:
-    row = conn.execute(
-        """
-        SELECT ts, value
-        FROM metrics
-        WHERE device_type = :device_type
-          AND device_id = :device_id
-          AND metric = :metric
-        ORDER BY ts DESC, id DESC
-        LIMIT 1
-        """,
-        {
-            "device_type": ECONOMICS_DEVICE_TYPE,
-            "device_id": ECONOMICS_DEVICE_ID,
-            "metric": metric,
-        },
-    ).fetchone()
-    if row is None:
-        return None
-    sample_ts = _safe_int(row[0])
-    sample_value = _safe_float(row[1])
-    if sample_ts is None or sample_value is None:
+    sample = latest_values.get(ECONOMICS_DEVICE_TYPE, ECONOMICS_DEVICE_ID, metric)
+    if sample is None:
         return None
-    if reference_ts_ms - sample_ts > max_age_ms:
+    if reference_ts_ms - sample.ts > max_age_ms:
         return None
-    return sample_value
+    return sample.value
 
 
 def _resolve_power_rate_metrics(
-    conn: sqlite3.Connection,
+    latest_values: LatestValueIndex,
     settings: dict[str, Any],
     max_age_ms: int,
     reference_ts_ms: int,
 ) -> list[PowerRateMetricSource]:
     configured_device_keys = _configured_device_keys(settings)
-    rows = conn.execute(
-        """
-        SELECT device_type, device_id, metric, ts, value
-        FROM metrics
-        WHERE metric IN ('power_rate', 'power_rate_j_th')
-        ORDER BY ts DESC, id DESC
-        """
-    ).fetchall()
-    latest_by_source: dict[tuple[str, str], PowerRateMetricSource] = {}
-    for device_type, device_id, metric, sample_ts, sample_value in rows:
-        source_key = (str(device_type), str(device_id))
-        if source_key in latest_by_source:
-            continue
-        if configured_device_keys and source_key not in configured_device_keys:
-            continue
-        sample_ts_int = _safe_int(sample_ts)
-        sample_value_float = _safe_float(sample_value)
-        if sample_ts_int is None or sample_value_float is None:
-            continue
-        if reference_ts_ms - sample_ts_int > max_age_ms:
+    latest_by_source: dict[tuple[str, str], tuple[str, LatestSample]] = {}
+    for metric in POWER_RATE_METRICS:
+        for source_key, sample in latest_values.get_metric(metric).items():
+            if configured_device_keys and source_key not in configured_device_keys:
+                continue
+            current = latest_by_source.get(source_key)
+            if current is None or sample.ts > current[1].ts:
+                latest_by_source[source_key] = (metric, sample)
+
+    sources: list[PowerRateMetricSource] = []
+    for (device_type, device_id), (metric, sample) in sorted(latest_by_source.items()):
+        if reference_ts_ms - sample.ts > max_age_ms:
             continue
-        latest_by_source[source_key] = PowerRateMetricSource(
-            device_type=str(device_type),
-            device_id=str(device_id),
-            metric=str(metric),
-            value=sample_value_float,
-            source=f"{device_type}:{device_id}:{metric}",
+        sources.append(
+            PowerRateMetricSource(
+                device_type=device_type,
+                device_id=device_id,
+                metric=metric,
+                value=sample.value,
+                source=f"{device_type}:{device_id}:{metric}",
+            )
         )
-    return [latest_by_source[key] for key in sorted(latest_by_source)]
+    return sources
 
 
 def _configured_device_keys(settings: dict[str, Any]) -> set[tuple[str, str]]:
@@ -832,13 +803,13 @@ def _discover_hashcost_sources(
     configured_device_keys = _configured_device_keys(settings)
     rows = conn.execute(
         """
-        SELECT device_type, device_id
-        FROM metrics
-        WHERE metric IN ('power_rate', 'power_rate_j_th')
-        UNION
-        SELECT device_type, device_id
-        FROM metric_rollups
+        SELECT DISTINCT device_type, device_id
+        FROM series
         WHERE metric IN ('power_rate', 'power_rate_j_th')
+          AND (
+            EXISTS (SELECT 1 FROM samples WHERE samples.series_id = series.id)
+            OR EXISTS (SELECT 1 FROM sample_rollups WHERE sample_rollups.series_id = series.id)
+          )
         ORDER BY device_type, device_id
         """
     ).fetchall()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Iterable
+
+
+@dataclass(frozen=True)
+class LatestSample:
+    ts: int
+    value: float
+    unit: str | None = None
+
+
+class LatestValueIndex:
+    """Thread-safe latest raw sample per ``(device_type, device_id, metric)``.
+
+    Samples are grouped by metric name first so that lookups of one metric
+    across all devices (for example every ``power_rate`` source) do not have
+    to walk the whole index.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._samples: dict[str, dict[tuple[str, str], LatestSample]] = {}
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self, conn: sqlite3.Connection) -> None:
+        rows = conn.execute(
+            """
+            SELECT series.device_type, series.device_id, series.metric, latest.ts, latest.value, series.unit
+            FROM series
+            CROSS JOIN samples AS latest
+            WHERE latest.series_id = series.id
+              AND latest.ts = (SELECT MAX(ts) FROM samples WHERE samples.series_id = series.id)
+            """
+        ).fetchall()
+        with self._lock:
+            # Samples recorded while the snapshot was being read are kept
+            # when they are newer than what the snapshot returned.
+            for device_type, device_id, metric, ts, value, unit in rows:
+                self._store(
+                    str(device_type),
+                    str(device_id),
+                    str(metric),
+                    ts,
+                    value,
+                    unit,
+                    replace_equal=False,
+                )
+            self._loaded = True
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._samples = {}
+            self._loaded = False
+
+    def discard_older(self, keys: Iterable[tuple[str, str, str]], ts: int) -> None:
+        """Drop the samples of ``(device_type, device_id, metric)`` keys older than ``ts``."""
+        with self._lock:
+            for device_type, device_id, metric in keys:
+                samples = self._samples.get(metric, {})
+                current = samples.get((device_type, device_id))
+                if current is not None and current.ts < ts:
+                    del samples[(device_type, device_id)]
+
+    def update(self, rows: Iterable[dict[str, Any]]) -> None:
+        with self._lock:
+            for row in rows:
+                self._store(
+                    str(row["device_type"]),
+                    str(row["device_id"]),
+                    str(row["metric"]),
+                    row.get("ts"),
+                    row.get("value"),
+                    row.get("unit"),
+                )
+
+    def get(self, device_type: str, device_id: str, metric: str) -> LatestSample | None:
+        with self._lock:
+            return self._samples.get(metric, {}).get((device_type, device_id))
+
+    def get_metric(self, metric: str) -> dict[tuple[str, str], LatestSample]:
+        with self._lock:
+            return dict(self._samples.get(metric, {}))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(samples) for samples in self._samples.values())
+
+    def _store(
+        self,
+        device_type: str,
+        device_id: str,
+        metric: str,
+        ts: Any,
+        value: Any,
+        unit: Any,
+        replace_equal: bool = True,
+    ) -> None:
+        try:
+            sample = LatestSample(
+                ts=int(ts),
+                value=float(value),
+                unit=str(unit) if unit is not None else None,
+            )
+        except (TypeError, ValueError):
+            return
+        samples = self._samples.setdefault(metric, {})
+        current = samples.get((device_type, device_id))
+        if current is None or sample.ts > current.ts or (replace_equal and sample.ts == current.ts):
+            samples[(device_type, device_id)] = sample
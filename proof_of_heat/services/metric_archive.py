@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import itertools
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator, Sequence
+
+try:  # Parquet is optional; archives fall back to gzip-compressed CSV.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the installed extras
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# Column layout per archive kind. ``ts`` always comes first; it picks the
+# day partition a row is written to.
+ARCHIVE_SCHEMAS: dict[str, tuple[tuple[str, type], ...]] = {
+    "samples": (
+        ("ts", int),
+        ("device_type", str),
+        ("device_id", str),
+        ("metric", str),
+        ("value", float),
+        ("unit", str),
+    ),
+    "rollups": (
+        ("ts", int),
+        ("resolution_seconds", int),
+        ("device_type", str),
+        ("device_id", str),
+        ("metric", str),
+        ("value", float),
+        ("min_value", float),
+        ("max_value", float),
+        ("sum_value", float),
+        ("sample_count", int),
+        ("time_weighted_value", float),
+        ("covered_ms", int),
+        ("unit", str),
+    ),
+    "raw_events": (
+        ("ts", int),
+        ("device_type", str),
+        ("device_id", str),
+        ("payload", str),
+    ),
+}
+ARCHIVE_FORMATS = ("auto", "parquet", "csv")
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+class MetricArchive:
+    """Append-only cold storage for rows that retention removes.
+
+    Rows are written to ``<root>/<kind>/<YYYY-MM-DD>/part-*.parquet`` (or
+    ``.csv.gz`` without pyarrow), one partition per UTC day. Every write adds
+    new part files, each written under a temporary name and renamed into
+    place, so readers never see a partial file.
+    """
+
+    def __init__(self, root: Path, file_format: str = "auto") -> None:
+        if file_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"unsupported archive format: {file_format!r}")
+        if file_format == "parquet" and not parquet_available():
+            logger.warning("pyarrow is not installed; archiving as compressed CSV instead of Parquet")
+        self._root = root
+        self._format = "parquet" if file_format != "csv" and parquet_available() else "csv"
+        self._sequence = itertools.count()
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    @property
+    def file_format(self) -> str:
+        return self._format
+
+    def write(self, kind: str, rows: Sequence[Sequence[Any]]) -> int:
+        """Archive ``rows`` laid out as ``ARCHIVE_SCHEMAS[kind]``; returns files written."""
+        schema = ARCHIVE_SCHEMAS[kind]
+        by_day: dict[str, list[Sequence[Any]]] = {}
+        for row in rows:
+            by_day.setdefault(_day_partition(int(row[0])), []).append(row)
+        suffix = ".parquet" if self._format == "parquet" else ".csv.gz"
+        for day, day_rows in by_day.items():
+            directory = self._root / kind / day
+            directory.mkdir(parents=True, exist_ok=True)
+            name = f"part-{time.time_ns()}-{os.getpid()}-{next(self._sequence)}{suffix}"
+            tmp_path = directory / f".{name}.tmp"
+            if self._format == "parquet":
+                _write_parquet(tmp_path, schema, day_rows)
+            else:
+                _write_csv(tmp_path, schema, day_rows)
+            os.replace(tmp_path, directory / name)
+        return len(by_day)
+
+    def read(
+        self,
+        kind: str,
+        start_ms: int | None = None,
+        end_ms: int | None = None,
+        predicate: Callable[[tuple[Any, ...]], bool] | None = None,
+    ) -> Iterator[tuple[Any, ...]]:
+        """Yield archived rows with ``start_ms <= ts <= end_ms``, in no particular order."""
+        schema = ARCHIVE_SCHEMAS[kind]
+        kind_root = self._root / kind
+        if not kind_root.is_dir():
+            return
+        first_day = _day_partition(start_ms) if start_ms is not None else None
+        last_day = _day_partition(end_ms) if end_ms is not None else None
+        for directory in sorted(kind_root.iterdir()):
+            day = directory.name
+            if (first_day is not None and day < first_day) or (last_day is not None and day > last_day):
+                continue
+            for path in sorted(directory.iterdir()):
+                if path.name.endswith(".parquet"):
+                    rows = _read_parquet(path, schema)
+                elif path.name.endswith(".csv.gz"):
+                    rows = _read_csv(path, schema)
+                else:
+                    continue
+                for row in rows:
+                    ts = row[0]
+                    if start_ms is not None and ts < start_ms:
+                        continue
+                    if end_ms is not None and ts > end_ms:
+                        continue
+                    if predicate is None or predicate(row):
+                        yield row
+
+
+def _day_partition(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def _write_csv(path: Path, schema: tuple[tuple[str, type], ...], rows: list[Sequence[Any]]) -> None:
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle, lineterminator="\n")
+        writer.writerow(name for name, _ in schema)
+        writer.writerows(rows)
+
+
+def _read_csv(path: Path, schema: tuple[tuple[str, type], ...]) -> Iterator[tuple[Any, ...]]:
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as handle:
+        reader = csv.reader(handle)
+        next(reader, None)
+        for record in reader:
+            # CSV has no NULL; empty cells are read back as None.
+            yield tuple(None if cell == "" else kind(cell) for cell, (_, kind) in zip(record, schema))
+
+
+def _write_parquet(path: Path, schema: tuple[tuple[str, type], ...], rows: list[Sequence[Any]]) -> None:
+    arrow_types = {int: pa.int64(), float: pa.float64(), str: pa.string()}
+    table = pa.table(
+        {
+            name: pa.array([row[index] for row in rows], type=arrow_types[kind])
+            for index, (name, kind) in enumerate(schema)
+        }
+    )
+    pq.write_table(table, path, compression="zstd")
+
+
+def _read_parquet(path: Path, schema: tuple[tuple[str, type], ...]) -> Iterator[tuple[Any, ...]]:
+    table = pq.read_table(path, columns=[name for name, _ in schema])
+    yield from zip(*(table.column(name).to_pylist() for name, _ in schema))
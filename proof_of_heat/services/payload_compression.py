@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import logging
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+try:  # zstd is optional; payloads fall back to zlib without it.
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the installed extras
+    zstandard = None
+
+PAYLOAD_CODECS = ("zlib", "zstd")
+# zlib only looks back 32 KiB, so a longer preset dictionary is wasted.
+ZLIB_MAX_DICTIONARY_SIZE = 32_768
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+@dataclass(frozen=True)
+class PayloadCompressionOptions:
+    codec: str = "zlib"
+    level: int = 6
+    dictionary: bool = False
+    dictionary_samples: int = 200
+    dictionary_size: int = 16_384
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "codec": self.codec,
+            "level": self.level,
+            "dictionary": self.dictionary,
+            "dictionary_samples": self.dictionary_samples,
+            "dictionary_size": self.dictionary_size,
+        }
+
+
+def parse_payload_compression_options(
+    settings: Any,
+    *,
+    logger: logging.Logger,
+) -> PayloadCompressionOptions:
+    defaults = PayloadCompressionOptions()
+    if not isinstance(settings, dict):
+        return defaults
+    database = settings.get("database")
+    if not isinstance(database, dict):
+        return defaults
+    compression = database.get("payload_compression")
+    if not isinstance(compression, dict):
+        return defaults
+
+    codec = str(compression.get("codec") or defaults.codec).strip().lower()
+    if codec not in PAYLOAD_CODECS:
+        logger.warning("Ignoring unsupported payload compression codec: %r", compression.get("codec"))
+        codec = defaults.codec
+    if codec == "zstd" and not zstd_available():
+        logger.warning("zstandard is not installed; compressing raw payloads with zlib instead")
+        codec = "zlib"
+
+    def _int_option(name: str, default: int, minimum: int, maximum: int | None = None) -> int:
+        value = compression.get(name)
+        if value is None:
+            return default
+        try:
+            parsed = int(value)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring invalid payload compression %s: %r", name, value)
+            return default
+        if parsed < minimum or (maximum is not None and parsed > maximum):
+            logger.warning("Ignoring out-of-range payload compression %s: %r", name, value)
+            return default
+        return parsed
+
+    default_level = defaults.level if codec == "zlib" else 3
+    return PayloadCompressionOptions(
+        codec=codec,
+        level=_int_option("level", default_level, minimum=1, maximum=9 if codec == "zlib" else 22),
+        dictionary=bool(compression.get("dictionary", defaults.dictionary)),
+        dictionary_samples=_int_option("dictionary_samples", defaults.dictionary_samples, minimum=1),
+        dictionary_size=_int_option("dictionary_size", defaults.dictionary_size, minimum=256),
+    )
+
+
+def compress_payload(codec: str, data: bytes, *, level: int, dictionary: bytes | None = None) -> bytes:
+    if codec == "zlib":
+        compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+        return compressor.compress(data) + compressor.flush()
+    if codec == "zstd":
+        return _zstd_compressor(level, dictionary).compress(data)
+    raise ValueError(f"unsupported payload codec: {codec!r}")
+
+
+def decompress_payload(codec: str, blob: bytes, *, dictionary: bytes | None = None) -> bytes:
+    if codec == "zlib":
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return decompressor.decompress(blob) + decompressor.flush()
+    if codec == "zstd":
+        if not zstd_available():
+            raise RuntimeError("zstandard is required to read zstd-compressed payloads")
+        # Decompressors are not thread-safe and reads run on several threads,
+        # so each call gets its own.
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(blob)
+    raise ValueError(f"unsupported payload codec: {codec!r}")
+
+
+def build_dictionary(codec: str, samples: list[bytes], size: int) -> bytes:
+    """Build a compression dictionary from sample payloads of one device type.
+
+    zstd trains a real dictionary. zlib has no trainer, but polls repeat the
+    same keys and most values every time, so a preset dictionary made of
+    recent payloads gets most of the benefit; the newest samples go last
+    because zlib matches closer content more cheaply.
+    """
+    if codec == "zstd":
+        return zstandard.train_dictionary(size, samples).as_bytes()
+    size = min(size, ZLIB_MAX_DICTIONARY_SIZE)
+    return b"".join(samples)[-size:]
+
+
+@lru_cache(maxsize=32)
+def _zstd_compressor(level: int, dictionary: bytes | None) -> Any:
+    # Only used under the writer lock, so one compressor per dictionary is
+    # safe to share.
+    dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+    return zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+
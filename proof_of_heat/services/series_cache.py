@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import logging
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Hashable, Iterable
+
+SeriesKey = tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class SeriesCacheOptions:
+    enabled: bool = True
+    max_mb: int = 32
+
+    @property
+    def max_bytes(self) -> int:
+        return self.max_mb * 1024 * 1024
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"enabled": self.enabled, "max_mb": self.max_mb}
+
+
+def parse_series_cache_options(
+    settings: Any,
+    *,
+    logger: logging.Logger,
+) -> SeriesCacheOptions:
+    defaults = SeriesCacheOptions()
+    if not isinstance(settings, dict):
+        return defaults
+    database = settings.get("database")
+    if not isinstance(database, dict):
+        return defaults
+    series_cache = database.get("series_cache")
+    if not isinstance(series_cache, dict):
+        return defaults
+
+    max_mb = defaults.max_mb
+    value = series_cache.get("max_mb")
+    if value is not None:
+        try:
+            parsed = int(value)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring invalid series cache max_mb: %r", value)
+        else:
+            if parsed < 1:
+                logger.warning("Ignoring out-of-range series cache max_mb: %r", value)
+            else:
+                max_mb = parsed
+
+    return SeriesCacheOptions(
+        enabled=bool(series_cache.get("enabled", defaults.enabled)),
+        max_mb=max_mb,
+    )
+
+
+@dataclass
+class CachedPoints:
+    """Closed part of a series read: every point with ``ts <= closed_end_ms``."""
+
+    closed_end_ms: int
+    ts: array
+    values: array
+    spacing: array
+
+    @property
+    def size(self) -> int:
+        return sum(len(column) * column.itemsize for column in (self.ts, self.values, self.spacing))
+
+    def points(self) -> Iterable[tuple[int, float, int]]:
+        return zip(self.ts, self.values, self.spacing)
+
+
+class SeriesCache:
+    """Byte-bounded LRU of stitched series points, for repeated chart reads.
+
+    An entry holds the points of one read up to its ``closed_end_ms``; only
+    what is newer has to be read again. Entries are dropped when a write
+    lands at or before their closed end, so writes at the live tail keep
+    them. Every committed write also bumps the version of its series.
+    Callers take ``version`` before their read snapshot starts and pass it
+    to ``put``, so a read that overlapped any write to the series is not
+    stored: its snapshot may predate a write into the range it closes.
+    """
+
+    def __init__(self, options: SeriesCacheOptions | None = None) -> None:
+        self._lock = Lock()
+        self._options = options or SeriesCacheOptions()
+        self._entries: OrderedDict[Hashable, tuple[SeriesKey, CachedPoints]] = OrderedDict()
+        self._by_series: dict[SeriesKey, set[Hashable]] = {}
+        self._versions: dict[SeriesKey, int] = {}
+        self._generation = 0
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._options.enabled
+
+    def configure(self, options: SeriesCacheOptions) -> None:
+        with self._lock:
+            self._options = options
+            self._clear_locked()
+
+    def version(self, series: SeriesKey) -> tuple[int, int]:
+        with self._lock:
+            return self._generation, self._versions.get(series, 0)
+
+    def get(self, key: Hashable) -> CachedPoints | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(
+        self,
+        key: Hashable,
+        series: SeriesKey,
+        version: tuple[int, int],
+        closed_end_ms: int,
+        points: Iterable[tuple[int, float, int]],
+        base: CachedPoints | None = None,
+    ) -> None:
+        """Store ``points``, appended to a copy of ``base`` when given.
+
+        Entries are never changed in place, so readers can keep iterating
+        an entry they got from ``get``.
+        """
+        if base is None:
+            cached = CachedPoints(closed_end_ms, array("q"), array("d"), array("q"))
+        else:
+            cached = CachedPoints(
+                closed_end_ms,
+                array("q", base.ts),
+                array("d", base.values),
+                array("q", base.spacing),
+            )
+        for ts, value, spacing_ms in points:
+            cached.ts.append(ts)
+            cached.values.append(value)
+            cached.spacing.append(spacing_ms)
+        size = cached.size
+        with self._lock:
+            if not self._options.enabled or size > self._options.max_bytes:
+                return
+            if version != (self._generation, self._versions.get(series, 0)):
+                return
+            self._remove_locked(key)
+            self._entries[key] = (series, cached)
+            self._by_series.setdefault(series, set()).add(key)
+            self._bytes += size
+            while self._bytes > self._options.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+                self._evictions += 1
+
+    def invalidate_writes(self, rows: Iterable[dict[str, Any]]) -> None:
+        """Bump the written series' versions and drop entries whose closed part a write landed in."""
+        oldest: dict[SeriesKey, int] = {}
+        for row in rows:
+            series = (str(row["device_type"]), str(row["device_id"]), str(row["metric"]))
+            ts = int(row["ts"])
+            if series not in oldest or ts < oldest[series]:
+                oldest[series] = ts
+        with self._lock:
+            for series, ts in oldest.items():
+                self._versions[series] = self._versions.get(series, 0) + 1
+                keys = [
+                    key
+                    for key in self._by_series.get(series, ())
+                    if self._entries[key][1].closed_end_ms >= ts
+                ]
+                for key in keys:
+                    self._remove_locked(key)
+                    self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._clear_locked()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self._options.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._options.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+    def _clear_locked(self) -> None:
+        self._entries.clear()
+        self._by_series = {}
+        self._bytes = 0
+        self._generation += 1
+
+    def _remove_locked(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        series, cached = entry
+        self._bytes -= cached.size
+        keys = self._by_series.get(series)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_series[series]
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import math
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Iterable, Iterator, Sequence
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_MEDIA_TYPE = "application/vnd.proof-of-heat.columnar+json"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+BINARY_HEADER = struct.Struct("<I")
+CSV_MEDIA_TYPE = "text/csv"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+GZIP_MEDIA_TYPE = "application/gzip"
+
+
+def negotiate_series_format(accept: str | None) -> str:
+    """Pick the series media type from an ``Accept`` header.
+
+    The columnar and binary formats are opt-in: they are only returned when
+    the client names them with a higher quality than plain JSON, which
+    ``application/json``, ``application/*`` and ``*/*`` all stand for. Ties
+    and everything else get plain JSON.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+    qualities: dict[str, float] = {}
+    for part in accept.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        if media_type in ("application/*", "*/*"):
+            media_type = JSON_MEDIA_TYPE
+        if media_type not in (JSON_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, BINARY_MEDIA_TYPE):
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type] = max(quality, qualities.get(media_type, quality))
+    best = JSON_MEDIA_TYPE
+    best_quality = qualities.get(JSON_MEDIA_TYPE, 0.0)
+    for media_type in (COLUMNAR_MEDIA_TYPE, BINARY_MEDIA_TYPE):
+        quality = qualities.get(media_type, 0.0)
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def encode_columnar(ts: Sequence[int], values: Sequence[float | None]) -> dict[str, Any]:
+    """Return ``{"ts": [...], "values": [...]}`` with delta-encoded timestamps.
+
+    ``ts[0]`` is absolute and every following entry is the difference to the
+    previous timestamp. Gap markers keep their ``None`` value.
+    """
+    deltas = [ts[0]] if ts else []
+    deltas.extend(current - previous for previous, current in zip(ts, ts[1:]))
+    return {"ts": deltas, "values": list(values)}
+
+
+def encode_binary(ts: Sequence[int], values: Sequence[float | None]) -> bytes:
+    """Pack a series as little-endian arrays.
+
+    Layout: ``uint32`` point count, then ``count`` ``int64`` timestamps in
+    milliseconds, then ``count`` ``float64`` values. Gap markers are encoded
+    as NaN.
+    """
+    ts_array = array("q", ts)
+    value_array = array("d", (math.nan if value is None else value for value in values))
+    if sys.byteorder != "little":  # pragma: no cover - depends on the host
+        ts_array.byteswap()
+        value_array.byteswap()
+    return BINARY_HEADER.pack(len(ts_array)) + ts_array.tobytes() + value_array.tobytes()
+
+
+def decode_binary(payload: bytes) -> tuple[list[int], list[float | None]]:
+    """Inverse of ``encode_binary``; NaN values come back as ``None``."""
+    (count,) = BINARY_HEADER.unpack_from(payload)
+    offset = BINARY_HEADER.size
+    ts_array = array("q")
+    ts_array.frombytes(payload[offset:offset + count * 8])
+    value_array = array("d")
+    value_array.frombytes(payload[offset + count * 8:offset + count * 16])
+    if sys.byteorder != "little":  # pragma: no cover - depends on the host
+        ts_array.byteswap()
+        value_array.byteswap()
+    return list(ts_array), [None if math.isnan(value) else value for value in value_array]
+
+
+def iter_csv(columns: Sequence[str], chunks: Iterable[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    """Encode row chunks as CSV, one header line first and one block per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8")
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(columns: Sequence[str], chunks: Iterable[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    """Encode row chunks as newline-delimited JSON objects keyed by ``columns``."""
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows).encode("utf-8")
+
+
+def iter_gzip(blocks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally without buffering the whole body."""
+    compressor = zlib.compressobj(wbits=31)
+    for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -174,6 +174,14 @@ def connect_logged_sqlite(
     *,
     logger: logging.Logger,
     isolation_level: str | None = "",
+    check_same_thread: bool = True,
+    timeout: float = 5.0,
 ) -> sqlite3.Connection:
     factory = partial(LoggedSQLiteConnection, logger=logger)
-    return sqlite3.connect(database, isolation_level=isolation_level, factory=factory)
+    return sqlite3.connect(
+        database,
+        isolation_level=isolation_level,
+        factory=factory,
+        check_same_thread=check_same_thread,
+        timeout=timeout,
+    )
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Empty, LifoQueue
+from threading import Condition, Lock
+from typing import Any, Callable, Iterator
+
+from proof_of_heat.services.sqlite_logging import connect_logged_sqlite
+
+JOURNAL_MODES = ("wal", "delete", "truncate", "persist", "memory", "off")
+SYNCHRONOUS_MODES = ("off", "normal", "full", "extra")
+
+
+@dataclass(frozen=True)
+class SQLiteConnectionOptions:
+    journal_mode: str = "wal"
+    synchronous: str = "normal"
+    cache_size: int = -16384
+    mmap_size: int = 0
+    busy_timeout_ms: int = 5000
+    read_pool_size: int = 2
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "journal_mode": self.journal_mode,
+            "synchronous": self.synchronous,
+            "cache_size": self.cache_size,
+            "mmap_size": self.mmap_size,
+            "busy_timeout_ms": self.busy_timeout_ms,
+            "read_pool_size": self.read_pool_size,
+        }
+
+
+def parse_connection_options(
+    settings: Any,
+    *,
+    logger: logging.Logger,
+) -> SQLiteConnectionOptions:
+    defaults = SQLiteConnectionOptions()
+    if not isinstance(settings, dict):
+        return defaults
+    database = settings.get("database")
+    if not isinstance(database, dict):
+        return defaults
+    connection = database.get("connection")
+    if not isinstance(connection, dict):
+        return defaults
+
+    journal_mode = str(connection.get("journal_mode") or defaults.journal_mode).strip().lower()
+    if journal_mode not in JOURNAL_MODES:
+        logger.warning("Ignoring unsupported SQLite journal_mode: %r", connection.get("journal_mode"))
+        journal_mode = defaults.journal_mode
+    synchronous = str(connection.get("synchronous") or defaults.synchronous).strip().lower()
+    if synchronous not in SYNCHRONOUS_MODES:
+        logger.warning("Ignoring unsupported SQLite synchronous mode: %r", connection.get("synchronous"))
+        synchronous = defaults.synchronous
+
+    def _int_option(name: str, default: int, minimum: int | None = None) -> int:
+        value = connection.get(name)
+        if value is None:
+            return default
+        try:
+            parsed = int(value)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring invalid SQLite %s: %r", name, value)
+            return default
+        if minimum is not None and parsed < minimum:
+            logger.warning("Ignoring out-of-range SQLite %s: %r", name, value)
+            return default
+        return parsed
+
+    return SQLiteConnectionOptions(
+        journal_mode=journal_mode,
+        synchronous=synchronous,
+        cache_size=_int_option("cache_size", defaults.cache_size),
+        mmap_size=_int_option("mmap_size", defaults.mmap_size, minimum=0),
+        busy_timeout_ms=_int_option("busy_timeout_ms", defaults.busy_timeout_ms, minimum=0),
+        read_pool_size=_int_option("read_pool_size", defaults.read_pool_size, minimum=1),
+    )
+
+
+class SQLiteConnectionManager:
+    """One long-lived writer connection plus a small pool of query-only readers."""
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        logger: logging.Logger,
+        options: SQLiteConnectionOptions | None = None,
+        on_writer_connect: Callable[[sqlite3.Connection], None] | None = None,
+        on_writer_rollback: Callable[[], None] | None = None,
+    ) -> None:
+        self._db_path = db_path
+        self._logger = logger
+        self._options = options or SQLiteConnectionOptions()
+        self._on_writer_connect = on_writer_connect
+        self._on_writer_rollback = on_writer_rollback
+        self._writer_lock = Lock()
+        self._writer: sqlite3.Connection | None = None
+        self._readers: LifoQueue[sqlite3.Connection] = LifoQueue()
+        self._stats_lock = Lock()
+        # Signalled when a reader is returned or a database swap finishes.
+        self._readers_changed = Condition(self._stats_lock)
+        self._active_readers = 0
+        self._swapping = False
+        self._generation = 0
+        self._connects = 0
+        self._writer_transactions = 0
+        self._reader_checkouts = 0
+
+    @property
+    def db_path(self) -> Path:
+        return self._db_path
+
+    @property
+    def options(self) -> SQLiteConnectionOptions:
+        return self._options
+
+    @property
+    def writer_lock(self) -> Lock:
+        return self._writer_lock
+
+    def configure(self, options: SQLiteConnectionOptions) -> None:
+        if options == self._options:
+            return
+        self._logger.info("Reopening SQLite connections with options %s", options.as_dict())
+        self.close()
+        self._options = options
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self._writer_lock:
+            conn = self._ensure_writer()
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                # Lets the owner drop in-memory state derived from the
+                # rolled-back transaction while still holding the lock.
+                if self._on_writer_rollback is not None:
+                    self._on_writer_rollback()
+                raise
+            else:
+                conn.commit()
+            finally:
+                with self._stats_lock:
+                    self._writer_transactions += 1
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn, generation = self._checkout_reader()
+        try:
+            yield conn
+        finally:
+            # Reads never hold a transaction open between checkouts so the
+            # next user always sees a fresh snapshot.
+            if conn.in_transaction:
+                conn.rollback()
+            self._return_reader(conn, generation)
+
+    def close(self) -> None:
+        with self._writer_lock:
+            self._close_locked()
+
+    def compact_into_copy(self) -> bool:
+        """Rewrite the database with ``VACUUM INTO`` and swap the copy in.
+
+        Writes wait for the whole rewrite; readers keep reading the current
+        file until the swap itself, which waits up to ``busy_timeout_ms`` for
+        checked-out readers to be returned. Returns ``False``, keeping the
+        current file, when they are not.
+        """
+        tmp_path = self._db_path.with_name(f"{self._db_path.name}.compact")
+        with self._writer_lock:
+            conn = self._ensure_writer()
+            tmp_path.unlink(missing_ok=True)
+            try:
+                conn.execute("VACUUM INTO ?", (str(tmp_path),))
+                deadline = time.monotonic() + self._options.busy_timeout_ms / 1000
+                with self._stats_lock:
+                    self._swapping = True
+                    while self._active_readers and time.monotonic() < deadline:
+                        self._readers_changed.wait(max(0.0, deadline - time.monotonic()))
+                    if self._active_readers:
+                        self._logger.warning("Keeping the current database: readers did not finish in time")
+                        return False
+                # With every connection closed SQLite checkpoints and removes
+                # the WAL, so nothing of the old file is left to replay.
+                self._close_locked()
+                os.replace(tmp_path, self._db_path)
+                self._ensure_writer()
+                return True
+            finally:
+                tmp_path.unlink(missing_ok=True)
+                with self._stats_lock:
+                    self._swapping = False
+                    self._readers_changed.notify_all()
+
+    def _close_locked(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        with self._stats_lock:
+            self._generation += 1
+        while True:
+            try:
+                conn = self._readers.get_nowait()
+            except Empty:
+                break
+            conn.close()
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "connects": self._connects,
+                "writer_open": self._writer is not None,
+                "idle_readers": self._readers.qsize(),
+                "writer_transactions": self._writer_transactions,
+                "reader_checkouts": self._reader_checkouts,
+                "options": self._options.as_dict(),
+            }
+
+    def _ensure_writer(self) -> sqlite3.Connection:
+        if self._writer is not None:
+            return self._writer
+        conn = self._connect()
+        try:
+            journal_row = conn.execute(f"PRAGMA journal_mode={self._options.journal_mode}").fetchone()
+            conn.execute(f"PRAGMA synchronous={self._options.synchronous}")
+            if journal_row and str(journal_row[0]).lower() != self._options.journal_mode:
+                self._logger.warning(
+                    "SQLite journal_mode %s was requested but %s is active",
+                    self._options.journal_mode,
+                    journal_row[0],
+                )
+            if self._on_writer_connect is not None:
+                self._on_writer_connect(conn)
+            conn.commit()
+        except BaseException:
+            conn.close()
+            raise
+        self._writer = conn
+        return conn
+
+    def _checkout_reader(self) -> tuple[sqlite3.Connection, int]:
+        if self._writer is None:
+            # The writer creates the file, switches journal mode and runs
+            # schema migrations before the first reader attaches.
+            with self._writer_lock:
+                self._ensure_writer()
+        with self._stats_lock:
+            while self._swapping:
+                self._readers_changed.wait()
+            generation = self._generation
+            self._reader_checkouts += 1
+            self._active_readers += 1
+        try:
+            return self._readers.get_nowait(), generation
+        except Empty:
+            pass
+        try:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only=ON")
+        except BaseException:
+            self._release_reader()
+            raise
+        return conn, generation
+
+    def _return_reader(self, conn: sqlite3.Connection, generation: int) -> None:
+        try:
+            with self._stats_lock:
+                current_generation = self._generation
+            if generation != current_generation or self._readers.qsize() >= self._options.read_pool_size:
+                conn.close()
+                return
+            self._readers.put(conn)
+        finally:
+            self._release_reader()
+
+    def _release_reader(self) -> None:
+        with self._stats_lock:
+            self._active_readers -= 1
+            self._readers_changed.notify_all()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = connect_logged_sqlite(
+            self._db_path,
+            logger=self._logger,
+            check_same_thread=False,
+            timeout=self._options.busy_timeout_ms / 1000,
+        )
+        conn.execute(f"PRAGMA cache_size={int(self._options.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size={int(self._options.mmap_size)}")
+        with self._stats_lock:
+            self._connects += 1
+        return conn
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from threading import Condition, Thread
+from typing import Any, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class WriteQueueOptions:
+    enabled: bool = True
+    max_batch_size: int = 200
+    max_latency_ms: int = 250
+    max_queue_size: int = 10_000
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "max_latency_ms": self.max_latency_ms,
+            "max_queue_size": self.max_queue_size,
+        }
+
+
+def parse_write_queue_options(
+    settings: Any,
+    *,
+    logger: logging.Logger,
+) -> WriteQueueOptions:
+    defaults = WriteQueueOptions()
+    if not isinstance(settings, dict):
+        return defaults
+    database = settings.get("database")
+    if not isinstance(database, dict):
+        return defaults
+    write_queue = database.get("write_queue")
+    if not isinstance(write_queue, dict):
+        return defaults
+
+    def _int_option(name: str, default: int, minimum: int) -> int:
+        value = write_queue.get(name)
+        if value is None:
+            return default
+        try:
+            parsed = int(value)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring invalid write queue %s: %r", name, value)
+            return default
+        if parsed < minimum:
+            logger.warning("Ignoring out-of-range write queue %s: %r", name, value)
+            return default
+        return parsed
+
+    return WriteQueueOptions(
+        enabled=bool(write_queue.get("enabled", defaults.enabled)),
+        max_batch_size=_int_option("max_batch_size", defaults.max_batch_size, minimum=1),
+        max_latency_ms=_int_option("max_latency_ms", defaults.max_latency_ms, minimum=0),
+        max_queue_size=_int_option("max_queue_size", defaults.max_queue_size, minimum=1),
+    )
+
+
+class WriteBehindQueue(Generic[T]):
+    """Bounded queue drained by one writer thread into group commits.
+
+    ``commit`` receives up to ``max_batch_size`` items at a time and is
+    expected to persist them in a single transaction. When a group commit
+    fails the items are retried one by one so a single bad item does not
+    take the rest of the group down with it.
+    """
+
+    def __init__(
+        self,
+        commit: Callable[[list[T]], None],
+        *,
+        logger: logging.Logger,
+        options: WriteQueueOptions | None = None,
+        name: str = "telemetry-writer",
+    ) -> None:
+        self._commit = commit
+        self._logger = logger
+        self._options = options or WriteQueueOptions()
+        self._name = name
+        self._cond = Condition()
+        self._items: deque[tuple[float, T]] = deque()
+        self._thread: Thread | None = None
+        self._stopping = False
+        self._flush_waiters = 0
+        self._in_flight = 0
+        self._enqueued = 0
+        self._committed = 0
+        self._dropped = 0
+        self._failed = 0
+        self._commits = 0
+        self._last_batch_size = 0
+        self._last_commit_latency_ms: float | None = None
+        self._max_commit_latency_ms = 0.0
+        self._total_commit_latency_ms = 0.0
+        self._max_queue_delay_ms = 0.0
+
+    @property
+    def options(self) -> WriteQueueOptions:
+        return self._options
+
+    @property
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def configure(self, options: WriteQueueOptions) -> None:
+        with self._cond:
+            self._options = options
+            self._cond.notify_all()
+
+    def start(self) -> None:
+        with self._cond:
+            if self.running:
+                return
+            self._stopping = False
+            self._thread = Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def submit(self, item: T) -> bool:
+        with self._cond:
+            if len(self._items) >= self._options.max_queue_size:
+                self._dropped += 1
+                dropped = self._dropped
+            else:
+                self._items.append((time.monotonic(), item))
+                self._enqueued += 1
+                self._cond.notify_all()
+                return True
+        if dropped == 1 or dropped % 100 == 0:
+            self._logger.warning("Write queue is full; dropped %s telemetry writes so far", dropped)
+        return False
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until everything submitted so far has been committed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                while self._items or self._in_flight:
+                    if not self.running:
+                        return False
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flush_waiters -= 1
+
+    def stop(self, timeout: float | None = None) -> bool:
+        """Drain the queue and stop the writer thread."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is None:
+            return True
+        thread.join(timeout)
+        if thread.is_alive():
+            self._logger.warning("Write queue did not drain within %s seconds", timeout)
+            return False
+        with self._cond:
+            self._thread = None
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "running": self.running,
+                "queue_depth": len(self._items),
+                "in_flight": self._in_flight,
+                "enqueued": self._enqueued,
+                "committed": self._committed,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "commits": self._commits,
+                "last_batch_size": self._last_batch_size,
+                "last_commit_latency_ms": self._last_commit_latency_ms,
+                "avg_commit_latency_ms": (
+                    self._total_commit_latency_ms / self._commits if self._commits else None
+                ),
+                "max_commit_latency_ms": self._max_commit_latency_ms,
+                "max_queue_delay_ms": self._max_queue_delay_ms,
+                "options": self._options.as_dict(),
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._items and not self._stopping:
+                    self._cond.wait()
+                if not self._items:
+                    return
+                deadline = self._items[0][0] + self._options.max_latency_ms / 1000
+                while (
+                    len(self._items) < self._options.max_batch_size
+                    and not self._stopping
+                    and not self._flush_waiters
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                count = min(len(self._items), self._options.max_batch_size)
+                group = [self._items.popleft() for _ in range(count)]
+                self._in_flight = count
+
+            started_at = time.monotonic()
+            committed, failed = self._commit_group([item for _, item in group])
+            finished_at = time.monotonic()
+
+            with self._cond:
+                latency_ms = (finished_at - started_at) * 1000
+                self._in_flight = 0
+                self._committed += committed
+                self._failed += failed
+                self._commits += 1
+                self._last_batch_size = count
+                self._last_commit_latency_ms = latency_ms
+                self._total_commit_latency_ms += latency_ms
+                self._max_commit_latency_ms = max(self._max_commit_latency_ms, latency_ms)
+                self._max_queue_delay_ms = max(
+                    self._max_queue_delay_ms,
+                    (started_at - group[0][0]) * 1000,
+                )
+                self._cond.notify_all()
+
+    def _commit_group(self, items: list[T]) -> tuple[int, int]:
+        try:
+            self._commit(items)
+            return len(items), 0
+        except Exception:
+            if len(items) == 1:
+                self._logger.exception("Failed to commit queued telemetry write")
+                return 0, 1
+            self._logger.exception("Group commit of %s telemetry writes failed; retrying one by one", len(items))
+        committed = failed = 0
+        for item in items:
+            try:
+                self._commit([item])
+                committed += 1
+            except Exception:
+                self._logger.exception("Failed to commit queued telemetry write")
+                failed += 1
+        return committed, failed
@@ -9,6 +9,7 @@ from typing import TYPE_CHECKING, Any
 import yaml
 
 from proof_of_heat.settings_schema import SettingsValidationError, validate_settings_data
+from proof_of_heat.settings_store import FrozenDict, FrozenList
 
 if TYPE_CHECKING:
     from dynaconf import Dynaconf
@@ -58,6 +59,8 @@ def _represent_settings_str(dumper: _SettingsDumper, value: str) -> yaml.nodes.S
 
 
 _SettingsDumper.add_representer(str, _represent_settings_str)
+_SettingsDumper.add_representer(FrozenDict, _SettingsDumper.represent_dict)
+_SettingsDumper.add_representer(FrozenList, _SettingsDumper.represent_list)
 
 def load_default_settings_yaml() -> str:
     return SETTINGS_EXAMPLE_FILE.read_text(encoding="utf-8")
@@ -125,6 +128,15 @@ def load_settings_yaml() -> str:
     return SETTINGS_FILE.read_text(encoding="utf-8")
 
 
+def settings_file_signature() -> tuple[int, int] | None:
+    """Return the settings file's modification time and size, if it exists."""
+    try:
+        stat = SETTINGS_FILE.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
 def parse_settings_yaml(raw_yaml: str) -> dict[str, Any]:
     try:
         parsed = yaml.load(raw_yaml, Loader=_SettingsLoader) or {}
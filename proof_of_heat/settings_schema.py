@@ -192,6 +192,8 @@ class RawEventsRetentionSettings(SettingsSchemaModel):
     enabled: bool = True
     retention_seconds: int | None = Field(default=None, gt=0)
     interval_seconds: int | None = Field(default=None, gt=0)
+    batch_size: int | None = Field(default=None, gt=0)
+    max_run_seconds: int | None = Field(default=None, gt=0)
 
     @model_validator(mode="after")
     def _validate_enabled_block(self) -> "RawEventsRetentionSettings":
@@ -212,6 +214,8 @@ class MetricsRetentionSettings(SettingsSchemaModel):
     enabled: bool = True
     interval_seconds: int | None = Field(default=None, gt=0)
     raw_retention_seconds: int | None = Field(default=None, gt=0)
+    batch_size: int | None = Field(default=None, gt=0)
+    max_run_seconds: int | None = Field(default=None, gt=0)
     rollups: list[MetricRollupSettings] | None = None
 
     @model_validator(mode="after")
@@ -227,9 +231,15 @@ class MetricsRetentionSettings(SettingsSchemaModel):
         return self
 
 
+class RetentionArchiveSettings(SettingsSchemaModel):
+    enabled: bool = True
+    format: Literal["auto", "parquet", "csv"] = "auto"
+
+
 class DatabaseRetentionSettings(SettingsSchemaModel):
     raw_events: RawEventsRetentionSettings | None = None
     metrics: MetricsRetentionSettings | None = None
+    archive: RetentionArchiveSettings | None = None
 
 
 class VacuumMaintenanceSettings(SettingsSchemaModel):
@@ -237,13 +247,66 @@ class VacuumMaintenanceSettings(SettingsSchemaModel):
     interval_seconds: int = Field(gt=0)
     min_free_ratio: float | None = Field(default=None, ge=0.0, le=1.0)
     min_reclaimable_mb: float | None = Field(default=None, ge=0.0)
+    mode: Literal["full", "incremental", "into"] = "full"
+    incremental_pages: int | None = Field(default=None, gt=0)
+    slice_pause_ms: int | None = Field(default=None, ge=0)
+    max_duration_seconds: int | None = Field(default=None, gt=0)
 
 
 class DatabaseMaintenanceSettings(SettingsSchemaModel):
     vacuum: VacuumMaintenanceSettings | None = None
 
 
+class DatabaseConnectionSettings(SettingsSchemaModel):
+    journal_mode: Literal["wal", "delete", "truncate", "persist", "memory", "off"] = "wal"
+    synchronous: Literal["off", "normal", "full", "extra"] = "normal"
+    cache_size: int | None = None
+    mmap_size: int | None = Field(default=None, ge=0)
+    busy_timeout_ms: int | None = Field(default=None, ge=0)
+    read_pool_size: int | None = Field(default=None, gt=0)
+
+
+class DatabaseWriteQueueSettings(SettingsSchemaModel):
+    enabled: bool = True
+    max_batch_size: int | None = Field(default=None, gt=0)
+    max_latency_ms: int | None = Field(default=None, ge=0)
+    max_queue_size: int | None = Field(default=None, gt=0)
+
+
+class DatabasePayloadCompressionSettings(SettingsSchemaModel):
+    codec: Literal["zlib", "zstd"] = "zlib"
+    level: int | None = Field(default=None, ge=1, le=22)
+    dictionary: bool = False
+    dictionary_samples: int | None = Field(default=None, gt=0)
+    dictionary_size: int | None = Field(default=None, ge=256)
+
+
+class DatabaseChangeOnlySettings(SettingsSchemaModel):
+    enabled: bool = False
+    keyframe_interval_seconds: int | None = Field(default=None, gt=0)
+    heartbeat_seconds: int | None = Field(default=None, gt=0)
+    deadband: float | None = Field(default=None, ge=0)
+    deadbands: dict[str, float] | None = None
+
+    @field_validator("deadbands")
+    @classmethod
+    def _validate_deadbands(cls, value: dict[str, float] | None) -> dict[str, float] | None:
+        if value is not None and any(deadband < 0 for deadband in value.values()):
+            raise ValueError("deadbands must be >= 0")
+        return value
+
+
+class DatabaseSeriesCacheSettings(SettingsSchemaModel):
+    enabled: bool = True
+    max_mb: int | None = Field(default=None, gt=0)
+
+
 class DatabaseSettings(SettingsSchemaModel):
+    connection: DatabaseConnectionSettings | None = None
+    write_queue: DatabaseWriteQueueSettings | None = None
+    payload_compression: DatabasePayloadCompressionSettings | None = None
+    change_only: DatabaseChangeOnlySettings | None = None
+    series_cache: DatabaseSeriesCacheSettings | None = None
     retention: DatabaseRetentionSettings | None = None
     maintenance: DatabaseMaintenanceSettings | None = None
 
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import logging
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+SettingsSubscriber = Callable[[dict[str, Any]], None]
+
+
+def _read_only(*_args: Any, **_kwargs: Any) -> None:
+    raise TypeError("settings snapshots are read-only; deepcopy them to build an edited version")
+
+
+class FrozenDict(dict):
+    """A ``dict`` that refuses changes; ``copy.deepcopy`` returns a plain one."""
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self) -> dict[str, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> dict[str, Any]:
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+
+class FrozenList(list):
+    """A ``list`` that refuses changes; ``copy.deepcopy`` returns a plain one."""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self) -> list[Any]:
+        return list(self)
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> list[Any]:
+        return [copy.deepcopy(value, memo) for value in self]
+
+
+def freeze(value: Any) -> Any:
+    """Return ``value`` with every nested dict and list made read-only."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """One validated version of the settings file.
+
+    ``data`` is shared by every reader of this snapshot and is read-only
+    (see ``freeze``); ``copy.deepcopy`` it to build an edited version.
+    """
+
+    raw_yaml: str
+    data: dict[str, Any]
+    digest: str
+    signature: Hashable | None
+
+
+class SettingsStore:
+    """Parsed settings that are only re-read when the settings file changes.
+
+    Every access stats the file through ``signature`` (modification time and
+    size). Only when that changes is the file read again, and only when its
+    content hash changes is it parsed and validated again; subscribers are
+    then called with the new settings. Without a ``signature`` the file is
+    read on every access but still parsed only when its content changes.
+    Saving through the store replaces the snapshot and notifies subscribers
+    straight away.
+    """
+
+    def __init__(
+        self,
+        *,
+        load_yaml: Callable[[], str],
+        parse_yaml: Callable[[str], dict[str, Any]],
+        save_yaml: Callable[[str], dict[str, Any]],
+        signature: Callable[[], Hashable | None] | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self._load_yaml = load_yaml
+        self._parse_yaml = parse_yaml
+        self._save_yaml = save_yaml
+        self._signature = signature or (lambda: None)
+        self._logger = logger or logging.getLogger(__name__)
+        self._lock = Lock()
+        self._notify_lock = Lock()
+        self._snapshot: SettingsSnapshot | None = None
+        self._subscribers: list[SettingsSubscriber] = []
+        self._reloads = 0
+
+    @property
+    def data(self) -> dict[str, Any]:
+        return self.snapshot().data
+
+    def snapshot(self) -> SettingsSnapshot:
+        """Return the current snapshot, reloading it if the file changed.
+
+        Raises whatever ``parse_yaml`` raises for an invalid file; the last
+        valid snapshot is kept for the next attempt.
+        """
+        signature = self._signature()
+        with self._lock:
+            current = self._snapshot
+            if current is not None and signature is not None and signature == current.signature:
+                return current
+            raw_yaml = self._load_yaml()
+            digest = _digest(raw_yaml)
+            if current is not None and digest == current.digest:
+                self._snapshot = SettingsSnapshot(current.raw_yaml, current.data, digest, signature)
+                return self._snapshot
+            snapshot = SettingsSnapshot(raw_yaml, freeze(self._parse_yaml(raw_yaml)), digest, signature)
+            self._snapshot = snapshot
+            self._reloads += 1
+        if current is not None:
+            self._logger.info("Settings file changed; reloaded settings")
+            self._notify(snapshot.data)
+        return snapshot
+
+    def save(self, raw_yaml: str) -> dict[str, Any]:
+        """Validate and write ``raw_yaml`` through ``save_yaml``, then notify."""
+        with self._lock:
+            parsed = freeze(self._save_yaml(raw_yaml))
+            # The saved file is re-rendered, so hash what is on disk now.
+            saved_yaml = self._load_yaml()
+            self._snapshot = SettingsSnapshot(saved_yaml, parsed, _digest(saved_yaml), self._signature())
+        self._notify(parsed)
+        return parsed
+
+    def subscribe(self, callback: SettingsSubscriber) -> None:
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "reloads": self._reloads,
+                "subscribers": len(self._subscribers),
+                "digest": self._snapshot.digest if self._snapshot is not None else None,
+            }
+
+    def _notify(self, data: dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        # Serialized so subscribers see settings versions in order.
+        with self._notify_lock:
+            for callback in subscribers:
+                try:
+                    callback(data)
+                except Exception:  # pragma: no cover - defensive logging
+                    self._logger.exception("Settings subscriber %r failed", callback)
+
+
+def _digest(raw_yaml: str) -> str:
+    return hashlib.sha256(raw_yaml.encode("utf-8")).hexdigest()
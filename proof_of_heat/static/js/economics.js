@@ -52,6 +52,11 @@ function getPresetMetrics(name) {
     return Array.isArray(preset && preset.metrics) ? preset.metrics : [];
 }
 
+function chartPointBudget() {
+    // About two points per horizontal pixel is as much as a line chart can show.
+    return Math.max(200, Math.round(ctx.canvas.clientWidth * 2) || 0);
+}
+
 function getMetricGapMs(metricName) {
     const gapMs = Number((catalogData.stale_after_ms_by_metric || {})[metricName]);
     return Number.isFinite(gapMs) && gapMs > 0 ? gapMs * 3 : null;
@@ -384,33 +389,36 @@ async function loadChart() {
     const startMs = parseLocalInputToMs(startDate, startHour, startMinute, startSecond);
     const endMs = parseLocalInputToMs(endDate, endHour, endMinute, endSecond);
 
-    const requests = selectedSeries.map(async (seriesItem) => {
-        const params = new URLSearchParams({ metric: seriesItem.metric });
-        if (startDate) params.set("start", toIsoWithOffset(startDate, startHour, startMinute, startSecond));
-        if (endDate) params.set("end", toIsoWithOffset(endDate, endHour, endMinute, endSecond));
-        const res = await fetch(apiUrl(`/api/economics/data?${params.toString()}`));
-        const data = await res.json();
-        return {
-            label: seriesItem.label,
-            points: data.points || [],
-        };
+    const query = {
+        series: selectedSeries.map((seriesItem) => {
+            const item = {
+                device_type: catalogData.device_type || "economics",
+                device_id: catalogData.device_id || "market",
+                metric: seriesItem.metric,
+            };
+            const gapMs = getMetricGapMs(seriesItem.metric);
+            if (gapMs !== null) item.gap_ms = Math.round(gapMs);
+            return item;
+        }),
+        max_points: chartPointBudget(),
+    };
+    if (startDate) query.start = toIsoWithOffset(startDate, startHour, startMinute, startSecond);
+    if (endDate) query.end = toIsoWithOffset(endDate, endHour, endMinute, endSecond);
+    const res = await fetch(apiUrl("/api/metrics/query"), {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(query),
     });
-    const metricSeries = await Promise.all(requests);
+    const data = res.ok ? await res.json() : { series: [] };
+    const metricSeries = selectedSeries.map((seriesItem, index) => ({
+        label: seriesItem.label,
+        points: ((data.series || [])[index] || {}).points || [],
+    }));
 
     if (chart) chart.destroy();
     const datasets = metricSeries.map((seriesData, index) => {
-        const gapMs = getMetricGapMs(selectedSeries[index] && selectedSeries[index].metric);
-        const series = [];
-        seriesData.points.forEach((point, pointIndex) => {
-            const ts = point.ts;
-            if (pointIndex > 0) {
-                const prevTs = seriesData.points[pointIndex - 1].ts;
-                if (gapMs !== null && ts - prevTs > gapMs) {
-                    series.push({ x: prevTs + gapMs, y: null });
-                }
-            }
-            series.push({ x: ts, y: point.value });
-        });
+        // Gaps arrive from the server as points with a null value.
+        const series = seriesData.points.map((point) => ({ x: point.ts, y: point.value }));
         const color = palette[index % palette.length];
         return {
             label: seriesData.label,
@@ -423,7 +431,7 @@ async function loadChart() {
         };
     });
 
-    const hasPoints = metricSeries.some((seriesData) => seriesData.points.length > 0);
+    const hasPoints = metricSeries.some((seriesData) => seriesData.points.some((point) => point.value !== null));
     emptyEl.textContent = hasPoints ? "" : "No data for the selected range.";
     chart = new Chart(ctx, {
         type: "line",
@@ -18,6 +18,7 @@ let deviceTypes = [];
 let metricsCatalog = {};
 const metricRows = [];
 const STORAGE_KEY = "proof_of_heat_metrics_view_v2";
+const GAP_MS = 12 * 60 * 1000;
 const palette = ["#2563eb", "#dc2626", "#16a34a", "#7c3aed", "#ea580c", "#0891b2", "#db2777", "#0f766e"];
 
 function setOptions(select, options) {
@@ -353,6 +354,11 @@ function createMetricRow(initialState = null) {
     return row;
 }
 
+function chartPointBudget() {
+    // About two points per horizontal pixel is as much as a line chart can show.
+    return Math.max(200, Math.round(ctx.canvas.clientWidth * 2) || 0);
+}
+
 async function loadChart() {
     const selectedSeries = collectSelectedSeries();
     if (!selectedSeries.length) {
@@ -375,35 +381,32 @@ async function loadChart() {
     const startMs = parseLocalInputToMs(startDate, startHour, startMinute, startSecond);
     const endMs = parseLocalInputToMs(endDate, endHour, endMinute, endSecond);
 
-    const requests = selectedSeries.map(async (seriesItem) => {
-        const params = new URLSearchParams({
+    const query = {
+        series: selectedSeries.map((seriesItem) => ({
             device_type: seriesItem.deviceType,
             device_id: seriesItem.deviceId,
             metric: seriesItem.metric,
-        });
-        if (startDate) params.set("start", toIsoWithOffset(startDate, startHour, startMinute, startSecond));
-        if (endDate) params.set("end", toIsoWithOffset(endDate, endHour, endMinute, endSecond));
-        const res = await fetch(apiUrl(`/api/metrics/data?${params.toString()}`));
-        const data = await res.json();
-        return {
-            label: `${seriesItem.deviceType} ${seriesItem.deviceId} · ${seriesItem.label}`,
-            points: data.points || [],
-        };
+        })),
+        max_points: chartPointBudget(),
+        gap_ms: GAP_MS,
+    };
+    if (startDate) query.start = toIsoWithOffset(startDate, startHour, startMinute, startSecond);
+    if (endDate) query.end = toIsoWithOffset(endDate, endHour, endMinute, endSecond);
+    const res = await fetch(apiUrl("/api/metrics/query"), {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(query),
     });
-    const metricSeries = await Promise.all(requests);
+    const data = res.ok ? await res.json() : { series: [] };
+    const metricSeries = selectedSeries.map((seriesItem, index) => ({
+        label: `${seriesItem.deviceType} ${seriesItem.deviceId} · ${seriesItem.label}`,
+        points: ((data.series || [])[index] || {}).points || [],
+    }));
 
     if (chart) chart.destroy();
     const datasets = metricSeries.map((seriesData, index) => {
-        const gapMs = 12 * 60 * 1000;
-        const series = [];
-        seriesData.points.forEach((point, pointIndex) => {
-            const ts = point.ts;
-            if (pointIndex > 0) {
-                const prevTs = seriesData.points[pointIndex - 1].ts;
-                if (ts - prevTs > gapMs) series.push({ x: prevTs + gapMs, y: null });
-            }
-            series.push({ x: ts, y: point.value });
-        });
+        // Gaps arrive from the server as points with a null value.
+        const series = seriesData.points.map((point) => ({ x: point.ts, y: point.value }));
         const color = palette[index % palette.length];
         return {
             label: seriesData.label,
@@ -416,7 +419,7 @@ async function loadChart() {
         };
     });
 
-    const hasPoints = metricSeries.some((seriesData) => seriesData.points.length > 0);
+    const hasPoints = metricSeries.some((seriesData) => seriesData.points.some((point) => point.value !== null));
     emptyEl.textContent = hasPoints ? "" : "No data for the selected range.";
     chart = new Chart(ctx, {
         type: "line",
@@ -0,0 +1,920 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the telemetry storage paths.
+
+Run from the repository root, for example:
+
+    python scripts/benchmark_telemetry.py connections --ticks 200
+    python scripts/benchmark_telemetry.py schema --days 365
+    python scripts/benchmark_telemetry.py series --days 30
+    python scripts/benchmark_telemetry.py encoding --points 100000
+    python scripts/benchmark_telemetry.py payloads --events 2000
+    python scripts/benchmark_telemetry.py catalog --days 90
+    python scripts/benchmark_telemetry.py stitch --rows 10000000
+    python scripts/benchmark_telemetry.py settings --ticks 1000
+    python scripts/benchmark_telemetry.py startup --devices 5 --delay-seconds 2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from proof_of_heat.services.device_polling import (  # noqa: E402
+    DevicePoller,
+    PollWriteBatch,
+)
+from proof_of_heat.services.metrics import MetricSample  # noqa: E402
+from proof_of_heat.services.payload_compression import zstd_available  # noqa: E402
+from proof_of_heat.services.series_cache import SeriesCacheOptions  # noqa: E402
+from proof_of_heat.services.series_encoding import encode_binary, encode_columnar  # noqa: E402
+from proof_of_heat.services.sqlite_logging import connect_logged_sqlite  # noqa: E402
+from proof_of_heat.settings import load_default_settings_yaml, parse_settings_yaml  # noqa: E402
+from proof_of_heat.settings_store import SettingsStore  # noqa: E402
+
+logger = logging.getLogger("proof_of_heat.benchmark")
+
+BENCH_CONTROL_INPUTS = {
+    "max_age_seconds": 180,
+    "indoor_temp": {
+        "select": "highest_priority_available",
+        "sources": [{"device_type": "zont", "device_id": "12000", "metric": "room_temp"}],
+    },
+    "supply_temp": {
+        "select": "highest_priority_available",
+        "sources": [{"device_type": "zont", "device_id": "12000", "metric": "boiler_feed_temp"}],
+    },
+    "power": {
+        "select": "sum_all_available",
+        "default": 0,
+        "sources": [{"device_type": "whatsminer", "device_id": "miner01", "metric": "power"}],
+    },
+}
+
+
+# Layout of the metrics table before the series/samples split, kept here so
+# the schema benchmark can compare against it.
+LEGACY_METRICS_DDL = (
+    """
+    CREATE TABLE metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        device_type TEXT NOT NULL,
+        device_id TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        value REAL NOT NULL,
+        unit TEXT,
+        labels TEXT,
+        component TEXT
+    )
+    """,
+    "CREATE INDEX idx_metrics_device_metric_ts ON metrics (device_id, metric, ts)",
+    "CREATE INDEX idx_metrics_type_device_id ON metrics (device_type, device_id)",
+    "CREATE INDEX idx_metrics_type_device_metric_ts ON metrics (device_type, device_id, metric, ts)",
+)
+
+
+def _print_result(name: str, result: dict[str, Any]) -> None:
+    print(json.dumps({"benchmark": name, **result}, sort_keys=True))
+
+
+def _timed(callback: Callable[[], Any]) -> tuple[float, Any]:
+    started_at = time.perf_counter()
+    result = callback()
+    return time.perf_counter() - started_at, result
+
+
+def _synthetic_metrics(tick: int, count: int) -> list[MetricSample]:
+    return [
+        MetricSample(name=f"metric_{idx}", value=float(tick + idx), unit="celsius")
+        for idx in range(count)
+    ]
+
+
+def bench_connections(args: argparse.Namespace) -> None:
+    payload = {"summary": {"power": 3200, "board-temperature": [60.0, 61.0, 62.0]}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        connect_calls = 0
+        original_connect = sqlite3.connect
+
+        def counting_connect(*connect_args: Any, **connect_kwargs: Any) -> sqlite3.Connection:
+            nonlocal connect_calls
+            connect_calls += 1
+            return original_connect(*connect_args, **connect_kwargs)
+
+        per_call_path = Path(tmp_dir) / "per_call.sqlite3"
+        schema_poller = DevicePoller({}, data_dir=None)
+        with sqlite3.connect(per_call_path) as conn:
+            schema_poller._ensure_tables(conn)
+
+        def per_call_tick(tick: int) -> None:
+            # Mirrors the previous write path: one connection per raw event
+            # insert and one per metrics batch.
+            with connect_logged_sqlite(per_call_path, logger=logger) as conn:
+                conn.execute(
+                    "INSERT INTO raw_events (ts, device_type, device_id, codec, payload) VALUES (?, ?, ?, 'zlib', ?)",
+                    (tick, "whatsminer", "miner01", zlib.compress(json.dumps(payload).encode())),
+                )
+            with connect_logged_sqlite(per_call_path, logger=logger) as conn:
+                conn.executemany(
+                    "INSERT INTO metrics (ts, device_type, device_id, metric, value, unit) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (tick, "whatsminer", "miner01", sample.name, sample.value, sample.unit)
+                        for sample in _synthetic_metrics(tick, args.metrics)
+                    ],
+                )
+
+        poller = DevicePoller(
+            {"control_inputs": BENCH_CONTROL_INPUTS},
+            data_dir=Path(tmp_dir),
+        )
+        poller._write_raw_event(ts_ms=0, device_type="whatsminer", device_id="miner01", payload=payload)
+
+        def pooled_tick(tick: int) -> None:
+            poller._write_raw_event(ts_ms=tick, device_type="whatsminer", device_id="miner01", payload=payload)
+            poller._write_metrics(
+                ts_ms=tick,
+                device_type="whatsminer",
+                device_id="miner01",
+                metrics=_synthetic_metrics(tick, args.metrics),
+            )
+
+        def batched_tick(tick: int) -> None:
+            poller._commit_poll_batch(
+                PollWriteBatch(
+                    ts_ms=tick,
+                    device_type="whatsminer",
+                    device_id="miner01",
+                    payload=payload,
+                    metrics=_synthetic_metrics(tick, args.metrics),
+                )
+            )
+
+        sqlite3.connect = counting_connect  # type: ignore[assignment]
+        try:
+            for name, tick_fn in (
+                ("per_call", per_call_tick),
+                ("pooled", pooled_tick),
+                ("batched", batched_tick),
+            ):
+                connect_calls = 0
+                commits_before = poller._db.stats()["writer_transactions"]
+                elapsed, _ = _timed(lambda: [tick_fn(tick) for tick in range(1, args.ticks + 1)])
+                commits = poller._db.stats()["writer_transactions"] - commits_before
+                _print_result(
+                    f"connections.{name}",
+                    {
+                        "ticks": args.ticks,
+                        "connects_per_tick": connect_calls / args.ticks,
+                        "commits_per_tick": (commits / args.ticks) if name != "per_call" else 2.0,
+                        "ms_per_tick": elapsed * 1000 / args.ticks,
+                    },
+                )
+        finally:
+            sqlite3.connect = original_connect  # type: ignore[assignment]
+            poller.shutdown()
+
+
+def _drift(tick: int, center: float, amplitude: float, digits: int) -> float:
+    """A reading that wanders slowly around ``center``, like a temperature."""
+    return round(center + amplitude * math.sin(tick / 120), digits)
+
+
+def _whatsminer_payload(tick: int, rng: random.Random) -> dict[str, Any]:
+    """Shaped like a Whatsminer summary + pools + device info poll."""
+    when = f"2026-03-29T10:{tick % 60:02d}:00+00:00"
+    summary = {
+        "elapsed": 86_400 + tick * 30,
+        "bootup-time": 1_774_700_000,
+        "freq-avg": int(_drift(tick, 612, 3, 0)),
+        "target-freq": 615,
+        "target-workmode": "normal",
+        "hash-realtime": round(94.8 + rng.uniform(-2, 2), 3),
+        "hash-average": _drift(tick, 95.1, 0.2, 2),
+        "hash-nominal": 96.0,
+        "environment-temperature": _drift(tick, 22, 1, 1),
+        "board-temperature": [_drift(tick + board * 7, 68, 3, 1) for board in range(3)],
+        "chip-temp-min": _drift(tick, 61, 2, 1),
+        "chip-temp-avg": _drift(tick, 74, 2, 1),
+        "chip-temp-max": _drift(tick, 86, 2, 1),
+        "power-limit": 3_600,
+        "power-realtime": 3_300 + rng.randint(-40, 40),
+        "power-rate": _drift(tick, 34.5, 0.5, 1),
+        "fan-speed-in": 4_980 + rng.randint(-60, 60),
+        "fan-speed-out": 5_010 + rng.randint(-60, 60),
+        "upfreq-complete": 1,
+        "power-mode": "Normal",
+        "factory-hash": 96.2,
+        "btminer-uptime": 86_400 + tick * 30,
+    }
+    pools = [
+        {
+            "id": index,
+            "url": f"stratum+tcp://pool{index}.example.com:3333",
+            "status": "alive",
+            "account": f"wallet.worker{index}",
+            "stratum-active": index == 1,
+            "reject-rate": _drift(tick, 0.5, 0.5, 2),
+            "last-share-time": 1_774_739_000 + tick * 30,
+            "accepted": 120_000 + tick * 4 + index,
+            "rejected": 350 + tick // 50,
+            "stale": 12,
+        }
+        for index in range(1, 4)
+    ]
+    device_info = {
+        "network": {"ip": "192.168.1.50", "proto": "dhcp", "netmask": "255.255.255.0", "dns": "192.168.1.1"},
+        "miner": {"type": "M50S++VL30", "hash-board": "HB_M50S", "working": "true", "pcbsn": "AB1234567890"},
+        "system": {"api": "2.0.6", "platform": "H6OS", "fwversion": "20250214.22.REL", "ledstatus": "auto"},
+        "power": {
+            "model": "P221B",
+            "iin": round(7.96 + rng.uniform(-0.1, 0.1), 2),
+            "vin": int(_drift(tick, 234, 2, 0)),
+            "vout": 1135,
+            "pin": 1869 + rng.randint(-20, 20),
+            "fanspeed": 4992,
+            "temp0": int(_drift(tick, 50, 1, 0)),
+        },
+    }
+    return {
+        "summary": {"code": 0, "when": when, "msg": {"summary": summary}},
+        "pools": {"code": 0, "when": when, "msg": {"pools": pools}},
+        "device_info": {"code": 0, "when": when, "msg": device_info},
+    }
+
+
+def _zont_payload(tick: int, rng: random.Random) -> dict[str, Any]:
+    """Shaped like the device object of a ZONT ``/api/devices`` response."""
+    now = 1_774_739_307 + tick * 60
+    thermometers = {
+        f"{index:024x}": {
+            "last_state": "ok",
+            "last_value": _drift(tick + index * 11, 20 + index, 0.5, 1),
+            "last_value_time": now,
+        }
+        for index in range(12)
+    }
+    circuits = [
+        {
+            "id": 1000 + index,
+            "name": name,
+            "target_temp": 21 + index,
+            "worktime": index * 1_000 + tick,
+            "status": "heating" if index % 2 else "idle",
+            "current_mode": 1,
+            "actual_temp": _drift(tick + index * 5, 20, 1, 1),
+        }
+        for index, name in enumerate(["Radiators", "Floor", "DHW", "Garage"])
+    ]
+    return {
+        "provider": "zont",
+        "serial": "SN-0123456789",
+        "device": {
+            "id": 12000,
+            "name": "Boiler room",
+            "model": "H2000+",
+            "serial": "SN-0123456789",
+            "online": True,
+            "temp_out": _drift(tick, -2, 1, 1),
+            "firmware_version": [2, 4, 1],
+            "timezone": 180,
+            "circuits": circuits,
+            "io": {
+                "thermometers-state": thermometers,
+                "last-boiler-state": {
+                    "target_temp": 55,
+                    "power": True,
+                    "ot": {"ff": True, "cs": 55, "rbt": _drift(tick, 52, 2, 1), "mrm": 100},
+                    "boiler_work_time": 12_000 + tick,
+                },
+                "heating-circuits-state": {str(circuit["id"]): {"work": True} for circuit in circuits},
+                "guard-state": {"state": "disabled", "alarm": False},
+                "power": {"voltage": _drift(tick, 12.1, 0.1, 2), "source": "main"},
+            },
+        },
+    }
+
+
+def bench_payloads(args: argparse.Namespace) -> None:
+    rng = random.Random(1)
+    # One poll of each device every 30 seconds.
+    events = [
+        (tick * 30_000, device_type, payload)
+        for tick in range(args.events)
+        for device_type, payload in (
+            ("whatsminer", _whatsminer_payload(tick, rng)),
+            ("zont", _zont_payload(tick, rng)),
+        )
+    ]
+    change_only = {"enabled": True, "keyframe_interval_seconds": 3_600}
+    variants: list[tuple[str, dict[str, Any] | None]] = [
+        ("text", None),
+        ("zlib", {"payload_compression": {"codec": "zlib"}}),
+        ("zlib_dictionary", {"payload_compression": {"codec": "zlib", "dictionary": True}}),
+        ("zlib_change_only", {"payload_compression": {"codec": "zlib"}, "change_only": change_only}),
+        (
+            "zlib_dictionary_change_only",
+            {"payload_compression": {"codec": "zlib", "dictionary": True}, "change_only": change_only},
+        ),
+    ]
+    if zstd_available():
+        variants.append(("zstd", {"payload_compression": {"codec": "zstd"}}))
+        variants.append(("zstd_dictionary", {"payload_compression": {"codec": "zstd", "dictionary": True}}))
+
+    for name, database in variants:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if database is None:
+                # The previous layout: the JSON text as it was stored before.
+                path = Path(tmp_dir) / "telemetry.sqlite3"
+                with sqlite3.connect(path) as conn:
+                    conn.execute(
+                        """
+                        CREATE TABLE raw_events (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            ts INTEGER NOT NULL,
+                            device_type TEXT NOT NULL,
+                            device_id TEXT NOT NULL,
+                            payload TEXT NOT NULL
+                        )
+                        """
+                    )
+                    elapsed, _ = _timed(
+                        lambda: conn.executemany(
+                            "INSERT INTO raw_events (ts, device_type, device_id, payload) VALUES (?, ?, 'dev1', ?)",
+                            [(tick, device_type, json.dumps(payload)) for tick, device_type, payload in events],
+                        )
+                    )
+                    payload_bytes = conn.execute("SELECT SUM(length(payload)) FROM raw_events").fetchone()[0]
+                    conn.commit()
+                read_ms = None
+            else:
+                poller = DevicePoller({"database": database}, data_dir=Path(tmp_dir))
+                path = Path(tmp_dir) / "telemetry.sqlite3"
+                try:
+
+                    def insert_all() -> None:
+                        with poller._db.writer() as conn:
+                            for tick, device_type, payload in events:
+                                poller._insert_raw_event(
+                                    conn,
+                                    PollWriteBatch(ts_ms=tick, device_type=device_type, device_id="dev1", payload=payload),
+                                )
+
+                    elapsed, _ = _timed(insert_all)
+                    with poller._db.writer() as conn:
+                        payload_bytes = conn.execute("SELECT SUM(length(payload)) FROM raw_events").fetchone()[0]
+                    read_seconds, _ = _timed(
+                        lambda: [poller.get_raw_events(device_type, "dev1", limit=args.events) for device_type in ("whatsminer", "zont")]
+                    )
+                    read_ms = read_seconds * 1000
+                finally:
+                    poller.shutdown()
+            # Compact both layouts the same way so the file sizes compare.
+            with sqlite3.connect(path, isolation_level=None) as conn:
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            _print_result(
+                f"payloads.{name}",
+                {
+                    "events": len(events),
+                    "bytes_per_payload": round(payload_bytes / len(events), 1),
+                    "db_mb": _file_size_mb(path),
+                    "insert_us_per_event": elapsed * 1_000_000 / len(events),
+                    "read_all_ms": read_ms,
+                },
+            )
+
+
+def _synthetic_series(count: int) -> list[tuple[str, str, str, str]]:
+    return [
+        ("whatsminer", f"miner{idx // 20:02d}", f"metric_{idx % 20}", "celsius")
+        for idx in range(count)
+    ]
+
+
+def _file_size_mb(path: Path) -> float:
+    return sum(
+        candidate.stat().st_size
+        for candidate in (path, path.with_name(path.name + "-wal"))
+        if candidate.exists()
+    ) / (1024 * 1024)
+
+
+def bench_schema(args: argparse.Namespace) -> None:
+    series = _synthetic_series(args.series)
+    ticks = args.days * 86_400 // args.interval_seconds
+    interval_ms = args.interval_seconds * 1000
+    query_series = series[len(series) // 2]
+    query_end = ticks * interval_ms
+    query_start = max(0, query_end - 86_400_000)
+
+    def legacy_insert(conn: sqlite3.Connection, tick: int) -> None:
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (tick * interval_ms, device_type, device_id, metric, float(tick), unit)
+                for device_type, device_id, metric, unit in series
+            ],
+        )
+
+    def legacy_query(conn: sqlite3.Connection) -> list[Any]:
+        return conn.execute(
+            """
+            SELECT ts, value FROM metrics
+            WHERE device_type = ? AND device_id = ? AND metric = ? AND ts BETWEEN ? AND ?
+            ORDER BY ts
+            """,
+            (*query_series[:3], query_start, query_end),
+        ).fetchall()
+
+    poller = DevicePoller({}, data_dir=None)
+
+    def normalized_insert(conn: sqlite3.Connection, tick: int) -> None:
+        poller._insert_metric_rows(
+            conn,
+            [
+                {
+                    "ts": tick * interval_ms,
+                    "device_type": device_type,
+                    "device_id": device_id,
+                    "metric": metric,
+                    "value": float(tick),
+                    "unit": unit,
+                }
+                for device_type, device_id, metric, unit in series
+            ],
+        )
+
+    def normalized_query(conn: sqlite3.Connection) -> list[Any]:
+        return conn.execute(
+            """
+            SELECT ts, value FROM samples
+            WHERE series_id = (
+                SELECT id FROM series WHERE device_type = ? AND device_id = ? AND metric = ?
+            )
+              AND ts BETWEEN ? AND ?
+            ORDER BY ts
+            """,
+            (*query_series[:3], query_start, query_end),
+        ).fetchall()
+
+    def create_legacy(conn: sqlite3.Connection) -> None:
+        for statement in LEGACY_METRICS_DDL:
+            conn.execute(statement)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, create, insert, query in (
+            ("legacy", create_legacy, legacy_insert, legacy_query),
+            ("normalized", poller._ensure_tables, normalized_insert, normalized_query),
+        ):
+            path = Path(tmp_dir) / f"{name}.sqlite3"
+            conn = sqlite3.connect(path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                with conn:
+                    create(conn)
+
+                def insert_all() -> None:
+                    for start in range(0, ticks, args.ticks_per_commit):
+                        with conn:
+                            for tick in range(start, min(start + args.ticks_per_commit, ticks)):
+                                insert(conn, tick)
+
+                insert_elapsed, _ = _timed(insert_all)
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                query_elapsed, points = _timed(lambda: [query(conn) for _ in range(args.queries)])
+                _print_result(
+                    f"schema.{name}",
+                    {
+                        "rows": ticks * len(series),
+                        "file_mb": round(_file_size_mb(path), 2),
+                        "insert_rows_per_s": round(ticks * len(series) / insert_elapsed),
+                        "day_query_ms": query_elapsed * 1000 / args.queries,
+                        "day_query_points": len(points[0]),
+                    },
+                )
+            finally:
+                conn.close()
+
+
+def bench_catalog(args: argparse.Namespace) -> None:
+    series = _synthetic_series(args.series)
+    ticks = args.days * 86_400 // args.interval_seconds
+    interval_ms = args.interval_seconds * 1000
+    poller = DevicePoller({}, data_dir=None)
+
+    def scan_catalog(conn: sqlite3.Connection) -> list[Any]:
+        # The query the catalog was loaded with before metric_catalog existed.
+        return conn.execute(
+            """
+            SELECT device_type, device_id, metric
+            FROM series
+            WHERE EXISTS (SELECT 1 FROM samples WHERE samples.series_id = series.id)
+               OR EXISTS (SELECT 1 FROM sample_rollups WHERE sample_rollups.series_id = series.id)
+            ORDER BY device_type, device_id, metric
+            """
+        ).fetchall()
+
+    def insert_samples(conn: sqlite3.Connection, rows: list[dict[str, Any]]) -> None:
+        # The sample write without the metric_catalog update.
+        conn.executemany(
+            """
+            INSERT INTO samples (series_id, ts, value)
+            VALUES (?, ?, ?)
+            ON CONFLICT (series_id, ts) DO UPDATE SET value = excluded.value
+            """,
+            [
+                (
+                    poller._resolve_series_id(
+                        conn,
+                        device_type=row["device_type"],
+                        device_id=row["device_id"],
+                        metric=row["metric"],
+                        unit=row["unit"],
+                    ),
+                    row["ts"],
+                    row["value"],
+                )
+                for row in rows
+            ],
+        )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, with_catalog in (("without_catalog", False), ("with_catalog", True)):
+            path = Path(tmp_dir) / f"{name}.sqlite3"
+            conn = sqlite3.connect(path)
+            insert = poller._insert_metric_rows if with_catalog else insert_samples
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                with conn:
+                    poller._ensure_tables(conn)
+
+                def insert_all() -> None:
+                    for start in range(0, ticks, args.ticks_per_commit):
+                        with conn:
+                            insert(
+                                conn,
+                                [
+                                    {
+                                        "ts": tick * interval_ms,
+                                        "device_type": device_type,
+                                        "device_id": device_id,
+                                        "metric": metric,
+                                        "value": float(tick),
+                                        "unit": unit,
+                                    }
+                                    for tick in range(start, min(start + args.ticks_per_commit, ticks))
+                                    for device_type, device_id, metric, unit in series
+                                ],
+                            )
+
+                insert_elapsed, _ = _timed(insert_all)
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                if with_catalog:
+                    load = poller._load_metric_catalog_from_db
+                else:
+                    load = scan_catalog
+                load_elapsed, _ = _timed(lambda: [load(conn) for _ in range(args.queries)])
+                _print_result(
+                    f"catalog.{name}",
+                    {
+                        "rows": ticks * len(series),
+                        "file_mb": round(_file_size_mb(path), 2),
+                        "insert_rows_per_s": round(ticks * len(series) / insert_elapsed),
+                        "catalog_load_ms": load_elapsed * 1000 / args.queries,
+                    },
+                )
+            finally:
+                conn.close()
+
+
+def bench_stitch(args: argparse.Namespace) -> None:
+    """Read one series that spans raw samples and two rollup tiers."""
+    now_ms = int(time.time() * 1000)
+    raw_days = 7
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 86_400,
+                    "raw_retention_seconds": raw_days * 86_400,
+                    "rollups": [
+                        {"resolution_seconds": 60, "retention_seconds": 90 * 86_400},
+                        {"resolution_seconds": 3_600, "retention_seconds": 730 * 86_400},
+                    ],
+                }
+            }
+        }
+    }
+    raw_start_ms = now_ms - raw_days * 86_400_000
+    tiers = (
+        (60, now_ms - 90 * 86_400_000, raw_start_ms),
+        (3_600, now_ms - 730 * 86_400_000, now_ms - 90 * 86_400_000),
+    )
+    # The read series gets a sample every second inside the raw window; the
+    # remaining rows go to other series so the tables have realistic depth.
+    series_rows = raw_days * 86_400 + sum((end - start) // (resolution * 1000) for resolution, start, end in tiers)
+    filler_series = max(0, -(-(args.rows - series_rows) // (raw_days * 86_400 // 30)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        poller = DevicePoller(settings, data_dir=Path(tmp_dir))
+        try:
+            with poller._db.writer() as conn:
+                series_id = poller._resolve_series_id(conn, "whatsminer", "miner01", "power", "w")
+                conn.executemany(
+                    "INSERT INTO samples (series_id, ts, value) VALUES (?, ?, ?)",
+                    ((series_id, ts, float(ts % 3_600_000)) for ts in range(raw_start_ms, now_ms, 1_000)),
+                )
+                for resolution, start, end in tiers:
+                    conn.executemany(
+                        """
+                        INSERT INTO sample_rollups (series_id, resolution_seconds, ts, value, min_value, max_value)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            (series_id, resolution, ts, float(ts % 3_600_000), 0.0, 3_600_000.0)
+                            for ts in range(start - start % (resolution * 1000), end, resolution * 1000)
+                        ),
+                    )
+                for index in range(filler_series):
+                    filler_id = poller._resolve_series_id(conn, "zont", f"device{index:03d}", "room_temp", "celsius")
+                    conn.executemany(
+                        "INSERT INTO samples (series_id, ts, value) VALUES (?, ?, ?)",
+                        ((filler_id, ts, 20.0) for ts in range(raw_start_ms, now_ms, 30_000)),
+                    )
+            with poller._db.reader() as conn:
+                total_rows = conn.execute(
+                    "SELECT (SELECT COUNT(*) FROM samples) + (SELECT COUNT(*) FROM sample_rollups)"
+                ).fetchone()[0]
+
+            for name, options, cached in (
+                (name, options, cached)
+                for cached in (False, True)
+                for name, options in (
+                    ("full", {}),
+                    ("budget", {"max_points": args.max_points}),
+                    ("week", {"start_ms": now_ms - 7 * 86_400_000}),
+                )
+            ):
+                # With the cache the warm-up read fills it and the timed
+                # reads only go to SQLite for the live tail.
+                poller._series_points_cache.configure(SeriesCacheOptions(enabled=cached))
+                if cached:
+                    name = f"{name}_cached"
+                query = {"start_ms": None, "end_ms": None, **options}
+
+                def read() -> tuple[list[int], list[float | None]]:
+                    return poller.get_metric_columns("whatsminer", "miner01", "power", **query)
+
+                read()
+                elapsed, results = _timed(lambda: [read() for _ in range(args.repeat)])
+                tracemalloc.start()
+                read()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                _print_result(
+                    f"stitch.{name}",
+                    {
+                        "rows": total_rows,
+                        "points": len(results[0][0]),
+                        "ms_per_read": elapsed * 1000 / args.repeat,
+                        "peak_mb": round(peak / (1024 * 1024), 1),
+                    },
+                )
+        finally:
+            poller.shutdown()
+
+
+def bench_series(args: argparse.Namespace) -> None:
+    interval_ms = args.interval_seconds * 1000
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - args.days * 86_400_000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        poller = DevicePoller({}, data_dir=Path(tmp_dir))
+        try:
+            with poller._db.writer() as conn:
+                poller._insert_metric_rows(
+                    conn,
+                    [
+                        {
+                            "ts": ts,
+                            "device_type": "whatsminer",
+                            "device_id": "miner01",
+                            "metric": "power",
+                            "value": float(ts % 3_600_000),
+                            "unit": "w",
+                        }
+                        for ts in range(start_ms, end_ms, interval_ms)
+                    ],
+                )
+
+            for name, options in (
+                ("full", {}),
+                ("budget", {"max_points": args.max_points, "gap_ms": args.gap_ms}),
+            ):
+                def respond() -> bytes:
+                    points = poller.get_metric_series(
+                        "whatsminer",
+                        "miner01",
+                        "power",
+                        start_ms,
+                        end_ms,
+                        **options,
+                    )
+                    return json.dumps({"points": points}).encode()
+
+                elapsed, body = _timed(lambda: [respond() for _ in range(args.repeat)])
+                _print_result(
+                    f"series.{name}",
+                    {
+                        "points": len(json.loads(body[0])["points"]),
+                        "response_kb": round(len(body[0]) / 1024, 1),
+                        "ms_per_response": elapsed * 1000 / args.repeat,
+                    },
+                )
+        finally:
+            poller.shutdown()
+
+
+def bench_encoding(args: argparse.Namespace) -> None:
+    start_ms = int(time.time() * 1000) - args.points * 30_000
+    ts = [start_ms + index * 30_000 for index in range(args.points)]
+    values: list[float | None] = [float(index % 3_600) / 10 for index in range(args.points)]
+    # A gap marker every thousand points, like a flaky sensor would produce.
+    values[::1000] = [None] * len(values[::1000])
+
+    encoders: dict[str, Callable[[], bytes]] = {
+        "json": lambda: json.dumps(
+            {"points": [{"ts": t, "value": v} for t, v in zip(ts, values)]}
+        ).encode(),
+        "columnar": lambda: json.dumps(encode_columnar(ts, values)).encode(),
+        "binary": lambda: encode_binary(ts, values),
+    }
+    for name, encode in encoders.items():
+        elapsed, body = _timed(lambda: [encode() for _ in range(args.repeat)])
+        _print_result(
+            f"encoding.{name}",
+            {
+                "points": args.points,
+                "response_kb": round(len(body[0]) / 1024, 1),
+                "ms_per_100k_points": elapsed * 1000 / args.repeat * 100_000 / args.points,
+            },
+        )
+
+
+def bench_settings(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "settings.yaml"
+        path.write_text(load_default_settings_yaml(), encoding="utf-8")
+
+        def load_yaml() -> str:
+            return path.read_text(encoding="utf-8")
+
+        def signature() -> tuple[int, int]:
+            stat = path.stat()
+            return stat.st_mtime_ns, stat.st_size
+
+        elapsed, _ = _timed(lambda: [parse_settings_yaml(load_yaml()) for _ in range(args.ticks)])
+        _print_result("settings.parse_per_tick", {"ticks": args.ticks, "us_per_tick": elapsed * 1e6 / args.ticks})
+
+        store = SettingsStore(
+            load_yaml=load_yaml,
+            parse_yaml=parse_settings_yaml,
+            save_yaml=parse_settings_yaml,
+            signature=signature,
+            logger=logger,
+        )
+        store.snapshot()
+        elapsed, _ = _timed(lambda: [store.data for _ in range(args.ticks)])
+        _print_result("settings.store_per_tick", {"ticks": args.ticks, "us_per_tick": elapsed * 1e6 / args.ticks})
+
+        # A changed file is read and validated once, on the first access after the change.
+        reloads = max(args.ticks // 100, 1)
+
+        def reload() -> None:
+            for index in range(reloads):
+                path.write_text(f"{load_default_settings_yaml()}\n# edit {index}\n", encoding="utf-8")
+                store.data
+
+        elapsed, _ = _timed(reload)
+        _print_result(
+            "settings.store_reload",
+            {"reloads": store.stats()["reloads"] - 1, "us_per_reload": elapsed * 1e6 / reloads},
+        )
+
+
+def bench_startup(args: argparse.Namespace) -> None:
+    def slow_poll(self: DevicePoller, device: dict[str, Any], request: dict[str, Any] | None = None) -> dict[str, Any]:
+        # Stands in for an unreachable miner that only fails after its timeouts.
+        time.sleep(args.delay_seconds)
+        return {"device_id": device["device_id"], "error": "timed out"}
+
+    DevicePoller.poll_whatsminer_device = slow_poll  # type: ignore[method-assign]
+    settings = {
+        "devices": {
+            "whatsminer": [{"device_id": f"miner{index:02d}"} for index in range(args.devices)],
+        },
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        poller = DevicePoller(settings, data_dir=Path(tmp))
+        try:
+            start_s, _ = _timed(poller.start)
+            ready_s, _ = _timed(lambda: _wait_until_ready(poller))
+        finally:
+            poller.shutdown()
+    _print_result(
+        "startup",
+        {
+            "devices": args.devices,
+            "delay_seconds": args.delay_seconds,
+            "start_returned_ms": start_s * 1000,
+            "ready_after_ms": (start_s + ready_s) * 1000,
+        },
+    )
+
+
+def _wait_until_ready(poller: DevicePoller) -> None:
+    while not poller.get_readiness()["ready"]:
+        time.sleep(0.01)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    connections = subparsers.add_parser("connections", help="connects and latency per poll tick")
+    connections.add_argument("--ticks", type=int, default=200)
+    connections.add_argument("--metrics", type=int, default=40)
+    connections.set_defaults(handler=bench_connections)
+
+    schema = subparsers.add_parser("schema", help="legacy vs normalized metric storage")
+    schema.add_argument("--days", type=int, default=365)
+    schema.add_argument("--series", type=int, default=40)
+    schema.add_argument("--interval-seconds", type=int, default=60)
+    schema.add_argument("--ticks-per-commit", type=int, default=100)
+    schema.add_argument("--queries", type=int, default=20)
+    schema.set_defaults(handler=bench_schema)
+
+    series = subparsers.add_parser("series", help="metric series response size and latency")
+    series.add_argument("--days", type=int, default=30)
+    series.add_argument("--interval-seconds", type=int, default=30)
+    series.add_argument("--max-points", type=int, default=2000)
+    series.add_argument("--gap-ms", type=int, default=720_000)
+    series.add_argument("--repeat", type=int, default=5)
+    series.set_defaults(handler=bench_series)
+
+    encoding = subparsers.add_parser("encoding", help="series serialization cost per format")
+    encoding.add_argument("--points", type=int, default=100_000)
+    encoding.add_argument("--repeat", type=int, default=5)
+    encoding.set_defaults(handler=bench_encoding)
+
+    payloads = subparsers.add_parser("payloads", help="raw_events payload storage per compression codec")
+    payloads.add_argument("--events", type=int, default=2000, help="polls per device type")
+    payloads.set_defaults(handler=bench_payloads)
+
+    catalog = subparsers.add_parser("catalog", help="metric catalog load time and ingest cost")
+    catalog.add_argument("--days", type=int, default=90)
+    catalog.add_argument("--series", type=int, default=40)
+    catalog.add_argument("--interval-seconds", type=int, default=60)
+    catalog.add_argument("--ticks-per-commit", type=int, default=100)
+    catalog.add_argument("--queries", type=int, default=20)
+    catalog.set_defaults(handler=bench_catalog)
+
+    stitch = subparsers.add_parser("stitch", help="rollup and raw stitching latency and peak memory")
+    stitch.add_argument("--rows", type=int, default=10_000_000, help="total rows in the database")
+    stitch.add_argument("--max-points", type=int, default=2000)
+    stitch.add_argument("--repeat", type=int, default=3)
+    stitch.set_defaults(handler=bench_stitch)
+
+    settings = subparsers.add_parser("settings", help="settings access cost per control tick")
+    settings.add_argument("--ticks", type=int, default=1000)
+    settings.set_defaults(handler=bench_settings)
+
+    startup = subparsers.add_parser("startup", help="time until start returns and until every device polled")
+    startup.add_argument("--devices", type=int, default=5)
+    startup.add_argument("--delay-seconds", type=float, default=2.0, help="time each fake device takes to poll")
+    startup.set_defaults(handler=bench_startup)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
+import asyncio
+import gzip
+import json
 import sys
 from types import SimpleNamespace
 
 import pytest
 import yaml
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
 from starlette.requests import Request
 
 from proof_of_heat import main
 from proof_of_heat.config import AppConfig
+from proof_of_heat.services.series_encoding import BINARY_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, decode_binary
 from proof_of_heat.settings import parse_settings_yaml as validate_settings_yaml
 
 
@@ -70,7 +75,14 @@ class DummyDevicePoller:
     recorded_control_decisions = []
     vacuum_status = {}
     vacuum_runs = []
+    write_queue_status = {}
+    series_cache_status = {}
+    readiness = {"ready": True, "devices": []}
+    retention_status = {}
+    metric_series_requests = []
+    metric_export_requests = []
     metric_catalog = {}
+    metric_catalog_series = []
     economics_metadata = {
         "enabled": True,
         "currencies": {"crypto": "BTC", "fiat": "RUB"},
@@ -108,12 +120,52 @@ class DummyDevicePoller:
     def get_metric_catalog(self):
         return self.metric_catalog.copy()
 
+    def get_metric_catalog_series(self):
+        return list(self.metric_catalog_series)
+
     def get_economics_metadata(self):
         return self.economics_metadata.copy()
 
-    def get_metric_series(self, device_type, device_id, metric, start_ms=None, end_ms=None):
+    def get_metric_series(
+        self,
+        device_type,
+        device_id,
+        metric,
+        start_ms=None,
+        end_ms=None,
+        aggregate="sample",
+        max_points=None,
+        gap_ms=None,
+    ):
+        if aggregate not in {"sample", "min", "max", "avg", "sum", "count", "twa"}:
+            raise ValueError(f"unsupported aggregate: {aggregate!r}")
+        self.metric_series_requests.append((device_type, device_id, metric, aggregate, max_points, gap_ms))
         return []
 
+    def get_metric_columns(self, *args, **kwargs):
+        self.get_metric_series(*args, **kwargs)
+        return [1_000, 31_000, 61_000], [1.5, None, 2.5]
+
+    def iter_metric_series(self, series, start_ms=None, end_ms=None, aggregate="sample", max_points=None, gap_ms=None):
+        for item in series:
+            self.get_metric_series(
+                item["device_type"],
+                item["device_id"],
+                item["metric"],
+                start_ms,
+                end_ms,
+                item.get("aggregate", aggregate),
+                max_points,
+                item.get("gap_ms", gap_ms),
+            )
+        return iter([(item, [{"ts": 1_000, "value": 1.5}]) for item in series])
+
+    def iter_metric_export(self, source="raw", **filters):
+        if source not in {"raw", "rollups"}:
+            raise ValueError(f"unsupported export source: {source!r}")
+        self.metric_export_requests.append((source, filters))
+        return ("ts", "metric", "value"), iter([[(1_000, "room_temp", 21.5)], [(2_000, "room_temp", 22.0)]])
+
     def get_latest_payloads(self):
         return self.latest_payloads.copy()
 
@@ -123,6 +175,9 @@ class DummyDevicePoller:
     def get_latest_control_decision(self):
         return self.latest_control_decision
 
+    def get_control_input_refresh_stats(self):
+        return {"refreshes": 2, "skipped_unrelated": 5, "skipped_unchanged": 1, "recomputed_inputs": 3}
+
     def record_control_decision(self, decision):
         self.recorded_control_decisions.append(decision)
         self.latest_control_decision = decision
@@ -137,6 +192,18 @@ class DummyDevicePoller:
         response["vacuumed"] = force
         return response
 
+    def get_write_queue_status(self):
+        return self.write_queue_status.copy()
+
+    def get_readiness(self):
+        return dict(self.readiness)
+
+    def get_series_cache_status(self):
+        return self.series_cache_status.copy()
+
+    def get_retention_status(self):
+        return self.retention_status.copy()
+
 
 def build_routes(
     tmp_path,
@@ -177,7 +244,14 @@ def build_test_app(
     DummyDevicePoller.recorded_control_decisions = []
     DummyDevicePoller.vacuum_status = {}
     DummyDevicePoller.vacuum_runs = []
+    DummyDevicePoller.write_queue_status = {}
+    DummyDevicePoller.series_cache_status = {}
+    DummyDevicePoller.readiness = {"ready": True, "devices": []}
+    DummyDevicePoller.retention_status = {}
+    DummyDevicePoller.metric_series_requests = []
+    DummyDevicePoller.metric_export_requests = []
     DummyDevicePoller.metric_catalog = {}
+    DummyDevicePoller.metric_catalog_series = []
     DummyDevicePoller.economics_metadata = {
         "enabled": True,
         "currencies": {"crypto": "BTC", "fiat": "RUB"},
@@ -224,6 +298,8 @@ def build_test_app(
     monkeypatch.setattr(main, "FastAPI", FastAPI, raising=False)
     monkeypatch.setattr(main, "HTMLResponse", HTMLResponse, raising=False)
     monkeypatch.setattr(main, "JSONResponse", JSONResponse, raising=False)
+    monkeypatch.setattr(main, "Response", Response, raising=False)
+    monkeypatch.setattr(main, "StreamingResponse", StreamingResponse, raising=False)
     monkeypatch.setattr(main, "_startup_error", None)
     monkeypatch.setattr(main, "APP_VERSION", "1.2.3-testsha", raising=False)
 
@@ -254,13 +330,46 @@ def test_update_config_returns_400_for_invalid_settings_yaml(tmp_path, monkeypat
     assert "fixed electricity mode does not allow tariffs" in exc_info.value.detail
 
 
-def make_request(path: str, root_path: str = "") -> Request:
+def test_settings_are_parsed_once_and_reloaded_when_the_file_changes(tmp_path, monkeypatch):
+    build_test_app(tmp_path, monkeypatch)
+    file_state = {"raw_yaml": "devices: {}\n", "signature": (1, 12)}
+    parses = []
+
+    def parse(raw_yaml):
+        parses.append(raw_yaml)
+        return yaml.safe_load(raw_yaml)
+
+    monkeypatch.setattr(main, "load_settings_yaml", lambda: file_state["raw_yaml"], raising=False)
+    monkeypatch.setattr(main, "parse_settings_yaml", parse, raising=False)
+    monkeypatch.setattr(main, "settings_file_signature", lambda: file_state["signature"], raising=False)
+    app = main.create_app(AppConfig(data_dir=tmp_path))
+    routes = {
+        f"{method} {route.path}": route.endpoint
+        for route in app.routes
+        for method in getattr(route, "methods", None) or []
+    }
+    poller = app.state.device_poller
+
+    routes["GET /api/config"]()
+    routes["GET /api/heating-curve"]()
+    assert len(parses) == 1
+
+    file_state.update(raw_yaml="devices: {}\nheating_curve:\n  slope: 5.0\n", signature=(2, 40))
+    assert routes["GET /api/heating-curve"]()["data"]["slope"] == 5.0
+    assert len(parses) == 2
+    assert poller.settings_data == {"devices": {}, "heating_curve": {"slope": 5.0}}
+
+
+def make_request(path: str, root_path: str = "", headers: dict[str, str] | None = None) -> Request:
     scope = {
         "type": "http",
         "method": "GET",
         "path": path,
         "root_path": root_path,
-        "headers": [],
+        "headers": [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in (headers or {}).items()
+        ],
         "query_string": b"",
         "client": ("127.0.0.1", 12345),
         "server": ("testserver", 80),
@@ -470,6 +579,15 @@ def test_control_inputs_api_returns_latest_payload(tmp_path, monkeypatch):
     assert payload["data"]["power_sources"] == ["whatsminer:1:power"]
 
 
+def test_control_inputs_refresh_stats_api_returns_counters(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+
+    payload = routes["/api/control-inputs/refresh-stats"]()
+
+    assert payload["data"]["skipped_unrelated"] == 5
+    assert payload["data"]["refreshes"] == 2
+
+
 def test_control_decisions_api_returns_latest_payload(tmp_path, monkeypatch):
     routes = build_routes(tmp_path, monkeypatch)
     DummyDevicePoller.latest_control_decision = {
@@ -524,6 +642,63 @@ def test_database_vacuum_api_returns_status_and_supports_force_run(tmp_path, mon
     assert DummyDevicePoller.vacuum_runs == [True]
 
 
+def test_readiness_endpoint_returns_503_until_devices_were_polled(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+    DummyDevicePoller.readiness = {
+        "ready": False,
+        "devices": [{"device_type": "whatsminer", "device_id": "miner01", "polled": False, "reported": False}],
+    }
+
+    response = routes["GET /health/ready"]()
+
+    assert response.status_code == 503
+    assert json.loads(response.body)["devices"][0]["device_id"] == "miner01"
+    DummyDevicePoller.readiness = {"ready": True, "devices": []}
+    assert routes["GET /health/ready"]().status_code == 200
+
+
+def test_database_write_queue_api_returns_queue_stats(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+    DummyDevicePoller.write_queue_status = {
+        "running": True,
+        "queue_depth": 3,
+        "dropped": 1,
+        "commits": 12,
+        "avg_commit_latency_ms": 1.5,
+    }
+
+    payload = routes["/api/database/write-queue"]()
+
+    assert payload["queue_depth"] == 3
+    assert payload["dropped"] == 1
+    assert payload["avg_commit_latency_ms"] == 1.5
+
+
+def test_database_retention_api_returns_last_runs(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+    DummyDevicePoller.retention_status = {
+        "raw_events": {
+            "configured": True,
+            "batch_size": 10_000,
+            "max_run_seconds": 600,
+            "last_run": {"completed": True, "batches": 3, "deleted_rows": 25_000, "rows_per_second": 50_000.0},
+        },
+        "metrics": {"configured": False, "batch_size": None, "max_run_seconds": None, "last_run": None},
+    }
+
+    payload = routes["/api/database/retention"]()
+
+    assert payload["raw_events"]["last_run"]["rows_per_second"] == 50_000.0
+    assert payload["metrics"]["configured"] is False
+
+
+def test_database_series_cache_api_returns_stats(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+    DummyDevicePoller.series_cache_status = {"enabled": True, "entries": 3, "hits": 10, "misses": 3}
+
+    assert routes["/api/database/series-cache"]()["hits"] == 10
+
+
 def test_metrics_catalog_api_returns_catalog(tmp_path, monkeypatch):
     routes = build_routes(tmp_path, monkeypatch)
     DummyDevicePoller.metric_catalog = {
@@ -542,6 +717,204 @@ def test_metrics_catalog_api_returns_catalog(tmp_path, monkeypatch):
     }
 
 
+def test_metrics_catalog_series_api_hides_economics(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+    zont_series = {
+        "device_type": "zont",
+        "device_id": "12000",
+        "metric": "room_temp",
+        "unit": "celsius",
+        "first_seen": 1_000,
+        "last_seen": 61_000,
+        "sample_count": 2,
+        "rollup_count": 0,
+    }
+    DummyDevicePoller.metric_catalog_series = [
+        zont_series,
+        {**zont_series, "device_type": "economics", "device_id": "market", "metric": "exchange_rate_btc_rub"},
+    ]
+
+    payload = routes["/api/metrics/catalog/series"]()
+
+    assert payload == {"series": [zont_series]}
+
+
+def test_metric_data_api_passes_read_options_and_rejects_unknown_aggregates(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+
+    routes["/api/metrics/data"](
+        device_type="zont",
+        device_id="12000",
+        metric="room_temp",
+        aggregate="max",
+        max_points=500,
+        gap_ms=720_000,
+    )
+    routes["/api/economics/data"](metric="exchange_rate_btc_usd")
+    with pytest.raises(HTTPException) as exc_info:
+        routes["/api/metrics/data"](device_type="zont", device_id="12000", metric="room_temp", aggregate="p99")
+
+    assert DummyDevicePoller.metric_series_requests == [
+        ("zont", "12000", "room_temp", "max", 500, 720_000),
+        ("economics", "market", "exchange_rate_btc_usd", "sample", None, None),
+    ]
+    assert exc_info.value.status_code == 400
+
+
+def test_metric_data_api_negotiates_columnar_and_binary_formats(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+
+    def fetch(accept):
+        return routes["/api/metrics/data"](
+            device_type="zont",
+            device_id="12000",
+            metric="room_temp",
+            request=make_request("/api/metrics/data", headers={"Accept": accept}),
+        )
+
+    plain = fetch("application/json, */*")
+    columnar = fetch(COLUMNAR_MEDIA_TYPE)
+    binary = fetch(f"{COLUMNAR_MEDIA_TYPE};q=0.5, {BINARY_MEDIA_TYPE}")
+
+    assert plain == {"points": []}
+    assert columnar.media_type == COLUMNAR_MEDIA_TYPE
+    assert json.loads(columnar.body) == {"ts": [1_000, 30_000, 30_000], "values": [1.5, None, 2.5]}
+    assert binary.media_type == BINARY_MEDIA_TYPE
+    assert decode_binary(binary.body) == ([1_000, 31_000, 61_000], [1.5, None, 2.5])
+
+
+def test_metric_query_api_streams_all_requested_series(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+
+    async def read_body(response):
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    response = routes["/api/metrics/query"](
+        {
+            "series": [
+                {"device_type": "zont", "device_id": "12000", "metric": "room_temp"},
+                {"device_type": "economics", "device_id": "market", "metric": "hashprice", "gap_ms": 60_000},
+            ],
+            "start": "2026-04-01T00:00:00Z",
+            "max_points": 300,
+        }
+    )
+    body = json.loads(asyncio.run(read_body(response)))
+    with pytest.raises(HTTPException) as missing_metric:
+        routes["/api/metrics/query"]({"series": [{"device_type": "zont", "device_id": "12000"}]})
+    with pytest.raises(HTTPException) as bad_aggregate:
+        routes["/api/metrics/query"](
+            {
+                "series": [{"device_type": "zont", "device_id": "12000", "metric": "room_temp"}],
+                "aggregate": "p99",
+            }
+        )
+
+    assert response.media_type == "application/json"
+    assert body == {
+        "series": [
+            {
+                "device_type": "zont",
+                "device_id": "12000",
+                "metric": "room_temp",
+                "points": [{"ts": 1000, "value": 1.5}],
+            },
+            {
+                "device_type": "economics",
+                "device_id": "market",
+                "metric": "hashprice",
+                "points": [{"ts": 1000, "value": 1.5}],
+            },
+        ]
+    }
+    assert DummyDevicePoller.metric_series_requests == [
+        ("zont", "12000", "room_temp", "sample", 300, None),
+        ("economics", "market", "hashprice", "sample", 300, 60_000),
+    ]
+    assert missing_metric.value.status_code == 400
+    assert bad_aggregate.value.status_code == 400
+
+
+def test_metric_query_api_rejects_malformed_options_with_400(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+    series = [{"device_type": "zont", "device_id": "12000", "metric": "room_temp"}]
+
+    for options, detail in [
+        ({"start": 123}, "start must be an ISO 8601 datetime"),
+        ({"end": "yesterday"}, "end must be an ISO 8601 datetime"),
+        ({"start": ""}, "start must be an ISO 8601 datetime"),
+    ]:
+        with pytest.raises(HTTPException) as exc_info:
+            routes["/api/metrics/query"]({"series": series, **options})
+        assert (exc_info.value.status_code, exc_info.value.detail) == (400, detail)
+
+    assert DummyDevicePoller.metric_series_requests == []
+
+    # The poller validates aggregate, max_points and gap_ms itself.
+    def reject_options(self, series, **options):
+        raise ValueError("max_points must be a positive integer")
+
+    monkeypatch.setattr(DummyDevicePoller, "iter_metric_series", reject_options)
+    with pytest.raises(HTTPException) as exc_info:
+        routes["/api/metrics/query"]({"series": series, "max_points": 0})
+    assert (exc_info.value.status_code, exc_info.value.detail) == (400, "max_points must be a positive integer")
+
+
+def test_metric_export_api_streams_csv_ndjson_and_gzip(tmp_path, monkeypatch):
+    routes = build_routes(tmp_path, monkeypatch)
+
+    async def read_body(response):
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    csv_response = routes["/api/metrics/export"](
+        device_type="zont",
+        metric="room_temp, boiler_feed_temp",
+        start="2026-04-01T00:00:00Z",
+    )
+    ndjson_response = routes["/api/metrics/export"](
+        export_format="ndjson", source="rollups", resolution_seconds=600
+    )
+    gzip_response = routes["/api/metrics/export"](compress=True)
+    with pytest.raises(HTTPException) as bad_format:
+        routes["/api/metrics/export"](export_format="xml")
+    with pytest.raises(HTTPException) as bad_source:
+        routes["/api/metrics/export"](source="samples")
+
+    assert csv_response.media_type == "text/csv"
+    assert csv_response.headers["content-disposition"] == 'attachment; filename="metrics-raw.csv"'
+    assert asyncio.run(read_body(csv_response)) == b"ts,metric,value\n1000,room_temp,21.5\n2000,room_temp,22.0\n"
+    assert [json.loads(line) for line in asyncio.run(read_body(ndjson_response)).splitlines()] == [
+        {"ts": 1_000, "metric": "room_temp", "value": 21.5},
+        {"ts": 2_000, "metric": "room_temp", "value": 22.0},
+    ]
+    assert gzip_response.media_type == "application/gzip"
+    assert gzip.decompress(asyncio.run(read_body(gzip_response))).startswith(b"ts,metric,value\n")
+    assert DummyDevicePoller.metric_export_requests[0] == (
+        "raw",
+        {
+            "device_types": ["zont"],
+            "device_ids": [],
+            "metrics": ["room_temp", "boiler_feed_temp"],
+            "start_ms": 1_775_001_600_000,
+            "end_ms": None,
+            "resolution_seconds": None,
+        },
+    )
+    assert DummyDevicePoller.metric_export_requests[1][1]["resolution_seconds"] == 600
+    assert bad_format.value.status_code == 400
+    assert bad_source.value.status_code == 400
+
+
+def test_metric_export_api_keeps_format_and_gzip_query_names(tmp_path, monkeypatch):
+    client = TestClient(build_test_app(tmp_path, monkeypatch))
+
+    response = client.get("/api/metrics/export", params={"format": "ndjson", "gzip": "true"})
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="metrics-raw.ndjson.gz"'
+    assert client.get("/api/metrics/export", params={"format": "xml"}).status_code == 400
+
+
 def test_economics_api_returns_latest_payload_and_catalog(tmp_path, monkeypatch):
     routes = build_routes(tmp_path, monkeypatch)
     DummyDevicePoller.economics_metadata = {
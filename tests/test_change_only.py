@@ -0,0 +1,87 @@
+import logging
+
+from proof_of_heat.services.change_only import (
+    ChangeOnlyOptions,
+    MetricChangeFilter,
+    apply_payload_diff,
+    diff_payload,
+    parse_change_only_options,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def test_payload_diff_round_trips_nested_changes():
+    base = {
+        "summary": {"power": 3_300, "firmware": "20250214", "boards": [68.1, 67.9, 68.4]},
+        "pools": [{"url": "stratum+tcp://a", "accepted": 10}],
+        "removed": {"nested": True},
+    }
+    current = {
+        "summary": {"power": 3_310, "firmware": "20250214", "boards": [68.1, 68.0, 68.4], "mode": "normal"},
+        "pools": [{"url": "stratum+tcp://a", "accepted": 12}, {"url": "stratum+tcp://b", "accepted": 0}],
+        "flag": 1,
+    }
+
+    patch = diff_payload(base, current)
+
+    assert patch["summary"] == {"power": [3_310], "boards": {"1": [68.0]}, "mode": ["normal"]}
+    assert patch["removed"] == []
+    assert apply_payload_diff(base, patch) == current
+    assert base["summary"]["power"] == 3_300
+    assert diff_payload(current, current) is None
+    assert apply_payload_diff(current, None) == current
+    # Equal values of a different JSON type still count as a change.
+    assert apply_payload_diff({"flag": 1}, diff_payload({"flag": 1}, {"flag": True})) == {"flag": True}
+
+
+def test_metric_change_filter_applies_deadband_heartbeat_and_step_edges():
+    options = ChangeOnlyOptions(enabled=True, heartbeat_seconds=60, deadband=0.5, deadbands={"power": 10.0})
+    change_filter = MetricChangeFilter()
+
+    def row(ts, metric, value):
+        return {"ts": ts, "device_type": "whatsminer", "device_id": "miner01", "metric": metric, "value": value}
+
+    kept = []
+    for ts, temp, power in [
+        (0, 20.0, 3_000),
+        (10_000, 20.2, 3_005),
+        (20_000, 20.4, 3_008),
+        (30_000, 21.0, 3_004),
+        (70_000, 21.1, 3_002),
+        (95_000, 21.2, 3_020),
+    ]:
+        kept.extend(
+            (item["metric"], item["ts"])
+            for item in change_filter.filter([row(ts, "temp", temp), row(ts, "power", power)], options)
+        )
+
+    # 20 s is the last sample before the jump at 30 s; 95 s is a heartbeat.
+    assert [ts for metric, ts in kept if metric == "temp"] == [0, 20_000, 30_000, 95_000]
+    # 70 s is a heartbeat, so nothing skipped is pending at the jump at 95 s.
+    assert [ts for metric, ts in kept if metric == "power"] == [0, 70_000, 95_000]
+    assert change_filter.filter([row(0, "temp", 1.0)], ChangeOnlyOptions()) == [row(0, "temp", 1.0)]
+
+
+def test_change_only_options_are_parsed_with_defaults():
+    assert parse_change_only_options({}, logger=logger) == ChangeOnlyOptions()
+    options = parse_change_only_options(
+        {
+            "database": {
+                "change_only": {
+                    "enabled": True,
+                    "heartbeat_seconds": 0,
+                    "deadband": 0.1,
+                    "deadbands": {"power": "5", "broken": "x"},
+                }
+            }
+        },
+        logger=logger,
+    )
+
+    assert options.enabled is True
+    assert options.heartbeat_seconds == 900
+    assert options.deadband_for("power") == 5.0
+    assert options.deadband_for("broken") == 0.1
+    assert options.deadband_for("temp") == 0.1
+    assert ChangeOnlyOptions(heartbeat_seconds=60).heartbeat_ms == 0
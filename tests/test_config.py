@@ -2,6 +2,7 @@ import json
 from pathlib import Path
 
 import pytest
+import yaml
 
 from proof_of_heat.config import (
     AppConfig,
@@ -13,6 +14,7 @@ from proof_of_heat.config import (
 )
 from proof_of_heat.settings import load_default_settings_yaml, parse_settings_yaml, render_settings_yaml
 from proof_of_heat.settings_schema import SettingsValidationError, build_settings_json_schema
+from proof_of_heat.settings_store import freeze
 
 
 def test_miner_config_defaults_min_power():
@@ -224,6 +226,14 @@ def test_render_settings_yaml_quotes_time_of_day_values():
     assert "start: '23:00'" in rendered
 
 
+def test_render_settings_yaml_dumps_read_only_snapshots_without_touching_safe_dumper():
+    snapshot = freeze({"devices": {"zont": [{"device_id": 1}]}})
+
+    assert yaml.safe_load(render_settings_yaml(snapshot)) == {"devices": {"zont": [{"device_id": 1}]}}
+    with pytest.raises(yaml.representer.RepresenterError):
+        yaml.safe_dump(snapshot)
+
+
 def test_example_settings_yaml_is_valid():
     raw_yaml = load_default_settings_yaml()
 
@@ -1,14 +1,29 @@
 import json
+import re
 import sqlite3
+import threading
 import time
+import zlib
 from datetime import datetime, timezone
 
+import pytest
+
 from proof_of_heat.services import device_polling
 from proof_of_heat.services import economic_polling
 from proof_of_heat.services.device_polling import DevicePoller
 from proof_of_heat.services.metrics import MetricSample
 
 
+def wait_for_first_runs(poller, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        readiness = poller.get_readiness()
+        if readiness["ready"] and not readiness["pending_maintenance"]:
+            return readiness
+        time.sleep(0.01)
+    raise AssertionError(f"first runs did not finish: {poller.get_readiness()}")
+
+
 def test_open_meteo_virtual_device_metrics_are_persisted(monkeypatch, tmp_path):
     settings = {
         "location": {
@@ -73,22 +88,229 @@ def test_open_meteo_virtual_device_metrics_are_persisted(monkeypatch, tmp_path):
     assert points[0]["value"] == 1.5
 
     db_path = tmp_path / "telemetry.sqlite3"
+    raw_events = poller.get_raw_events("open_meteo", "1001")
     with sqlite3.connect(db_path) as conn:
-        raw_event = conn.execute(
-            "SELECT payload FROM raw_events WHERE device_type = ? AND device_id = ?",
-            ("open_meteo", "1001"),
-        ).fetchone()
         metric_unit = conn.execute(
             "SELECT unit FROM metrics WHERE device_type = ? AND device_id = ? AND metric = ?",
             ("open_meteo", "1001", "temperature"),
         ).fetchone()
 
-    assert raw_event is not None
-    assert json.loads(raw_event[0])["type"] == "virtual"
+    assert len(raw_events) == 1
+    assert raw_events[0]["payload"]["type"] == "virtual"
     assert metric_unit == ("celsius",)
 
 
-def test_metrics_table_is_migrated_in_place_for_older_sqlite_files(monkeypatch, tmp_path):
+def test_uncompressed_raw_events_are_migrated_to_compressed_payloads(tmp_path):
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        conn.execute(
+            """
+            CREATE TABLE raw_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts INTEGER NOT NULL,
+                device_type TEXT NOT NULL,
+                device_id TEXT NOT NULL,
+                payload TEXT NOT NULL
+            )
+            """
+        )
+        conn.executemany(
+            "INSERT INTO raw_events (ts, device_type, device_id, payload) VALUES (?, 'zont', '12000', ?)",
+            [(1_000, '{"temp_out": 3.2}'), (2_000, '{\n  "temp_out": 3.4\n}')],
+        )
+
+    poller = DevicePoller({}, data_dir=tmp_path)
+    poller._write_raw_event(ts_ms=3_000, device_type="zont", device_id="12000", payload={"temp_out": 3.6})
+
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        stored = conn.execute("SELECT id, codec, typeof(payload) FROM raw_events ORDER BY id").fetchall()
+    assert stored == [(1, "zlib", "blob"), (2, "zlib", "blob"), (3, "zlib", "blob")]
+    assert [event["payload"] for event in poller.get_raw_events("zont", "12000")] == [
+        {"temp_out": 3.6},
+        {"temp_out": 3.4},
+        {"temp_out": 3.2},
+    ]
+    poller.shutdown()
+
+
+def test_raw_event_payloads_switch_to_a_dictionary_after_enough_samples(tmp_path):
+    settings = {"database": {"payload_compression": {"dictionary": True, "dictionary_samples": 3}}}
+    poller = DevicePoller(settings, data_dir=tmp_path)
+
+    for tick in range(5):
+        poller._write_raw_event(
+            ts_ms=tick,
+            device_type="whatsminer",
+            device_id="miner01",
+            payload={"summary": {"power": 3_000 + tick, "fan-speed-in": 4_980}},
+        )
+
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        dictionary_ids = [row[0] for row in conn.execute("SELECT dictionary_id FROM raw_events ORDER BY id")]
+        dictionaries = conn.execute("SELECT device_type, codec FROM raw_event_dictionaries").fetchall()
+    assert dictionary_ids == [None, None, 1, 1, 1]
+    assert dictionaries == [("whatsminer", "zlib")]
+
+    # A new poller reads the dictionary back from the database.
+    reopened = DevicePoller(settings, data_dir=tmp_path)
+    assert [event["payload"]["summary"]["power"] for event in reopened.get_raw_events("whatsminer", "miner01")] == [
+        3_004,
+        3_003,
+        3_002,
+        3_001,
+        3_000,
+    ]
+    poller.shutdown()
+    reopened.shutdown()
+
+
+def test_change_only_mode_stores_keyframes_diffs_and_changed_samples(tmp_path):
+    settings = {
+        "database": {
+            "change_only": {"enabled": True, "keyframe_interval_seconds": 60, "heartbeat_seconds": 60},
+            "retention": {"raw_events": {"retention_seconds": 30, "interval_seconds": 3_600}},
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    static = {"firmware": "20250214.22.REL", "pools": ["stratum+tcp://pool.example.com:3333"] * 3}
+
+    for tick, power in enumerate([3_000, 3_000, 3_000, 3_200, 3_200]):
+        poller._commit_poll_batch(
+            device_polling.PollWriteBatch(
+                ts_ms=tick * 20_000,
+                device_type="whatsminer",
+                device_id="miner01",
+                payload={"summary": {"power": power, "elapsed": tick * 20}, "device_info": static},
+                metrics=[MetricSample(name="power", value=float(power), unit="W")],
+            )
+        )
+
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        keyframe_ids = [row[0] for row in conn.execute("SELECT keyframe_id FROM raw_events ORDER BY id")]
+    # The keyframe interval restarts the chain at 60 s.
+    assert keyframe_ids == [None, 1, 1, None, 4]
+    events = poller.get_raw_events("whatsminer", "miner01")
+    assert [event["payload"]["summary"]["elapsed"] for event in events] == [80, 60, 40, 20, 0]
+    assert all(event["payload"]["device_info"] == static for event in events)
+
+    # The 40 s sample is kept so the jump at 60 s reads as a step.
+    points = poller.get_metric_series("whatsminer", "miner01", "power", None, None)
+    assert [(point["ts"], point["value"]) for point in points] == [(0, 3_000.0), (40_000, 3_000.0), (60_000, 3_200.0)]
+    assert poller._latest_values.get("whatsminer", "miner01", "power").ts == 80_000
+    # A still series is only stored once per heartbeat, which is not a gap.
+    gap_points = poller.get_metric_series("whatsminer", "miner01", "power", None, None, gap_ms=30_000)
+    assert all(point["value"] is not None for point in gap_points)
+
+    # Retention keeps the keyframe that a surviving diff still needs.
+    poller._apply_raw_events_retention(reference_ts_ms=100_000)
+    assert [event["ts"] for event in poller.get_raw_events("whatsminer", "miner01")] == [80_000, 60_000]
+    assert poller.get_raw_events("whatsminer", "miner01")[0]["payload"]["summary"] == {"power": 3_200, "elapsed": 80}
+    poller.shutdown()
+
+
+def test_raw_events_with_a_deleted_keyframe_are_flagged_not_fatal(tmp_path):
+    settings = {
+        "database": {
+            "change_only": {"enabled": True, "keyframe_interval_seconds": 3_600},
+            "retention": {
+                "raw_events": {"retention_seconds": 25, "interval_seconds": 3_600},
+                "archive": {"format": "csv"},
+            },
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    static = {"firmware": "20250214.22.REL", "pools": ["stratum+tcp://pool.example.com:3333"] * 3}
+    for tick in range(4):
+        poller._commit_poll_batch(
+            device_polling.PollWriteBatch(
+                ts_ms=tick * 10_000,
+                device_type="whatsminer",
+                device_id="miner01",
+                payload={"summary": {"elapsed": tick * 10}, "device_info": static},
+                metrics=[],
+            )
+        )
+    poller._commit_poll_batch(
+        device_polling.PollWriteBatch(
+            ts_ms=40_000,
+            device_type="zont",
+            device_id="12000",
+            payload={"temp": 20},
+            metrics=[],
+        )
+    )
+    # What an older retention run could leave behind.
+    with poller._db.writer() as conn:
+        conn.execute("DELETE FROM raw_events WHERE keyframe_id IS NULL AND device_type = 'whatsminer'")
+
+    events = poller.get_raw_events("whatsminer", "miner01")
+
+    assert [(event["ts"], event["payload"]) for event in events] == [(30_000, None), (20_000, None), (10_000, None)]
+    assert events[0]["error"] == "raw event keyframe 1 is missing"
+    assert poller.get_raw_events("zont", "12000")[0]["payload"] == {"temp": 20}
+
+    # Retention archives the orphaned diffs instead of failing on them.
+    assert poller._apply_raw_events_retention(reference_ts_ms=50_000) == 2
+    archived = sorted(poller._load_metric_archive().read("raw_events"))
+    assert [json.loads(row[3])["diff"] for row in archived] == [
+        {"summary": {"elapsed": [10]}},
+        {"summary": {"elapsed": [20]}},
+    ]
+    poller.shutdown()
+
+
+def test_raw_events_retention_never_orphans_change_only_diffs_across_chunks(monkeypatch, tmp_path):
+    settings = {
+        "database": {
+            "change_only": {"enabled": True, "keyframe_interval_seconds": 3_600},
+            "retention": {
+                "raw_events": {"retention_seconds": 35, "interval_seconds": 3_600, "batch_size": 2},
+                "archive": {"format": "csv"},
+            },
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    static = {"firmware": "20250214.22.REL", "pools": ["stratum+tcp://pool.example.com:3333"] * 3}
+    for tick in range(10):
+        poller._commit_poll_batch(
+            device_polling.PollWriteBatch(
+                ts_ms=tick * 10_000,
+                device_type="whatsminer",
+                device_id="miner01",
+                payload={"summary": {"elapsed": tick * 10}, "device_info": static},
+                metrics=[],
+            )
+        )
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        assert [row[0] for row in conn.execute("SELECT keyframe_id FROM raw_events ORDER BY id")] == [None] + [1] * 9
+
+    # The keyframe at 0 s falls in the first chunk, its expired diffs in
+    # later ones, and the first run stops after that first chunk.
+    monkeypatch.setattr(device_polling.RetentionRun, "out_of_time", lambda self: True)
+    poller._apply_raw_events_retention(reference_ts_ms=100_000)
+    monkeypatch.undo()
+    events = poller.get_raw_events("whatsminer", "miner01")
+    assert [event["ts"] for event in events][-1] == 0
+    assert [event["payload"]["summary"]["elapsed"] for event in events][:2] == [90, 80]
+
+    poller._apply_raw_events_retention(reference_ts_ms=100_000)
+    events = poller.get_raw_events("whatsminer", "miner01")
+    # Diffs from 70 s on survive, so their keyframe does too.
+    assert [event["ts"] for event in events] == [90_000, 80_000, 70_000, 0]
+    assert all(event["payload"]["device_info"] == static for event in events)
+    archived = sorted(poller._load_metric_archive().read("raw_events"))
+    assert [row[0] for row in archived] == [10_000, 20_000, 30_000, 40_000, 50_000, 60_000]
+    assert all(json.loads(row[3])["device_info"] == static for row in archived)
+
+    # Once its last diff expires, the keyframe goes in the same chunk.
+    poller._apply_raw_events_retention(reference_ts_ms=200_000)
+    assert poller.get_raw_events("whatsminer", "miner01") == []
+    assert sorted(row[0] for row in poller._load_metric_archive().read("raw_events")) == [
+        tick * 10_000 for tick in range(10)
+    ]
+    poller.shutdown()
+
+
+def test_legacy_metrics_table_is_migrated_to_series_schema(monkeypatch, tmp_path):
     settings = {
         "location": {
             "name": "Moscow",
@@ -142,14 +364,18 @@ def test_metrics_table_is_migrated_in_place_for_older_sqlite_files(monkeypatch,
     poller.poll_open_meteo_device(settings["devices"]["open_meteo"][0])
 
     with sqlite3.connect(db_path) as conn:
-        metric_columns = {
-            row[1]
-            for row in conn.execute("PRAGMA table_info(metrics)").fetchall()
-        }
-        metric_indexes = {
-            row[1]
-            for row in conn.execute("PRAGMA index_list(metrics)").fetchall()
-        }
+        object_types = dict(
+            conn.execute(
+                """
+                SELECT name, type
+                FROM sqlite_master
+                WHERE name IN ('metrics', 'metric_rollups', 'series', 'samples', 'sample_rollups')
+                """
+            ).fetchall()
+        )
+        series_rows = conn.execute(
+            "SELECT device_type, device_id, metric, unit FROM series ORDER BY id"
+        ).fetchall()
         legacy_row = conn.execute(
             """
             SELECT ts, device_type, device_id, metric, value
@@ -165,9 +391,17 @@ def test_metrics_table_is_migrated_in_place_for_older_sqlite_files(monkeypatch,
             """
         ).fetchone()
 
-    assert {"unit", "labels", "component"} <= metric_columns
-    assert "idx_metrics_type_device_id" in metric_indexes
-    assert "idx_metrics_type_device_metric_ts" in metric_indexes
+    assert object_types == {
+        "metrics": "view",
+        "metric_rollups": "view",
+        "series": "table",
+        "samples": "table",
+        "sample_rollups": "table",
+    }
+    assert series_rows == [
+        ("legacy", "device-1", "temp", None),
+        ("open_meteo", "1001", "temperature", "celsius"),
+    ]
     assert legacy_row == (1, "legacy", "device-1", "temp", 10.0)
     assert new_row == ("temperature", 1.5, "celsius")
 
@@ -270,19 +504,10 @@ def test_met_no_metrics_use_poll_time_instead_of_provider_hour_bucket(monkeypatc
               AND metric = 'air_temperature'
             """
         ).fetchone()
-        provider_ts = conn.execute(
-            """
-            SELECT json_extract(payload, '$.provider_ts_ms')
-            FROM raw_events
-            WHERE device_type = 'met_no' AND device_id = '1002'
-            ORDER BY id DESC
-            LIMIT 1
-            """
-        ).fetchone()
+    latest_event = poller.get_raw_events("met_no", "1002", limit=1)[0]
 
     assert distinct_ts == (2,)
-    assert provider_ts is not None
-    assert int(provider_ts[0]) == poller._to_epoch_ms("2026-03-29T10:00:00+00:00")
+    assert int(latest_event["payload"]["provider_ts_ms"]) == poller._to_epoch_ms("2026-03-29T10:00:00+00:00")
 
 
 def test_whatsminer_collects_summary_pools_and_device_info(monkeypatch, tmp_path):
@@ -364,20 +589,10 @@ def test_whatsminer_collects_summary_pools_and_device_info(monkeypatch, tmp_path
     assert payload["pools"]["msg"]["pools"][0]["user"] == "worker1"
     assert payload["device_info"]["msg"]["power"]["model"] == "P221B"
 
-    db_path = tmp_path / "telemetry.sqlite3"
-    with sqlite3.connect(db_path) as conn:
-        raw_event = conn.execute(
-            """
-            SELECT payload
-            FROM raw_events
-            WHERE device_type = 'whatsminer' AND device_id = 'miner01'
-            ORDER BY id DESC
-            LIMIT 1
-            """
-        ).fetchone()
+    raw_events = poller.get_raw_events("whatsminer", "miner01", limit=1)
 
-    assert raw_event is not None
-    raw_payload = json.loads(raw_event[0])
+    assert len(raw_events) == 1
+    raw_payload = raw_events[0]["payload"]
     assert "summary" in raw_payload
     assert "pools" in raw_payload
     assert "device_info" in raw_payload
@@ -723,6 +938,107 @@ def test_control_inputs_ignore_stale_metrics_and_default_power_to_zero(tmp_path)
     assert row == (None, 0.0, "[]")
 
 
+def test_control_inputs_resolve_from_latest_value_index_warmed_on_start(tmp_path):
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    settings = {
+        "control_inputs": {
+            "max_age_seconds": 180,
+            "indoor_temp": {
+                "select": "highest_priority_available",
+                "sources": [{"device_type": "zont", "device_id": "12000", "metric": "room_temp"}],
+            },
+        },
+    }
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        DevicePoller({}, data_dir=None)._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (now_ms - 20_000, "zont", "12000", "room_temp", 20.5, "celsius"),
+                (now_ms - 10_000, "zont", "12000", "room_temp", 21.0, "celsius"),
+            ],
+        )
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    poller.start()
+    wait_for_first_runs(poller)
+    assert poller._latest_values.loaded is True
+    assert poller._latest_values.get("zont", "12000", "room_temp").value == 21.0
+
+    statements = []
+    with poller._db.writer() as conn:
+        conn.set_trace_callback(statements.append)
+    poller._write_metrics(
+        ts_ms=now_ms,
+        device_type="whatsminer",
+        device_id="miner01",
+        metrics=[MetricSample(name="power", value=3200.0, unit="w")],
+    )
+    with poller._db.writer() as conn:
+        conn.set_trace_callback(None)
+
+    assert poller.get_latest_control_inputs()["indoor_temp"] == 21.0
+    assert [statement for statement in statements if statement.lstrip().startswith("SELECT")] == []
+    assert poller._latest_values.get("control_inputs", "main", "indoor_temp").value == 21.0
+    poller.shutdown()
+
+
+def test_control_inputs_refresh_only_for_relevant_sources_and_skip_unchanged_rows(tmp_path):
+    settings = {
+        "control_inputs": {
+            "max_age_seconds": 180,
+            "indoor_temp": {
+                "select": "highest_priority_available",
+                "sources": [{"device_type": "zont", "device_id": "12000", "metric": "room_temp"}],
+            },
+            "power": {
+                "select": "sum_all_available",
+                "default": 0,
+                "sources": [{"device_type": "whatsminer", "device_id": "miner01", "metric": "power"}],
+            },
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+
+    def write(ts_ms, device_type, device_id, name, value):
+        poller._write_metrics(
+            ts_ms=ts_ms,
+            device_type=device_type,
+            device_id=device_id,
+            metrics=[MetricSample(name=name, value=value, unit=None)],
+        )
+
+    write(1_000, "zont", "12000", "room_temp", 21.0)
+    write(2_000, "open_meteo", "1001", "temperature", 3.0)
+    write(3_000, "economics", "market", "exchange_rate_btc_usd", 70_000.0)
+    write(4_000, "zont", "12000", "room_temp", 21.0)
+    write(5_000, "whatsminer", "miner01", "power", 3_200.0)
+    write(100_000, "zont", "12000", "room_temp", 21.0)
+
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        rows = conn.execute("SELECT ts, indoor_temp, power FROM control_inputs ORDER BY ts").fetchall()
+        control_metric_count = conn.execute(
+            "SELECT COUNT(*) FROM metrics WHERE device_type = 'control_inputs'"
+        ).fetchone()[0]
+
+    assert rows == [
+        (1_000, 21.0, 0.0),
+        (5_000, 21.0, 3_200.0),
+        (100_000, 21.0, 3_200.0),
+    ]
+    assert control_metric_count == 6
+    assert poller.get_control_input_refresh_stats() == {
+        "refreshes": 3,
+        "skipped_unrelated": 2,
+        "skipped_unchanged": 1,
+        "recomputed_inputs": 7,
+    }
+    poller.shutdown()
+
+
 def test_control_decisions_are_persisted_and_written_to_metrics(tmp_path):
     poller = DevicePoller({}, data_dir=tmp_path)
 
@@ -808,8 +1124,8 @@ def test_raw_events_retention_deletes_rows_older_than_retention(tmp_path):
         poller._ensure_tables(conn)
         conn.executemany(
             """
-            INSERT INTO raw_events (ts, device_type, device_id, payload)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO raw_events (ts, device_type, device_id, codec, payload)
+            VALUES (?, ?, ?, 'zlib', ?)
             """,
             [
                 (cutoff_ts_ms - 1, "legacy", "too-old", "{}"),
@@ -836,6 +1152,86 @@ def test_raw_events_retention_deletes_rows_older_than_retention(tmp_path):
     assert remaining_ids == ["boundary", "fresh"]
 
 
+def test_raw_events_retention_deletes_in_chunks_and_stops_when_out_of_time(monkeypatch, tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "raw_events": {
+                    "retention_seconds": 1,
+                    "interval_seconds": 3_600,
+                    "batch_size": 4,
+                    "max_run_seconds": 60,
+                }
+            }
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    with poller._db.writer() as conn:
+        conn.executemany(
+            "INSERT INTO raw_events (ts, device_type, device_id, codec, payload) VALUES (?, 'bulk', 'dev', 'zlib', ?)",
+            # Rows that share a timestamp stay in the same chunk.
+            [(ts // 2, zlib.compress(b"{}")) for ts in range(20)] + [(5_000, zlib.compress(b"{}"))],
+        )
+
+    # The first run is out of time after its first chunk.
+    monkeypatch.setattr(device_polling.RetentionRun, "out_of_time", lambda self: True)
+    first = poller._apply_raw_events_retention(reference_ts_ms=2_000)
+    first_run = poller.get_retention_status()["raw_events"]["last_run"]
+    monkeypatch.undo()
+    second = poller._apply_raw_events_retention(reference_ts_ms=2_000)
+    status = poller.get_retention_status()["raw_events"]
+
+    assert (first, first_run["batches"], first_run["completed"]) == (4, 1, False)
+    assert second == 16
+    assert status["last_run"]["batches"] == 4
+    assert status["last_run"]["completed"] is True
+    assert status["last_run"]["rows_per_second"] > 0
+    assert (status["batch_size"], status["max_run_seconds"]) == (4, 60)
+    assert [event["ts"] for event in poller.get_raw_events("bulk", "dev")] == [5_000]
+    poller.shutdown()
+
+
+def test_metrics_retention_expires_rollups_in_chunks_and_resumes(monkeypatch, tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 600,
+                    "batch_size": 3,
+                    "rollups": [{"resolution_seconds": 60, "retention_seconds": 600, "sample": "last"}],
+                }
+            }
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    with poller._db.writer() as conn:
+        conn.executemany(
+            """
+            INSERT INTO metric_rollups (ts, resolution_seconds, device_type, device_id, metric, value, unit)
+            VALUES (?, 60, 'whatsminer', ?, 'power', 1.0, 'W')
+            """,
+            [(minute * 60_000, device_id) for minute in range(8) for device_id in ("a", "b")],
+        )
+
+    # The first run is out of time as soon as it deleted something.
+    monkeypatch.setattr(device_polling.RetentionRun, "out_of_time", lambda self: self.deleted_rows > 0)
+    first = poller._apply_metrics_retention(reference_ts_ms=3_600_000)
+    monkeypatch.undo()
+    second = poller._apply_metrics_retention(reference_ts_ms=3_600_000)
+
+    with poller._db.reader() as conn:
+        remaining = conn.execute("SELECT COUNT(*) FROM metric_rollups").fetchone()[0]
+    last_run = poller.get_retention_status()["metrics"]["last_run"]
+    assert first["deleted_rollup_rows"] == 3
+    assert second["deleted_rollup_rows"] == 13
+    assert remaining == 0
+    # Series a has 5 rows left and series b 8, in chunks of 3.
+    assert last_run["batches"] == 5
+    assert last_run["completed"] is True
+    poller.shutdown()
+
+
 def test_metrics_retention_rolls_up_last_sample_and_prunes_old_rows(tmp_path):
     settings = {
         "database": {
@@ -908,7 +1304,7 @@ def test_metrics_retention_rolls_up_last_sample_and_prunes_old_rows(tmp_path):
     ]
 
 
-def test_metrics_retention_deletes_expired_rollup_rows(tmp_path):
+def test_metrics_retention_rolls_up_in_chunks_and_resumes_from_checkpoint(tmp_path):
     settings = {
         "database": {
             "retention": {
@@ -916,6 +1312,7 @@ def test_metrics_retention_deletes_expired_rollup_rows(tmp_path):
                     "enabled": True,
                     "interval_seconds": 3_600,
                     "raw_retention_seconds": 604_800,
+                    "batch_size": 2,
                     "rollups": [
                         {
                             "resolution_seconds": 600,
@@ -930,62 +1327,95 @@ def test_metrics_retention_deletes_expired_rollup_rows(tmp_path):
 
     poller = DevicePoller(settings, data_dir=tmp_path)
     db_path = tmp_path / "telemetry.sqlite3"
-    reference_ts_ms = 2_000_000_000_000
-    rollup_cutoff_ms = reference_ts_ms - 15_552_000_000
+    reference_ts_ms = 1_000_000_000_000
+    first_bucket_ms = ((reference_ts_ms - 604_800_000 - 3_600_000) // 600_000) * 600_000
 
     with sqlite3.connect(db_path) as conn:
         poller._ensure_tables(conn)
         conn.executemany(
             """
-            INSERT INTO metric_rollups (
-                ts,
-                resolution_seconds,
-                device_type,
-                device_id,
-                metric,
-                value,
-                unit
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
             """,
             [
-                (rollup_cutoff_ms - 600_000, 600, "open_meteo", "1001", "temperature", 1.0, "celsius"),
-                (rollup_cutoff_ms, 600, "open_meteo", "1001", "temperature", 2.0, "celsius"),
+                (
+                    first_bucket_ms + bucket * 600_000 + offset,
+                    device_type,
+                    device_id,
+                    metric,
+                    float(bucket * 10 + offset),
+                    None,
+                )
+                for device_type, device_id, metric, buckets in (
+                    ("open_meteo", "1001", "temperature", 3),
+                    ("zont", "12000", "room_temp", 2),
+                )
+                for bucket in range(buckets)
+                for offset in (1, 2)
             ],
         )
 
+    rollup_sample_chunk = poller._rollup_sample_chunk
+    chunks = []
+
+    def interrupted_rollup_sample_chunk(conn, *, series_id, **kwargs):
+        if series_id == 2:
+            raise RuntimeError("interrupted")
+        chunk = rollup_sample_chunk(conn, series_id=series_id, **kwargs)
+        if chunk is not None:
+            chunks.append(chunk)
+        return chunk
+
+    poller._rollup_sample_chunk = interrupted_rollup_sample_chunk
+    with pytest.raises(RuntimeError):
+        poller._apply_metrics_retention(reference_ts_ms=reference_ts_ms)
+
+    with sqlite3.connect(db_path) as conn:
+        remaining_devices = conn.execute("SELECT DISTINCT device_id FROM metrics").fetchall()
+        checkpoint = conn.execute("SELECT state FROM maintenance_checkpoints").fetchall()
+
+    assert chunks == [(1, 2), (1, 2), (1, 2)]
+    assert remaining_devices == [("12000",)]
+    assert checkpoint == [('{"series_id": 1, "resolution_seconds": 600}',)]
+
+    del poller._rollup_sample_chunk
     result = poller._apply_metrics_retention(reference_ts_ms=reference_ts_ms)
 
     with sqlite3.connect(db_path) as conn:
-        remaining_rollups = conn.execute(
-            """
-            SELECT ts, value
-            FROM metric_rollups
-            ORDER BY ts
-            """
+        rollup_rows = conn.execute(
+            "SELECT device_id, ts, value FROM metric_rollups ORDER BY device_id, ts"
         ).fetchall()
+        remaining_raw_rows = conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+        checkpoint = conn.execute("SELECT state FROM maintenance_checkpoints").fetchall()
 
     assert result == {
-        "rolled_up_rows": 0,
-        "deleted_raw_rows": 0,
-        "deleted_rollup_rows": 1,
+        "rolled_up_rows": 2,
+        "deleted_raw_rows": 4,
+        "deleted_rollup_rows": 0,
     }
-    assert remaining_rollups == [(rollup_cutoff_ms, 2.0)]
+    assert rollup_rows == [
+        ("1001", first_bucket_ms, 2.0),
+        ("1001", first_bucket_ms + 600_000, 12.0),
+        ("1001", first_bucket_ms + 1_200_000, 22.0),
+        ("12000", first_bucket_ms, 2.0),
+        ("12000", first_bucket_ms + 600_000, 12.0),
+    ]
+    assert remaining_raw_rows == 0
+    assert checkpoint == []
+    poller.shutdown()
 
 
-def test_metric_catalog_cache_is_refreshed_after_rollup_expiration(tmp_path):
+def test_metrics_rollup_tiers_cascade_every_series_after_resuming_from_checkpoint(tmp_path):
     settings = {
         "database": {
             "retention": {
                 "metrics": {
                     "enabled": True,
                     "interval_seconds": 3_600,
-                    "raw_retention_seconds": 604_800,
+                    "raw_retention_seconds": 86_400,
                     "rollups": [
-                        {
-                            "resolution_seconds": 600,
-                            "retention_seconds": 15_552_000,
-                            "sample": "last",
-                        }
+                        {"resolution_seconds": 600, "retention_seconds": 172_800, "sample": "last"},
+                        {"resolution_seconds": 3_600, "retention_seconds": 2_592_000, "sample": "last"},
                     ],
                 }
             }
@@ -994,47 +1424,622 @@ def test_metric_catalog_cache_is_refreshed_after_rollup_expiration(tmp_path):
 
     poller = DevicePoller(settings, data_dir=tmp_path)
     db_path = tmp_path / "telemetry.sqlite3"
-    reference_ts_ms = 2_000_000_000_000
-    rollup_cutoff_ms = reference_ts_ms - 15_552_000_000
+    reference_ts_ms = 1_000_000_000_000
+    first_hour_ms = ((reference_ts_ms - 86_400_000) // 3_600_000) * 3_600_000 - 3 * 3_600_000
 
     with sqlite3.connect(db_path) as conn:
         poller._ensure_tables(conn)
-        conn.execute(
+        conn.executemany(
             """
-            INSERT INTO metric_rollups (
-                ts,
-                resolution_seconds,
-                device_type,
-                device_id,
-                metric,
-                value,
-                unit
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
             """,
-            (rollup_cutoff_ms - 600_000, 600, "open_meteo", "1001", "temperature", 1.0, "celsius"),
+            [
+                (first_hour_ms + offset, device_type, device_id, "temperature", 1.0, None)
+                for device_type, device_id in (("open_meteo", "1001"), ("zont", "12000"))
+                for offset in range(0, 3 * 3_600_000, 600_000)
+            ],
         )
 
-    assert poller.get_metric_catalog() == {"open_meteo": {"1001": ["temperature"]}}
+    def interrupted_cascade_rollup_chunk(conn, **kwargs):
+        raise RuntimeError("interrupted")
 
-    result = poller._apply_metrics_retention(reference_ts_ms=reference_ts_ms)
+    poller._cascade_rollup_chunk = interrupted_cascade_rollup_chunk
+    with pytest.raises(RuntimeError):
+        poller._apply_metrics_retention(reference_ts_ms=reference_ts_ms)
 
-    assert result == {
-        "rolled_up_rows": 0,
-        "deleted_raw_rows": 0,
-        "deleted_rollup_rows": 1,
-    }
-    assert poller.list_metric_device_types() == []
-    assert poller.get_metric_catalog() == {}
+    with sqlite3.connect(db_path) as conn:
+        checkpoint = conn.execute("SELECT state FROM maintenance_checkpoints").fetchall()
+    assert checkpoint == [('{"series_id": 2, "resolution_seconds": 600}',)]
 
+    del poller._cascade_rollup_chunk
+    poller._apply_metrics_retention(reference_ts_ms=reference_ts_ms)
 
-def test_zont_refresh_interval_180_is_valid(monkeypatch, tmp_path):
+    with sqlite3.connect(db_path) as conn:
+        hourly_rows = conn.execute(
+            """
+            SELECT device_id, COUNT(*)
+            FROM metric_rollups
+            WHERE resolution_seconds = 3600
+            GROUP BY device_id
+            ORDER BY device_id
+            """
+        ).fetchall()
+    assert hourly_rows == [("1001", 3), ("12000", 3)]
+    poller.shutdown()
+
+
+def test_metrics_rollups_keep_bucket_aggregates_and_merge_late_samples(tmp_path):
     settings = {
-        "devices": {
-            "refresh_interval": 30,
-            "zont": [
-                {
-                    "integration_id": 1,
-                    "device_id": 12000,
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 604_800,
+                    "rollups": [
+                        {
+                            "resolution_seconds": 600,
+                            "retention_seconds": 15_552_000,
+                            "sample": "last",
+                        }
+                    ],
+                }
+            }
+        }
+    }
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    db_path = tmp_path / "telemetry.sqlite3"
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    bucket_ms = ((now_ms - 604_800_000 - 3_600_000) // 600_000) * 600_000
+    recent_ts_ms = now_ms - 60_000
+
+    def insert_samples(rows):
+        with sqlite3.connect(db_path) as conn:
+            poller._ensure_tables(conn)
+            conn.executemany(
+                """
+                INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+                VALUES (?, 'whatsminer', 'miner01', 'power', ?, 'w')
+                """,
+                rows,
+            )
+
+    insert_samples(
+        [
+            (bucket_ms, 10.0),
+            (bucket_ms + 150_000, 20.0),
+            (bucket_ms + 300_000, 40.0),
+            (recent_ts_ms, 5.0),
+        ]
+    )
+    poller._apply_metrics_retention(reference_ts_ms=now_ms)
+
+    def series(aggregate):
+        return [
+            point["value"]
+            for point in poller.get_metric_series("whatsminer", "miner01", "power", None, None, aggregate=aggregate)
+        ]
+
+    assert series("sample") == [40.0, 5.0]
+    assert series("min") == [10.0, 5.0]
+    assert series("max") == [40.0, 5.0]
+    assert series("sum") == [70.0, 5.0]
+    assert series("count") == [3.0, 1.0]
+    assert series("avg") == [pytest.approx(70.0 / 3), 5.0]
+    # 10 held for 150 s, 20 for 150 s and 40 until the end of the bucket.
+    assert series("twa") == [pytest.approx(27.5), 5.0]
+    with pytest.raises(ValueError):
+        series("median")
+
+    insert_samples([(bucket_ms + 450_000, 0.0)])
+    poller._apply_metrics_retention(reference_ts_ms=now_ms)
+
+    assert series("count") == [4.0, 1.0]
+    assert series("min") == [0.0, 5.0]
+    assert series("sum") == [70.0, 5.0]
+    assert series("sample") == [0.0, 5.0]
+    poller.shutdown()
+
+
+def test_metrics_rollup_tiers_cascade_and_reads_pick_tier_per_range(tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 86_400,
+                    "rollups": [
+                        {"resolution_seconds": 3_600, "retention_seconds": 2_592_000, "sample": "last"},
+                        {"resolution_seconds": 600, "retention_seconds": 172_800, "sample": "last"},
+                        {"resolution_seconds": 900, "retention_seconds": 172_800, "sample": "last"},
+                    ],
+                }
+            }
+        }
+    }
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    db_path = tmp_path / "telemetry.sqlite3"
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    first_ts_ms = (now_ms // 3_600_000) * 3_600_000 - 4 * 86_400_000
+    samples = [(ts, float(index)) for index, ts in enumerate(range(first_ts_ms, now_ms - 60_000, 300_000))]
+
+    with sqlite3.connect(db_path) as conn:
+        poller._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, 'zont', '12000', 'boiler_feed_temp', ?, 'celsius')
+            """,
+            samples,
+        )
+
+    poller._apply_metrics_retention(reference_ts_ms=now_ms)
+
+    raw_cutoff_ms = ((now_ms - 86_400_000) // 600_000) * 600_000
+    hourly_end_ms = (raw_cutoff_ms // 3_600_000) * 3_600_000
+    expected_hours = {}
+    for ts, value in samples:
+        if ts < hourly_end_ms:
+            count, total = expected_hours.get((ts // 3_600_000) * 3_600_000, (0, 0.0))
+            expected_hours[(ts // 3_600_000) * 3_600_000] = (count + 1, total + value)
+
+    with sqlite3.connect(db_path) as conn:
+        hourly_rows = conn.execute(
+            """
+            SELECT ts, sample_count, sum_value
+            FROM sample_rollups
+            WHERE resolution_seconds = 3600
+            ORDER BY ts
+            """
+        ).fetchall()
+        ten_minute_range = conn.execute(
+            "SELECT MIN(ts), MAX(ts) FROM sample_rollups WHERE resolution_seconds = 600"
+        ).fetchone()
+        resolutions = {row[0] for row in conn.execute("SELECT DISTINCT resolution_seconds FROM sample_rollups")}
+
+    assert hourly_rows == [(ts, count, total) for ts, (count, total) in sorted(expected_hours.items())]
+    assert ten_minute_range[0] >= now_ms - 172_800_000
+    assert ten_minute_range[1] == raw_cutoff_ms - 600_000
+    assert resolutions == {600, 3_600}
+
+    def spacings(points):
+        return {later["ts"] - earlier["ts"] for earlier, later in zip(points, points[1:])}
+
+    points = poller.get_metric_series("zont", "12000", "boiler_feed_temp", None, None)
+    hourly_points = [point for point in points if point["ts"] < now_ms - 172_800_000]
+    ten_minute_points = [point for point in points if now_ms - 172_800_000 <= point["ts"] < raw_cutoff_ms]
+    raw_points = [point for point in points if point["ts"] >= raw_cutoff_ms]
+    assert spacings(hourly_points) == {3_600_000}
+    assert spacings(ten_minute_points) == {600_000}
+    assert spacings(raw_points) == {300_000}
+
+    budget_points = poller.get_metric_series(
+        "zont",
+        "12000",
+        "boiler_feed_temp",
+        now_ms - 3 * 86_400_000,
+        raw_cutoff_ms - 1,
+        max_points=100,
+    )
+    assert spacings(budget_points) == {3_600_000}
+    assert len(budget_points) <= 100
+
+    second_run = poller._apply_metrics_retention(reference_ts_ms=now_ms)
+    with sqlite3.connect(db_path) as conn:
+        hourly_count = conn.execute(
+            "SELECT COUNT(*) FROM sample_rollups WHERE resolution_seconds = 3600"
+        ).fetchone()[0]
+
+    assert second_run["rolled_up_rows"] == 0
+    assert hourly_count == len(expected_hours)
+    poller.shutdown()
+
+
+def test_metric_series_downsamples_to_point_budget_and_marks_gaps(tmp_path):
+    poller = DevicePoller({}, data_dir=tmp_path)
+    step_ms = 630_000
+    base_ms = step_ms * 2_000_000
+    samples = [(base_ms + index * 30_000, float(index)) for index in range(240)]
+    samples += [(base_ms + 10_800_000 + index * 30_000, float(index)) for index in range(60)]
+
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        poller._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, 'whatsminer', 'miner01', 'power', ?, 'w')
+            """,
+            samples,
+        )
+
+    def read(**kwargs):
+        return poller.get_metric_series(
+            "whatsminer",
+            "miner01",
+            "power",
+            base_ms,
+            base_ms + 12_600_000,
+            **kwargs,
+        )
+
+    averaged = read(max_points=20, gap_ms=720_000)
+    peaks = read(max_points=20, aggregate="max")
+    raw = read(gap_ms=720_000)
+
+    assert len(averaged) == 16
+    assert averaged[0] == {"ts": base_ms, "value": 10.0}
+    assert averaged[12] == {"ts": base_ms + 6_930_000 + 2 * step_ms, "value": None}
+    assert averaged[13]["ts"] == base_ms + 10_800_000
+    assert [point["value"] for point in averaged].count(None) == 1
+    assert peaks[0] == {"ts": base_ms, "value": 20.0}
+    assert len(raw) == 301
+    assert raw[240] == {"ts": base_ms + 7_170_000 + 720_000, "value": None}
+    with pytest.raises(ValueError):
+        read(max_points=0)
+    with pytest.raises(ValueError, match="max_points"):
+        read(max_points=True)
+    with pytest.raises(ValueError, match="unsupported aggregate"):
+        read(aggregate=["avg"])
+    poller.shutdown()
+
+
+def test_metric_series_batch_reads_all_series_on_one_reader(tmp_path):
+    poller = DevicePoller({}, data_dir=tmp_path)
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        poller._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, ?, ?, ?, ?, NULL)
+            """,
+            [
+                (1_000, "zont", "12000", "room_temp", 21.0),
+                (2_000, "zont", "12000", "room_temp", 21.5),
+                (1_500, "whatsminer", "miner01", "power", 3_000.0),
+            ],
+        )
+    series = [
+        {"device_type": "zont", "device_id": "12000", "metric": "room_temp"},
+        {"device_type": "whatsminer", "device_id": "miner01", "metric": "power", "aggregate": "count"},
+        {"device_type": "whatsminer", "device_id": "miner02", "metric": "power"},
+    ]
+
+    with pytest.raises(ValueError):
+        poller.iter_metric_series([{**series[0], "gap_ms": -1}], None, None)
+    with pytest.raises(ValueError, match="gap_ms must be a positive integer"):
+        poller.iter_metric_series([{**series[0], "gap_ms": False}], None, None)
+    with pytest.raises(ValueError, match="unsupported aggregate"):
+        poller.iter_metric_series([{**series[0], "aggregate": 1}], None, None)
+    with pytest.raises(ValueError, match="max_points must be a positive integer"):
+        poller.iter_metric_series(series, None, None, max_points=True)
+    checkouts_before = poller._db.stats()["reader_checkouts"]
+    results = list(poller.iter_metric_series(series, None, 2_000))
+
+    assert poller._db.stats()["reader_checkouts"] - checkouts_before == 1
+    assert [(item, points) for item, points in results] == [
+        (series[0], [{"ts": 1_000, "value": 21.0}, {"ts": 2_000, "value": 21.5}]),
+        (series[1], [{"ts": 1_500, "value": 1.0}]),
+        (series[2], []),
+    ]
+    poller.shutdown()
+
+
+def test_metric_export_streams_filtered_rows_in_chunks_without_the_writer(tmp_path):
+    poller = DevicePoller({}, data_dir=tmp_path)
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        poller._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (3_000, "zont", "12000", "room_temp", 21.2, "c"),
+                (1_000, "zont", "12000", "room_temp", 21.0, "c"),
+                (2_000, "zont", "12000", "room_temp", 21.1, "c"),
+                (1_000, "whatsminer", "miner01", "power", 3_000.0, "w"),
+                (1_000, "zont", "12000", "boiler_feed_temp", 45.0, "c"),
+            ],
+        )
+        conn.execute(
+            """
+            INSERT INTO metric_rollups (ts, resolution_seconds, device_type, device_id, metric, value, unit)
+            VALUES (0, 600, 'zont', '12000', 'room_temp', 20.5, 'c')
+            """
+        )
+
+    with pytest.raises(ValueError):
+        poller.iter_metric_export("samples")
+    with pytest.raises(ValueError):
+        poller.iter_metric_export("raw", resolution_seconds=600)
+
+    columns, chunks = poller.iter_metric_export(
+        "raw",
+        device_types=["zont"],
+        metrics=["room_temp", "boiler_feed_temp"],
+        start_ms=1_000,
+        chunk_size=2,
+    )
+    first_chunk = next(chunks)
+    assert poller._db.writer_lock.acquire(blocking=False)
+    poller._db.writer_lock.release()
+    rows = first_chunk + [row for chunk in chunks for row in chunk]
+
+    assert columns == ("ts", "device_type", "device_id", "metric", "value", "unit")
+    assert len(first_chunk) == 2
+    assert rows == [
+        (1_000, "zont", "12000", "boiler_feed_temp", 45.0, "c"),
+        (1_000, "zont", "12000", "room_temp", 21.0, "c"),
+        (2_000, "zont", "12000", "room_temp", 21.1, "c"),
+        (3_000, "zont", "12000", "room_temp", 21.2, "c"),
+    ]
+
+    columns, chunks = poller.iter_metric_export("rollups", resolution_seconds=600)
+    assert [dict(zip(columns, row)) for chunk in chunks for row in chunk] == [
+        {
+            "ts": 0,
+            "resolution_seconds": 600,
+            "device_type": "zont",
+            "device_id": "12000",
+            "metric": "room_temp",
+            "value": 20.5,
+            "min_value": None,
+            "max_value": None,
+            "sum_value": None,
+            "sample_count": None,
+            "time_weighted_value": None,
+            "covered_ms": None,
+            "unit": "c",
+        }
+    ]
+    poller.shutdown()
+
+
+def test_metrics_retention_deletes_expired_rollup_rows(tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 604_800,
+                    "rollups": [
+                        {
+                            "resolution_seconds": 600,
+                            "retention_seconds": 15_552_000,
+                            "sample": "last",
+                        }
+                    ],
+                }
+            }
+        }
+    }
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    db_path = tmp_path / "telemetry.sqlite3"
+    reference_ts_ms = 2_000_000_000_000
+    rollup_cutoff_ms = reference_ts_ms - 15_552_000_000
+
+    with sqlite3.connect(db_path) as conn:
+        poller._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metric_rollups (
+                ts,
+                resolution_seconds,
+                device_type,
+                device_id,
+                metric,
+                value,
+                unit
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (rollup_cutoff_ms - 600_000, 600, "open_meteo", "1001", "temperature", 1.0, "celsius"),
+                (rollup_cutoff_ms, 600, "open_meteo", "1001", "temperature", 2.0, "celsius"),
+            ],
+        )
+
+    result = poller._apply_metrics_retention(reference_ts_ms=reference_ts_ms)
+
+    with sqlite3.connect(db_path) as conn:
+        remaining_rollups = conn.execute(
+            """
+            SELECT ts, value
+            FROM metric_rollups
+            ORDER BY ts
+            """
+        ).fetchall()
+
+    assert result == {
+        "rolled_up_rows": 0,
+        "deleted_raw_rows": 0,
+        "deleted_rollup_rows": 1,
+    }
+    assert remaining_rollups == [(rollup_cutoff_ms, 2.0)]
+
+
+def test_retention_archives_expired_rows_and_reads_them_back(tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "raw_events": {"retention_seconds": 86_400, "interval_seconds": 3_600},
+                "metrics": {
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 3_600,
+                    "rollups": [{"resolution_seconds": 600, "retention_seconds": 86_400}],
+                },
+                "archive": {"format": "csv"},
+            }
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    old_bucket_ms = (now_ms - 3 * 86_400_000) // 600_000 * 600_000
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        poller._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, 'zont', '12000', 'room_temp', ?, 'c')
+            """,
+            [(old_bucket_ms + 60_000, 20.0), (old_bucket_ms + 120_000, 22.0), (now_ms, 23.0)],
+        )
+        conn.execute(
+            """
+            INSERT INTO raw_events (ts, device_type, device_id, codec, payload)
+            VALUES (?, 'zont', '12000', 'zlib', ?)
+            """,
+            (old_bucket_ms, zlib.compress(b'{"temp": 20}')),
+        )
+
+    poller._apply_metrics_retention(reference_ts_ms=now_ms)
+    poller._apply_raw_events_retention(reference_ts_ms=now_ms)
+
+    archive = poller._load_metric_archive()
+    archived_kinds = {path.relative_to(archive.root).parts[0] for path in archive.root.rglob("*.csv.gz")}
+    assert archived_kinds == {"samples", "rollups", "raw_events"}
+    assert sorted(row[4] for row in archive.read("samples")) == [20.0, 22.0]
+    assert [row[:2] for row in archive.read("rollups")] == [(old_bucket_ms, 600)]
+    assert list(archive.read("raw_events")) == [(old_bucket_ms, "zont", "12000", '{"temp": 20}')]
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sample_rollups").fetchone() == (0,)
+        assert conn.execute("SELECT COUNT(*) FROM raw_events").fetchone() == (0,)
+
+    start_ms = now_ms - 4 * 86_400_000
+    assert poller.get_metric_series("zont", "12000", "room_temp", start_ms, None) == [
+        {"ts": old_bucket_ms, "value": 22.0},
+        {"ts": now_ms, "value": 23.0},
+    ]
+    assert poller.get_metric_series("zont", "12000", "room_temp", start_ms, None, aggregate="min", max_points=10) == [
+        {"ts": old_bucket_ms, "value": 20.0},
+        {"ts": now_ms, "value": 23.0},
+    ]
+    poller.shutdown()
+
+
+def test_archived_rollups_are_read_once_per_query_and_only_for_explicit_old_ranges(tmp_path, monkeypatch):
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 3_600,
+                    "rollups": [{"resolution_seconds": 600, "retention_seconds": 86_400}],
+                },
+                "archive": {"format": "csv"},
+            }
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    old_bucket_ms = (now_ms - 3 * 86_400_000) // 600_000 * 600_000
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        poller._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, 'zont', '12000', ?, ?, 'c')
+            """,
+            [
+                (old_bucket_ms + 60_000, "room_temp", 20.0),
+                (old_bucket_ms + 60_000, "target_temp", 21.0),
+                (now_ms, "room_temp", 23.0),
+            ],
+        )
+    poller._apply_metrics_retention(reference_ts_ms=now_ms)
+
+    reads = []
+    original_read = device_polling.MetricArchive.read
+
+    def counting_read(self, kind, *args, **kwargs):
+        reads.append(kind)
+        return original_read(self, kind, *args, **kwargs)
+
+    monkeypatch.setattr(device_polling.MetricArchive, "read", counting_read)
+    series = [
+        {"device_type": "zont", "device_id": "12000", "metric": "room_temp"},
+        {"device_type": "zont", "device_id": "12000", "metric": "target_temp"},
+    ]
+
+    results = list(poller.iter_metric_series(series, now_ms - 4 * 86_400_000, None))
+
+    assert reads == ["rollups"]
+    assert [[point["value"] for point in points] for _item, points in results] == [[20.0, 23.0], [21.0]]
+
+    # An open-ended read stays on the hot tables.
+    assert poller.get_metric_series("zont", "12000", "room_temp", None, None) == [{"ts": now_ms, "value": 23.0}]
+    assert reads == ["rollups"]
+    poller.shutdown()
+
+
+def test_metric_catalog_cache_is_refreshed_after_rollup_expiration(tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 604_800,
+                    "rollups": [
+                        {
+                            "resolution_seconds": 600,
+                            "retention_seconds": 15_552_000,
+                            "sample": "last",
+                        }
+                    ],
+                }
+            }
+        }
+    }
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    db_path = tmp_path / "telemetry.sqlite3"
+    reference_ts_ms = 2_000_000_000_000
+    rollup_cutoff_ms = reference_ts_ms - 15_552_000_000
+
+    with sqlite3.connect(db_path) as conn:
+        poller._ensure_tables(conn)
+        conn.execute(
+            """
+            INSERT INTO metric_rollups (
+                ts,
+                resolution_seconds,
+                device_type,
+                device_id,
+                metric,
+                value,
+                unit
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (rollup_cutoff_ms - 600_000, 600, "open_meteo", "1001", "temperature", 1.0, "celsius"),
+        )
+
+    assert poller.get_metric_catalog() == {"open_meteo": {"1001": ["temperature"]}}
+
+    result = poller._apply_metrics_retention(reference_ts_ms=reference_ts_ms)
+
+    assert result == {
+        "rolled_up_rows": 0,
+        "deleted_raw_rows": 0,
+        "deleted_rollup_rows": 1,
+    }
+    assert poller.list_metric_device_types() == []
+    assert poller.get_metric_catalog() == {}
+
+
+def test_zont_refresh_interval_180_is_valid(monkeypatch, tmp_path):
+    settings = {
+        "devices": {
+            "refresh_interval": 30,
+            "zont": [
+                {
+                    "integration_id": 1,
+                    "device_id": 12000,
                     "serial": "SN-NEEDED",
                     "refresh_interval": 180,
                 }
@@ -1074,8 +2079,8 @@ def test_raw_events_retention_job_is_scheduled_and_runs_on_start(tmp_path):
         poller._ensure_tables(conn)
         conn.executemany(
             """
-            INSERT INTO raw_events (ts, device_type, device_id, payload)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO raw_events (ts, device_type, device_id, codec, payload)
+            VALUES (?, ?, ?, 'zlib', ?)
             """,
             [
                 (now_ms - 86_500_000, "legacy", "old", "{}"),
@@ -1084,6 +2089,7 @@ def test_raw_events_retention_job_is_scheduled_and_runs_on_start(tmp_path):
         )
 
     poller.start()
+    wait_for_first_runs(poller)
     try:
         assert poller._scheduler is not None
         jobs = poller._scheduler.get_jobs()
@@ -1131,7 +2137,8 @@ def test_metrics_retention_job_is_scheduled_and_runs_on_start(tmp_path):
     poller = DevicePoller(settings, data_dir=tmp_path)
     db_path = tmp_path / "telemetry.sqlite3"
     now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
-    old_ts_ms = now_ms - 604_900_000
+    # Old enough to fall into a bucket that ends before the raw cutoff.
+    old_ts_ms = now_ms - 604_800_000 - 1_200_000
 
     with sqlite3.connect(db_path) as conn:
         poller._ensure_tables(conn)
@@ -1144,6 +2151,7 @@ def test_metrics_retention_job_is_scheduled_and_runs_on_start(tmp_path):
         )
 
     poller.start()
+    wait_for_first_runs(poller)
     try:
         assert poller._scheduler is not None
         jobs = poller._scheduler.get_jobs()
@@ -1218,8 +2226,8 @@ def test_database_vacuum_runs_when_free_ratio_exceeds_threshold(tmp_path):
         poller._ensure_tables(conn)
         conn.executemany(
             """
-            INSERT INTO raw_events (ts, device_type, device_id, payload)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO raw_events (ts, device_type, device_id, codec, payload)
+            VALUES (?, ?, ?, 'zlib', ?)
             """,
             [
                 (idx, "bulk", str(idx), large_payload)
@@ -1266,8 +2274,8 @@ def test_database_vacuum_skips_when_free_ratio_is_below_threshold(tmp_path):
         poller._ensure_tables(conn)
         conn.executemany(
             """
-            INSERT INTO raw_events (ts, device_type, device_id, payload)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO raw_events (ts, device_type, device_id, codec, payload)
+            VALUES (?, ?, ?, 'zlib', ?)
             """,
             [
                 (idx, "bulk", str(idx), large_payload)
@@ -1313,8 +2321,8 @@ def test_database_vacuum_skips_when_reclaimable_mb_is_below_threshold(tmp_path):
         poller._ensure_tables(conn)
         conn.executemany(
             """
-            INSERT INTO raw_events (ts, device_type, device_id, payload)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO raw_events (ts, device_type, device_id, codec, payload)
+            VALUES (?, ?, ?, 'zlib', ?)
             """,
             [
                 (idx, "bulk", str(idx), large_payload)
@@ -1361,8 +2369,8 @@ def test_database_vacuum_force_runs_even_when_thresholds_are_not_met(tmp_path):
         poller._ensure_tables(conn)
         conn.executemany(
             """
-            INSERT INTO raw_events (ts, device_type, device_id, payload)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO raw_events (ts, device_type, device_id, codec, payload)
+            VALUES (?, ?, ?, 'zlib', ?)
             """,
             [
                 (idx, "bulk", str(idx), large_payload)
@@ -1386,6 +2394,55 @@ def test_database_vacuum_force_runs_even_when_thresholds_are_not_met(tmp_path):
     assert after_freelist_count == 0
 
 
+def test_incremental_database_vacuum_converts_once_then_frees_pages_in_slices(tmp_path):
+    settings = {
+        "database": {
+            "maintenance": {
+                "vacuum": {
+                    "interval_seconds": 86_400,
+                    "min_free_ratio": 0.01,
+                    "min_reclaimable_mb": 0.0,
+                    "mode": "incremental",
+                    "incremental_pages": 16,
+                    "slice_pause_ms": 0,
+                }
+            }
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+
+    def fill_and_delete(rows):
+        with poller._db.writer() as conn:
+            conn.executemany(
+                "INSERT INTO raw_events (ts, device_type, device_id, codec, payload) VALUES (?, 'bulk', ?, 'zlib', ?)",
+                [(idx, str(idx), b"x" * 4096) for idx in range(rows)],
+            )
+        with poller._db.writer() as conn:
+            conn.execute("DELETE FROM raw_events")
+
+    fill_and_delete(64)
+    converted = poller.run_database_vacuum()
+    fill_and_delete(64)
+    sliced = poller.run_database_vacuum()
+    status = poller.get_database_vacuum_status()
+
+    assert (converted["vacuumed"], converted["before"]["auto_vacuum"], converted["after"]["auto_vacuum"]) == (
+        True,
+        "none",
+        "incremental",
+    )
+    assert converted["pauses"]["count"] == 1
+    assert sliced["vacuumed"] is True
+    assert sliced["before"]["freelist_count"] > 16
+    assert sliced["after"]["freelist_count"] == 0
+    assert sliced["pauses"]["count"] == -(-sliced["before"]["freelist_count"] // 16)
+    assert sliced["pauses"]["max_ms"] >= sliced["pauses"]["avg_ms"] > 0
+    assert status["last_run"]["mode"] == "incremental"
+    assert status["last_run"]["pauses"] == sliced["pauses"]
+    assert status["policy"]["incremental_pages"] == 16
+    poller.shutdown()
+
+
 def test_metric_series_reads_rollups_and_raw_rows_across_cutoff(tmp_path):
     settings = {
         "database": {
@@ -1445,10 +2502,111 @@ def test_metric_series_reads_rollups_and_raw_rows_across_cutoff(tmp_path):
         raw_ts_ms,
     )
 
-    assert points == [
-        {"ts": rollup_ts_ms, "value": 1.0},
-        {"ts": raw_ts_ms, "value": 2.0},
-    ]
+    assert points == [
+        {"ts": rollup_ts_ms, "value": 1.0},
+        {"ts": raw_ts_ms, "value": 2.0},
+    ]
+
+
+def test_metric_series_stitches_tiers_and_raw_fallback_in_one_query(tmp_path):
+    day_ms = 86_400_000
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 86_400,
+                    "rollups": [
+                        {"resolution_seconds": 600, "retention_seconds": 10 * 86_400},
+                        {"resolution_seconds": 3_600, "retention_seconds": 100 * 86_400},
+                    ],
+                }
+            }
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    hourly_ts = (now_ms - 20 * day_ms) // 3_600_000 * 3_600_000
+    # Not rolled up yet, so the 10-minute tier falls back to raw samples.
+    unrolled_ts = now_ms - 5 * day_ms
+    raw_ts = now_ms - 60_000
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        poller._ensure_tables(conn)
+        conn.execute(
+            """
+            INSERT INTO metric_rollups (ts, resolution_seconds, device_type, device_id, metric, value, unit)
+            VALUES (?, 3600, 'zont', '12000', 'room_temp', 19.0, 'celsius')
+            """,
+            (hourly_ts,),
+        )
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, 'zont', '12000', 'room_temp', ?, 'celsius')
+            """,
+            [(raw_ts, 21.0), (unrolled_ts, 20.0)],
+        )
+
+    statements = []
+    with poller._db.reader() as conn:
+        conn.set_trace_callback(statements.append)
+    points = poller.get_metric_series("zont", "12000", "room_temp", None, None)
+    with poller._db.reader() as conn:
+        conn.set_trace_callback(None)
+
+    assert points == [
+        {"ts": hourly_ts, "value": 19.0},
+        {"ts": unrolled_ts, "value": 20.0},
+        {"ts": raw_ts, "value": 21.0},
+    ]
+    assert len([statement for statement in statements if "samples" in statement]) == 1
+    poller.shutdown()
+
+
+def test_metric_series_cache_rereads_only_the_live_tail(tmp_path):
+    poller = DevicePoller({}, data_dir=tmp_path)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    start_ms = now_ms - 3_600_000
+
+    def write(ts_ms, value):
+        poller._write_metrics(
+            ts_ms=ts_ms,
+            device_type="zont",
+            device_id="12000",
+            metrics=[MetricSample(name="room_temp", value=value, unit="celsius")],
+        )
+
+    def read():
+        statements = []
+        with poller._db.reader() as conn:
+            conn.set_trace_callback(statements.append)
+        points = poller.get_metric_series("zont", "12000", "room_temp", start_ms, None)
+        with poller._db.reader() as conn:
+            conn.set_trace_callback(None)
+        tail_starts = [
+            int(re.search(r"ts >= (\d+)", statement).group(1))
+            for statement in statements
+            if "FROM samples" in statement
+        ]
+        return [point["value"] for point in points], tail_starts
+
+    write(start_ms + 60_000, 20.0)
+    write(start_ms + 120_000, 20.5)
+
+    assert read() == ([20.0, 20.5], [start_ms])
+    values, tail_starts = read()
+    assert values == [20.0, 20.5]
+    assert tail_starts[0] > start_ms + 120_000
+
+    write(now_ms + 1_000, 21.0)
+    assert read()[0] == [20.0, 20.5, 21.0]
+
+    # A backfilled sample lands in the cached part and drops the entry.
+    write(start_ms + 90_000, 20.2)
+    assert read() == ([20.0, 20.2, 20.5, 21.0], [start_ms])
+    assert poller.get_series_cache_status()["invalidations"] == 1
+    poller.shutdown()
 
 
 def test_metric_catalog_includes_rollup_only_metrics(tmp_path):
@@ -1523,6 +2681,285 @@ def test_metric_catalog_cache_is_updated_after_new_metric_writes(tmp_path):
     }
 
 
+def test_metric_catalog_table_tracks_counts_and_is_rebuilt_for_existing_databases(tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 600,
+                    "rollups": [{"resolution_seconds": 600, "retention_seconds": 86_400, "sample": "last"}],
+                }
+            }
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    for ts_ms, value in [(1_000, 1.0), (61_000, 2.0), (61_000, 2.5), (1_300_000, 3.0)]:
+        poller._write_metrics(
+            ts_ms=ts_ms,
+            device_type="open_meteo",
+            device_id="1001",
+            metrics=[MetricSample(name="temperature", value=value, unit="celsius")],
+        )
+
+    series = poller.get_metric_catalog_series()
+    assert series == [
+        {
+            "device_type": "open_meteo",
+            "device_id": "1001",
+            "metric": "temperature",
+            "unit": "celsius",
+            "first_seen": 1_000,
+            "last_seen": 1_300_000,
+            # The rewrite at 61 s replaced a sample instead of adding one.
+            "sample_count": 3,
+            "rollup_count": 0,
+        }
+    ]
+
+    poller._apply_metrics_retention(reference_ts_ms=1_300_000)
+    series = poller.get_metric_catalog_series()
+    assert (series[0]["sample_count"], series[0]["rollup_count"]) == (1, 1)
+    # The rollup point is stamped at the start of its bucket.
+    assert series[0]["first_seen"] == 0
+
+    poller.shutdown()
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        # Ad-hoc SQL through the views keeps the catalog in step as well.
+        conn.execute(
+            "INSERT INTO metrics (ts, device_type, device_id, metric, value, unit) VALUES (?, ?, ?, ?, ?, ?)",
+            (1_300_000, "open_meteo", "1001", "temperature", 3.5, "celsius"),
+        )
+        conn.execute(
+            "INSERT INTO metrics (ts, device_type, device_id, metric, value, unit) VALUES (?, ?, ?, ?, ?, ?)",
+            (1_360_000, "open_meteo", "1001", "temperature", 4.0, "celsius"),
+        )
+        assert conn.execute("SELECT sample_count, last_seen FROM metric_catalog").fetchone() == (2, 1_360_000)
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'samples'").fetchone() == (0,)
+        series[0].update(sample_count=2, last_seen=1_360_000)
+        # A database whose catalog predates this version is rebuilt from the data.
+        conn.execute("DROP TABLE metric_catalog")
+
+    reopened = DevicePoller(settings, data_dir=tmp_path)
+    assert reopened.get_metric_catalog_series() == series
+    assert reopened.get_metric_catalog() == {"open_meteo": {"1001": ["temperature"]}}
+
+
+def test_metric_reads_do_not_wait_for_long_metrics_retention(tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 604_800,
+                    "rollups": [
+                        {
+                            "resolution_seconds": 600,
+                            "retention_seconds": 15_552_000,
+                            "sample": "last",
+                        }
+                    ],
+                }
+            }
+        }
+    }
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    old_ts_ms = now_ms - 604_800_000 - 600_000
+    recent_ts_ms = now_ms - 60_000
+
+    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
+        poller._ensure_tables(conn)
+        conn.executemany(
+            """
+            INSERT INTO metrics (ts, device_type, device_id, metric, value, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (old_ts_ms, "open_meteo", "1001", "temperature", 1.0, "celsius"),
+                (recent_ts_ms, "open_meteo", "1001", "temperature", 2.0, "celsius"),
+            ],
+        )
+
+    rollup_started = threading.Event()
+    release_rollup = threading.Event()
+    rollup_sample_chunk = poller._rollup_sample_chunk
+
+    def slow_rollup_sample_chunk(*args, **kwargs):
+        rollup_started.set()
+        release_rollup.wait(timeout=10)
+        return rollup_sample_chunk(*args, **kwargs)
+
+    poller._rollup_sample_chunk = slow_rollup_sample_chunk
+    retention_thread = threading.Thread(target=poller._apply_metrics_retention)
+    retention_thread.start()
+    try:
+        assert rollup_started.wait(timeout=5)
+
+        started_at = time.monotonic()
+        points = poller.get_metric_series("open_meteo", "1001", "temperature", recent_ts_ms, None)
+        catalog = poller.get_metric_catalog()
+        elapsed = time.monotonic() - started_at
+
+        assert retention_thread.is_alive()
+        assert elapsed < 1.0
+        assert points == [{"ts": recent_ts_ms, "value": 2.0}]
+        assert catalog == {"open_meteo": {"1001": ["temperature"]}}
+    finally:
+        release_rollup.set()
+        retention_thread.join(timeout=10)
+
+    assert not retention_thread.is_alive()
+    assert poller.get_metric_series("open_meteo", "1001", "temperature", None, None) == [
+        {"ts": (old_ts_ms // 600_000) * 600_000, "value": 1.0},
+        {"ts": recent_ts_ms, "value": 2.0},
+    ]
+    poller.shutdown()
+
+
+def test_repeated_polls_reuse_pooled_sqlite_connections(monkeypatch, tmp_path):
+    settings = {
+        "location": {
+            "name": "Moscow",
+            "latitude": 55.7558,
+            "longitude": 37.6173,
+            "timezone": "Europe/Moscow",
+        },
+        "devices": {"open_meteo": [{"device_id": 1001, "type": "virtual"}]},
+        "database": {"connection": {"synchronous": "full", "cache_size": -4096}},
+    }
+    monkeypatch.setattr(
+        device_polling,
+        "fetch_open_meteo_weather",
+        lambda **kwargs: {
+            "provider": "open_meteo",
+            "timestamp": "2026-03-29T10:15:00+00:00",
+            "current": {"temperature": 1.5},
+            "units": {"temperature": "celsius"},
+        },
+    )
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    poller.poll_open_meteo_device(settings["devices"]["open_meteo"][0])
+    poller.get_metric_series("open_meteo", "1001", "temperature", None, None)
+    connects_after_warmup = poller._db.stats()["connects"]
+
+    for _ in range(5):
+        # Samples are unique per series and millisecond timestamp.
+        time.sleep(0.002)
+        poller.poll_open_meteo_device(settings["devices"]["open_meteo"][0])
+        poller.get_metric_series("open_meteo", "1001", "temperature", None, None)
+
+    assert poller._db.stats()["connects"] == connects_after_warmup
+    assert poller._db.options.synchronous == "full"
+    assert len(poller.get_metric_series("open_meteo", "1001", "temperature", None, None)) == 6
+    poller.shutdown()
+
+
+def test_poll_commits_raw_event_metrics_and_control_inputs_in_one_transaction(monkeypatch, tmp_path):
+    settings = {
+        "location": {
+            "name": "Moscow",
+            "latitude": 55.7558,
+            "longitude": 37.6173,
+            "timezone": "Europe/Moscow",
+        },
+        "devices": {"open_meteo": [{"device_id": 1001, "type": "virtual"}]},
+        "control_inputs": {
+            "max_age_seconds": 180,
+            "outdoor_temp": {
+                "select": "highest_priority_available",
+                "sources": [{"device_type": "open_meteo", "device_id": "1001", "metric": "temperature"}],
+            },
+        },
+    }
+    monkeypatch.setattr(
+        device_polling,
+        "fetch_open_meteo_weather",
+        lambda **kwargs: {
+            "provider": "open_meteo",
+            "timestamp": "2026-03-29T10:15:00+00:00",
+            "current": {"temperature": 1.5},
+            "units": {"temperature": "celsius"},
+        },
+    )
+    device = settings["devices"]["open_meteo"][0]
+    db_path = tmp_path / "telemetry.sqlite3"
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    poller.get_metric_catalog()
+    transactions_before = poller._db.stats()["writer_transactions"]
+    poller.poll_open_meteo_device(device)
+    assert poller._db.stats()["writer_transactions"] == transactions_before + 1
+
+    def failing_refresh(conn, ts_ms, touched=None):
+        raise RuntimeError("control inputs failed")
+
+    monkeypatch.setattr(poller, "_refresh_control_inputs", failing_refresh)
+    with pytest.raises(RuntimeError):
+        poller.poll_open_meteo_device(device)
+    poller.shutdown()
+
+    with sqlite3.connect(db_path) as conn:
+        raw_events = conn.execute("SELECT COUNT(*) FROM raw_events").fetchone()[0]
+        metric_rows = conn.execute(
+            "SELECT metric FROM metrics WHERE device_type = 'open_meteo'"
+        ).fetchall()
+        control_inputs = conn.execute("SELECT outdoor_temp FROM control_inputs").fetchall()
+
+    assert raw_events == 1
+    assert metric_rows == [("temperature",)]
+    assert control_inputs == [(1.5,)]
+
+
+def test_started_poller_persists_polls_through_write_queue(monkeypatch, tmp_path):
+    settings = {
+        "location": {
+            "name": "Moscow",
+            "latitude": 55.7558,
+            "longitude": 37.6173,
+            "timezone": "Europe/Moscow",
+        },
+        "devices": {"open_meteo": [{"device_id": 1001, "type": "virtual", "refresh_interval": 3_600}]},
+        "database": {"write_queue": {"max_batch_size": 100, "max_latency_ms": 60_000}},
+    }
+    monkeypatch.setattr(
+        device_polling,
+        "fetch_open_meteo_weather",
+        lambda **kwargs: {
+            "provider": "open_meteo",
+            "timestamp": "2026-03-29T10:15:00+00:00",
+            "current": {"temperature": 1.5},
+            "units": {"temperature": "celsius"},
+        },
+    )
+    device = settings["devices"]["open_meteo"][0]
+
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    poller.start()
+    wait_for_first_runs(poller)
+    try:
+        for _ in range(3):
+            time.sleep(0.002)
+            poller.poll_open_meteo_device(device)
+        queued_status = poller.get_write_queue_status()
+        assert queued_status["running"] is True
+        assert queued_status["queue_depth"] == 4
+        assert poller.get_latest_payloads()["open_meteo:1001"]["payload"]["current"] == {"temperature": 1.5}
+    finally:
+        poller.shutdown()
+
+    status = poller.get_write_queue_status()
+    assert status["running"] is False
+    assert status["committed"] == 4
+    assert status["commits"] == 1
+    assert status["dropped"] == 0
+    assert len(poller.get_metric_series("open_meteo", "1001", "temperature", None, None)) == 4
+
+
 def test_economics_metrics_are_computed_and_persisted(monkeypatch, tmp_path):
     current_iso = datetime.now(timezone.utc).isoformat()
     settings = {
@@ -1675,19 +3112,10 @@ def test_economics_metrics_are_computed_and_persisted(monkeypatch, tmp_path):
         "hashcost_btc_th_day__whatsminer__miner01",
     } <= metric_names
 
-    with sqlite3.connect(tmp_path / "telemetry.sqlite3") as conn:
-        raw_event = conn.execute(
-            """
-            SELECT payload
-            FROM raw_events
-            WHERE device_type = 'economics' AND device_id = 'market'
-            ORDER BY id DESC
-            LIMIT 1
-            """
-        ).fetchone()
+    raw_events = poller.get_raw_events("economics", "market", limit=1)
 
-    assert raw_event is not None
-    raw_payload = json.loads(raw_event[0])
+    assert len(raw_events) == 1
+    raw_payload = raw_events[0]["payload"]
     assert raw_payload["exchange_rate"]["crypto_usd"]["prices"]["USD"] == 100000
     assert raw_payload["exchange_rate"]["usd_fiat"]["rates"]["EUR"] == 100.0
     assert raw_payload["hashprice"]["reward_stats"]["payload"]["totalReward"] == "90000000000"
@@ -1900,6 +3328,7 @@ def test_economics_is_polled_immediately_on_start(monkeypatch, tmp_path):
 
     poller = DevicePoller(settings, data_dir=tmp_path)
     poller.start()
+    wait_for_first_runs(poller)
     try:
         assert len(calls) == 1
         latest_payloads = poller.get_latest_payloads()
@@ -2048,3 +3477,242 @@ def test_economics_time_of_day_tariff_uses_location_timezone(monkeypatch, tmp_pa
     payload = poller.poll_economics(settings["economics"])
 
     assert payload["derived"]["electricity_price_rub_kwh"] == 5.0
+
+
+def test_update_settings_reconciles_only_changed_poll_jobs(monkeypatch, tmp_path):
+    calls = []
+    polled = threading.Event()
+
+    def fake_poll_whatsminer(self, device, request=None):
+        calls.append((device["device_id"], device.get("host"), threading.current_thread().name))
+        polled.set()
+        return {"ok": True}
+
+    monkeypatch.setattr(DevicePoller, "poll_whatsminer_device", fake_poll_whatsminer)
+
+    def miner(device_id, host="miner.local", refresh_interval=30):
+        return {"device_id": device_id, "host": host, "refresh_interval": refresh_interval}
+
+    settings = {"devices": {"whatsminer": [miner("a"), miner("b"), miner("c")]}}
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    poller.start()
+    wait_for_first_runs(poller)
+    try:
+        scheduler = poller._scheduler
+        before = {job.id: job.next_run_time for job in scheduler.get_jobs()}
+        assert len(calls) == 3
+        calls.clear()
+        polled.clear()
+
+        poller.update_settings(
+            {
+                "devices": {
+                    "whatsminer": [
+                        miner("a"),
+                        miner("b", refresh_interval=60),
+                        miner("d"),
+                    ]
+                }
+            }
+        )
+
+        assert poller._scheduler is scheduler
+        jobs = {job.id: job for job in scheduler.get_jobs()}
+        assert sorted(jobs) == ["whatsminer-a", "whatsminer-b", "whatsminer-d"]
+        assert jobs["whatsminer-a"].next_run_time == before["whatsminer-a"]
+        assert "interval[0:01:00]" in str(jobs["whatsminer-b"].trigger)
+        # The new device is polled right away, on a scheduler thread.
+        assert polled.wait(5)
+        assert calls[0][:2] == ("d", "miner.local")
+        assert calls[0][2] != threading.current_thread().name
+
+        calls.clear()
+        polled.clear()
+        poller.update_settings(
+            {
+                "devices": {
+                    "whatsminer": [
+                        miner("a", host="other.local"),
+                        miner("b", refresh_interval=60),
+                        miner("d"),
+                    ]
+                }
+            }
+        )
+        assert polled.wait(5)
+        assert calls[0][:2] == ("a", "other.local")
+        assert scheduler.get_job("whatsminer-a").args[1]["host"] == "other.local"
+    finally:
+        poller.shutdown()
+
+
+def test_start_returns_before_first_polls_and_reports_readiness(monkeypatch, tmp_path):
+    release = threading.Event()
+
+    def fake_poll_whatsminer(self, device, request=None):
+        if device["device_id"] == "slow":
+            release.wait(5)
+            raise OSError("miner unreachable")
+        return {"ok": True}
+
+    monkeypatch.setattr(DevicePoller, "poll_whatsminer_device", fake_poll_whatsminer)
+    settings = {"devices": {"whatsminer": [{"device_id": "slow"}, {"device_id": "fast"}]}}
+    poller = DevicePoller(settings, data_dir=tmp_path)
+
+    started_at = time.monotonic()
+    poller.start()
+    try:
+        assert time.monotonic() - started_at < 1
+        deadline = time.monotonic() + 5
+        while not poller.get_readiness()["devices"][0]["polled"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        readiness = poller.get_readiness()
+        assert readiness["ready"] is False
+        assert [(device["device_id"], device["polled"], device["reported"]) for device in readiness["devices"]] == [
+            ("fast", True, True),
+            ("slow", False, False),
+        ]
+
+        release.set()
+        readiness = wait_for_first_runs(poller)
+        # The slow miner failed: it was polled but has nothing to report.
+        assert readiness["devices"][1] == {
+            "device_type": "whatsminer",
+            "device_id": "slow",
+            "polled": True,
+            "reported": False,
+            "last_reported_at": None,
+        }
+    finally:
+        release.set()
+        poller.shutdown()
+
+
+def test_start_migrates_storage_in_the_background_before_polling(monkeypatch, tmp_path):
+    migrating = threading.Event()
+    release = threading.Event()
+    ensure_tables = DevicePoller._ensure_tables
+    calls = []
+
+    def slow_ensure_tables(self, conn):
+        migrating.set()
+        release.wait(5)
+        ensure_tables(self, conn)
+
+    def fake_poll_whatsminer(self, device, request=None):
+        calls.append(device["device_id"])
+        return {"ok": True}
+
+    monkeypatch.setattr(DevicePoller, "_ensure_tables", slow_ensure_tables)
+    monkeypatch.setattr(DevicePoller, "poll_whatsminer_device", fake_poll_whatsminer)
+    poller = DevicePoller({"devices": {"whatsminer": [{"device_id": "miner01"}]}}, data_dir=tmp_path)
+
+    started_at = time.monotonic()
+    poller.start()
+    try:
+        assert time.monotonic() - started_at < 1
+        assert migrating.wait(5)
+        readiness = poller.get_readiness()
+        assert (readiness["ready"], readiness["storage_ready"]) == (False, False)
+        # Settings can change while the migration is still running.
+        poller.update_settings({"devices": {"whatsminer": [{"device_id": "miner01", "refresh_interval": 60}]}})
+        assert calls == []
+
+        release.set()
+        readiness = wait_for_first_runs(poller)
+        assert readiness["storage_ready"] is True
+        assert calls == ["miner01"]
+        assert "interval[0:01:00]" in str(poller._scheduler.get_job("whatsminer-miner01").trigger)
+    finally:
+        release.set()
+        poller.shutdown()
+
+
+def test_metrics_retention_evicts_only_drained_series_from_latest_values(tmp_path):
+    settings = {
+        "database": {
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 600,
+                    "rollups": [{"resolution_seconds": 600, "retention_seconds": 86_400, "sample": "last"}],
+                }
+            }
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    for ts_ms, metric in [(1_000, "room_temp"), (61_000, "room_temp"), (61_000, "target_temp"), (1_300_000, "target_temp")]:
+        poller._write_metrics(
+            ts_ms=ts_ms,
+            device_type="zont",
+            device_id="12000",
+            metrics=[MetricSample(name=metric, value=21.0, unit="celsius")],
+        )
+    poller._warm_latest_values()
+
+    poller._apply_metrics_retention(reference_ts_ms=1_300_000)
+
+    # Only room_temp lost all of its raw samples; the index is not reloaded.
+    assert poller._latest_values.loaded is True
+    assert poller._latest_values.get("zont", "12000", "room_temp") is None
+    assert poller._latest_values.get("zont", "12000", "target_temp").ts == 1_300_000
+    poller.shutdown()
+
+
+def test_change_only_reads_reject_count_based_aggregates_over_rollups(tmp_path):
+    settings = {
+        "database": {
+            "change_only": {"enabled": True, "heartbeat_seconds": 3_600},
+            "retention": {
+                "metrics": {
+                    "enabled": True,
+                    "interval_seconds": 3_600,
+                    "raw_retention_seconds": 600,
+                    "rollups": [{"resolution_seconds": 600, "retention_seconds": 86_400 * 365, "sample": "last"}],
+                }
+            },
+        }
+    }
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    start_ms = (now_ms - 7_200_000) // 600_000 * 600_000
+    # 20 W held for nine minutes, then 30 W for one: only two samples are stored.
+    for minute, power in enumerate([20.0] * 9 + [30.0]):
+        poller._write_metrics(
+            ts_ms=start_ms + minute * 60_000,
+            device_type="whatsminer",
+            device_id="miner01",
+            metrics=[MetricSample(name="power", value=power, unit="W")],
+        )
+    poller._apply_metrics_retention(reference_ts_ms=now_ms)
+
+    for aggregate in ("avg", "sum", "count", "twa"):
+        with pytest.raises(ValueError, match="change-only"):
+            poller.get_metric_series("whatsminer", "miner01", "power", start_ms, now_ms, aggregate=aggregate)
+    assert [
+        point["value"]
+        for point in poller.get_metric_series("whatsminer", "miner01", "power", start_ms, now_ms, aggregate="max")
+    ] == [30.0]
+    poller.shutdown()
+
+
+def test_change_only_downsampling_takes_the_first_stored_value_of_each_step(tmp_path):
+    settings = {"database": {"change_only": {"enabled": True, "heartbeat_seconds": 3_600}}}
+    poller = DevicePoller(settings, data_dir=tmp_path)
+    # 20 W held for 50 s, then 30 W: the stored points are 0 s, 40 s
+    # (the last skipped sample before the change) and 50 s.
+    for second, power in [(0, 20.0), (10, 20.0), (20, 20.0), (30, 20.0), (40, 20.0), (50, 30.0), (60, 30.0)]:
+        poller._write_metrics(
+            ts_ms=second * 1_000,
+            device_type="whatsminer",
+            device_id="miner01",
+            metrics=[MetricSample(name="power", value=power, unit="W")],
+        )
+
+    points = poller.get_metric_series("whatsminer", "miner01", "power", 0, 59_999, max_points=1)
+
+    # An average of the stored points would report 23.3 W for a minute
+    # that held 20 W for most of it.
+    assert points == [{"ts": 0, "value": 20.0}]
+    poller.shutdown()
@@ -0,0 +1,64 @@
+import sqlite3
+
+from proof_of_heat.services.device_polling import DevicePoller
+from proof_of_heat.services.latest_values import LatestSample, LatestValueIndex
+
+
+def test_latest_value_index_loads_newest_sample_per_metric():
+    conn = sqlite3.connect(":memory:")
+    DevicePoller({}, data_dir=None)._ensure_tables(conn)
+    conn.executemany(
+        "INSERT INTO metrics (ts, device_type, device_id, metric, value, unit) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (1_000, "whatsminer", "miner01", "power", 3000.0, "w"),
+            (3_000, "whatsminer", "miner01", "power", 3100.0, "w"),
+            (2_000, "whatsminer", "miner01", "power", 3050.0, "w"),
+            (2_500, "whatsminer", "miner02", "power", 1500.0, "w"),
+            (2_500, "zont", "12000", "room_temp", 21.5, "celsius"),
+        ],
+    )
+
+    index = LatestValueIndex()
+    index.update([{"ts": 4_000, "device_type": "zont", "device_id": "12000", "metric": "room_temp", "value": 22.0}])
+    index.load(conn)
+
+    assert index.loaded is True
+    assert len(index) == 3
+    assert index.get("whatsminer", "miner01", "power") == LatestSample(ts=3_000, value=3100.0, unit="w")
+    assert index.get("zont", "12000", "room_temp") == LatestSample(ts=4_000, value=22.0)
+    assert set(index.get_metric("power")) == {("whatsminer", "miner01"), ("whatsminer", "miner02")}
+    assert index.get("whatsminer", "miner03", "power") is None
+
+
+def test_latest_value_index_ignores_older_updates_and_can_be_invalidated():
+    index = LatestValueIndex()
+    row = {"device_type": "economics", "device_id": "market", "metric": "exchange_rate_btc_usd", "unit": "USD/BTC"}
+
+    index.update([{**row, "ts": 2_000, "value": 70_000.0}])
+    index.update([{**row, "ts": 1_000, "value": 60_000.0}, {**row, "ts": 2_000, "value": None}])
+    assert index.get("economics", "market", "exchange_rate_btc_usd").value == 70_000.0
+
+    index.update([{**row, "ts": 2_000, "value": 71_000.0}])
+    assert index.get("economics", "market", "exchange_rate_btc_usd").value == 71_000.0
+
+    index.invalidate()
+    assert index.loaded is False
+    assert index.get("economics", "market", "exchange_rate_btc_usd") is None
+
+
+def test_latest_value_index_discards_only_older_samples_of_given_series():
+    index = LatestValueIndex()
+    index.update(
+        [
+            {"ts": 1_000, "device_type": "zont", "device_id": "12000", "metric": "room_temp", "value": 21.0},
+            {"ts": 5_000, "device_type": "zont", "device_id": "12001", "metric": "room_temp", "value": 22.0},
+            {"ts": 1_000, "device_type": "zont", "device_id": "12002", "metric": "room_temp", "value": 23.0},
+        ]
+    )
+
+    index.discard_older([("zont", "12000", "room_temp"), ("zont", "12001", "room_temp")], 2_000)
+
+    assert index.loaded is False
+    assert index.get("zont", "12000", "room_temp") is None
+    assert index.get("zont", "12001", "room_temp").value == 22.0
+    assert index.get("zont", "12002", "room_temp").value == 23.0
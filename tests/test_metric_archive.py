@@ -0,0 +1,40 @@
+import pytest
+
+from proof_of_heat.services.metric_archive import MetricArchive
+
+DAY_MS = 86_400_000
+
+
+def test_metric_archive_partitions_by_day_and_round_trips_rows(tmp_path):
+    archive = MetricArchive(tmp_path / "archive", "csv")
+    rows = [
+        (DAY_MS - 1, "zont", "12000", "room_temp", 21.5, "c"),
+        (DAY_MS, "zont", "12000", "room_temp", 21.0, None),
+        (2 * DAY_MS + 5, "whatsminer", "miner01", "power", 3_000.0, "w"),
+    ]
+
+    assert archive.write("samples", rows) == 3
+    archive.write("samples", [(DAY_MS + 1, "zont", "12000", "room_temp", 22.0, "c")])
+
+    assert sorted(path.name for path in (tmp_path / "archive" / "samples").iterdir()) == [
+        "1970-01-01",
+        "1970-01-02",
+        "1970-01-03",
+    ]
+    assert len(list((tmp_path / "archive" / "samples" / "1970-01-02").glob("part-*.csv.gz"))) == 2
+    assert sorted(archive.read("samples")) == sorted([*rows, (DAY_MS + 1, "zont", "12000", "room_temp", 22.0, "c")])
+    assert sorted(archive.read("samples", DAY_MS, 2 * DAY_MS, predicate=lambda row: row[3] == "room_temp")) == [
+        (DAY_MS, "zont", "12000", "room_temp", 21.0, None),
+        (DAY_MS + 1, "zont", "12000", "room_temp", 22.0, "c"),
+    ]
+
+
+def test_metric_archive_ignores_unfinished_files_and_rejects_unknown_formats(tmp_path):
+    archive = MetricArchive(tmp_path / "archive", "auto")
+    (tmp_path / "archive" / "samples" / "1970-01-01").mkdir(parents=True)
+    (tmp_path / "archive" / "samples" / "1970-01-01" / ".part-1.csv.gz.tmp").write_bytes(b"partial")
+
+    assert list(archive.read("samples")) == []
+    assert list(archive.read("rollups")) == []
+    with pytest.raises(ValueError):
+        MetricArchive(tmp_path / "archive", "orc")
@@ -0,0 +1,51 @@
+import logging
+
+from proof_of_heat.services import payload_compression
+from proof_of_heat.services.payload_compression import (
+    ZLIB_MAX_DICTIONARY_SIZE,
+    build_dictionary,
+    compress_payload,
+    decompress_payload,
+    parse_payload_compression_options,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def test_zlib_payloads_round_trip_with_and_without_a_dictionary():
+    samples = [f'{{"summary":{{"power":{3_000 + index},"fan-speed-in":4980}}}}'.encode() for index in range(20)]
+    dictionary = build_dictionary("zlib", samples, 1_024)
+    payload = b'{"summary":{"power":3123,"fan-speed-in":4980}}'
+
+    plain = compress_payload("zlib", payload, level=6)
+    with_dictionary = compress_payload("zlib", payload, level=6, dictionary=dictionary)
+
+    assert decompress_payload("zlib", plain) == payload
+    assert decompress_payload("zlib", with_dictionary, dictionary=dictionary) == payload
+    assert len(with_dictionary) < len(plain)
+
+
+def test_zlib_dictionary_keeps_the_newest_samples_within_the_window():
+    samples = [bytes([index]) * 10_000 for index in range(5)]
+
+    dictionary = build_dictionary("zlib", samples, 1_000_000)
+
+    assert len(dictionary) == ZLIB_MAX_DICTIONARY_SIZE
+    assert dictionary.endswith(bytes([4]) * 10_000)
+
+
+def test_payload_compression_options_fall_back_to_zlib_and_defaults(monkeypatch):
+    monkeypatch.setattr(payload_compression, "zstandard", None)
+
+    assert parse_payload_compression_options({}, logger=logger).codec == "zlib"
+    options = parse_payload_compression_options(
+        {"database": {"payload_compression": {"codec": "zstd", "level": 19, "dictionary": True}}},
+        logger=logger,
+    )
+    invalid = parse_payload_compression_options(
+        {"database": {"payload_compression": {"codec": "lz4", "dictionary_samples": 0}}},
+        logger=logger,
+    )
+
+    assert (options.codec, options.level, options.dictionary) == ("zlib", 6, True)
+    assert (invalid.codec, invalid.dictionary_samples) == ("zlib", 200)
@@ -0,0 +1,80 @@
+import logging
+
+from proof_of_heat.services.series_cache import (
+    SeriesCache,
+    SeriesCacheOptions,
+    parse_series_cache_options,
+)
+
+
+logger = logging.getLogger("tests.series.cache")
+
+SERIES = ("zont", "12000", "room_temp")
+
+
+def test_series_cache_options_are_parsed_from_database_settings():
+    options = parse_series_cache_options(
+        {"database": {"series_cache": {"enabled": False, "max_mb": 0}}},
+        logger=logger,
+    )
+
+    assert options == SeriesCacheOptions(enabled=False, max_mb=32)
+    assert parse_series_cache_options({"database": {"series_cache": {"max_mb": "8"}}}, logger=logger).max_bytes == (
+        8 * 1024 * 1024
+    )
+    assert parse_series_cache_options({}, logger=logger) == SeriesCacheOptions()
+
+
+def test_series_cache_evicts_least_recently_used_entries_by_size():
+    cache = SeriesCache(SeriesCacheOptions(max_mb=1))
+    # 24 bytes per point, so two of these fit and a third does not.
+    points = [(ts, 1.0, 0) for ts in range(20_000)]
+    for key in ("a", "b"):
+        cache.put(key, SERIES, cache.version(SERIES), 20_000, points)
+    assert cache.get("a") is not None
+
+    cache.put("c", SERIES, cache.version(SERIES), 20_000, points)
+
+    assert cache.get("b") is None
+    assert list(cache.get("a").points())[:2] == [(0, 1.0, 0), (1, 1.0, 0)]
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 960_000, 1)
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_series_cache_drops_entries_only_for_writes_into_their_closed_part():
+    cache = SeriesCache()
+    cache.put("room", SERIES, cache.version(SERIES), 5_000, [(1_000, 20.0, 0)])
+    cache.put("power", ("whatsminer", "miner01", "power"), cache.version(SERIES), 5_000, [])
+    stale_version = cache.version(SERIES)
+
+    cache.invalidate_writes([{"ts": 6_000, "device_type": "zont", "device_id": "12000", "metric": "room_temp"}])
+    assert cache.get("room") is not None
+
+    cache.invalidate_writes([{"ts": 4_000, "device_type": "zont", "device_id": "12000", "metric": "room_temp"}])
+    assert cache.get("room") is None
+    assert cache.get("power") is not None
+
+    # A read that started before the invalidation must not repopulate it.
+    cache.put("room", SERIES, stale_version, 5_000, [(1_000, 20.0, 0)])
+    assert cache.get("room") is None
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_series_cache_rejects_a_read_that_overlapped_a_write_to_its_series():
+    cache = SeriesCache()
+    # The read takes its version and snapshot, then a backdated write
+    # commits before the read stores its closed range. Nothing was cached
+    # yet, so no entry is dropped, but the read must not be stored.
+    version = cache.version(SERIES)
+    cache.invalidate_writes([{"ts": 2_000, "device_type": "zont", "device_id": "12000", "metric": "room_temp"}])
+    cache.put("room", SERIES, version, 5_000, [(1_000, 20.0, 0)])
+    assert cache.get("room") is None
+
+    # Writes to other series do not affect it.
+    version = cache.version(SERIES)
+    cache.invalidate_writes([{"ts": 2_000, "device_type": "whatsminer", "device_id": "miner01", "metric": "power"}])
+    cache.put("room", SERIES, version, 5_000, [(1_000, 20.0, 0)])
+    assert cache.get("room") is not None
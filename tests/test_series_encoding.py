@@ -0,0 +1,74 @@
+import gzip
+import json
+import math
+import struct
+
+from proof_of_heat.services.series_encoding import (
+    BINARY_MEDIA_TYPE,
+    COLUMNAR_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    decode_binary,
+    encode_binary,
+    encode_columnar,
+    iter_csv,
+    iter_gzip,
+    iter_ndjson,
+    negotiate_series_format,
+)
+
+
+def test_negotiate_series_format_is_opt_in_and_honours_quality():
+    assert negotiate_series_format(None) == JSON_MEDIA_TYPE
+    assert negotiate_series_format("*/*") == JSON_MEDIA_TYPE
+    assert negotiate_series_format("application/json") == JSON_MEDIA_TYPE
+    assert negotiate_series_format(COLUMNAR_MEDIA_TYPE) == COLUMNAR_MEDIA_TYPE
+    assert negotiate_series_format(f"{BINARY_MEDIA_TYPE};q=0.4, {COLUMNAR_MEDIA_TYPE};q=0.9") == COLUMNAR_MEDIA_TYPE
+    assert negotiate_series_format(f"{BINARY_MEDIA_TYPE};q=0") == JSON_MEDIA_TYPE
+
+
+
+def test_negotiate_series_format_ranks_json_and_wildcards_with_the_opt_in_types():
+    assert negotiate_series_format(f"application/json, {BINARY_MEDIA_TYPE};q=0.5") == JSON_MEDIA_TYPE
+    assert negotiate_series_format(f"application/json;q=1, {COLUMNAR_MEDIA_TYPE};q=0.1") == JSON_MEDIA_TYPE
+    assert negotiate_series_format(f"*/*;q=0.8, {COLUMNAR_MEDIA_TYPE};q=0.9") == COLUMNAR_MEDIA_TYPE
+    assert negotiate_series_format(f"{BINARY_MEDIA_TYPE}, */*;q=0.1") == BINARY_MEDIA_TYPE
+    # Ties keep plain JSON.
+    assert negotiate_series_format(f"{COLUMNAR_MEDIA_TYPE}, application/json") == JSON_MEDIA_TYPE
+    assert negotiate_series_format(f"{BINARY_MEDIA_TYPE};q=0.5, application/*;q=0.5") == JSON_MEDIA_TYPE
+
+
+def test_encode_columnar_delta_encodes_timestamps():
+    assert encode_columnar([], []) == {"ts": [], "values": []}
+    assert encode_columnar([1_000, 1_500, 3_000], [1.0, None, 2.0]) == {
+        "ts": [1_000, 500, 1_500],
+        "values": [1.0, None, 2.0],
+    }
+
+
+def test_encode_binary_uses_little_endian_layout_and_round_trips():
+    ts = [1_700_000_000_000, 1_700_000_030_000]
+    values = [21.5, None]
+
+    payload = encode_binary(ts, values)
+
+    assert len(payload) == 4 + 2 * 8 + 2 * 8
+    assert struct.unpack_from("<I", payload) == (2,)
+    assert struct.unpack_from("<2q", payload, 4) == tuple(ts)
+    first, second = struct.unpack_from("<2d", payload, 20)
+    assert first == 21.5 and math.isnan(second)
+    assert decode_binary(payload) == (ts, values)
+
+
+def test_export_encoders_stream_one_block_per_chunk():
+    columns = ("ts", "metric", "value")
+    chunks = [[(1_000, "room_temp", 21.5)], [(2_000, "power, total", None)]]
+
+    csv_blocks = list(iter_csv(columns, chunks))
+    ndjson_blocks = list(iter_ndjson(columns, chunks))
+
+    assert csv_blocks == [b"ts,metric,value\n", b"1000,room_temp,21.5\n", b'2000,"power, total",\n']
+    assert [json.loads(block) for block in ndjson_blocks] == [
+        {"ts": 1_000, "metric": "room_temp", "value": 21.5},
+        {"ts": 2_000, "metric": "power, total", "value": None},
+    ]
+    assert gzip.decompress(b"".join(iter_gzip(iter(csv_blocks)))) == b"".join(csv_blocks)
@@ -0,0 +1,106 @@
+import copy
+import logging
+
+import pytest
+import yaml
+
+from proof_of_heat.settings_store import SettingsStore
+
+
+logger = logging.getLogger("tests.settings.store")
+
+
+def build_store(tmp_path):
+    path = tmp_path / "settings.yaml"
+    path.write_text("devices: {}\n", encoding="utf-8")
+    parses = []
+
+    def parse(raw_yaml):
+        parses.append(raw_yaml)
+        parsed = yaml.safe_load(raw_yaml)
+        if not isinstance(parsed, dict):
+            raise ValueError("Settings YAML must be a mapping at the top level.")
+        return parsed
+
+    def save(raw_yaml):
+        parsed = parse(raw_yaml)
+        path.write_text(yaml.safe_dump(parsed, sort_keys=False), encoding="utf-8")
+        return parsed
+
+    def signature():
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    store = SettingsStore(
+        load_yaml=lambda: path.read_text(encoding="utf-8"),
+        parse_yaml=parse,
+        save_yaml=save,
+        signature=signature,
+        logger=logger,
+    )
+    return store, path, parses
+
+
+def test_settings_store_parses_only_when_the_file_changes(tmp_path):
+    store, path, parses = build_store(tmp_path)
+    notified = []
+    store.subscribe(notified.append)
+
+    first = store.snapshot()
+    assert store.snapshot() is first
+    assert store.data == {"devices": {}}
+    assert len(parses) == 1
+    assert notified == []
+
+    # Rewriting the same content changes the mtime but not the hash.
+    path.write_text("devices: {}\n", encoding="utf-8")
+    assert store.data is first.data
+    assert len(parses) == 1
+
+    path.write_text("devices: {}\nheating_mode:\n  enabled: false\n", encoding="utf-8")
+    assert store.data["heating_mode"] == {"enabled": False}
+    assert len(parses) == 2
+    assert notified == [store.data]
+    assert store.stats()["reloads"] == 2
+
+
+def test_settings_store_save_notifies_and_keeps_last_valid_snapshot(tmp_path):
+    store, path, parses = build_store(tmp_path)
+    notified = []
+    store.subscribe(notified.append)
+    store.subscribe(lambda data: 1 / 0)
+
+    saved = store.save("devices: {}\nheating_curve:\n  slope: 5.0\n")
+
+    assert notified == [saved]
+    assert store.data is saved
+    parse_count = len(parses)
+
+    path.write_text("- not a mapping\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        store.snapshot()
+    path.write_text(yaml.safe_dump(copy.deepcopy(saved), sort_keys=False), encoding="utf-8")
+    assert store.data is saved
+    assert len(parses) == parse_count + 1
+    assert len(notified) == 1
+
+
+def test_settings_snapshot_cannot_be_mutated_through_a_reader(tmp_path):
+    store, path, parses = build_store(tmp_path)
+    path.write_text("devices:\n  zont:\n    - device_id: 1\n", encoding="utf-8")
+    data = store.data
+
+    with pytest.raises(TypeError):
+        data["heating_mode"] = {"enabled": False}
+    with pytest.raises(TypeError):
+        data["devices"]["zont"].append({"device_id": 2})
+    with pytest.raises(TypeError):
+        data["devices"]["zont"][0].update(device_id=3)
+    assert store.data == {"devices": {"zont": [{"device_id": 1}]}}
+    assert isinstance(store.data["devices"], dict)
+
+    # A deep copy is a plain, editable version that leaves the store alone.
+    edited = copy.deepcopy(data)
+    edited["devices"]["zont"].append({"device_id": 2})
+    assert store.data == {"devices": {"zont": [{"device_id": 1}]}}
+    assert yaml.safe_load(yaml.safe_dump(edited)) == {"devices": {"zont": [{"device_id": 1}, {"device_id": 2}]}}
@@ -0,0 +1,128 @@
+import logging
+
+import pytest
+
+from proof_of_heat.services.sqlite_pool import (
+    SQLiteConnectionManager,
+    SQLiteConnectionOptions,
+    parse_connection_options,
+)
+
+
+logger = logging.getLogger("tests.sqlite.pool")
+
+
+def test_connection_options_are_parsed_from_database_settings():
+    options = parse_connection_options(
+        {
+            "database": {
+                "connection": {
+                    "journal_mode": "WAL",
+                    "synchronous": "full",
+                    "cache_size": -2048,
+                    "mmap_size": 268435456,
+                    "read_pool_size": 4,
+                }
+            }
+        },
+        logger=logger,
+    )
+
+    assert options == SQLiteConnectionOptions(
+        journal_mode="wal",
+        synchronous="full",
+        cache_size=-2048,
+        mmap_size=268_435_456,
+        busy_timeout_ms=5000,
+        read_pool_size=4,
+    )
+    assert parse_connection_options({}, logger=logger) == SQLiteConnectionOptions()
+
+
+def test_connection_manager_reuses_writer_and_pooled_readers(tmp_path):
+    created = []
+    manager = SQLiteConnectionManager(
+        tmp_path / "pool.sqlite3",
+        logger=logger,
+        options=SQLiteConnectionOptions(cache_size=-1024, mmap_size=1_048_576),
+        on_writer_connect=lambda conn: created.append(
+            conn.execute("CREATE TABLE IF NOT EXISTS sample (value INTEGER)")
+        ),
+    )
+
+    for value in range(5):
+        with manager.writer() as conn:
+            conn.execute("INSERT INTO sample (value) VALUES (?)", (value,))
+    for _ in range(5):
+        with manager.reader() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM sample").fetchone()[0]
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+
+    stats = manager.stats()
+    manager.close()
+
+    assert len(created) == 1
+    assert count == 5
+    assert journal_mode == "wal"
+    assert cache_size == -1024
+    assert stats["connects"] == 2
+    assert stats["writer_transactions"] == 5
+    assert stats["reader_checkouts"] == 5
+
+
+def test_connection_manager_rolls_back_failed_writes_and_rejects_reader_writes(tmp_path):
+    rollbacks = []
+    manager = SQLiteConnectionManager(
+        tmp_path / "pool.sqlite3",
+        logger=logger,
+        on_writer_connect=lambda conn: conn.execute("CREATE TABLE IF NOT EXISTS sample (value INTEGER)"),
+        on_writer_rollback=lambda: rollbacks.append(True),
+    )
+
+    with pytest.raises(RuntimeError):
+        with manager.writer() as conn:
+            conn.execute("INSERT INTO sample (value) VALUES (1)")
+            raise RuntimeError("boom")
+    assert rollbacks == [True]
+
+    with manager.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sample").fetchone()[0] == 0
+        with pytest.raises(Exception, match="readonly"):
+            conn.execute("INSERT INTO sample (value) VALUES (2)")
+
+    manager.close()
+
+
+def test_connection_manager_swaps_in_a_compacted_copy(tmp_path):
+    db_path = tmp_path / "pool.sqlite3"
+    manager = SQLiteConnectionManager(
+        db_path,
+        logger=logger,
+        options=SQLiteConnectionOptions(busy_timeout_ms=50),
+        on_writer_connect=lambda conn: conn.execute("CREATE TABLE IF NOT EXISTS sample (value BLOB)"),
+    )
+    with manager.writer() as conn:
+        conn.executemany("INSERT INTO sample (value) VALUES (?)", [(b"x" * 4096,)] * 200)
+    with manager.writer() as conn:
+        conn.execute("DELETE FROM sample WHERE rowid > 10")
+    with manager.writer() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size_before = db_path.stat().st_size
+
+    # A reader that is still checked out holds the swap back.
+    with manager.reader() as conn:
+        conn.execute("SELECT COUNT(*) FROM sample").fetchone()
+        assert manager.compact_into_copy() is False
+    assert manager.compact_into_copy() is True
+
+    with manager.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sample").fetchone()[0] == 10
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    with manager.writer() as conn:
+        conn.execute("INSERT INTO sample (value) VALUES (x'00')")
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    manager.close()
+
+    assert db_path.stat().st_size < size_before
+    assert not db_path.with_name("pool.sqlite3.compact").exists()
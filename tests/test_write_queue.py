@@ -0,0 +1,92 @@
+import logging
+import threading
+
+from proof_of_heat.services.write_queue import (
+    WriteBehindQueue,
+    WriteQueueOptions,
+    parse_write_queue_options,
+)
+
+
+logger = logging.getLogger("tests.write.queue")
+
+
+def test_write_queue_options_are_parsed_from_database_settings():
+    options = parse_write_queue_options(
+        {
+            "database": {
+                "write_queue": {
+                    "enabled": False,
+                    "max_batch_size": 50,
+                    "max_latency_ms": 0,
+                    "max_queue_size": -1,
+                }
+            }
+        },
+        logger=logger,
+    )
+
+    assert options == WriteQueueOptions(
+        enabled=False,
+        max_batch_size=50,
+        max_latency_ms=0,
+        max_queue_size=10_000,
+    )
+    assert parse_write_queue_options({}, logger=logger) == WriteQueueOptions()
+
+
+def test_write_queue_groups_items_into_batches_and_flushes_on_stop():
+    commits = []
+    queue = WriteBehindQueue(
+        commits.append,
+        logger=logger,
+        options=WriteQueueOptions(max_batch_size=4, max_latency_ms=60_000),
+    )
+    queue.start()
+    for item in range(10):
+        assert queue.submit(item)
+
+    assert queue.stop(timeout=5)
+    stats = queue.stats()
+
+    assert [item for group in commits for item in group] == list(range(10))
+    assert max(len(group) for group in commits) == 4
+    assert len(commits) == 3
+    assert stats["running"] is False
+    assert stats["committed"] == 10
+    assert stats["commits"] == 3
+    assert stats["queue_depth"] == 0
+
+
+def test_write_queue_drops_items_when_full_and_retries_failed_groups():
+    release = threading.Event()
+    commits = []
+
+    def commit(items):
+        release.wait(timeout=5)
+        if "bad" in items:
+            raise ValueError("bad item")
+        commits.append(items)
+
+    queue = WriteBehindQueue(
+        commit,
+        logger=logger,
+        options=WriteQueueOptions(max_batch_size=10, max_latency_ms=0, max_queue_size=2),
+    )
+    queue.start()
+    assert queue.submit("first")
+    while queue.stats()["in_flight"] == 0:
+        threading.Event().wait(0.01)
+    assert queue.submit("good")
+    assert queue.submit("bad")
+    assert not queue.submit("overflow")
+
+    release.set()
+    assert queue.flush(timeout=5)
+    stats = queue.stats()
+    queue.stop(timeout=5)
+
+    assert commits == [["first"], ["good"]]
+    assert stats["dropped"] == 1
+    assert stats["failed"] == 1
+    assert stats["committed"] == 2